@@ -0,0 +1,344 @@
+# Copyright 2016 PerfKitBenchmarker Authors. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Caches files downloaded by packages on the controller.
+
+Packages declare the files they download as Artifacts in their ARTIFACTS
+attribute. Rather than each VM downloading them, the controller downloads
+every artifact once, into --artifact_cache_dir, and pushes it to the VMs (see
+BaseLinuxMixin.InstallBatch).
+
+The cache is content addressed:
+
+  <cache dir>/sha256/<SHA-256 of the content>  holds the content.
+  <cache dir>/urls/<SHA-256 of the URL>        holds the SHA-256 of the content
+                                               last downloaded from the URL.
+
+When an artifact declares its checksum, the downloaded content must match it,
+and a file with the right name under sha256/ is used without consulting the
+URL. Otherwise the checksum seen on the first download is recorded under
+urls/, and later runs reuse that content: a warning is logged, since that
+content is trusted as is. Either way, a download shorter than its
+Content-Length, or an archive (.tar.gz, .tgz, .tar.bz2, .tar, .zip, .jar)
+that cannot be read to the end, is not cached. With --artifact_cache_offline,
+nothing is downloaded, so a cache directory populated by an earlier run (or
+copied from another machine) is enough to install packages offline.
+
+The cache also holds the trees of packages compiled from source, so that they
+are compiled once per package version, OS image and CPU rather than on every
+VM of every run (see BaseLinuxMixin.CachedBuild):
+
+  <cache dir>/builds/<package>/<SHA-256 of the key>.tar.gz
+"""
+
+import hashlib
+import logging
+import os
+import posixpath
+import tarfile
+import tempfile
+import threading
+import urllib2
+import urlparse
+import zipfile
+
+from perfkitbenchmarker import errors
+from perfkitbenchmarker import flags
+from perfkitbenchmarker import vm_util
+
+flags.DEFINE_string('artifact_cache_dir', None,
+                    'Directory where the controller caches the files that '
+                    'packages download. Defaults to "artifacts" in the '
+                    'PerfKitBenchmarker temporary directory, which persists '
+                    'across runs.')
+flags.DEFINE_boolean('artifact_cache_offline', False,
+                     'If true, never download artifacts: they must be found '
+                     'in --artifact_cache_dir.')
+flags.DEFINE_boolean('build_cache', True,
+                     'If true, packages compiled from source are compiled on '
+                     'one VM, and the resulting files are stored in '
+                     '--artifact_cache_dir and extracted on the other VMs, '
+                     'in this run and later ones. If false, every VM compiles '
+                     'them.')
+
+FLAGS = flags.FLAGS
+
+_DOWNLOAD_CHUNK_SIZE = 1024 * 1024
+_DOWNLOAD_TIMEOUT = 300
+# Suffixes of the file names of the archives checked by _CheckArchive.
+_TAR_SUFFIXES = ('.tar.gz', '.tgz', '.tar.bz2', '.tar')
+_ZIP_SUFFIXES = ('.zip', '.jar')
+
+# Serializes downloads of the same URL, and builds with the same key, by the
+# threads of this process.
+_locks = {}
+_locks_lock = threading.Lock()
+
+
+class Artifact(object):
+  """A file a package downloads.
+
+  Attributes:
+    url: string. Where to download the file from.
+    sha256: string. Expected SHA-256 of the file as hex digits. Artifacts
+        with a fixed version should declare it. If None, the content of the
+        first download is trusted, and a warning is logged.
+    filename: string. Name of the file on the VM.
+  """
+
+  def __init__(self, url, sha256=None, filename=None):
+    self.url = url
+    self.sha256 = sha256.lower() if sha256 else None
+    self.filename = (filename or
+                     posixpath.basename(urlparse.urlparse(url).path))
+
+  def __repr__(self):
+    return 'Artifact(%r)' % self.url
+
+  @property
+  def remote_path(self):
+    """The path of the file once pushed to a VM."""
+    return posixpath.join(vm_util.VM_TMP_DIR, self.filename)
+
+
+def GetCacheDir():
+  """Returns the directory of the artifact cache."""
+  return FLAGS.artifact_cache_dir or os.path.join(vm_util.TEMP_DIR,
+                                                  'artifacts')
+
+
+def _GetLock(key):
+  with _locks_lock:
+    return _locks.setdefault(key, threading.Lock())
+
+
+def _Sha256(value):
+  return hashlib.sha256(value).hexdigest()
+
+
+def _ContentDir():
+  return os.path.join(GetCacheDir(), 'sha256')
+
+
+def _UrlIndexDir():
+  return os.path.join(GetCacheDir(), 'urls')
+
+
+def _ContentPath(digest):
+  return os.path.join(_ContentDir(), digest)
+
+
+def _UrlIndexPath(url):
+  return os.path.join(_UrlIndexDir(), _Sha256(url))
+
+
+def _WriteAtomically(directory, write):
+  """Creates or replaces a file in 'directory', without exposing partial files.
+
+  Args:
+    directory: string. Directory of the file, created if missing.
+    write: Function called with the path of a temporary file in 'directory',
+        which it fills. Returns the name of the file to create.
+
+  Returns:
+    The path of the file.
+  """
+  if not os.path.isdir(directory):
+    try:
+      os.makedirs(directory)
+    except OSError:
+      if not os.path.isdir(directory):
+        raise
+  fd, temp_path = tempfile.mkstemp(dir=directory, prefix='.tmp')
+  os.close(fd)
+  try:
+    path = os.path.join(directory, write(temp_path))
+    os.rename(temp_path, path)
+  except:
+    os.unlink(temp_path)
+    raise
+  return path
+
+
+def _FindCached(artifact):
+  """Returns the path of the cached content of 'artifact', or None."""
+  if artifact.sha256 and os.path.exists(_ContentPath(artifact.sha256)):
+    return _ContentPath(artifact.sha256)
+  try:
+    with open(_UrlIndexPath(artifact.url)) as f:
+      digest = f.read().strip()
+  except IOError:
+    return None
+  if artifact.sha256 and digest != artifact.sha256:
+    return None
+  path = _ContentPath(digest)
+  return path if os.path.exists(path) else None
+
+
+def _CheckArchive(artifact, path):
+  """Reads an archive to the end, which fails if it is truncated or corrupt.
+
+  Raises:
+    errors.Setup.ArtifactChecksumError: If the archive cannot be read.
+  """
+  filename = artifact.filename.lower()
+  try:
+    if filename.endswith(_TAR_SUFFIXES):
+      with tarfile.open(path) as archive:
+        for member in archive:
+          if member.isfile():
+            archive.extractfile(member).read()
+    elif filename.endswith(_ZIP_SUFFIXES):
+      with zipfile.ZipFile(path) as archive:
+        bad_member = archive.testzip()
+      if bad_member:
+        raise zipfile.BadZipfile('Bad CRC for %s' % bad_member)
+  except (EOFError, IOError, tarfile.TarError, zipfile.BadZipfile) as e:
+    raise errors.Setup.ArtifactChecksumError(
+        '%s is not a valid archive: %s' % (artifact.url, e))
+
+
+def _Download(artifact):
+  """Downloads 'artifact' into the cache and returns the path of its content.
+
+  Raises:
+    errors.Setup.MissingArtifactError: If the download failed, or was shorter
+        than its Content-Length.
+    errors.Setup.ArtifactChecksumError: If the content does not have the
+        checksum the artifact declares, or is an archive that cannot be read.
+  """
+  logging.info('Downloading %s into the artifact cache.', artifact.url)
+  if not artifact.sha256:
+    logging.warning('%s declares no SHA-256, so its content is not verified '
+                    'and will be reused by later runs as is.', artifact.url)
+
+  def WriteContent(temp_path):
+    digest = hashlib.sha256()
+    size = 0
+    try:
+      response = urllib2.urlopen(artifact.url, timeout=_DOWNLOAD_TIMEOUT)
+      try:
+        with open(temp_path, 'wb') as f:
+          for chunk in iter(lambda: response.read(_DOWNLOAD_CHUNK_SIZE), ''):
+            digest.update(chunk)
+            f.write(chunk)
+            size += len(chunk)
+        content_length = response.info().getheader('Content-Length')
+      finally:
+        response.close()
+    except (IOError, urllib2.URLError) as e:
+      raise errors.Setup.MissingArtifactError(
+          'Could not download %s: %s' % (artifact.url, e))
+    truncated = (content_length and content_length.isdigit() and
+                 size != int(content_length))
+    if truncated:
+      raise errors.Setup.MissingArtifactError(
+          'Downloaded %d bytes of %s, expected %s.' % (size, artifact.url,
+                                                       content_length))
+    digest = digest.hexdigest()
+    if artifact.sha256 and digest != artifact.sha256:
+      raise errors.Setup.ArtifactChecksumError(
+          '%s has SHA-256 %s, expected %s.' % (artifact.url, digest,
+                                               artifact.sha256))
+    _CheckArchive(artifact, temp_path)
+    return digest
+
+  path = _WriteAtomically(_ContentDir(), WriteContent)
+
+  def WriteIndex(temp_path):
+    with open(temp_path, 'w') as f:
+      f.write(os.path.basename(path) + '\n')
+    return os.path.basename(_UrlIndexPath(artifact.url))
+
+  _WriteAtomically(_UrlIndexDir(), WriteIndex)
+  return path
+
+
+def GetArtifact(artifact):
+  """Returns the path of the content of an artifact on the controller.
+
+  Downloads the artifact unless it is already cached. Concurrent calls for the
+  same artifact download it once.
+
+  Args:
+    artifact: Artifact.
+
+  Raises:
+    errors.Setup.MissingArtifactError: If the artifact is not cached and could
+        not be downloaded.
+    errors.Setup.ArtifactChecksumError: If the downloaded content does not
+        have the checksum the artifact declares.
+  """
+  with _GetLock(artifact.url):
+    path = _FindCached(artifact)
+    if path:
+      return path
+    if FLAGS.artifact_cache_offline:
+      raise errors.Setup.MissingArtifactError(
+          '%s is not in the artifact cache %s, and --artifact_cache_offline '
+          'is set.' % (artifact.url, GetCacheDir()))
+    return _Download(artifact)
+
+
+def GetBuildKey(package_name, version, cloud, os_type, image, cpu):
+  """Returns the key identifying a build of a package in the cache.
+
+  Args:
+    package_name: string. Name of the package.
+    version: string. Version of the package. Builds made from another version
+        are not reused.
+    cloud: string. Cloud of the VM.
+    os_type: string. OS type of the VM.
+    image: string. Image the VM booted from, or None for the default image of
+        the cloud.
+    cpu: string. Describes the CPU of the VM: its machine architecture, model
+        and feature flags. Builds tuned for the CPU they are compiled on
+        (e.g. OpenBLAS) may not run, or may run differently, on another one.
+  """
+  return '%s/%s' % (package_name,
+                    _Sha256(repr((version, cloud, os_type, image, cpu))))
+
+
+def _BuildPath(key):
+  return os.path.join(GetCacheDir(), 'builds', key + '.tar.gz')
+
+
+def GetBuildLock(key):
+  """Returns the lock held while looking up or storing a build."""
+  return _GetLock(key)
+
+
+def FindBuild(key):
+  """Returns the path of a cached build, or None if it is not cached."""
+  path = _BuildPath(key)
+  return path if os.path.exists(path) else None
+
+
+def StoreBuild(key, pull):
+  """Stores a build in the cache.
+
+  Args:
+    key: string. Key of the build, as returned by GetBuildKey.
+    pull: Function called with a local path, where it copies the archive of
+        the build.
+
+  Returns:
+    The path of the archive in the cache.
+  """
+  path = _BuildPath(key)
+
+  def Write(temp_path):
+    pull(temp_path)
+    return os.path.basename(path)
+
+  return _WriteAtomically(os.path.dirname(path), Write)
@@ -15,12 +15,14 @@
 """Container for all data required for a benchmark to run."""
 
 import copy
+import functools
 import logging
 import pickle
 import copy_reg
 import os
 import thread
 import threading
+import time
 import uuid
 import provider_info
 
@@ -29,6 +31,7 @@ from perfkitbenchmarker import context
 from perfkitbenchmarker import disk
 from perfkitbenchmarker import errors
 from perfkitbenchmarker import flags
+from perfkitbenchmarker import resource_graph
 from perfkitbenchmarker import static_virtual_machine as static_vm
 from perfkitbenchmarker import virtual_machine
 from perfkitbenchmarker import vm_util
@@ -107,6 +110,16 @@ flags.DEFINE_enum('benchmark_compatibility_checking', SUPPORTED,
                   ' check. The default is ' + SUPPORTED)
 
 
+def _GetNetworkName(key, net):
+  """Returns a name identifying a network registered under 'key'."""
+  name = getattr(net, 'name', None)
+  if name:
+    return name
+  if isinstance(key, tuple):
+    return ' '.join(str(k) for k in key if k is not None)
+  return str(key)
+
+
 class BenchmarkSpec(object):
   """Contains the various data required to make a benchmark run."""
 
@@ -135,6 +148,10 @@ class BenchmarkSpec(object):
     self.uuid = str(uuid.uuid4())
     self.always_call_cleanup = False
     self._flags = None
+    # resource_graph.Intervals of the resource operations performed by
+    # Provision, the steps of PrepareVm, and Delete that have not been
+    # published yet.
+    self.resource_intervals = []
 
     # Set the current thread's BenchmarkSpec object to this one.
     context.SetThreadBenchmarkSpec(self)
@@ -276,39 +293,98 @@ class BenchmarkSpec(object):
     targets = [(vm.PrepareBackgroundWorkload, (), {}) for vm in self.vms]
     vm_util.RunParallelThreads(targets, len(targets))
 
+  def _GetVmsByNetwork(self):
+    """Groups the VMs by the registered network they use.
+
+    Returns:
+      A (vms_by_network_key, unattached_vms) tuple. vms_by_network_key maps
+      each key of self.networks to the list of VMs using that network.
+      unattached_vms lists the VMs whose network is not registered, which are
+      conservatively treated as using every network.
+    """
+    network_keys = {id(net): key for key, net in self.networks.iteritems()}
+    vms_by_network_key = {key: [] for key in self.networks}
+    unattached_vms = []
+    for vm in self.vms:
+      key = network_keys.get(id(getattr(vm, 'network', None)))
+      if key is None:
+        unattached_vms.append(vm)
+      else:
+        vms_by_network_key[key].append(vm)
+    return vms_by_network_key, unattached_vms
+
   def Provision(self):
-    """Prepares the VMs and networks necessary for the benchmark to run."""
-    vm_util.RunThreaded(lambda net: net.Create(), self.networks.values())
+    """Prepares the VMs and networks necessary for the benchmark to run.
 
-    if self.vms:
-      vm_util.RunThreaded(self.PrepareVm, self.vms)
-      if FLAGS.os_type != WINDOWS:
-        vm_util.GenerateSSHConfig(self)
+    Each VM is created as soon as its own network exists, rather than after
+    every network has been created.
+    """
+    graph = resource_graph.ResourceGraph('Create',
+                                         skip_dependents_of_failures=True)
+    network_nodes = {
+        key: graph.AddNode('Network', _GetNetworkName(key, net), net.Create)
+        for key, net in self.networks.iteritems()}
+    vms_by_network_key, unattached_vms = self._GetVmsByNetwork()
+    for key, vms in vms_by_network_key.iteritems():
+      for vm in vms:
+        graph.AddNode('VM', vm.name, functools.partial(self.PrepareVm, vm),
+                      [network_nodes[key]])
+    for vm in unattached_vms:
+      graph.AddNode('VM', vm.name, functools.partial(self.PrepareVm, vm),
+                    network_nodes.values())
+    try:
+      # Stop provisioning as soon as one resource fails to be created rather
+      # than waiting for every other one; Delete cleans up whatever was
+      # created.
+      graph.Run(fail_fast=True)
+    finally:
+      self.resource_intervals.extend(graph.intervals)
+
+    if self.vms and FLAGS.os_type != WINDOWS:
+      vm_util.GenerateSSHConfig(self)
 
   def Delete(self):
+    """Deletes the VMs, their disks, the firewalls and the networks.
+
+    Each resource is deleted as soon as the resources depending on it are
+    gone: scratch disks after their VM, firewalls after the VMs of their
+    cloud, and networks after their VMs, those VMs' disks and the firewall
+    of their cloud.
+    """
     if self.deleted:
       return
 
-    if self.vms:
-      try:
-        vm_util.RunThreaded(self.DeleteVm, self.vms)
-      except Exception:
-        logging.exception('Got an exception deleting VMs. '
-                          'Attempting to continue tearing down.')
-
-    for firewall in self.firewalls.itervalues():
-      try:
-        firewall.DisallowAllPorts()
-      except Exception:
-        logging.exception('Got an exception disabling firewalls. '
-                          'Attempting to continue tearing down.')
-
-    for net in self.networks.itervalues():
-      try:
-        net.Delete()
-      except Exception:
-        logging.exception('Got an exception deleting networks. '
-                          'Attempting to continue tearing down.')
+    graph = resource_graph.ResourceGraph('Delete',
+                                         skip_dependents_of_failures=False)
+    vm_nodes = {}
+    disk_nodes = {}
+    for vm in self.vms:
+      vm_nodes[vm] = graph.AddNode('VM', vm.name,
+                                   functools.partial(self.DeleteVm, vm))
+      disk_nodes[vm] = graph.AddNode('Scratch Disks', vm.name,
+                                     vm.DeleteScratchDisks, [vm_nodes[vm]])
+    firewall_nodes = {}
+    for cloud, firewall in self.firewalls.iteritems():
+      firewall_nodes[cloud] = graph.AddNode(
+          'Firewall', cloud, firewall.DisallowAllPorts,
+          [vm_nodes[vm] for vm in self.vms
+           if getattr(vm, 'CLOUD', cloud) == cloud])
+    vms_by_network_key, unattached_vms = self._GetVmsByNetwork()
+    for key, net in self.networks.iteritems():
+      vms = vms_by_network_key[key] + unattached_vms
+      dependencies = [vm_nodes[vm] for vm in vms]
+      dependencies.extend(disk_nodes[vm] for vm in vms)
+      if net.CLOUD in firewall_nodes:
+        dependencies.append(firewall_nodes[net.CLOUD])
+      graph.AddNode('Network', _GetNetworkName(key, net), net.Delete,
+                    dependencies)
+    try:
+      graph.Run()
+    except Exception:
+      logging.exception('Got an exception tearing down resources. '
+                        'Attempted to delete every resource regardless.')
+    finally:
+      self.resource_intervals.extend(graph.intervals)
     self.deleted = True
 
   def StartBackgroundWorkload(self):
@@ -343,39 +419,84 @@ class BenchmarkSpec(object):
 
     return vm_class(vm_spec)
 
+  def _RecordCreateIntervals(self, vm, start_time, stop_time, succeeded):
+    """Splits the interval of vm.Create into the steps of the creation.
+
+    The VM is created by its _CreateResource method, which calls the cloud
+    API and records create_start_time and create_end_time, after the
+    dependencies of the VM are created and before _PostCreate runs.
+    """
+    steps = []
+    if vm.create_start_time:
+      steps.append(('Create Dependencies', start_time, vm.create_start_time))
+      if vm.create_end_time:
+        steps.append(('Create Instance', vm.create_start_time,
+                      vm.create_end_time))
+        steps.append(('Post Create', vm.create_end_time, stop_time))
+      else:
+        steps.append(('Create Instance', vm.create_start_time, stop_time))
+    else:
+      steps.append(('Create Dependencies', start_time, stop_time))
+    for i, (operation, step_start, step_stop) in enumerate(steps):
+      self.resource_intervals.append(resource_graph.Interval(
+          'VM', operation, vm.name, step_start, step_stop,
+          succeeded or i < len(steps) - 1))
+
   def PrepareVm(self, vm):
     """Creates a single VM and prepares a scratch disk if required.
 
+    The time taken by each step is added to resource_intervals, e.g. as
+    'VM Wait For Boot' Intervals.
+
     Args:
         vm: The BaseVirtualMachine object representing the VM.
     """
-    vm.Create()
+    def Step(operation):
+      return resource_graph.MeasureInterval(self.resource_intervals, 'VM',
+                                            operation, vm.name)
+
+    start_time = time.time()
+    succeeded = False
+    try:
+      vm.Create()
+      succeeded = True
+    finally:
+      self._RecordCreateIntervals(vm, start_time, time.time(), succeeded)
     logging.info('VM: %s', vm.ip_address)
     logging.info('Waiting for boot completion.')
-    vm.AllowRemoteAccessPorts()
-    vm.WaitForBootCompletion()
-    vm.AddMetadata(benchmark=self.name, perfkit_uuid=self.uuid,
-                   benchmark_uid=self.uid)
-    vm.OnStartup()
+    with Step('Allow Remote Access Ports'):
+      vm.AllowRemoteAccessPorts()
+    with Step('Wait For Boot'):
+      vm.WaitForBootCompletion()
+    with Step('Open SSH Connections'):
+      vm.OpenSshConnections()
+    with Step('Add Metadata'):
+      vm.AddMetadata(benchmark=self.name, perfkit_uuid=self.uuid,
+                     benchmark_uid=self.uid)
+    with Step('Startup'):
+      vm.OnStartup()
     if any((spec.disk_type == disk.LOCAL for spec in vm.disk_specs)):
-      vm.SetupLocalDisks()
+      with Step('Setup Local Disks'):
+        vm.SetupLocalDisks()
     for disk_spec in vm.disk_specs:
-      vm.CreateScratchDisk(disk_spec)
+      with Step('Create Scratch Disk'):
+        vm.CreateScratchDisk(disk_spec)
 
     # This must come after Scratch Disk creation to support the
     # Containerized VM case
-    vm.PrepareVMEnvironment()
+    with Step('Prepare Environment'):
+      vm.PrepareVMEnvironment()
 
   def DeleteVm(self, vm):
-    """Deletes a single vm and scratch disk if required.
+    """Deletes a single vm. Its scratch disks are deleted separately.
 
     Args:
         vm: The BaseVirtualMachine object representing the VM.
     """
     if vm.is_static and vm.install_packages:
       vm.PackageCleanup()
+    vm.CloseSshConnections()
     vm.Delete()
-    vm.DeleteScratchDisks()
 
   def PickleSpec(self):
     """Pickles the spec so that it can be unpickled on a subsequent run."""
@@ -0,0 +1,137 @@
+# Copyright 2016 PerfKitBenchmarker Authors. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Copies a file to many VMs, using the VMs that have it as sources.
+
+Pushing a large file from the controller to each VM is limited by the uplink
+of the controller. BroadcastFile copies it directly to a few seed VMs only.
+Then, in rounds, every VM that has the file copies it to one VM that does not,
+so the number of copies doubles each round.
+
+Every copy is verified against the SHA-256 of the source. A VM that did not
+receive a correct copy from its peer gets the file directly from the source.
+"""
+
+import hashlib
+import logging
+
+from perfkitbenchmarker import errors
+from perfkitbenchmarker import flags
+from perfkitbenchmarker import vm_util
+
+flags.DEFINE_integer('broadcast_fanout', 4,
+                     'Number of VMs to which the controller copies a '
+                     'broadcast file directly. The other VMs receive it from '
+                     'their peers. Set it to at least the number of VMs to '
+                     'copy files from the controller to every VM.',
+                     lower_bound=1)
+
+FLAGS = flags.FLAGS
+
+_CHUNK_SIZE = 1024 * 1024
+
+
+def _GetLocalSha256(path):
+  digest = hashlib.sha256()
+  with open(path, 'rb') as f:
+    for chunk in iter(lambda: f.read(_CHUNK_SIZE), ''):
+      digest.update(chunk)
+  return digest.hexdigest()
+
+
+def _GetRemoteSha256(vm, path):
+  stdout, _ = vm.RemoteCommand('sha256sum %s' % path)
+  return stdout.split()[0]
+
+
+class _Broadcast(object):
+  """A file being copied to VMs.
+
+  Attributes:
+    source_path: string. Path of the file on the controller, or on source_vm.
+    remote_path: string. Path of the file on the VMs.
+    source_vm: The VM holding the file, or None if the controller holds it.
+    sha256: string. SHA-256 of the file.
+  """
+
+  def __init__(self, source_path, remote_path, source_vm):
+    self.source_path = source_path
+    self.remote_path = remote_path
+    self.source_vm = source_vm
+    if source_vm:
+      self.sha256 = _GetRemoteSha256(source_vm, source_path)
+    else:
+      self.sha256 = _GetLocalSha256(source_path)
+
+  def _Verify(self, vm):
+    sha256 = _GetRemoteSha256(vm, self.remote_path)
+    if sha256 != self.sha256:
+      raise errors.VirtualMachine.RemoteCommandError(
+          'Copy of %s on %s has SHA-256 %s, expected %s.' % (
+              self.remote_path, vm, sha256, self.sha256))
+
+  def CopyFromSource(self, vm):
+    """Copies the file from the source to 'vm'."""
+    if self.source_vm:
+      self.source_vm.MoveFile(vm, self.source_path, self.remote_path)
+    else:
+      vm.PushFile(self.source_path, self.remote_path)
+    self._Verify(vm)
+
+  def CopyFromPeer(self, sender, receiver):
+    """Copies the file from 'sender' to 'receiver', or else from the source."""
+    if sender is self.source_vm:
+      self.CopyFromSource(receiver)
+      return
+    try:
+      sender.MoveFile(receiver, self.remote_path, self.remote_path)
+      self._Verify(receiver)
+    except errors.VirtualMachine.RemoteCommandError as e:
+      logging.warning('Copying %s from %s to %s failed, copying it from the '
+                      'source instead: %s', self.remote_path, sender,
+                      receiver, e)
+      self.CopyFromSource(receiver)
+
+
+def BroadcastFile(vms, source_path, remote_path, source_vm=None):
+  """Copies a file to VMs, using the VMs that have it as sources.
+
+  Args:
+    vms: list of Linux VMs to copy the file to.
+    source_path: string. Path of the file on the controller, or on source_vm
+        if it is set.
+    remote_path: string. Path of the copies on the VMs.
+    source_vm: The VM holding the file, if it is not on the controller. If it
+        belongs to 'vms', the file is not copied to it.
+
+  Raises:
+    errors.VmUtil.ThreadException: If a VM could receive a correct copy of the
+        file neither from its peer nor from the source.
+  """
+  broadcast = _Broadcast(source_path, remote_path, source_vm)
+  pending = [vm for vm in vms if vm is not source_vm]
+  if source_vm:
+    holders = [source_vm]
+  else:
+    fanout = FLAGS.broadcast_fanout
+    seeds, pending = pending[:fanout], pending[fanout:]
+    vm_util.RunThreaded(broadcast.CopyFromSource, seeds)
+    holders = seeds
+  while pending:
+    receivers, pending = pending[:len(holders)], pending[len(holders):]
+    logging.info('Copying %s to %d VMs from their peers, %d VMs remaining.',
+                 remote_path, len(receivers), len(pending))
+    vm_util.RunThreaded(broadcast.CopyFromPeer,
+                        [((sender, receiver), {})
+                         for sender, receiver in zip(holders, receivers)])
+    holders = holders + receivers
@@ -57,16 +57,31 @@ For valid disk spec keys, see disk.BaseDiskSpec and derived classes.
 """
 
 import copy
+import hashlib
+import json
 import logging
+import os
+import tempfile
+import threading
 import yaml
 
 from perfkitbenchmarker import data
 from perfkitbenchmarker import errors
 from perfkitbenchmarker import flags
+from perfkitbenchmarker import vm_util
 
 FLAGS = flags.FLAGS
 CONFIG_CONSTANTS = 'default_config_constants.yaml'
 
+# Configs parsed by LoadMinimalConfig are cached in this file, so that later
+# runs do not need to parse the YAML again. It is in the shared
+# vm_util.TEMP_DIR rather than in a run's temporary directory, so it persists
+# across runs and is shared by concurrent ones. Delete it to clear the cache.
+MINIMAL_CONFIG_CACHE_FILE = os.path.join(vm_util.TEMP_DIR,
+                                         'minimal_config_cache.json')
+_minimal_config_cache = None
+_minimal_config_cache_lock = threading.Lock()
+
 flags.DEFINE_string('benchmark_config_file', None,
                     'The file path to the user config file which will '
                     'override benchmark defaults. This should either be '
@@ -226,6 +241,69 @@ def GetMergedFlags(config):
   return flags_values
 
 
+def _ToYamlStrings(value):
+  """Converts the unicode strings in a value loaded from JSON like PyYAML.
+
+  PyYAML loads ASCII strings as str and only other strings as unicode,
+  whereas the json module always returns unicode.
+  """
+  if isinstance(value, unicode):
+    try:
+      return value.encode('ascii')
+    except UnicodeEncodeError:
+      return value
+  if isinstance(value, list):
+    return [_ToYamlStrings(item) for item in value]
+  if isinstance(value, dict):
+    return {_ToYamlStrings(k): _ToYamlStrings(v)
+            for k, v in value.iteritems()}
+  return value
+
+
+def _GetMinimalConfigCache(constants_mtime):
+  """Returns the dict of cached minimal configs, reading the file if needed.
+
+  The cache is discarded if the constants file has been modified since it
+  was written, since any of the configs may refer to its anchors.
+  """
+  global _minimal_config_cache
+  if _minimal_config_cache is None:
+    try:
+      with open(MINIMAL_CONFIG_CACHE_FILE) as fp:
+        _minimal_config_cache = _ToYamlStrings(json.load(fp))
+    except (IOError, ValueError):
+      _minimal_config_cache = {}
+  if _minimal_config_cache.get('constants_mtime') != constants_mtime:
+    _minimal_config_cache = {'constants_mtime': constants_mtime,
+                             'configs': {}}
+  return _minimal_config_cache
+
+
+def _CacheMinimalConfig(cache, key, config):
+  """Adds a config to the minimal config cache and writes the cache file.
+
+  Configs that would not survive a round trip through JSON are not cached.
+  """
+  try:
+    if _ToYamlStrings(json.loads(json.dumps(config))) != config:
+      return
+  except (TypeError, ValueError):
+    return
+  cache['configs'][key] = config
+  try:
+    if not os.path.isdir(vm_util.TEMP_DIR):
+      os.makedirs(vm_util.TEMP_DIR)
+    # Write to a temporary file and rename it, so that concurrent runs never
+    # see a partially written cache.
+    fd, temp_path = tempfile.mkstemp(dir=vm_util.TEMP_DIR)
+    with os.fdopen(fd, 'w') as fp:
+      json.dump(cache, fp)
+    os.rename(temp_path, MINIMAL_CONFIG_CACHE_FILE)
+  except (IOError, OSError) as e:
+    logging.debug('Could not write the config cache %s: %s',
+                  MINIMAL_CONFIG_CACHE_FILE, e)
+
+
 def LoadMinimalConfig(benchmark_config, benchmark_name):
   """Loads a benchmark config without using any flags in the process.
 
@@ -233,6 +311,13 @@ def LoadMinimalConfig(benchmark_config, benchmark_name):
   benchmark config prior to loading it. This allows the config to use
   references to anchors defined in the constants file.
 
+  Loaded configs are cached in MINIMAL_CONFIG_CACHE_FILE, which persists
+  across runs. An entry is keyed by the benchmark name and a digest of
+  'benchmark_config', so editing a benchmark's config misses the cache. The
+  whole cache is discarded when the modification time of the constants file
+  changes. Changes to anything else, e.g. to this module, do not invalidate
+  it.
+
   Args:
     benchmark_config: str. The default config in YAML format.
     benchmark_name: str. The name of the benchmark.
@@ -240,8 +325,16 @@ def LoadMinimalConfig(benchmark_config, benchmark_name):
   Returns:
     dict. The loaded config.
   """
+  constants_path = data.ResourcePath(CONFIG_CONSTANTS, False)
+  cache_key = '%s:%s' % (benchmark_name,
+                         hashlib.sha1(benchmark_config).hexdigest())
+  with _minimal_config_cache_lock:
+    cache = _GetMinimalConfigCache(os.path.getmtime(constants_path))
+    if cache_key in cache['configs']:
+      return copy.deepcopy(cache['configs'][cache_key])
+
   yaml_config = []
-  with open(data.ResourcePath(CONFIG_CONSTANTS, False)) as fp:
+  with open(constants_path) as fp:
     yaml_config.append(fp.read())
   yaml_config.append(benchmark_config)
 
@@ -256,6 +349,8 @@ def LoadMinimalConfig(benchmark_config, benchmark_name):
         'Encountered a problem loading the default benchmark config. Please '
         'ensure that all references are defined. Error received:\n%s' % e)
 
+  with _minimal_config_cache_lock:
+    _CacheMinimalConfig(cache, cache_key, copy.deepcopy(config[benchmark_name]))
   return config[benchmark_name]
 
 
@@ -36,6 +36,14 @@ class Setup(object):
     """Error raised when the given run_uri is invalid."""
     pass
 
+  class MissingArtifactError(Error):
+    """Error raised when an artifact is neither cached nor downloadable."""
+    pass
+
+  class ArtifactChecksumError(Error):
+    """Error raised when the content of an artifact has the wrong checksum."""
+    pass
+
 
 class VirtualMachine(object):
   """Errors raised by virtual_machine.py."""
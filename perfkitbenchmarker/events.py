@@ -47,12 +47,28 @@ Signal sent immediately after a phase runs, regardless of whether it was
 successful.
 
 Sender: the phase. Currently only RUN_PHASE.
-Payload: benchmark_spec.""")
+Payload: benchmark_spec.
+
+Receivers may return a list of Sample objects (e.g. summaries of performance
+counters collected during the phase), which are published along with the
+benchmark's own samples.""")
+
+samples_created = _events.signal('samples-created', doc="""
+Called with a list of sample objects and benchmark spec.
+
+Signal sent once for each batch of samples added to a publisher, immediately
+after the samples are created. The samples' metadata is mutable, and may be
+updated by the subscriber.
+
+Sender: None
+Payload: benchmark_spec (BenchmarkSpec), samples (list of dicts).""")
 
 sample_created = _events.signal('sample-created', doc="""
 Called with sample object and benchmark spec.
 
-Signal sent immediately after a sample is created by a publisher.
+Signal sent for each sample of a batch, after samples_created. It is only
+sent if it has receivers: prefer connecting to samples_created, which
+costs one call per batch rather than one per sample.
 The sample's metadata is mutable, and may be updated by the subscriber.
 
 Sender: None
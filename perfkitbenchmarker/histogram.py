@@ -0,0 +1,251 @@
+# Copyright 2016 PerfKitBenchmarker Authors. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""A log-linear histogram of non-negative values.
+
+The layout follows HdrHistogram. Values are first converted to an integer
+number of 'unit's. Integers below 2 ** precision_bits each get their own
+bucket, so that range is recorded exactly. Above it, every power of two is
+split into 2 ** (precision_bits - 1) equally sized buckets, which bounds the
+relative error of any recorded value by 2 ** (1 - precision_bits).
+
+Recording a value is O(1), merging two histograms and querying any number of
+quantiles are both O(buckets). Histograms with the same layout can be
+serialized with Serialize and restored with Deserialize without losing
+anything, so histograms recorded by independent clients combine exactly.
+"""
+
+import array
+import json
+
+DEFAULT_PRECISION_BITS = 11
+
+_SERIALIZATION_VERSION = 1
+# Relative difference from a multiple of the unit that FromBuckets ignores.
+_UNIT_TOLERANCE = 1e-9
+
+
+class Histogram(object):
+  """Counts of values in log-linear buckets.
+
+  Attributes:
+    precision_bits: int. Values below 2 ** precision_bits units are
+        recorded exactly.
+    unit: Number. Size of the smallest bucket, in the units of the recorded
+        values. Values are rounded down to a multiple of it.
+    total_count: int. Number of values recorded.
+    total: float. Sum of the recorded values.
+    total_of_squares: float. Sum of the squares of the recorded values.
+  """
+
+  def __init__(self, precision_bits=DEFAULT_PRECISION_BITS, unit=1):
+    if precision_bits < 1:
+      raise ValueError('precision_bits must be at least 1, got {0}.'.format(
+          precision_bits))
+    if unit <= 0:
+      raise ValueError('unit must be positive, got {0}.'.format(unit))
+    self.precision_bits = precision_bits
+    self.unit = unit
+    self.total_count = 0
+    self.total = 0.0
+    self.total_of_squares = 0.0
+    self._sub_bucket_count = 1 << precision_bits
+    self._half_sub_bucket_count = self._sub_bucket_count >> 1
+    self._counts = array.array('l')
+
+  def _Index(self, units):
+    """Returns the index of the bucket holding 'units'."""
+    if units < self._sub_bucket_count:
+      return units
+    exponent = units.bit_length() - self.precision_bits
+    return exponent * self._half_sub_bucket_count + (units >> exponent)
+
+  def _LowerBound(self, index):
+    """Returns the smallest value, in units, held by the bucket at 'index'."""
+    if index < self._sub_bucket_count:
+      return index
+    exponent = index // self._half_sub_bucket_count - 1
+    return (index - exponent * self._half_sub_bucket_count) << exponent
+
+  def _ToValue(self, units):
+    return units * self.unit if self.unit != 1 else units
+
+  def _Grow(self, size):
+    if size > len(self._counts):
+      self._counts.extend(array.array('l', [0]) * (size - len(self._counts)))
+
+  def Record(self, value, count=1):
+    """Records 'count' occurrences of 'value'.
+
+    Raises:
+      ValueError: When 'value' or 'count' is negative.
+    """
+    self._Record(int(value // self.unit), value, count)
+
+  def _Record(self, units, value, count):
+    """Records 'count' occurrences of 'value', which is 'units' units."""
+    if value < 0 or count < 0:
+      raise ValueError('Cannot record {0} occurrences of {1}.'.format(
+          count, value))
+    index = self._Index(units)
+    self._Grow(index + 1)
+    self._counts[index] += count
+    self.total_count += count
+    self.total += value * count
+    self.total_of_squares += value * value * count
+
+  def Merge(self, other):
+    """Adds the counts of another histogram to this one.
+
+    Raises:
+      ValueError: When the histograms do not have the same layout.
+    """
+    if (self.precision_bits, self.unit) != (other.precision_bits, other.unit):
+      raise ValueError(
+          'Cannot merge histograms with different layouts: '
+          '(precision_bits={0}, unit={1}) and (precision_bits={2}, '
+          'unit={3}).'.format(self.precision_bits, self.unit,
+                              other.precision_bits, other.unit))
+    self._Grow(len(other._counts))
+    counts = self._counts
+    for index, count in enumerate(other._counts):
+      if count:
+        counts[index] += count
+    self.total_count += other.total_count
+    self.total += other.total
+    self.total_of_squares += other.total_of_squares
+
+  def Buckets(self):
+    """Yields (lower_bound, count) for every non-empty bucket, in order."""
+    for index, count in enumerate(self._counts):
+      if count:
+        yield self._ToValue(self._LowerBound(index)), count
+
+  def ValuesAtQuantiles(self, quantiles):
+    """Returns the value at each of several quantiles.
+
+    The value at quantile p is the lower bound of the first bucket whose
+    cumulative count reaches p * total_count. All quantiles are answered in a
+    single pass over the buckets.
+
+    Args:
+      quantiles: iterable of floats in the interval [0, 1].
+
+    Returns:
+      A list with one value per quantile, in the order given.
+
+    Raises:
+      ValueError: When the histogram is empty or a quantile is out of range.
+    """
+    quantiles = list(quantiles)
+    for p in quantiles:
+      if p < 0 or p > 1:
+        raise ValueError('Invalid quantile: {0}'.format(p))
+    if not self.total_count:
+      raise ValueError('Cannot compute quantiles of an empty histogram.')
+    order = sorted(range(len(quantiles)), key=quantiles.__getitem__)
+    results = [None] * len(quantiles)
+    position = 0
+    cumulative = 0
+    lower_bound = None
+    for lower_bound, count in self.Buckets():
+      cumulative += count
+      while (position < len(order) and
+             cumulative >= self.total_count * quantiles[order[position]]):
+        results[order[position]] = lower_bound
+        position += 1
+      if position == len(order):
+        break
+    # Rounding can leave the highest quantiles just above the total count.
+    for i in order[position:]:
+      results[i] = lower_bound
+    return results
+
+  def Mean(self):
+    return self.total / self.total_count if self.total_count else None
+
+  def StandardDeviation(self):
+    """Returns the sample standard deviation of the recorded values."""
+    if self.total_count < 2:
+      return 0 if self.total_count else None
+    variance = ((self.total_of_squares -
+                 self.total * self.total / self.total_count) /
+                (self.total_count - 1))
+    return max(variance, 0.0) ** 0.5
+
+  def Serialize(self):
+    """Returns a JSON string from which Deserialize restores the histogram."""
+    return json.dumps({
+        'version': _SERIALIZATION_VERSION,
+        'precision_bits': self.precision_bits,
+        'unit': self.unit,
+        'total': self.total,
+        'total_of_squares': self.total_of_squares,
+        'counts': [[index, count] for index, count in enumerate(self._counts)
+                   if count]}, sort_keys=True)
+
+
+def Deserialize(serialized):
+  """Restores a Histogram from the output of Histogram.Serialize.
+
+  Raises:
+    ValueError: When 'serialized' is not a serialized Histogram.
+  """
+  try:
+    data = json.loads(serialized)
+    if data['version'] != _SERIALIZATION_VERSION:
+      raise ValueError('Unsupported histogram version: {0}'.format(
+          data['version']))
+    result = Histogram(data['precision_bits'], data['unit'])
+    counts = data['counts']
+    if counts:
+      result._Grow(max(index for index, _ in counts) + 1)
+    for index, count in counts:
+      result._counts[index] += count
+      result.total_count += count
+    result.total = data['total']
+    result.total_of_squares = data['total_of_squares']
+  except (KeyError, TypeError) as e:
+    raise ValueError('Invalid serialized histogram: {0!r}'.format(e))
+  return result
+
+
+def FromBuckets(buckets, precision_bits=DEFAULT_PRECISION_BITS, unit=1):
+  """Creates a Histogram from (value, count) pairs, e.g. a parsed histogram.
+
+  Unlike Histogram.Record, which rounds values down to a multiple of 'unit',
+  this rejects values that are not already one, since a bucket value between
+  two units means that 'unit' does not match the histogram being read.
+
+  Args:
+    buckets: iterable of (value, count) tuples.
+    precision_bits: int. See Histogram.
+    unit: Number. See Histogram.
+
+  Returns:
+    Histogram.
+
+  Raises:
+    ValueError: When a value is not a multiple of 'unit', or a value or count
+        is negative.
+  """
+  result = Histogram(precision_bits, unit)
+  for value, count in buckets:
+    units = value / float(unit)
+    rounded_units = int(round(units))
+    # Tolerates the rounding errors of units that are not integers, e.g. 0.1.
+    if abs(units - rounded_units) > _UNIT_TOLERANCE * max(1, abs(units)):
+      raise ValueError('Bucket value {0} is not a multiple of the unit '
+                       '{1}.'.format(value, unit))
+    result._Record(rounded_units, value, count)
+  return result
@@ -14,8 +14,11 @@
 
 """Utilities for dynamically importing python files."""
 
+import collections
 import importlib
 import pkgutil
+import re
+import threading
 
 
 def LoadModulesForPath(path, package_prefix=None):
@@ -54,3 +57,77 @@ def LoadModulesWithName(path, package_prefix, name):
   for _, modname, ispkg in module_iter:
     if not ispkg and modname.split('.')[-1] == name:
       importlib.import_module(modname)
+
+
+class LazyModuleDict(collections.Mapping):
+  """A read-only dict of the modules on a path, imported on first access.
+
+  Listing the keys or testing membership does not import any module, so
+  loading the dict is cheap no matter how many modules the path contains.
+
+  Modules are keyed by their name, or by the value of a module level string
+  constant when 'key_attribute' is given (e.g. 'BENCHMARK_NAME'). The constant
+  is read from the module's source when it is assigned a string literal
+  there; otherwise the module is imported to find it.
+
+  Example usage:
+    PACKAGES = LazyModuleDict(__path__, __name__)
+  """
+
+  def __init__(self, path, package_prefix, key_attribute=None):
+    """Initializes the dict.
+
+    Args:
+      path: Path containing python modules.
+      package_prefix: Prefix (e.g., package name) to prefix all modules.
+        'path' and 'package_prefix' will be joined with a '.'.
+      key_attribute: Optional name of a module level string constant to key
+        the modules by, instead of by their names.
+    """
+    self._path = path
+    self._package_prefix = package_prefix + '.'
+    self._key_attribute = key_attribute
+    self._lock = threading.Lock()
+    self._module_names = None
+
+  def _GetKey(self, module_finder, module_name):
+    """Returns the key of the module 'module_name'."""
+    if not self._key_attribute:
+      return module_name[len(self._package_prefix):]
+    source = module_finder.find_module(module_name).get_source(module_name)
+    match = re.search(
+        r'^%s\s*=\s*[\'"]([^\'"]+)[\'"]\s*$' % self._key_attribute,
+        source or '', re.MULTILINE)
+    if match:
+      return match.group(1)
+    return getattr(importlib.import_module(module_name), self._key_attribute)
+
+  def _GetModuleNames(self):
+    """Returns an OrderedDict mapping keys to fully qualified module names."""
+    with self._lock:
+      if self._module_names is None:
+        module_names = collections.OrderedDict()
+        modules = pkgutil.iter_modules(self._path,
+                                       prefix=self._package_prefix)
+        for module_finder, module_name, ispkg in modules:
+          if not ispkg:
+            module_names[self._GetKey(module_finder, module_name)] = (
+                module_name)
+        self._module_names = module_names
+      return self._module_names
+
+  def __getitem__(self, key):
+    return importlib.import_module(self._GetModuleNames()[key])
+
+  def __contains__(self, key):
+    return key in self._GetModuleNames()
+
+  def __iter__(self):
+    return iter(self._GetModuleNames())
+
+  def __len__(self):
+    return len(self._GetModuleNames())
+
+  def LoadAll(self):
+    """Imports all modules, and returns them in key order."""
+    return self.values()
@@ -16,6 +16,10 @@
 
 Aerospike is an opensource NoSQL solution. This benchmark runs a read/update
 load test with varying numbers of client threads against an Aerospike server.
+By default the thread count is stepped linearly; with
+--aerospike_load_search=latency_limit the thread counts are chosen by a search
+for the highest throughput with average latency under 1ms instead (see
+perfkitbenchmarker.load_search).
 
 This test can be run in a variety of configurations including memory only,
 remote/persistent ssd, and local ssd. The Aerospike configuration is controlled
@@ -28,6 +32,7 @@ from perfkitbenchmarker import configs
 from perfkitbenchmarker import data
 from perfkitbenchmarker import disk
 from perfkitbenchmarker import flags
+from perfkitbenchmarker import load_search
 from perfkitbenchmarker import sample
 from perfkitbenchmarker import vm_util
 from perfkitbenchmarker.linux_packages import aerospike_server
@@ -48,6 +53,19 @@ flags.DEFINE_integer('aerospike_client_threads_step_size', 8,
 flags.DEFINE_integer('aerospike_read_percent', 90,
                      'The percent of operations which are reads.',
                      lower_bound=0, upper_bound=100)
+flags.DEFINE_enum('aerospike_load_search', 'linear',
+                  ['linear', 'latency_limit'],
+                  'How to choose client thread counts. "linear" runs every '
+                  'count from --aerospike_min_client_threads to '
+                  '--aerospike_max_client_threads in steps of '
+                  '--aerospike_client_threads_step_size. "latency_limit" '
+                  'doubles and then bisects the thread count to find the '
+                  'highest throughput with latency under 1ms, stopping once '
+                  'the step size is reached.')
+
+# Latency limit, in milliseconds, for
+# max_throughput_for_completion_latency_under_1ms.
+LATENCY_LIMIT_MS = 1.0
 
 BENCHMARK_NAME = 'aerospike'
 BENCHMARK_CONFIG = """
@@ -89,9 +107,7 @@ def CheckPrerequisites():
 
 def _PrepareClient(client):
   """Prepare the Aerospike C client on a VM."""
-  client.Install('build_tools')
-  client.Install('lua5_1')
-  client.Install('openssl')
+  client.InstallBatch(['build_tools', 'lua5_1', 'openssl'])
   clone_command = 'git clone %s'
   client.RemoteCommand(clone_command % AEROSPIKE_CLIENT)
   build_command = ('cd %s && git checkout %s && git submodule update --init '
@@ -166,10 +182,7 @@ def Run(benchmark_spec):
                   (CLIENT_DIR, ','.join(s.internal_ip for s in servers)))
   client.RemoteCommand(load_command, should_log=True)
 
-  max_throughput_for_completion_latency_under_1ms = 0.0
-  for threads in range(FLAGS.aerospike_min_client_threads,
-                       FLAGS.aerospike_max_client_threads + 1,
-                       FLAGS.aerospike_client_threads_step_size):
+  def RunLoad(threads):
     load_command = ('timeout 15 ./%s/benchmarks/target/benchmarks '
                     '-z %s -n test -w RU,%s -o B:1000 -k 1000000 '
                     '--latency 5,1 -h %s;:' %
@@ -184,11 +197,30 @@ def Run(benchmark_spec):
         'Storage Type': FLAGS.aerospike_storage_type,
         'Read Percent': FLAGS.aerospike_read_percent,
     }
-    samples.append(sample.Sample('Average Latency', latency, 'ms', metadata))
-    if latency < 1.0:
+    return load_search.Measurement(
+        tps, latency, [sample.Sample('Average Latency', latency, 'ms',
+                                     metadata)])
+
+  if FLAGS.aerospike_load_search == 'linear':
+    measurements = [
+        RunLoad(threads)
+        for threads in range(FLAGS.aerospike_min_client_threads,
+                             FLAGS.aerospike_max_client_threads + 1,
+                             FLAGS.aerospike_client_threads_step_size)]
+  else:
+    result = load_search.MaxThroughputUnderLatencyLimit(
+        RunLoad, FLAGS.aerospike_min_client_threads,
+        FLAGS.aerospike_max_client_threads, LATENCY_LIMIT_MS,
+        resolution=FLAGS.aerospike_client_threads_step_size)
+    measurements = [m for point in result.points for m in point.measurements]
+
+  max_throughput_for_completion_latency_under_1ms = 0.0
+  for measurement in measurements:
+    samples.extend(measurement.samples)
+    if load_search.MeetsLatencyLimit(measurement.latency, LATENCY_LIMIT_MS):
       max_throughput_for_completion_latency_under_1ms = max(
           max_throughput_for_completion_latency_under_1ms,
-          tps)
+          measurement.throughput)
 
   samples.append(sample.Sample(
                  'max_throughput_for_completion_latency_under_1ms',
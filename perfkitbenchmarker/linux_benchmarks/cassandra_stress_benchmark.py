@@ -23,6 +23,7 @@ import collections
 import functools
 import logging
 import math
+import os
 import posixpath
 import time
 
@@ -31,7 +32,7 @@ from perfkitbenchmarker import configs
 from perfkitbenchmarker import data
 from perfkitbenchmarker import errors
 from perfkitbenchmarker import flags
-from perfkitbenchmarker import regex_util
+from perfkitbenchmarker import remote_job
 from perfkitbenchmarker import sample
 from perfkitbenchmarker import vm_util
 from perfkitbenchmarker.linux_packages import cassandra
@@ -196,6 +197,12 @@ AGGREGATED_METRICS = {'op rate', 'partition rate', 'row rate',
 # Maximum value will be choisen between client vms.
 MAXIMUM_METRICS = {'latency max'}
 
+# Column of the progress lines in the result file which identifies the lines
+# summarizing all operation types.
+_INTERVAL_TYPE_COLUMN = 'type'
+_INTERVAL_TOTAL_TYPE = 'total'
+_RESULTS_HEADER = 'Results:'
+
 
 def GetConfig(user_config):
   return configs.LoadConfig(BENCHMARK_CONFIG, user_config, BENCHMARK_NAME)
@@ -341,7 +348,7 @@ def _ResultFilePath(vm):
 def RunTestOnLoader(vm, loader_index, operations_per_vm, data_node_ips,
                     command, user_operations, population_per_vm,
                     population_dist, population_params):
-  """Run Cassandra-stress test on loader node.
+  """Start Cassandra-stress test on loader node.
 
   Args:
     vm: The target vm.
@@ -354,6 +361,9 @@ def RunTestOnLoader(vm, loader_index, operations_per_vm, data_node_ips,
     population_per_vm: integer. Population per loader vm.
     population_dist: string. The population distribution.
     population_params: string. Representing additional population parameters.
+
+  Returns:
+    The remote_job.RemoteJob running the test.
   """
   if command == USER_COMMAND:
     command += ' profile={profile} ops\({ops}\)'.format(
@@ -378,7 +388,7 @@ def RunTestOnLoader(vm, loader_index, operations_per_vm, data_node_ips,
                                               population_params)
   else:
     population_dist = '-pop seq=%s' % population_params
-  vm.RobustRemoteCommand(
+  return vm.StartRemoteJob(
       '{cassandra} {command} cl={consistency_level} n={num_keys} '
       '-node {nodes} {schema} {population_dist} '
       '-log file={result_file} -rate threads={threads} '
@@ -427,33 +437,103 @@ def RunCassandraStressTest(cassandra_vms, loader_vms, num_operations,
             command, profile_operations, population_per_vm,
             population_dist, population_params), {})
           for i in xrange(0, num_loaders)]
-  vm_util.RunThreaded(RunTestOnLoader, args)
+  jobs = vm_util.RunThreaded(RunTestOnLoader, args)
+  remote_job.WaitForJobs(jobs)
+
+
+def _ParseOperationTime(value):
+  hours, minutes, seconds = value.split(':')
+  return int(hours) * 3600 + int(minutes) * 60 + int(seconds)
+
 
+def ParseResultFile(lines):
+  """Parses the output of cassandra-stress.
 
-def CollectResultFile(vm, results):
-  """Collect result file on vm.
+  The output is read one line at a time, so the result files of long runs are
+  never held in memory.
+
+  Args:
+    lines: iterable of strings, e.g. an open result file.
+
+  Returns:
+    A (results, intervals) tuple. 'results' is a dict mapping each metric in
+    RESULTS_METRICS to its value. 'intervals' is a list of (time, op_rate)
+    tuples, one per progress line, where 'time' is the number of seconds
+    since the start of the run.
+
+  Raises:
+    errors.Benchmarks.RunError: When a metric is missing from the output.
+  """
+  results = {}
+  intervals = []
+  columns = None
+  in_results = False
+  for line in lines:
+    line = line.strip()
+    if in_results:
+      metric, _, value = line.partition(':')
+      metric = metric.strip()
+      if metric not in RESULTS_METRICS:
+        continue
+      value = value.split()[0]
+      if metric == RESULTS_METRICS[-1]:  # Total operation time
+        results[metric] = _ParseOperationTime(value)
+      else:
+        results[metric] = float(value)
+    elif line == _RESULTS_HEADER:
+      in_results = True
+    elif line.startswith(_INTERVAL_TYPE_COLUMN + ','):
+      columns = [column.strip() for column in line.split(',')]
+      time_index = columns.index('time')
+      op_rate_index = columns.index('op/s')
+    elif columns and line.startswith(_INTERVAL_TOTAL_TYPE + ','):
+      values = line.split(',')
+      if len(values) == len(columns):
+        intervals.append((float(values[time_index]),
+                          float(values[op_rate_index])))
+  missing = [m for m in RESULTS_METRICS if m not in results]
+  if missing:
+    raise errors.Benchmarks.RunError(
+        'cassandra-stress output is missing results: %s' % ', '.join(missing))
+  return results, intervals
+
+
+def CollectResultFile(vm):
+  """Collect and parse result files on vm.
 
   Args:
     vm: The target vm.
-    results: A dictionary of lists. Each list contains results of a field
-       defined in RESULTS_METRICS collected from each loader machines.
+
+  Returns:
+    A (results, intervals) tuple, as returned by ParseResultFile.
   """
   result_path = _ResultFilePath(vm)
   vm.PullFile(vm_util.GetTempDir(), result_path)
-  resp, _ = vm.RemoteCommand('tail -n 20 ' + result_path)
-  for metric in RESULTS_METRICS:
-    value = regex_util.ExtractGroup(r'%s[\t ]+: ([\d\.:]+)' % metric, resp)
-    if metric == RESULTS_METRICS[-1]:  # Total operation time
-      value = value.split(':')
-      results[metric].append(
-          int(value[0]) * 3600 + int(value[1]) * 60 + int(value[2]))
-    else:
-      results[metric].append(float(value))
+  with open(os.path.join(vm_util.GetTempDir(),
+                         posixpath.basename(result_path))) as result_file:
+    return ParseResultFile(result_file)
+
+
+def _SumIntervals(interval_lists):
+  """Sums the loaders' op rates over intervals ending in the same second.
+
+  Returns:
+    A list of (time, op_rate) tuples, sorted by time.
+  """
+  op_rates = collections.defaultdict(float)
+  for intervals in interval_lists:
+    for interval_time, op_rate in intervals:
+      op_rates[int(round(interval_time))] += op_rate
+  return sorted(op_rates.items())
 
 
 def CollectResults(benchmark_spec, metadata):
   """Collect and parse test results.
 
+  Latency percentiles are the average of the percentiles reported by each
+  loader, as the latency_aggregation metadata key records, rather than
+  percentiles of all the operations of the run.
+
   Args:
     benchmark_spec: The benchmark specification. Contains all data
         that is required to run the benchmark.
@@ -465,9 +545,12 @@ def CollectResults(benchmark_spec, metadata):
   logging.info('Gathering results.')
   vm_dict = benchmark_spec.vm_groups
   loader_vms = vm_dict[CLIENT_GROUP]
+  loader_results = vm_util.RunThreaded(CollectResultFile, loader_vms)
   raw_results = collections.defaultdict(list)
-  args = [((vm, raw_results), {}) for vm in loader_vms]
-  vm_util.RunThreaded(CollectResultFile, args)
+  for loader_result, _ in loader_results:
+    for metric, value in loader_result.iteritems():
+      raw_results[metric].append(value)
+  metadata = dict(metadata, latency_aggregation='mean_of_loaders')
   results = []
   for metric in RESULTS_METRICS:
     if metric in MAXIMUM_METRICS:
@@ -483,6 +566,11 @@ def CollectResults(benchmark_spec, metadata):
     elif metric == 'Total operation time':
       unit = 'seconds'
     results.append(sample.Sample(metric, value, unit, metadata))
+  intervals = _SumIntervals([intervals for _, intervals in loader_results])
+  for interval_time, op_rate in intervals:
+    interval_metadata = dict(metadata, interval_end=interval_time)
+    results.append(sample.Sample('interval op rate', op_rate,
+                                 'operations per second', interval_metadata))
   logging.info('Cassandra results:\n%s', results)
   return results
 
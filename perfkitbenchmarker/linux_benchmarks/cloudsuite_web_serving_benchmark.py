@@ -297,9 +297,7 @@ def PreparePrivateKey(vm):
 
 
 def _PrepareVms(vm):
-  vm.Install('wget')
-  vm.Install('ant')
-  vm.Install('openjdk7')
+  vm.InstallBatch(['wget', 'ant', 'openjdk7'])
   vm.RemoteCommand('cd %s && '
                    'wget parsa.epfl.ch/cloudsuite/software/web.tar.gz && '
                    'tar xzf web.tar.gz' % vm_util.VM_TMP_DIR)
@@ -26,6 +26,7 @@ import posixpath
 import re
 import time
 
+from perfkitbenchmarker import broadcast
 from perfkitbenchmarker import configs
 from perfkitbenchmarker import vm_util
 from perfkitbenchmarker import flags
@@ -139,15 +140,22 @@ def _BuildIndex(solr_nodes):
                      'bin/solr stop -p {1}'.format(
                          solr.SOLR_HOME_DIR, SOLR_PORT))
 
-  def DownloadIndex(vm):
+  # The first node downloads the index, and the others copy it from their
+  # peers rather than downloading it too.
+  index_path = posixpath.join(solr_nodes[0].GetScratchDir(), 'index.tar.gz')
+  solr_nodes[0].RobustRemoteCommand('wget -O {0} {1}'.format(index_path,
+                                                             INDEX_URL))
+  broadcast.BroadcastFile(solr_nodes, index_path, index_path,
+                          source_vm=solr_nodes[0])
+
+  def ExtractIndex(vm):
     solr_core_dir = posixpath.join(vm.GetScratchDir(), 'solr_cores')
     vm.RobustRemoteCommand('cd {0} && '
-                           'wget -O - {1} | '
-                           'tar zxvf - -C {2}'.format(
-                               solr_core_dir, INDEX_URL,
+                           'tar zxvf {1} -C {2} && rm {1}'.format(
+                               solr_core_dir, index_path,
                                'cloudsuite_web_search*'))
 
-  vm_util.RunThreaded(DownloadIndex, solr_nodes, len(solr_nodes))
+  vm_util.RunThreaded(ExtractIndex, solr_nodes, len(solr_nodes))
   server_heap_size = FLAGS.cs_websearch_server_heap_size
   for vm in solr_nodes:
     if vm == solr_nodes[0]:
@@ -42,6 +42,7 @@ from perfkitbenchmarker import configs
 from perfkitbenchmarker import data
 from perfkitbenchmarker import errors
 from perfkitbenchmarker import flags
+from perfkitbenchmarker import flags_validators
 from perfkitbenchmarker import sample
 from perfkitbenchmarker import vm_util
 from perfkitbenchmarker.sample import PercentileCalculator  # noqa
@@ -52,13 +53,56 @@ flags.DEFINE_enum('storage', benchmark_spec_class.GCP,
                   'storage provider (GCP/AZURE/AWS/OPENSTACK) to use.')
 
 flags.DEFINE_enum('object_storage_scenario', 'all',
-                  ['all', 'cli', 'api_data', 'api_namespace'],
+                  ['all', 'cli', 'api_data', 'api_namespace',
+                   'api_multistream'],
                   'select all, or one particular scenario to run: \n'
-                  'ALL: runs all scenarios. This is the default. \n'
+                  'ALL: runs all scenarios except api_multistream. This is '
+                  'the default. \n'
                   'cli: runs the command line only scenario. \n'
                   'api_data: runs API based benchmarking for data paths. \n'
                   'api_namespace: runs API based benchmarking for namespace '
-                  'operations.')
+                  'operations. \n'
+                  'api_multistream: runs API based benchmarking of many '
+                  'concurrent large object streams.')
+
+flags.DEFINE_integer('object_storage_multistream_num_streams', 10,
+                     'Number of concurrent streams in the api_multistream '
+                     'scenario.', lower_bound=1)
+
+flags.DEFINE_integer('object_storage_multistream_objects_per_stream', 5,
+                     'Number of objects written and read by each stream in '
+                     'the api_multistream scenario.', lower_bound=1)
+
+flags.DEFINE_integer('object_storage_multistream_object_size_mb', 100,
+                     'Size of each object in MiB in the api_multistream '
+                     'scenario.', lower_bound=1)
+
+flags.DEFINE_integer('object_storage_multistream_part_size_mb', 8,
+                     'Multipart upload and ranged download part size in MiB '
+                     'in the api_multistream scenario, at least 5. 0 '
+                     'transfers each object with a single request.',
+                     lower_bound=0)
+
+# S3 rejects all but the last part of a multipart upload when it is smaller
+# than 5 MiB.
+MIN_MULTISTREAM_PART_SIZE_MB = 5
+
+
+def _ValidateMultistreamPartSize(part_size_mb):
+  if 0 < part_size_mb < MIN_MULTISTREAM_PART_SIZE_MB:
+    raise flags_validators.Error(
+        'Parts must be at least %d MiB, or 0 to disable them.' %
+        MIN_MULTISTREAM_PART_SIZE_MB)
+  return True
+
+
+flags.RegisterValidator('object_storage_multistream_part_size_mb',
+                        _ValidateMultistreamPartSize)
+
+flags.DEFINE_enum('object_storage_multistream_pool', 'thread',
+                  ['thread', 'process'],
+                  'Whether the streams of the api_multistream scenario run '
+                  'in threads or in processes on the client VM.')
 
 flags.DEFINE_enum('cli_test_size', 'normal',
                   ['normal', 'large'],
@@ -152,6 +196,10 @@ CLI_TEST_FAILURE_TOLERANCE = 0.05
 CLI_TEST_ITERATION_COUNT_AZURE = 3
 
 SINGLE_STREAM_THROUGHPUT = 'single stream %s throughput Mbps'
+SINGLE_STREAM_PAYLOAD_GENERATION_TIME = 'single stream payload generation time'
+MULTI_STREAM_THROUGHPUT = 'multi stream %s throughput Mbps'
+MULTI_STREAM_PER_STREAM_THROUGHPUT = (
+    'multi stream %s per-stream throughput Mbps')
 
 ONE_BYTE_LATENCY = 'one byte %s latency'
 
@@ -206,6 +254,41 @@ def _JsonStringToPercentileResults(results, json_input, metric_name,
         metadata))
 
 
+def _ParseMultiStreamResults(results, raw_result, metadata):
+  """Parses the output of the MultiStreamThroughput api test.
+
+  Args:
+    results: The final result set to put result in.
+    raw_result: The output of the api test script.
+    metadata: The metadata to be included.
+
+  Raises:
+    ValueError: if the output does not contain the expected results.
+  """
+  for up_and_down in ['upload', 'download']:
+    aggregate = re.findall(
+        'Multi stream %s aggregate throughput in Bps: (.*)' % up_and_down,
+        raw_result)
+    per_stream = re.findall(
+        'Multi stream %s per-stream throughput in Bps: (.*)' % up_and_down,
+        raw_result)
+    if not aggregate or not per_stream:
+      raise ValueError('Unexpected test outcome from MultiStreamThroughput '
+                       'api test: %s.' % raw_result)
+    # Convert Bytes per second to Mega bits per second, as in the single
+    # stream results.
+    results.append(sample.Sample(MULTI_STREAM_THROUGHPUT % up_and_down,
+                                 8 * float(aggregate[0]) / 1000 / 1000,
+                                 THROUGHPUT_UNIT, metadata))
+    per_stream_result = json.loads(per_stream[0])
+    for percentile in PERCENTILES_LIST:
+      results.append(sample.Sample(
+          '%s %s' % (MULTI_STREAM_PER_STREAM_THROUGHPUT % up_and_down,
+                     percentile),
+          8 * float(per_stream_result[percentile]) / 1000 / 1000,
+          THROUGHPUT_UNIT, metadata))
+
+
 def _GetClientLibVersion(vm, library_name):
   """ This function returns the version of client lib installed on a vm.
 
@@ -354,6 +437,45 @@ def ApiBasedBenchmarks(results, metadata, vm, storage, test_script_path,
           raise ValueError('Unexpected test outcome from '
                            'SingleStreamThroughput api test: %s.' % raw_result)
 
+      # Reported separately from the transfers, which it does not overlap.
+      result_string = re.findall(
+          'Single stream payload generation time in seconds: (.*)', raw_result)
+      if result_string:
+        results.append(sample.Sample(SINGLE_STREAM_PAYLOAD_GENERATION_TIME,
+                                     float(result_string[0]), LATENCY_UNIT,
+                                     metadata))
+
+    # Not part of 'all': it transfers gigabytes, and would change the results
+    # of the default scenario.
+    if FLAGS.object_storage_scenario == 'api_multistream':
+      multi_stream_throughput_cmd = (
+          '%s --bucket=%s --storage_provider=%s '
+          '--scenario=MultiStreamThroughput --num_streams=%d '
+          '--objects_per_stream=%d --object_size_bytes=%d '
+          '--part_size_bytes=%d --stream_pool=%s') % (
+              test_script_path, bucket_name, storage,
+              FLAGS.object_storage_multistream_num_streams,
+              FLAGS.object_storage_multistream_objects_per_stream,
+              FLAGS.object_storage_multistream_object_size_mb * 1024 * 1024,
+              FLAGS.object_storage_multistream_part_size_mb * 1024 * 1024,
+              FLAGS.object_storage_multistream_pool)
+      if azure_command_suffix is not None:
+        multi_stream_throughput_cmd = ('%s %s') % (
+            multi_stream_throughput_cmd, azure_command_suffix)
+
+      _, raw_result = vm.RemoteCommand(multi_stream_throughput_cmd)
+      logging.info('MultiStreamThroughput raw result is %s', raw_result)
+
+      multi_stream_metadata = metadata.copy()
+      multi_stream_metadata.update({
+          'num_streams': FLAGS.object_storage_multistream_num_streams,
+          'objects_per_stream':
+              FLAGS.object_storage_multistream_objects_per_stream,
+          'object_size_mb': FLAGS.object_storage_multistream_object_size_mb,
+          'part_size_mb': FLAGS.object_storage_multistream_part_size_mb,
+          'stream_pool': FLAGS.object_storage_multistream_pool})
+      _ParseMultiStreamResults(results, raw_result, multi_stream_metadata)
+
     if (FLAGS.object_storage_scenario == 'all' or
         FLAGS.object_storage_scenario == 'api_namespace'):
       # list-after-write consistency metrics
@@ -79,9 +79,7 @@ def Prepare(benchmark_spec):
   vms = benchmark_spec.vms
   vm = vms[0]
   logging.info('Preparing SciMark2 on %s', vm)
-  vm.Install('build_tools')
-  vm.Install('wget')
-  vm.Install('openjdk7')
+  vm.InstallBatch(['build_tools', 'wget', 'openjdk7'])
   vm.InstallPackages('unzip')
   cmds = [
       'rm -rf {0} && mkdir {0}'.format(SCIMARK2_PATH),
@@ -100,12 +100,10 @@ def Prepare(benchmark_spec):
   vms = benchmark_spec.vms
   vm = vms[0]
   logging.info('prepare SpecCPU2006 on %s', vm)
-  vm.Install('wget')
-  vm.Install('build_tools')
-  vm.Install('fortran')
-  if (FLAGS.runspec_enable_32bit):
-    vm.Install('multilib')
-  vm.Install('numactl')
+  packages = ['wget', 'build_tools', 'fortran', 'numactl']
+  if FLAGS.runspec_enable_32bit:
+    packages.append('multilib')
+  vm.InstallBatch(packages)
   try:
     local_tar_file_path = data.ResourcePath(SPECCPU2006_TAR)
   except data.ResourceNotFound as e:
@@ -20,7 +20,8 @@ This is close to HTTP-RR:
   * The server does very little work.
 
 Doubles connections up to a fixed count, reports single connection latency and
-maximum error-free throughput.
+maximum error-free throughput. With --tomcat_wrk_load_search, the connection
+counts are chosen by a search instead (see perfkitbenchmarker.load_search).
 
 `wrk` is a scalable web load generator.
 `tomcat` is a popular Java web server.
@@ -33,6 +34,7 @@ import urlparse
 
 from perfkitbenchmarker import configs
 from perfkitbenchmarker import flags
+from perfkitbenchmarker import load_search
 from perfkitbenchmarker import vm_util
 from perfkitbenchmarker.linux_packages import tomcat
 from perfkitbenchmarker.linux_packages import wrk
@@ -49,6 +51,17 @@ flags.DEFINE_boolean('tomcat_wrk_report_all_samples', False,
                      'counts. If false (the default), report only the '
                      'connection counts with lowest p50 latency and highest '
                      'throughput.')
+flags.DEFINE_enum('tomcat_wrk_load_search', 'doubling',
+                  ['doubling', 'knee', 'latency_limit'],
+                  'How to choose connection counts. "doubling" runs every '
+                  'power of two up to --tomcat_wrk_max_connections. "knee" '
+                  'searches for the count with the highest throughput. '
+                  '"latency_limit" searches for the highest throughput with '
+                  'p99 latency within --tomcat_wrk_latency_limit_ms.')
+flags.DEFINE_float('tomcat_wrk_latency_limit_ms', 10.0,
+                   'p99 latency limit, in milliseconds, used when '
+                   '--tomcat_wrk_load_search=latency_limit.',
+                   lower_bound=0.0)
 
 # Stop when >= 1% of requests have errors
 MAX_ERROR_RATE = 0.01
@@ -97,8 +110,7 @@ def _PrepareServer(vm):
 def _PrepareClient(vm):
   """Install wrk on the client VM."""
   _IncreaseMaxOpenFiles(vm)
-  vm.Install('curl')
-  vm.Install('wrk')
+  vm.InstallBatch(['curl', 'wrk'])
 
 
 def Prepare(benchmark_spec):
@@ -132,10 +144,11 @@ def Run(benchmark_spec):
   wrk_vm = benchmark_spec.vm_groups['client'][0]
 
   samples = []
-  errors = 0
-  connections = 1
   duration = FLAGS.tomcat_wrk_test_length
   max_connections = FLAGS.tomcat_wrk_max_connections
+  search_mode = FLAGS.tomcat_wrk_load_search
+  latency_limit = (FLAGS.tomcat_wrk_latency_limit_ms
+                   if search_mode == 'latency_limit' else None)
 
   target = urlparse.urljoin('http://{0}:{1}'.format(tomcat_vm.ip_address,
                                                     tomcat.TOMCAT_HTTP_PORT),
@@ -144,9 +157,7 @@ def Run(benchmark_spec):
   logging.info('Warming up for %ds', WARM_UP_DURATION)
   list(wrk.Run(wrk_vm, connections=1, target=target, duration=WARM_UP_DURATION))
 
-  all_by_metric = []
-
-  while connections <= max_connections:
+  def _RunWrk(connections):
     run_samples = list(wrk.Run(wrk_vm, connections=connections, target=target,
                                duration=duration))
 
@@ -161,17 +172,37 @@ def Run(benchmark_spec):
     else:
       error_rate = float(errors) / requests
 
+    logging.info('Ran with %d connections; %.2f%% errors, %.2f req/s',
+                 connections, error_rate, throughput)
+
     if error_rate <= MAX_ERROR_RATE:
-      all_by_metric.append(by_metric)
+      latency = by_metric['p99 latency'].value
     else:
       logging.warn('Error rate exceeded maximum (%g > %g)', error_rate,
                    MAX_ERROR_RATE)
+      latency = None
+    return load_search.Measurement(throughput, latency, run_samples)
+
+  if search_mode == 'doubling':
+    measurements = []
+    connections = 1
+    while connections <= max_connections:
+      measurements.append(_RunWrk(connections))
+      # Retry with double the connections
+      connections *= 2
+  else:
+    if search_mode == 'knee':
+      result = load_search.FindKnee(_RunWrk, 1, max_connections,
+                                    log_scale=True)
+    else:
+      result = load_search.MaxThroughputUnderLatencyLimit(
+          _RunWrk, 1, max_connections, latency_limit)
+    measurements = [m for point in result.points for m in point.measurements]
 
-    logging.info('Ran with %d connections; %.2f%% errors, %.2f req/s',
-                 connections, error_rate, throughput)
-
-    # Retry with double the connections
-    connections *= 2
+  all_by_metric = [
+      {i.metric: i for i in m.samples} for m in measurements
+      if m.latency is not None and (latency_limit is None or
+                                    m.latency <= latency_limit)]
 
   if not all_by_metric:
     raise ValueError('No requests succeeded.')
@@ -195,7 +226,10 @@ def Run(benchmark_spec):
                sorted(max_throughput.itervalues(), key=sort_key))
 
   for sample in samples:
-    sample.metadata.update(ip_type='external', runtime_in_seconds=duration)
+    sample.metadata.update(ip_type='external', runtime_in_seconds=duration,
+                           load_search=search_mode)
+    if latency_limit is not None:
+      sample.metadata.update(p99_latency_limit_ms=latency_limit)
 
   return samples
 
@@ -11,10 +11,11 @@
 # WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
 # See the License for the specific language governing permissions and
 # limitations under the License.
-"""Contains package imports and a dictionary of package names and modules.
+"""Contains a dictionary of package names and modules.
 
 All modules within this package are considered packages, and are loaded
-dynamically. Add non-package code to other packages.
+dynamically when they are first looked up. Add non-package code to other
+packages.
 
 Packages should, at a minimum, define install functions for each type of
 package manager (e.g. YumInstall(vm) and AptInstall(vm)).
@@ -27,6 +28,19 @@ function. If the package manually places files in other locations
 (e.g. /user/bin), then it also needs to define uninstall functions
 (e.g. YumUninstall(vm)).
 
+Packages may also declare, as module attributes, the names of the packages
+they need in DEPENDENCIES and the packages they install through the package
+manager in APT_PACKAGES and YUM_PACKAGES (space-separated strings). Declared
+dependencies are installed before the package, and the declared OS packages of
+a package and of all its dependencies are installed in a single package
+manager command. Files the package would download should be declared as
+artifact_cache.Artifacts in ARTIFACTS (or APT_ARTIFACTS and YUM_ARTIFACTS):
+they are downloaded once, on the controller, and copied to the artifact's
+remote_path on the VM before the install function runs. See
+BaseLinuxMixin.InstallBatch. Packages compiled from source should compile
+through vm.CachedBuild, which compiles them on one VM and extracts the result
+on the others.
+
 All functions in each package module should be prefixed with the type of package
 manager, and all functions should accept a BaseVirtualMachine object as their
 only arguments.
@@ -38,9 +52,6 @@ packages in benchmarks.
 from perfkitbenchmarker import import_util
 
 
-def _LoadPackages():
-  return dict([(module.__name__.split('.')[-1], module) for module in
-               import_util.LoadModulesForPath(__path__, __name__)])
-
-
-PACKAGES = _LoadPackages()
+# Maps package names to package modules. Modules are only imported when they
+# are looked up.
+PACKAGES = import_util.LazyModuleDict(__path__, __name__)
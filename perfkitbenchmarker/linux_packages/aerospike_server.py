@@ -36,14 +36,19 @@ flags.DEFINE_enum('aerospike_storage_type', MEMORY, [MEMORY, DISK],
                   'disk is controlled by the "data_disk_type" flag.')
 
 
+def _Build(vm):
+  """Compiles the Aerospike server on the VM."""
+  vm.RemoteCommand('git clone {0} {1}'.format(GIT_REPO, AEROSPIKE_DIR))
+  vm.RemoteCommand('cd {0} && git checkout {1} && git submodule update --init '
+                   '&& make'.format(AEROSPIKE_DIR, GIT_TAG))
+
+
 def _Install(vm):
   """Installs the Aerospike server on the VM."""
   vm.Install('build_tools')
   vm.Install('lua5_1')
   vm.Install('openssl')
-  vm.RemoteCommand('git clone {0} {1}'.format(GIT_REPO, AEROSPIKE_DIR))
-  vm.RemoteCommand('cd {0} && git checkout {1} && git submodule update --init '
-                   '&& make'.format(AEROSPIKE_DIR, GIT_TAG))
+  vm.CachedBuild('aerospike_server', GIT_TAG, [AEROSPIKE_DIR], _Build)
 
 
 def YumInstall(vm):
@@ -17,23 +17,25 @@
 
 import posixpath
 
+from perfkitbenchmarker import artifact_cache
 from perfkitbenchmarker import vm_util
 
-ANT_TAR_URL = ('archive.apache.org/dist/ant/binaries/'
+ANT_TAR_URL = ('http://archive.apache.org/dist/ant/binaries/'
                'apache-ant-1.9.6-bin.tar.gz')
 
 ANT_HOME_DIR = posixpath.join(vm_util.VM_TMP_DIR, 'ant')
 
+DEPENDENCIES = ('wget',)
+ARTIFACTS = (artifact_cache.Artifact(ANT_TAR_URL),)
+
 
 def _Install(vm):
   """Installs the Ant package on the VM."""
-  vm.Install('wget')
   vm.RemoteCommand('mkdir -p {0} && '
                    'cd {0} && '
-                   'wget {1} && '
                    'tar -zxf apache-ant-1.9.6-bin.tar.gz && '
-                   'ln -s {0}/apache-ant-1.9.6/ {2}'.format(
-                       vm_util.VM_TMP_DIR, ANT_TAR_URL, ANT_HOME_DIR))
+                   'ln -s {0}/apache-ant-1.9.6/ {1}'.format(
+                       vm_util.VM_TMP_DIR, ANT_HOME_DIR))
 
 
 def YumInstall(vm):
@@ -24,6 +24,7 @@ import os
 import posixpath
 import time
 
+from perfkitbenchmarker import artifact_cache
 from perfkitbenchmarker import data
 from perfkitbenchmarker import errors
 from perfkitbenchmarker import vm_util
@@ -32,6 +33,7 @@ from perfkitbenchmarker.linux_packages.ant import ANT_HOME_DIR
 
 JNA_JAR_URL = ('https://maven.java.net/content/repositories/releases/'
                'net/java/dev/jna/jna/4.1.0/jna-4.1.0.jar')
+JNA_JAR_ARTIFACT = artifact_cache.Artifact(JNA_JAR_URL)
 CASSANDRA_GIT_REPRO = 'https://github.com/apache/cassandra.git'
 CASSANDRA_VERSION = 'cassandra-2.1.10'
 CASSANDRA_YAML_TEMPLATE = 'cassandra/cassandra.yaml.j2'
@@ -42,6 +44,9 @@ CASSANDRA_OUT = posixpath.join(CASSANDRA_DIR, 'cassandra.out')
 CASSANDRA_ERR = posixpath.join(CASSANDRA_DIR, 'cassandra.err')
 NODETOOL = posixpath.join(CASSANDRA_DIR, 'bin', 'nodetool')
 
+DEPENDENCIES = ('ant', 'build_tools', 'openjdk7', 'curl')
+ARTIFACTS = (JNA_JAR_ARTIFACT,)
+
 
 # Number of times to attempt to start the cluster.
 CLUSTER_START_TRIES = 10
@@ -63,10 +68,6 @@ def CheckPrerequisites():
 
 def _Install(vm):
   """Installs Cassandra from a tarball."""
-  vm.Install('ant')
-  vm.Install('build_tools')
-  vm.Install('openjdk7')
-  vm.Install('curl')
   vm.RemoteCommand(
       'cd {0}; git clone {1}; cd {2}; git checkout {3}; {4}/bin/ant'.format(
           vm_util.VM_TMP_DIR,
@@ -75,9 +76,9 @@ def _Install(vm):
           CASSANDRA_VERSION,
           ANT_HOME_DIR))
   # Add JNA
-  vm.RemoteCommand('cd {0} && curl -LJO {1}'.format(
-      posixpath.join(CASSANDRA_DIR, 'lib'),
-      JNA_JAR_URL))
+  vm.RemoteCommand('cp {0} {1}'.format(
+      JNA_JAR_ARTIFACT.remote_path,
+      posixpath.join(CASSANDRA_DIR, 'lib')))
 
 
 def YumInstall(vm):
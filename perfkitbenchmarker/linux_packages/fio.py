@@ -35,25 +35,32 @@ CMD_PARAMETER_REGEX = r'--(\w+=[/\w\d]+)\n'
 CMD_PARAMETER_REPL_REGEX = r'\1\n'
 CMD_STONEWALL_PARAMETER = '--stonewall'
 JOB_STONEWALL_PARAMETER = 'stonewall'
+DEPENDENCIES = ('build_tools',)
+YUM_PACKAGES = 'libaio-devel libaio bc'
+APT_PACKAGES = 'libaio-dev libaio1 bc'
 
 
-def _Install(vm):
-  """Installs the fio package on the VM."""
-  vm.Install('build_tools')
+def _Build(vm):
+  """Compiles fio on the VM."""
   vm.RemoteCommand('git clone {0} {1}'.format(GIT_REPO, FIO_DIR))
   vm.RemoteCommand('cd {0} && git checkout {1}'.format(FIO_DIR, GIT_TAG))
   vm.RemoteCommand('cd {0} && ./configure && make'.format(FIO_DIR))
 
 
+def _Install(vm):
+  """Installs the fio package on the VM."""
+  vm.CachedBuild('fio', GIT_TAG, [FIO_DIR], _Build)
+
+
 def YumInstall(vm):
   """Installs the fio package on the VM."""
-  vm.InstallPackages('libaio-devel libaio bc')
+  vm.InstallPackages(YUM_PACKAGES)
   _Install(vm)
 
 
 def AptInstall(vm):
   """Installs the fio package on the VM."""
-  vm.InstallPackages('libaio-dev libaio1 bc')
+  vm.InstallPackages(APT_PACKAGES)
   _Install(vm)
 
 
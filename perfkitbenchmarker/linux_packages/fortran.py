@@ -14,12 +14,15 @@
 
 """Module containing fortran installation and cleanup functions."""
 
+YUM_PACKAGES = 'gcc-gfortran libgfortran'
+APT_PACKAGES = 'gfortran'
+
 
 def YumInstall(vm):
   """Installs the fortran package on the VM."""
-  vm.InstallPackages('gcc-gfortran libgfortran')
+  vm.InstallPackages(YUM_PACKAGES)
 
 
 def AptInstall(vm):
   """Installs the fortan package on the VM."""
-  vm.InstallPackages('gfortran')
+  vm.InstallPackages(APT_PACKAGES)
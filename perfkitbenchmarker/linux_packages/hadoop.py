@@ -23,6 +23,7 @@ import posixpath
 import re
 import time
 
+from perfkitbenchmarker import artifact_cache
 from perfkitbenchmarker import data
 from perfkitbenchmarker import regex_util
 from perfkitbenchmarker import vm_util
@@ -30,6 +31,7 @@ from perfkitbenchmarker import vm_util
 HADOOP_VERSION = '2.5.2'
 HADOOP_URL = ('http://www.us.apache.org/dist/hadoop/common/hadoop-{0}/'
               'hadoop-{0}.tar.gz').format(HADOOP_VERSION)
+HADOOP_ARTIFACT = artifact_cache.Artifact(HADOOP_URL)
 
 DATA_FILES = ['hadoop/core-site.xml.j2', 'hadoop/yarn-site.xml.j2',
               'hadoop/hdfs-site.xml', 'hadoop/mapred-site.xml',
@@ -42,6 +44,11 @@ HADOOP_SBIN = posixpath.join(HADOOP_DIR, 'sbin')
 HADOOP_CONF_DIR = posixpath.join(HADOOP_DIR, 'etc', 'hadoop')
 HADOOP_PRIVATE_KEY = posixpath.join(HADOOP_CONF_DIR, 'hadoop_keyfile')
 
+DEPENDENCIES = ('openjdk7', 'curl')
+ARTIFACTS = (HADOOP_ARTIFACT,)
+YUM_PACKAGES = 'snappy snappy-devel'
+APT_PACKAGES = 'libsnappy1 libsnappy-dev'
+
 
 def CheckPrerequisites():
   """Verifies that the required resources are present.
@@ -54,22 +61,20 @@ def CheckPrerequisites():
 
 
 def _Install(vm):
-  vm.Install('openjdk7')
-  vm.Install('curl')
-  vm.RemoteCommand(('mkdir {0} && curl -L {1} | '
-                    'tar -C {0} --strip-components=1 -xzf -').format(
-                        HADOOP_DIR, HADOOP_URL))
+  vm.RemoteCommand(('mkdir {0} && '
+                    'tar -C {0} --strip-components=1 -xzf {1}').format(
+                        HADOOP_DIR, HADOOP_ARTIFACT.remote_path))
 
 
 def YumInstall(vm):
   """Installs Hadoop on the VM."""
-  vm.InstallPackages('snappy snappy-devel')
+  vm.InstallPackages(YUM_PACKAGES)
   _Install(vm)
 
 
 def AptInstall(vm):
   """Installs Hadoop on the VM."""
-  vm.InstallPackages('libsnappy1 libsnappy-dev')
+  vm.InstallPackages(APT_PACKAGES)
   _Install(vm)
 
 
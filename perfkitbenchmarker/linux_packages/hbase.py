@@ -21,6 +21,7 @@ import functools
 import os
 import posixpath
 
+from perfkitbenchmarker import artifact_cache
 from perfkitbenchmarker import data
 from perfkitbenchmarker import vm_util
 from perfkitbenchmarker.linux_packages import hadoop
@@ -28,6 +29,7 @@ from perfkitbenchmarker.linux_packages import hadoop
 HBASE_VERSION = '1.0.2'
 HBASE_URL = ('http://www.us.apache.org/dist/hbase/hbase-{0}/'
              'hbase-{0}-bin.tar.gz').format(HBASE_VERSION)
+HBASE_ARTIFACT = artifact_cache.Artifact(HBASE_URL)
 
 DATA_FILES = ['hbase/hbase-site.xml.j2', 'hbase/regionservers.j2',
               'hbase/hbase-env.sh.j2']
@@ -36,6 +38,9 @@ HBASE_DIR = posixpath.join(vm_util.VM_TMP_DIR, 'hbase')
 HBASE_BIN = posixpath.join(HBASE_DIR, 'bin')
 HBASE_CONF_DIR = posixpath.join(HBASE_DIR, 'conf')
 
+DEPENDENCIES = ('hadoop', 'curl')
+ARTIFACTS = (HBASE_ARTIFACT,)
+
 
 def CheckPrerequisites():
   """Verifies that the required resources are present.
@@ -48,11 +53,9 @@ def CheckPrerequisites():
 
 
 def _Install(vm):
-  vm.Install('hadoop')
-  vm.Install('curl')
-  vm.RemoteCommand(('mkdir {0} && curl -L {1} | '
-                    'tar -C {0} --strip-components=1 -xzf -').format(
-                        HBASE_DIR, HBASE_URL))
+  vm.RemoteCommand(('mkdir {0} && '
+                    'tar -C {0} --strip-components=1 -xzf {1}').format(
+                        HBASE_DIR, HBASE_ARTIFACT.remote_path))
 
 
 def YumInstall(vm):
@@ -22,23 +22,22 @@ http://icl.cs.utk.edu/hpcc/
 
 import re
 
+from perfkitbenchmarker import artifact_cache
 from perfkitbenchmarker import vm_util
 from perfkitbenchmarker.linux_packages import openblas
 
 HPCC_TAR = 'hpcc-1.4.3.tar.gz'
 HPCC_URL = 'http://icl.cs.utk.edu/projectsfiles/hpcc/download/' + HPCC_TAR
+ARTIFACTS = (artifact_cache.Artifact(HPCC_URL),)
 HPCC_DIR = '%s/hpcc-1.4.3' % vm_util.VM_TMP_DIR
 MAKE_FLAVOR = 'Linux_PII_CBLAS'
 HPCC_MAKEFILE = 'Make.' + MAKE_FLAVOR
 HPCC_MAKEFILE_PATH = HPCC_DIR + '/hpl/' + HPCC_MAKEFILE
+DEPENDENCIES = ('wget', 'openmpi', 'openblas')
 
 
-def _Install(vm):
-  """Installs the HPCC package on the VM."""
-  vm.Install('wget')
-  vm.Install('openmpi')
-  vm.Install('openblas')
-  vm.RemoteCommand('wget %s -P %s' % (HPCC_URL, vm_util.VM_TMP_DIR))
+def _Build(vm):
+  """Compiles HPCC on the VM."""
   vm.RemoteCommand('cd %s && tar xvfz %s' % (vm_util.VM_TMP_DIR, HPCC_TAR))
   vm.RemoteCommand(
       'cp %s/hpl/setup/%s %s' % (HPCC_DIR, HPCC_MAKEFILE, HPCC_MAKEFILE_PATH))
@@ -52,6 +51,12 @@ def _Install(vm):
   vm.RemoteCommand('cd %s; make arch=Linux_PII_CBLAS' % HPCC_DIR)
 
 
+def _Install(vm):
+  """Installs the HPCC package on the VM."""
+  vm.CachedBuild('hpcc', '%s %s' % (HPCC_TAR, openblas.GIT_TAG), [HPCC_DIR],
+                 _Build)
+
+
 def YumInstall(vm):
   """Installs the HPCC package on the VM."""
   _Install(vm)
@@ -17,6 +17,10 @@ from perfkitbenchmarker import vm_util
 
 """Module containing libxml2 installation and cleanup functions."""
 
+LIBXML2_TAR = 'libxml2-2.7.6.tar.gz'
+LIBXML2_DIR = posixpath.join(vm_util.VM_TMP_DIR, 'web-release',
+                             'libxml2-2.7.6')
+
 
 def YumInstall(vm):
   """Installs the libxml2 package on the VM."""
@@ -24,10 +28,21 @@ def YumInstall(vm):
   vm.InstallPackages('libxml2-devel')
 
 
+def _AptBuild(vm):
+  """Compiles libxml2 on the VM."""
+  vm.RemoteCommand('cd %s && wget xmlsoft.org/sources/%s && '
+                   'tar xzf %s && cd %s && ./configure && make'
+                   % (posixpath.dirname(LIBXML2_DIR), LIBXML2_TAR, LIBXML2_TAR,
+                      LIBXML2_DIR))
+
+
+def _AptMakeInstall(vm):
+  """Installs libxml2 from its build tree."""
+  vm.RemoteCommand('cd %s && sudo make install' % LIBXML2_DIR)
+
+
 def AptInstall(vm):
   """Installs the libxml2 package-version 2.7.6 on the VM."""
   vm.InstallPackages('gcc build-essential')
-  vm.RemoteCommand('cd %s && wget xmlsoft.org/sources/libxml2-2.7.6.tar.gz && '
-                   'tar xzf libxml2-2.7.6.tar.gz && cd libxml2-2.7.6 && '
-                   './configure && make && sudo make install'
-                   % posixpath.join(vm_util.VM_TMP_DIR, 'web-release'))
+  vm.CachedBuild('libxml2', LIBXML2_TAR, [LIBXML2_DIR], _AptBuild,
+                 _AptMakeInstall)
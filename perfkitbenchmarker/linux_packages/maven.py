@@ -15,19 +15,19 @@
 
 """Module containing maven installation and cleanup functions."""
 
+from perfkitbenchmarker import artifact_cache
 from perfkitbenchmarker import vm_util
 
 MVN_TAR = 'apache-maven-3.3.3-bin.tar.gz'
 MVN_URL = ('http://www.us.apache.org/dist/maven/maven-3/3.3.3/binaries/' +
            MVN_TAR)
 MVN_DIR = '%s/apache-maven-3.3.3' % vm_util.VM_TMP_DIR
+DEPENDENCIES = ('openjdk7', 'wget')
+ARTIFACTS = (artifact_cache.Artifact(MVN_URL),)
 
 
 def _Install(vm):
   """Installs the maven package on the VM."""
-  vm.Install('openjdk7')
-  vm.Install('wget')
-  vm.RemoteCommand('wget %s -P %s' % (MVN_URL, vm_util.VM_TMP_DIR))
   vm.RemoteCommand('cd %s && tar xvzf %s' % (vm_util.VM_TMP_DIR, MVN_TAR))
 
 
@@ -15,6 +15,7 @@
 
 """Module containing memtier installation and cleanup functions."""
 
+from perfkitbenchmarker import artifact_cache
 from perfkitbenchmarker import vm_util
 
 GIT_REPO = 'https://github.com/RedisLabs/memtier_benchmark'
@@ -26,14 +27,12 @@ MEMTIER_DIR = '%s/memtier_benchmark' % vm_util.VM_TMP_DIR
 APT_PACKAGES = ('autoconf automake libpcre3-dev '
                 'libevent-dev pkg-config zlib1g-dev')
 YUM_PACKAGES = 'zlib-devel pcre-devel libmemcached-devel'
+DEPENDENCIES = ('build_tools',)
+YUM_ARTIFACTS = (artifact_cache.Artifact(LIBEVENT_URL),)
 
 
-def YumInstall(vm):
-  """Installs the memtier package on the VM."""
-  vm.Install('build_tools')
-  vm.InstallPackages(YUM_PACKAGES)
-  vm.Install('wget')
-  vm.RemoteCommand('wget {0} -P {1}'.format(LIBEVENT_URL, vm_util.VM_TMP_DIR))
+def _YumBuild(vm):
+  """Compiles libevent and memtier on the VM."""
   vm.RemoteCommand('cd {0} && tar xvzf {1}'.format(vm_util.VM_TMP_DIR,
                                                    LIBEVENT_TAR))
   vm.RemoteCommand('cd {0} && ./configure && sudo make install'.format(
@@ -42,17 +41,40 @@ def YumInstall(vm):
   vm.RemoteCommand('cd {0} && git checkout {1}'.format(MEMTIER_DIR, GIT_TAG))
   pkg_config = 'PKG_CONFIG_PATH=/usr/local/lib/pkgconfig:${PKG_CONFIG_PATH}'
   vm.RemoteCommand('cd {0} && autoreconf -ivf && {1} ./configure && '
-                   'sudo make install'.format(MEMTIER_DIR, pkg_config))
+                   'make'.format(MEMTIER_DIR, pkg_config))
 
 
-def AptInstall(vm):
+def _YumMakeInstall(vm):
+  """Installs libevent and memtier from their build trees."""
+  vm.RemoteCommand('cd {0} && sudo make install'.format(LIBEVENT_DIR))
+  vm.RemoteCommand('cd {0} && sudo make install'.format(MEMTIER_DIR))
+
+
+def YumInstall(vm):
   """Installs the memtier package on the VM."""
-  vm.Install('build_tools')
-  vm.InstallPackages(APT_PACKAGES)
+  vm.InstallPackages(YUM_PACKAGES)
+  vm.CachedBuild('memtier', '%s %s' % (GIT_TAG, LIBEVENT_TAR),
+                 [LIBEVENT_DIR, MEMTIER_DIR], _YumBuild, _YumMakeInstall)
+
+
+def _AptBuild(vm):
+  """Compiles memtier on the VM."""
   vm.RemoteCommand('git clone {0} {1}'.format(GIT_REPO, MEMTIER_DIR))
   vm.RemoteCommand('cd {0} && git checkout {1}'.format(MEMTIER_DIR, GIT_TAG))
   vm.RemoteCommand('cd {0} && autoreconf -ivf && ./configure && '
-                   'sudo make install'.format(MEMTIER_DIR))
+                   'make'.format(MEMTIER_DIR))
+
+
+def _AptMakeInstall(vm):
+  """Installs memtier from its build tree."""
+  vm.RemoteCommand('cd {0} && sudo make install'.format(MEMTIER_DIR))
+
+
+def AptInstall(vm):
+  """Installs the memtier package on the VM."""
+  vm.InstallPackages(APT_PACKAGES)
+  vm.CachedBuild('memtier', GIT_TAG, [MEMTIER_DIR], _AptBuild,
+                 _AptMakeInstall)
 
 
 def _Uninstall(vm):
@@ -15,6 +15,7 @@
 
 """Module containing netperf installation and cleanup functions."""
 
+from perfkitbenchmarker import artifact_cache
 from perfkitbenchmarker import vm_util
 
 NETPERF_TAR = 'netperf-2.6.0.tar.gz'
@@ -22,16 +23,20 @@ NETPERF_URL = 'ftp://ftp.netperf.org/netperf/archive/%s' % NETPERF_TAR
 NETPERF_DIR = '%s/netperf-2.6.0' % vm_util.VM_TMP_DIR
 NETSERVER_PATH = NETPERF_DIR + '/src/netserver'
 NETPERF_PATH = NETPERF_DIR + '/src/netperf'
+ARTIFACTS = (artifact_cache.Artifact(NETPERF_URL),)
+
+
+def _Build(vm):
+  """Compiles netperf on the VM."""
+  vm.RemoteCommand('cd %s && tar xvzf %s' % (vm_util.VM_TMP_DIR, NETPERF_TAR))
+  vm.RemoteCommand('cd %s && ./configure && make' % NETPERF_DIR)
 
 
 def _Install(vm):
   """Installs the netperf package on the VM."""
   vm.Install('build_tools')
   vm.Install('curl')
-  vm.RemoteCommand('curl %s -o %s/%s' % (
-      NETPERF_URL, vm_util.VM_TMP_DIR, NETPERF_TAR))
-  vm.RemoteCommand('cd %s && tar xvzf %s' % (vm_util.VM_TMP_DIR, NETPERF_TAR))
-  vm.RemoteCommand('cd %s && ./configure && make' % NETPERF_DIR)
+  vm.CachedBuild('netperf', NETPERF_TAR, [NETPERF_DIR], _Build)
 
 
 def YumInstall(vm):
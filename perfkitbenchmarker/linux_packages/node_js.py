@@ -22,13 +22,23 @@ GIT_TAG = 'v0.11.14'
 NODE_DIR = '%s/node' % vm_util.VM_TMP_DIR
 
 
-def _Install(vm):
-  """Installs the node.js package on the VM."""
-  vm.Install('build_tools')
+def _Build(vm):
+  """Compiles node.js on the VM."""
   vm.RemoteCommand('git clone {0} {1}'.format(GIT_REPO, NODE_DIR))
   vm.RemoteCommand('cd {0} && git checkout {1}'.format(NODE_DIR, GIT_TAG))
   vm.RemoteCommand('cd {0} && ./configure --prefix=/usr'.format(NODE_DIR))
-  vm.RemoteCommand('cd {0} && make && sudo make install'.format(NODE_DIR))
+  vm.RemoteCommand('cd {0} && make'.format(NODE_DIR))
+
+
+def _MakeInstall(vm):
+  """Installs node.js from its build tree."""
+  vm.RemoteCommand('cd {0} && sudo make install'.format(NODE_DIR))
+
+
+def _Install(vm):
+  """Installs the node.js package on the VM."""
+  vm.Install('build_tools')
+  vm.CachedBuild('node_js', GIT_TAG, [NODE_DIR], _Build, _MakeInstall)
 
 
 def YumInstall(vm):
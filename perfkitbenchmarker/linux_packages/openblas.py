@@ -19,17 +19,21 @@ from perfkitbenchmarker import vm_util
 OPENBLAS_DIR = '%s/OpenBLAS' % vm_util.VM_TMP_DIR
 GIT_REPO = 'https://github.com/xianyi/OpenBLAS'
 GIT_TAG = 'v0.2.11'
+DEPENDENCIES = ('build_tools', 'fortran')
 
 
-def _Install(vm):
-  """Installs the OpenBLAS package on the VM."""
-  vm.Install('build_tools')
-  vm.Install('fortran')
+def _Build(vm):
+  """Compiles OpenBLAS on the VM."""
   vm.RemoteCommand('git clone {0} {1}'.format(GIT_REPO, OPENBLAS_DIR))
   vm.RemoteCommand('cd {0} && git checkout {1}'.format(OPENBLAS_DIR, GIT_TAG))
   vm.RemoteCommand('cd {0} && make'.format(OPENBLAS_DIR))
 
 
+def _Install(vm):
+  """Installs the OpenBLAS package on the VM."""
+  vm.CachedBuild('openblas', GIT_TAG, [OPENBLAS_DIR], _Build)
+
+
 def YumInstall(vm):
   """Installs the OpenBLAS package on the VM."""
   _Install(vm)
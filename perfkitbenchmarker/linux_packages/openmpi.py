@@ -20,20 +20,28 @@ from perfkitbenchmarker import vm_util
 MPI_DIR = '%s/openmpi-1.6.5' % vm_util.VM_TMP_DIR
 MPI_TAR = 'openmpi-1.6.5.tar.gz'
 MPI_URL = 'http://www.open-mpi.org/software/ompi/v1.6/downloads/' + MPI_TAR
+DEPENDENCIES = ('build_tools', 'wget')
 
 
-def _Install(vm):
-  """Installs the OpenMPI package on the VM."""
-  vm.Install('build_tools')
-  vm.Install('wget')
+def _Build(vm):
+  """Compiles OpenMPI on the VM."""
   vm.RemoteCommand('wget %s -P %s' % (MPI_URL, vm_util.VM_TMP_DIR))
   vm.RemoteCommand('cd %s && tar xvfz %s' % (vm_util.VM_TMP_DIR, MPI_TAR))
   make_jobs = vm.num_cpus
   config_cmd = ('./configure --enable-static --disable-shared --disable-dlopen '
                 '--prefix=/usr')
   vm.RobustRemoteCommand(
-      'cd %s && %s && make -j %s && sudo make install' %
-      (MPI_DIR, config_cmd, make_jobs))
+      'cd %s && %s && make -j %s' % (MPI_DIR, config_cmd, make_jobs))
+
+
+def _MakeInstall(vm):
+  """Installs OpenMPI from its build tree."""
+  vm.RobustRemoteCommand('cd %s && sudo make install' % MPI_DIR)
+
+
+def _Install(vm):
+  """Installs the OpenMPI package on the VM."""
+  vm.CachedBuild('openmpi', MPI_TAR, [MPI_DIR], _Build, _MakeInstall)
 
 
 def YumInstall(vm):
@@ -22,13 +22,18 @@ REDIS_DIR = '%s/redis-2.8.9' % vm_util.VM_TMP_DIR
 REDIS_URL = 'http://download.redis.io/releases/' + REDIS_TAR
 
 
+def _Build(vm):
+  """Compiles redis on the VM."""
+  vm.RemoteCommand('wget %s -P %s' % (REDIS_URL, vm_util.VM_TMP_DIR))
+  vm.RemoteCommand('cd %s && tar xvfz %s' % (vm_util.VM_TMP_DIR, REDIS_TAR))
+  vm.RemoteCommand('cd %s && make' % REDIS_DIR)
+
+
 def _Install(vm):
   """Installs the redis package on the VM."""
   vm.Install('build_tools')
   vm.Install('wget')
-  vm.RemoteCommand('wget %s -P %s' % (REDIS_URL, vm_util.VM_TMP_DIR))
-  vm.RemoteCommand('cd %s && tar xvfz %s' % (vm_util.VM_TMP_DIR, REDIS_TAR))
-  vm.RemoteCommand('cd %s && make' % REDIS_DIR)
+  vm.CachedBuild('redis_server', REDIS_TAR, [REDIS_DIR], _Build)
 
 
 def YumInstall(vm):
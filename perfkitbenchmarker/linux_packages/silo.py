@@ -26,10 +26,9 @@ YUM_PACKAGES = ('jemalloc-devel numactl-devel libdb-cxx-devel mysql-devel '
                 'libaio-devel openssl-devel')
 
 
-def _Install(vm):
-  """Installs the Silo package on the VM."""
+def _Build(vm):
+  """Compiles Silo on the VM."""
   nthreads = vm.num_cpus * 2
-  vm.Install('build_tools')
   vm.RemoteCommand('git clone {0} {1}'.format(GIT_REPO, SILO_DIR))
   vm.RemoteCommand('cd {0} && git checkout {1}'.format(SILO_DIR,
                                                        GIT_TAG))
@@ -40,6 +39,12 @@ def _Install(vm):
           -j{1} dbtest'.format(SILO_DIR, nthreads))
 
 
+def _Install(vm):
+  """Installs the Silo package on the VM."""
+  vm.Install('build_tools')
+  vm.CachedBuild('silo', GIT_TAG, [SILO_DIR], _Build)
+
+
 def YumInstall(vm):
   """Installs the Silo package on the VM."""
   vm.InstallPackages(YUM_PACKAGES)
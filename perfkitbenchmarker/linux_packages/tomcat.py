@@ -31,6 +31,7 @@ TOMCAT_URL = ('https://archive.apache.org/dist/tomcat/tomcat-8/v8.0.28/bin/'
               'apache-tomcat-8.0.28.tar.gz')
 TOMCAT_DIR = posixpath.join(vm_util.VM_TMP_DIR, 'tomcat')
 TOMCAT_HTTP_PORT = 8080
+DEPENDENCIES = ('openjdk7', 'curl')
 
 flags.DEFINE_string('tomcat_url', TOMCAT_URL, 'Tomcat 8 download URL.')
 
@@ -47,8 +48,6 @@ _TOMCAT_PROTOCOL = 'org.apache.coyote.http11.Http11Nio2Protocol'
 
 
 def _Install(vm):
-  vm.Install('openjdk7')
-  vm.Install('curl')
   vm.RemoteCommand(
       ('mkdir -p {0} && curl -L {1} | '
        'tar -C {0} --strip-components 1 -xzf -').format(TOMCAT_DIR,
@@ -30,6 +30,7 @@ from perfkitbenchmarker import vm_util
 WRK_URL = 'https://github.com/wg/wrk/archive/4.0.1.tar.gz'
 WRK_DIR = posixpath.join(vm_util.VM_TMP_DIR, 'wrk')
 WRK_PATH = posixpath.join(WRK_DIR, 'wrk')
+DEPENDENCIES = ('build_tools', 'curl', 'openssl')
 
 # Rather than parse WRK's free text output, this script is used to generate a
 # CSV report
@@ -44,10 +45,6 @@ _CSV_PREFIX = '==CSV==\n'
 
 
 def _Install(vm):
-  vm.Install('build_tools')
-  vm.Install('curl')
-  vm.Install('openssl')
-
   vm.RemoteCommand(('mkdir -p {0} && curl -L {1} '
                     '| tar --strip-components=1 -C {0} -xzf -').format(
                         WRK_DIR,
@@ -35,7 +35,6 @@ By default, this runs YCSB workloads A and B against the database, 32 threads
 per client VM, with an initial database size of 1GB (1k records).
 Each workload runs for at most 30 minutes.
 """
-import bisect
 import collections
 import copy
 import csv
@@ -48,8 +47,10 @@ import operator
 import os
 import posixpath
 
+from perfkitbenchmarker import artifact_cache
 from perfkitbenchmarker import data
 from perfkitbenchmarker import flags
+from perfkitbenchmarker import histogram
 from perfkitbenchmarker import sample
 from perfkitbenchmarker import vm_util
 
@@ -57,11 +58,18 @@ FLAGS = flags.FLAGS
 
 YCSB_TAR_URL = ('https://github.com/brianfrankcooper/YCSB/releases/'
                 'download/0.3.0/ycsb-0.3.0.tar.gz')
+YCSB_ARTIFACT = artifact_cache.Artifact(YCSB_TAR_URL)
 YCSB_DIR = posixpath.join(vm_util.VM_TMP_DIR, 'ycsb')
 YCSB_EXE = posixpath.join(YCSB_DIR, 'bin', 'ycsb')
+DEPENDENCIES = ('openjdk7', 'curl')
+ARTIFACTS = (YCSB_ARTIFACT,)
 
 _DEFAULT_PERCENTILES = 50, 75, 90, 95, 99, 99.9
 
+# YCSB reports 1ms histogram bins up to 'histogram.buckets' (1000 by default).
+# Histograms with this precision keep every bin below 2048ms separate.
+_HISTOGRAM_PRECISION_BITS = 11
+
 # Binary operators to aggregate reported statistics.
 # Statistics with operator 'None' will be dropped.
 AGGREGATE_OPERATORS = {
@@ -139,11 +147,9 @@ def CheckPrerequisites():
 
 def _Install(vm):
   """Installs the YCSB package on the VM."""
-  vm.Install('openjdk7')
-  vm.Install('curl')
-  vm.RemoteCommand(('mkdir -p {0} && curl -L {1} | '
-                    'tar -C {0} --strip-components=1 -xzf -').format(
-                        YCSB_DIR, YCSB_TAR_URL))
+  vm.RemoteCommand(('mkdir -p {0} && '
+                    'tar -C {0} --strip-components=1 -xzf {1}').format(
+                        YCSB_DIR, YCSB_ARTIFACT.remote_path))
 
 
 def YumInstall(vm):
@@ -244,70 +250,30 @@ def ParseResults(ycsb_result_string, data_type='histogram'):
   return result
 
 
-def _CumulativeSum(xs):
-  total = 0
-  for x in xs:
-    total += x
-    yield total
-
-
-def _WeightedQuantile(x, weights, p):
-  """Weighted quantile measurement for an ordered list.
-
-  This method interpolates to the higher value when the quantile is not a direct
-  member of the list. This works well for YCSB, since latencies are floored.
-
-  Args:
-    x: List of values.
-    weights: List of numeric weights.
-    p: float. Desired quantile in the interval [0, 1].
-
-  Returns:
-    float.
-
-  Raises:
-    ValueError: When 'x' and 'weights' are not the same length, or 'p' is not in
-      the interval [0, 1].
-  """
-  if len(x) != len(weights):
-    raise ValueError('Lengths do not match: {0} != {1}'.format(
-        len(x), len(weights)))
-  if p < 0 or p > 1:
-    raise ValueError('Invalid quantile: {0}'.format(p))
-  n = sum(weights)
-  target = n * float(p)
-  cumulative = list(_CumulativeSum(weights))
-
-  # Find the first cumulative weight >= target
-  i = bisect.bisect_left(cumulative, target)
-  if i == len(x):
-    return x[-1]
-  else:
-    return x[i]
-
-
 def _PercentilesFromHistogram(ycsb_histogram, percentiles=_DEFAULT_PERCENTILES):
   """Calculate percentiles for from a YCSB histogram.
 
   Args:
-    ycsb_histogram: List of (time_ms, frequency) tuples.
+    ycsb_histogram: List of (time_ms, frequency) tuples, or a
+        histogram.Histogram.
     percentiles: iterable of floats, in the interval [0, 100].
 
   Returns:
     dict, mapping from percentile to value.
   """
-  result = collections.OrderedDict()
-  histogram = sorted(ycsb_histogram)
+  if not isinstance(ycsb_histogram, histogram.Histogram):
+    ycsb_histogram = histogram.FromBuckets(ycsb_histogram,
+                                           _HISTOGRAM_PRECISION_BITS)
+  percentiles = list(percentiles)
+  labels = []
   for percentile in percentiles:
     if percentile < 0 or percentile > 100:
       raise ValueError('Invalid percentile: {0}'.format(percentile))
     if math.modf(percentile)[0] < 1e-7:
       percentile = int(percentile)
-    label = 'p{0}'.format(percentile)
-    latencies, freqs = zip(*histogram)
-    time_ms = _WeightedQuantile(latencies, freqs, percentile * 0.01)
-    result[label] = time_ms
-  return result
+    labels.append('p{0}'.format(percentile))
+  values = ycsb_histogram.ValuesAtQuantiles(p * 0.01 for p in percentiles)
+  return collections.OrderedDict(zip(labels, values))
 
 
 def _CombineResults(result_list, combine_histograms=True):
@@ -331,24 +297,38 @@ def _CombineResults(result_list, combine_histograms=True):
       for k in drop_keys:
         group['statistics'].pop(k, None)
 
-  def CombineHistograms(hist1, hist2):
-    h1 = dict(hist1)
-    h2 = dict(hist2)
-    keys = sorted(frozenset(h1) | frozenset(h2))
-    result = []
-    for k in keys:
-      result.append((k, h1.get(k, 0) + h2.get(k, 0)))
-    return result
+  def CopyGroup(group):
+    """Copy the parts of a group which are modified while combining."""
+    group = dict(group)
+    group['statistics'] = dict(group['statistics'])
+    return group
+
+  # Bins are summed in a Histogram per group rather than in the lists, which
+  # are only rebuilt once all results have been added.
+  histograms = {}
+
+  def AddHistogram(group_name, group):
+    if 'histogram' in group:
+      if group_name not in histograms:
+        histograms[group_name] = histogram.Histogram(_HISTOGRAM_PRECISION_BITS)
+      for time_ms, count in group['histogram']:
+        histograms[group_name].Record(time_ms, count)
 
-  result = copy.deepcopy(result_list[0])
+  result = copy.copy(result_list[0])
+  result['groups'] = collections.OrderedDict(
+      (group_name, CopyGroup(group))
+      for group_name, group in result_list[0]['groups'].iteritems())
   DropUnaggregated(result)
+  for group_name, group in result['groups'].iteritems():
+    AddHistogram(group_name, group)
 
   for indiv in result_list[1:]:
     for group_name, group in indiv['groups'].iteritems():
       if group_name not in result['groups']:
         logging.warn('Found result group "%s" in individual YCSB result, '
                      'but not in accumulator.', group_name)
-        result['groups'][group_name] = copy.deepcopy(group)
+        result['groups'][group_name] = CopyGroup(group)
+        AddHistogram(group_name, group)
         continue
 
       # Combine reported statistics.
@@ -374,17 +354,18 @@ def _CombineResults(result_list, combine_histograms=True):
             op(result['groups'][group_name]['statistics'][k], v))
 
       if combine_histograms:
-        result['groups'][group_name]['histogram'] = CombineHistograms(
-            result['groups'][group_name]['histogram'],
-            group['histogram'])
+        AddHistogram(group_name, group)
       else:
         result['groups'][group_name].pop('histogram', None)
+        histograms.pop(group_name, None)
     result['client'] = ' '.join((result['client'], indiv['client']))
     result['command_line'] = ';'.join((result['command_line'],
                                        indiv['command_line']))
     if 'target' in result and 'target' in indiv:
       result['target'] += indiv['target']
 
+  for group_name, group_histogram in histograms.iteritems():
+    result['groups'][group_name]['histogram'] = list(group_histogram.Buckets())
   return result
 
 
@@ -23,9 +23,13 @@ installed.
 To install a package on a VM, just call vm.Install(package_name).
 The package name is just the name of the package module (i.e. the
 file name minus .py). The framework will take care of all cleanup
-for you.
+for you. To install several packages at once, call
+vm.InstallBatch(package_names): the packages they depend on are installed
+too, with as few package manager calls and as much concurrency as their
+DEPENDENCIES allow.
 """
 
+import functools
 import logging
 import os
 import pipes
@@ -35,10 +39,15 @@ import threading
 import time
 import uuid
 
+from perfkitbenchmarker import artifact_cache
+from perfkitbenchmarker import context
 from perfkitbenchmarker import disk
 from perfkitbenchmarker import errors
 from perfkitbenchmarker import flags
 from perfkitbenchmarker import linux_packages
+from perfkitbenchmarker import remote_job
+from perfkitbenchmarker import resource_graph
+from perfkitbenchmarker import tcp_probe
 from perfkitbenchmarker import virtual_machine
 from perfkitbenchmarker import vm_util
 
@@ -66,15 +75,63 @@ EXECUTE_COMMAND = 'execute_command.py'
 # then copies the stdout and stderr, exiting with the status of the command run
 # by EXECUTE_COMMAND.
 WAIT_FOR_COMMAND = 'wait_for_command.py'
-
+# COMMAND_STATUS prints the exit status of any number of commands started by
+# EXECUTE_COMMAND, without waiting for them to complete.
+COMMAND_STATUS = 'command_status.py'
+
+flags.DEFINE_bool('boot_tcp_probe', True,
+                  'Whether to wait for the SSH port of booting VMs to accept '
+                  'TCP connections before trying to run SSH commands on '
+                  'them.')
 flags.DEFINE_bool('setup_remote_firewall', False,
                   'Whether PKB should configure the firewall of each remote'
                   'VM to make sure it accepts all internal connections.')
 
 
+def _GetPackageDependencies(package_name):
+  """Returns the names of the PerfKit packages a package depends on."""
+  return getattr(linux_packages.PACKAGES[package_name], 'DEPENDENCIES', ())
+
+
+def _GetPackageClosure(package_names):
+  """Returns the names of packages and of all packages they depend on.
+
+  Args:
+    package_names: iterable of PerfKit package names.
+
+  Returns:
+    A list of package names without duplicates, in which every package comes
+    after the packages it depends on.
+
+  Raises:
+    ValueError: If packages depend on each other in a cycle.
+  """
+  closure = []
+  visiting = set()
+
+  def Visit(package_name):
+    if package_name in closure:
+      return
+    if package_name in visiting:
+      raise ValueError('Circular dependency on package %s.' % package_name)
+    visiting.add(package_name)
+    for dependency in _GetPackageDependencies(package_name):
+      Visit(dependency)
+    closure.append(package_name)
+
+  for package_name in package_names:
+    Visit(package_name)
+  return closure
+
+
 class BaseLinuxMixin(virtual_machine.BaseOsMixin):
   """Class that holds Linux related VM methods and attributes."""
 
+  # Prefix of the install functions and OS package lists of PerfKit packages
+  # for the package manager of the distribution, e.g. 'Apt' for AptInstall and
+  # APT_PACKAGES. Specific Linux flavors should set this.
+  PACKAGE_MANAGER = None
+
   # If multiple ssh calls are made in parallel using -t it will mess
   # the stty settings up and the terminal will become very hard to use.
   # Serializing calls to ssh with the -t option fixes the problem.
@@ -88,6 +145,23 @@ class BaseLinuxMixin(virtual_machine.BaseOsMixin):
 
     self._remote_command_script_upload_lock = threading.Lock()
     self._has_remote_command_script = False
+    # 'user@host' of the running SSH master connection, if any.
+    self._ssh_master_user_host = None
+    # Time at which the master was last started or checked, or None until
+    # OpenSshConnections is called.
+    self._ssh_master_check_time = None
+    self._ssh_master_lock = threading.Lock()
+
+    # PerfKit packages may be installed concurrently by InstallBatch. Each
+    # package and each artifact has its own lock (see _GetInstallLock), while
+    # the package manager runs one command at a time.
+    self._install_locks = {}
+    self._install_locks_lock = threading.Lock()
+    self._package_manager_lock = threading.Lock()
+    # OS packages installed through InstallPackages.
+    self._installed_os_packages = set()
+    # URLs of the artifacts copied to the VM by PushArtifacts.
+    self._pushed_artifacts = set()
 
   def _PushRobustCommandScripts(self):
     """Pushes the scripts required by RobustRemoteCommand to this VM.
@@ -96,7 +170,7 @@ class BaseLinuxMixin(virtual_machine.BaseOsMixin):
     """
     with self._remote_command_script_upload_lock:
       if not self._has_remote_command_script:
-        for f in (EXECUTE_COMMAND, WAIT_FOR_COMMAND):
+        for f in (EXECUTE_COMMAND, WAIT_FOR_COMMAND, COMMAND_STATUS):
           self.PushDataFile(f, os.path.join(vm_util.VM_TMP_DIR,
                                             os.path.basename(f)))
         self._has_remote_command_script = True
@@ -117,42 +191,134 @@ class BaseLinuxMixin(virtual_machine.BaseOsMixin):
     If should_log is True, log the command's output at the info
     level. If False, log the command's output at the debug level.
     """
+    job = self.StartRemoteJob(command)
+    return self.FinishRemoteJob(job, should_log=should_log)
+
+  def StartRemoteJob(self, command):
+    """Starts a command in the background on the VM.
+
+    Runs 'command' via EXECUTE_COMMAND, as RobustRemoteCommand does, but
+    returns as soon as it has been started, once the PID of EXECUTE_COMMAND
+    is in the job's wrapper_pid_file. See remote_job.PollJobs and
+    remote_job.WaitForJobs to wait for many jobs without a thread for each.
+
+    Args:
+      command: A valid bash command, as a string or list of strings.
+
+    Returns:
+      A remote_job.RemoteJob.
+    """
     self._PushRobustCommandScripts()
 
     execute_path = os.path.join(vm_util.VM_TMP_DIR,
                                 os.path.basename(EXECUTE_COMMAND))
-    wait_path = os.path.join(vm_util.VM_TMP_DIR,
-                             os.path.basename(WAIT_FOR_COMMAND))
 
     uid = uuid.uuid4()
     file_base = os.path.join(vm_util.VM_TMP_DIR, 'cmd%s' % uid)
-    wrapper_log = file_base + '.log'
-    stdout_file = file_base + '.stdout'
-    stderr_file = file_base + '.stderr'
-    status_file = file_base + '.status'
 
     if not isinstance(command, basestring):
       command = ' '.join(command)
+    job = remote_job.RemoteJob(self, command, file_base)
 
     start_command = ['nohup', 'python', execute_path,
-                     '--stdout', stdout_file,
-                     '--stderr', stderr_file,
-                     '--status', status_file,
+                     '--stdout', job.stdout_file,
+                     '--stderr', job.stderr_file,
+                     '--status', job.status_file,
                      '--command', pipes.quote(command)]
 
-    start_command = '%s 1> %s 2>&1 &' % (' '.join(start_command),
-                                         wrapper_log)
+    start_command = '%s 1> %s 2>&1 & echo $! > %s' % (
+        ' '.join(start_command), job.wrapper_log, job.wrapper_pid_file)
     self.RemoteCommand(start_command)
+    return job
+
+  def UpdateRemoteJobStatuses(self, jobs):
+    """Sets the exit status of the jobs that completed.
+
+    Checks all jobs with a single command, which does not wait for them.
+
+    Args:
+      jobs: list of remote_job.RemoteJob started on this VM.
+    """
+    status_path = os.path.join(vm_util.VM_TMP_DIR,
+                               os.path.basename(COMMAND_STATUS))
+    stdout, _ = self.RemoteCommand(' '.join(
+        ['python', status_path] +
+        ['%s,%s' % (job.status_file, job.wrapper_pid_file) for job in jobs]))
+    statuses = stdout.split()
+    if len(statuses) != len(jobs):
+      raise errors.VirtualMachine.RemoteCommandError(
+          'Expected the status of %d jobs, got: %r' % (len(jobs), stdout))
+    for job, status in zip(jobs, statuses):
+      if status != 'running':
+        job.retcode = int(status)
+
+  def ReadRemoteJobOutput(self, job, stdout_callback=None):
+    """Fetches the lines of stdout a job wrote since the previous call.
+
+    Works whether the job is running or done, as long as it has not been
+    finished with FinishRemoteJob. While the job is running, a last line
+    without a newline may still be being written: it is left for the next
+    call, so that only whole lines are returned.
+
+    Args:
+      job: remote_job.RemoteJob started on this VM.
+      stdout_callback: If provided, called with each line of new output as it
+          is received, rather than accumulating it. See vm_util.IssueCommand.
+
+    Returns:
+      The new output, or its last vm_util.OUTPUT_TAIL_SIZE bytes if
+      'stdout_callback' was provided.
+    """
+    chunks = []
+    num_bytes = [0]
+    partial_line = ['']
+
+    def _Receive(line):
+      if not line.endswith('\n') and not job.done:
+        partial_line[0] = line
+        return
+      num_bytes[0] += len(line)
+      if stdout_callback:
+        stdout_callback(line)
+      else:
+        chunks.append(line)
+
+    stdout, _ = self.RemoteCommand(
+        'tail -c +%d %s' % (job.stdout_offset + 1, job.stdout_file),
+        stdout_callback=_Receive)
+    job.stdout_offset += num_bytes[0]
+    if not stdout_callback:
+      return ''.join(chunks)
+    return stdout[:len(stdout) - len(partial_line[0])]
 
-    wait_command = ['python', wait_path, '--stdout', stdout_file,
-                    '--stderr', stderr_file,
-                    '--status', status_file,
+  def FinishRemoteJob(self, job, should_log=False):
+    """Waits for a job to complete, then collects its output.
+
+    Uses WAIT_FOR_COMMAND, which deletes the output files of the job.
+
+    Args:
+      job: remote_job.RemoteJob started on this VM.
+      should_log: bool. Whether to log the output of the command at the info
+          level rather than the debug level.
+
+    Returns:
+      A tuple of stdout and stderr of the command.
+
+    Raises:
+      errors.VirtualMachine.RemoteCommandError: If the command failed.
+    """
+    wait_path = os.path.join(vm_util.VM_TMP_DIR,
+                             os.path.basename(WAIT_FOR_COMMAND))
+    wait_command = ['python', wait_path, '--stdout', job.stdout_file,
+                    '--stderr', job.stderr_file,
+                    '--status', job.status_file,
                     '--delete']
     try:
       return self.RemoteCommand(' '.join(wait_command), should_log=should_log)
     except:
       # In case the error was with the wrapper script itself, print the log.
-      stdout, _ = self.RemoteCommand('cat %s' % wrapper_log, should_log=False)
+      stdout, _ = self.RemoteCommand('cat %s' % job.wrapper_log,
+                                     should_log=False)
       if stdout.strip():
         logging.warn('Exception during RobustRemoteCommand. '
                      'Wrapper script log:\n%s', stdout)
@@ -198,11 +364,39 @@ class BaseLinuxMixin(virtual_machine.BaseOsMixin):
       self.SetupPackageManager()
     self.BurnCpu()
 
-  @vm_util.Retry(log_errors=False, poll_interval=1)
   def WaitForBootCompletion(self):
-    """Waits until VM is has booted."""
-    resp, _ = self.RemoteHostCommand('hostname', retries=1,
-                                     suppress_warning=True)
+    """Waits until VM is has booted.
+
+    Unless --boot_tcp_probe is false, TCP connections to the SSH port are
+    probed first, so that SSH is only tried once the port is open. The probe
+    is skipped when --ssh_options is set, since they may route SSH through a
+    bastion (ProxyCommand, -J) from which only the VM is reachable. If the
+    probe fails, SSH is tried anyway. Both share --default_timeout.
+    """
+    deadline = time.time() + FLAGS.default_timeout
+    if (FLAGS.boot_tcp_probe and not FLAGS.ssh_options and
+        self.port_open_time is None):
+      try:
+        self.port_open_time = tcp_probe.WaitForPort(
+            self.ip_address, self.ssh_port, FLAGS.default_timeout)
+      except errors.VirtualMachine.VmStateError as e:
+        logging.warning('%s Trying SSH anyway.', e)
+    self._WaitForSsh(max(0, deadline - time.time()))
+
+  def _WaitForSsh(self, timeout):
+    """Waits until an SSH command succeeds on the VM.
+
+    Args:
+      timeout: float. Maximum time to retry the command, in seconds.
+    """
+    # sshd may accept connections shortly before it accepts logins.
+    @vm_util.Retry(log_errors=False, poll_interval=.5, max_poll_interval=4,
+                   timeout=timeout)
+    def GetHostname():
+      return self.RemoteHostCommand('hostname', retries=1,
+                                    suppress_warning=True)
+
+    resp, _ = GetHostname()
     if self.bootable_time is None:
       self.bootable_time = time.time()
     if self.hostname is None:
@@ -212,6 +406,164 @@ class BaseLinuxMixin(virtual_machine.BaseOsMixin):
     """Grabs a snapshot of the currently installed packages."""
     pass
 
+  def PrepareForInstall(self):
+    """Prepares the package manager before packages are installed.
+
+    Specific Linux flavors may override this.
+    """
+    pass
+
+  def _HasOsPackages(self, packages):
+    """Returns whether InstallPackages already installed 'packages'."""
+    return set(packages.split()) <= self._installed_os_packages
+
+  def Install(self, package_name):
+    """Installs a PerfKit package on the VM."""
+    self.InstallBatch([package_name])
+
+  def _GetInstallLock(self, key):
+    """Returns the lock of a package name or artifact URL."""
+    with self._install_locks_lock:
+      return self._install_locks.setdefault(key, threading.Lock())
+
+  def _InstallPackage(self, package_name):
+    """Runs the install function of a PerfKit package, unless it already ran.
+
+    May be called from several threads at once.
+    """
+    with self._GetInstallLock(package_name):
+      if package_name not in self._installed_packages:
+        package = linux_packages.PACKAGES[package_name]
+        getattr(package, self.PACKAGE_MANAGER + 'Install')(self)
+        self._installed_packages.add(package_name)
+
+  def InstallBatch(self, package_names):
+    """Installs PerfKit packages and the packages they depend on.
+
+    The DEPENDENCIES of the packages are followed to find every package that
+    is not installed yet. The OS packages all of them declare (e.g. in
+    APT_PACKAGES) are installed first, in a single package manager command,
+    while the ARTIFACTS they declare are pushed from the controller's artifact
+    cache. Then every PerfKit package is installed as soon as the packages it
+    depends on are, so that independent packages are built concurrently.
+
+    The time taken by each step is added to the resource_intervals of the
+    benchmark spec of the calling thread, which are published as samples.
+
+    Args:
+      package_names: list of PerfKit package names.
+    """
+    if not self.install_packages:
+      return
+    pending = [package_name
+               for package_name in _GetPackageClosure(package_names)
+               if package_name not in self._installed_packages]
+    if not pending:
+      return
+    self.PrepareForInstall()
+
+    prefix = self.PACKAGE_MANAGER.upper()
+    os_packages = []
+    artifacts = {}
+    for package_name in pending:
+      package = linux_packages.PACKAGES[package_name]
+      for os_package in getattr(package, prefix + '_PACKAGES', '').split():
+        if (os_package not in os_packages and
+            os_package not in self._installed_os_packages):
+          os_packages.append(os_package)
+      artifacts[package_name] = (
+          tuple(getattr(package, 'ARTIFACTS', ())) +
+          tuple(getattr(package, prefix + '_ARTIFACTS', ())))
+
+    graph = resource_graph.ResourceGraph('Install',
+                                         skip_dependents_of_failures=True)
+    os_nodes = []
+    if os_packages:
+      os_nodes.append(graph.AddNode(
+          'OS Packages', self.name,
+          functools.partial(self.InstallPackages, ' '.join(os_packages))))
+    package_nodes = {}
+    for package_name in pending:
+      dependencies = [package_nodes[dependency] for dependency in
+                      _GetPackageDependencies(package_name)
+                      if dependency in package_nodes]
+      if artifacts[package_name]:
+        dependencies.append(graph.AddNode(
+            'Artifacts', '%s on %s' % (package_name, self.name),
+            functools.partial(self.PushArtifacts, artifacts[package_name])))
+      package_nodes[package_name] = graph.AddNode(
+          'Package', '%s on %s' % (package_name, self.name),
+          functools.partial(self._InstallPackage, package_name),
+          dependencies + os_nodes)
+    try:
+      graph.Run(fail_fast=True)
+    finally:
+      spec = context.GetThreadBenchmarkSpec()
+      if spec:
+        spec.resource_intervals.extend(graph.intervals)
+
+  def PushArtifacts(self, artifacts):
+    """Copies files from the artifact cache of the controller to the VM.
+
+    Artifacts missing from the cache are downloaded there first. Each artifact
+    is copied to its remote_path once.
+
+    Args:
+      artifacts: iterable of artifact_cache.Artifact.
+    """
+    for artifact in artifacts:
+      with self._GetInstallLock(artifact.url):
+        if artifact.url not in self._pushed_artifacts:
+          self.PushFile(artifact_cache.GetArtifact(artifact),
+                        artifact.remote_path)
+          self._pushed_artifacts.add(artifact.url)
+
+  def CachedBuild(self, package_name, version, paths, build, install=None):
+    """Compiles a package, or extracts a build of it from the build cache.
+
+    The first VM to call this for a package version, OS image and CPU (machine
+    architecture, model and feature flags) runs 'build', then archives 'paths'
+    into the cache of the controller. Other VMs with the same CPU, in this run
+    and later ones, extract that archive instead of compiling, so builds tuned
+    for the CPU they are compiled on are never run on another CPU. Concurrent
+    callers wait for the first build.
+
+    Args:
+      package_name: string. Name of the package.
+      version: string. Version of the package. Changing it invalidates the
+          builds cached for the previous version.
+      paths: list of strings. Absolute paths on the VM of the files and
+          directories produced by 'build'.
+      build: Function called with the VM to compile the package.
+      install: Function called with the VM after 'build', or after extracting
+          the build, e.g. to run "make install". Optional.
+    """
+    if not FLAGS.build_cache:
+      build(self)
+    else:
+      cpu, _ = self.RemoteCommand(
+          'uname -m && grep -E "^(model name|flags|Features|CPU implementer|'
+          'CPU part)[[:space:]]*:" /proc/cpuinfo | sort -u')
+      key = artifact_cache.GetBuildKey(package_name, version, self.CLOUD,
+                                       self.OS_TYPE, self.image, cpu.strip())
+      remote_path = posixpath.join(vm_util.VM_TMP_DIR,
+                                   package_name + '-build.tar.gz')
+      with artifact_cache.GetBuildLock(key):
+        local_path = artifact_cache.FindBuild(key)
+        if not local_path:
+          build(self)
+          self.RemoteCommand('cd / && sudo tar -czf %s %s' % (
+              remote_path, ' '.join(path.lstrip('/') for path in paths)))
+          artifact_cache.StoreBuild(
+              key, lambda path: self.PullFile(path, remote_path))
+      if local_path:
+        logging.info('Extracting a build of %s on %s from the build cache.',
+                     package_name, self.name)
+        self.PushFile(local_path, remote_path)
+        self.RemoteCommand('sudo tar -xzf %s -C /' % remote_path)
+    if install:
+      install(self)
+
   def RestorePackages(self):
     """Restores the currently installed packages to those snapshotted."""
     pass
@@ -284,6 +636,7 @@ class BaseLinuxMixin(virtual_machine.BaseOsMixin):
 
     remote_location = '%s@%s:%s' % (
         self.user_name, self.ip_address, remote_path)
+    self._CheckSshControlMaster()
     scp_cmd = ['scp', '-P', str(self.ssh_port), '-pr']
     scp_cmd.extend(vm_util.GetSshOptions(self.ssh_private_key))
     if copy_to:
@@ -303,15 +656,18 @@ class BaseLinuxMixin(virtual_machine.BaseOsMixin):
   def RemoteCommand(self, command,
                     should_log=False, retries=SSH_RETRIES,
                     ignore_failure=False, login_shell=False,
-                    suppress_warning=False, timeout=None):
+                    suppress_warning=False, timeout=None,
+                    stdout_callback=None):
     return self.RemoteHostCommand(command, should_log, retries,
                                   ignore_failure, login_shell,
-                                  suppress_warning, timeout)
+                                  suppress_warning, timeout,
+                                  stdout_callback=stdout_callback)
 
   def RemoteHostCommand(self, command,
                         should_log=False, retries=SSH_RETRIES,
                         ignore_failure=False, login_shell=False,
-                        suppress_warning=False, timeout=None):
+                        suppress_warning=False, timeout=None,
+                        stdout_callback=None):
     """Runs a command on the VM.
 
     This is guaranteed to run on the host VM, whereas RemoteCommand might run
@@ -328,6 +684,11 @@ class BaseLinuxMixin(virtual_machine.BaseOsMixin):
       login_shell: Run command in a login shell.
       suppress_warning: Suppress the result logging from IssueCommand when the
           return code is non-zero.
+      timeout: The timeout for IssueCommand.
+      stdout_callback: A callable. If specified, it is called with each line
+          of stdout as it is received, and only the tails of stdout and stderr
+          are returned. See vm_util.IssueCommand. The command is not retried
+          once it has written to stdout, so no line is passed twice.
 
     Returns:
       A tuple of stdout and stderr from running the command.
@@ -340,6 +701,7 @@ class BaseLinuxMixin(virtual_machine.BaseOsMixin):
       # newlines are escaped.
       command = command.replace('\n', '\\n')
 
+    self._CheckSshControlMaster()
     user_host = '%s@%s' % (self.user_name, self.ip_address)
     ssh_cmd = ['ssh', '-A', '-p', str(self.ssh_port), user_host]
     ssh_cmd.extend(vm_util.GetSshOptions(self.ssh_private_key))
@@ -350,13 +712,27 @@ class BaseLinuxMixin(virtual_machine.BaseOsMixin):
       else:
         ssh_cmd.append(command)
 
+      # Set once stdout_callback has been called.
+      streamed = []
+
+      def StreamLine(line):
+        if not streamed:
+          streamed.append(True)
+        stdout_callback(line)
+
       for _ in range(retries):
         stdout, stderr, retcode = vm_util.IssueCommand(
             ssh_cmd, force_info_log=should_log,
             suppress_warning=suppress_warning,
-            timeout=timeout)
+            timeout=timeout,
+            stdout_callback=StreamLine if stdout_callback else None)
         if retcode != 255:  # Retry on 255 because this indicates an SSH failure
           break
+        if streamed:
+          # The command ran: its output cannot be passed to the callback again.
+          break
+        # The master connection may be what failed.
+        self._CheckSshControlMaster(force=True)
     finally:
       if login_shell:
         self._pseudo_tty_lock.release()
@@ -371,6 +747,79 @@ class BaseLinuxMixin(virtual_machine.BaseOsMixin):
 
     return stdout, stderr
 
+  def OpenSshConnections(self):
+    """Starts the multiplexed SSH master connection to the VM.
+
+    Commands and copies connect directly until this is called, e.g. while
+    the VM boots. See _CheckSshControlMaster for how the master is kept
+    running afterwards.
+    """
+    if not vm_util.SshConnectionReuseEnabled() or not self.ip_address:
+      return
+    with self._ssh_master_lock:
+      self._StartSshControlMaster()
+
+  def _StartSshControlMaster(self):
+    """Starts the master connection. Must be called with _ssh_master_lock."""
+    user_host = '%s@%s' % (self.user_name, self.ip_address)
+    if vm_util.StartSshControlMaster(user_host, self.ssh_port,
+                                     self.ssh_private_key):
+      self._ssh_master_user_host = user_host
+    else:
+      self._ssh_master_user_host = None
+    self._ssh_master_check_time = time.time()
+
+  def _CheckSshControlMaster(self, force=False):
+    """Restarts the master connection if it is gone.
+
+    The master exits once it has been idle for --ssh_control_persist, or when
+    the VM reboots, after which commands connect directly. So at most every
+    vm_util.SSH_MASTER_CHECK_INTERVAL seconds, or when 'force' is set, this
+    checks it with 'ssh -O check', and starts it again if it is not running.
+    Commands issued meanwhile by other threads do not wait for this.
+
+    Args:
+      force: bool. Whether to check even if the master was checked recently.
+    """
+    if self._ssh_master_check_time is None:
+      return
+    if (not force and time.time() - self._ssh_master_check_time <
+        vm_util.SSH_MASTER_CHECK_INTERVAL):
+      return
+    if not self._ssh_master_lock.acquire(False):
+      return
+    try:
+      if self._ssh_master_check_time is None:
+        return
+      user_host = '%s@%s' % (self.user_name, self.ip_address)
+      if (self._ssh_master_user_host == user_host and
+          vm_util.CheckSshControlMaster(user_host, self.ssh_port,
+                                        self.ssh_private_key)):
+        self._ssh_master_check_time = time.time()
+      else:
+        logging.info('The SSH master connection to %s is not running. '
+                     'Starting it again.', self.name)
+        self._StartSshControlMaster()
+    finally:
+      self._ssh_master_lock.release()
+
+  def CloseSshConnections(self):
+    """Stops the multiplexed SSH master connection to the VM, if any.
+
+    Commands and copies issued after this connect directly, until
+    OpenSshConnections is called again.
+    """
+    if not vm_util.SshConnectionReuseEnabled() or not self.ip_address:
+      return
+    with self._ssh_master_lock:
+      self._ssh_master_user_host = None
+      self._ssh_master_check_time = None
+    user_host = '%s@%s' % (self.user_name, self.ip_address)
+    ssh_cmd = ['ssh', '-O', 'exit', '-p', str(self.ssh_port), user_host]
+    ssh_cmd.extend(vm_util.GetSshOptions(self.ssh_private_key))
+    # A non-zero return code just means that there was no master running.
+    vm_util.IssueCommand(ssh_cmd, suppress_warning=True)
+
   def MoveFile(self, target, source_path, remote_path=''):
     self.MoveHostFile(target, source_path, remote_path)
 
@@ -562,6 +1011,7 @@ class RhelMixin(BaseLinuxMixin):
   """Class holding RHEL specific VM methods and attributes."""
 
   OS_TYPE = 'rhel'
+  PACKAGE_MANAGER = 'Yum'
 
   def OnStartup(self):
     """Eliminates the need to have a tty to run sudo commands."""
@@ -608,20 +1058,16 @@ class RhelMixin(BaseLinuxMixin):
 
   def InstallPackages(self, packages):
     """Installs packages using the yum package manager."""
-    self.RemoteCommand('sudo yum install -y %s' % packages)
+    if self._HasOsPackages(packages):
+      return
+    with self._package_manager_lock:
+      self.RemoteCommand('sudo yum install -y %s' % packages)
+      self._installed_os_packages.update(packages.split())
 
   def InstallPackageGroup(self, package_group):
     """Installs a 'package group' using the yum package manager."""
-    self.RemoteCommand('sudo yum groupinstall -y "%s"' % package_group)
-
-  def Install(self, package_name):
-    """Installs a PerfKit package on the VM."""
-    if not self.install_packages:
-      return
-    if package_name not in self._installed_packages:
-      package = linux_packages.PACKAGES[package_name]
-      package.YumInstall(self)
-      self._installed_packages.add(package_name)
+    with self._package_manager_lock:
+      self.RemoteCommand('sudo yum groupinstall -y "%s"' % package_group)
 
   def Uninstall(self, package_name):
     """Uninstalls a PerfKit package on the VM."""
@@ -663,6 +1109,7 @@ class DebianMixin(BaseLinuxMixin):
   """Class holding Debian specific VM methods and attributes."""
 
   OS_TYPE = 'debian'
+  PACKAGE_MANAGER = 'Apt'
 
   def __init__(self, *args, **kwargs):
     super(DebianMixin, self).__init__(*args, **kwargs)
@@ -700,37 +1147,33 @@ class DebianMixin(BaseLinuxMixin):
     self.RemoteCommand('sudo DEBIAN_FRONTEND=\'noninteractive\' '
                        'apt-get --purge -y dselect-upgrade')
 
-  @vm_util.Retry()
-  def InstallPackages(self, packages):
-    """Installs packages using the apt package manager."""
-    try:
-      install_command = ('sudo DEBIAN_FRONTEND=\'noninteractive\' '
-                         '/usr/bin/apt-get -y install %s' % (packages))
-      self.RemoteCommand(install_command)
-    except errors.VirtualMachine.RemoteCommandError as e:
-      # TODO(user): Remove code below after Azure fix their package repository,
-      # or add code to recover the sources.list
-      self.RemoteCommand(
-          'sudo sed -i.bk "s/azure.archive.ubuntu.com/archive.ubuntu.com/g" '
-          '/etc/apt/sources.list')
-      logging.info('Installing "%s" failed on %s. This may be transient. '
-                   'Updating package list.', packages, self)
-      self.AptUpdate()
-      raise e
-
-  def Install(self, package_name):
-    """Installs a PerfKit package on the VM."""
-    if not self.install_packages:
-      return
-
+  def PrepareForInstall(self):
+    """Updates the package lists, the first time packages are installed."""
     if not self._apt_updated:
       self.AptUpdate()
       self._apt_updated = True
 
-    if package_name not in self._installed_packages:
-      package = linux_packages.PACKAGES[package_name]
-      package.AptInstall(self)
-      self._installed_packages.add(package_name)
+  @vm_util.Retry()
+  def InstallPackages(self, packages):
+    """Installs packages using the apt package manager."""
+    if self._HasOsPackages(packages):
+      return
+    with self._package_manager_lock:
+      try:
+        install_command = ('sudo DEBIAN_FRONTEND=\'noninteractive\' '
+                           '/usr/bin/apt-get -y install %s' % (packages))
+        self.RemoteCommand(install_command)
+      except errors.VirtualMachine.RemoteCommandError as e:
+        # TODO(user): Remove code below after Azure fix their package
+        # repository, or add code to recover the sources.list
+        self.RemoteCommand(
+            'sudo sed -i.bk "s/azure.archive.ubuntu.com/archive.ubuntu.com/g" '
+            '/etc/apt/sources.list')
+        logging.info('Installing "%s" failed on %s. This may be transient. '
+                     'Updating package list.', packages, self)
+        self.AptUpdate()
+        raise e
+      self._installed_os_packages.update(packages.split())
 
   def Uninstall(self, package_name):
     """Uninstalls a PerfKit package on the VM."""
@@ -827,7 +1270,8 @@ class ContainerizedDebianMixin(DebianMixin):
   def RemoteCommand(self, command,
                     should_log=False, retries=SSH_RETRIES,
                     ignore_failure=False, login_shell=False,
-                    suppress_warning=False, timeout=None):
+                    suppress_warning=False, timeout=None,
+                    stdout_callback=None):
     """Runs a command inside the container.
 
     Args:
@@ -841,6 +1285,8 @@ class ContainerizedDebianMixin(DebianMixin):
       login_shell: Run command in a login shell.
       suppress_warning: Suppress the result logging from IssueCommand when the
           return code is non-zero.
+      stdout_callback: A callable called with each line of stdout. See
+          RemoteHostCommand.
 
     Returns:
       A tuple of stdout and stderr from running the command.
@@ -851,7 +1297,8 @@ class ContainerizedDebianMixin(DebianMixin):
     logging.info('Docker running: %s' % command)
     command = "sudo docker exec %s bash -c '%s'" % (self.docker_id, command)
     return self.RemoteHostCommand(command, should_log, retries,
-                                  ignore_failure, login_shell, suppress_warning)
+                                  ignore_failure, login_shell, suppress_warning,
+                                  stdout_callback=stdout_callback)
 
   def ContainerCopy(self, file_name, container_path='', copy_to=True):
     """Copies a file to and from container_path to the host's vm_util.VM_TMP_DIR.
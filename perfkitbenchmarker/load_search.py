@@ -0,0 +1,330 @@
+# Copyright 2016 PerfKitBenchmarker Authors. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Searches a load parameter for the best throughput a system sustains.
+
+Load-sweep benchmarks run the same workload at increasing load (connections,
+client threads, ...) and report the highest throughput seen, optionally
+subject to a latency limit. Stepping through every load spends most of the
+run on points far from the answer. The functions in this module choose the
+next load to try from the results seen so far:
+
+  * MaxThroughputUnderLatencyLimit doubles the load until the latency limit
+    is exceeded, then bisects between the last load that met the limit and
+    the first one that did not.
+  * FindKnee runs a golden-section search for the load with the highest
+    throughput, assuming that throughput rises to a single peak (the knee)
+    and then flattens or falls.
+
+Both stop once the remaining interval is no wider than the requested
+resolution. Measurements that are too close to call, either against the
+latency limit or against each other, are repeated and their medians used.
+"""
+
+import collections
+import logging
+import math
+
+from perfkitbenchmarker import flags
+
+flags.DEFINE_integer('load_search_max_retries', 2,
+                     'Maximum number of times a load search repeats a '
+                     'measurement that is too close to the latency limit, or '
+                     'to the measurement it is compared with, to call.',
+                     lower_bound=0)
+flags.DEFINE_float('load_search_noise_margin', 0.05,
+                   'Relative difference below which a load search considers '
+                   'two values to be within noise of each other.',
+                   lower_bound=0.0)
+
+FLAGS = flags.FLAGS
+
+# 1 / phi. Each golden-section step shrinks the interval by this factor.
+_INVERSE_GOLDEN_RATIO = (math.sqrt(5) - 1) / 2
+
+
+# The result of running the workload once at a single load.
+#
+# throughput: Number. Higher is better.
+# latency: Number, or None if the run failed. A run with a latency of None
+#     never counts as meeting the latency limit.
+# samples: List of sample.Sample objects produced by the run.
+Measurement = collections.namedtuple('Measurement',
+                                     ['throughput', 'latency', 'samples'])
+
+
+# The outcome of a search.
+#
+# best: LoadPoint with the highest throughput among the points that met the
+#     latency limit, or None if no point did. Ties go to the lowest load.
+# points: List of every LoadPoint measured, in the order first measured.
+SearchResult = collections.namedtuple('SearchResult', ['best', 'points'])
+
+
+def MeetsLatencyLimit(latency, latency_limit):
+  """Returns whether a latency meets a limit, as the searches decide it.
+
+  Args:
+    latency: float or None. A measured latency. None never meets the limit.
+    latency_limit: float or None. The maximum latency, inclusive, or None for
+        no limit.
+  """
+  return latency is not None and (latency_limit is None or
+                                  latency <= latency_limit)
+
+
+def _Median(values):
+  values = sorted(values)
+  middle = len(values) // 2
+  if len(values) % 2:
+    return values[middle]
+  return (values[middle - 1] + values[middle]) / 2.0
+
+
+class LoadPoint(object):
+  """All measurements taken at a single load.
+
+  Attributes:
+    load: int. The load parameter.
+    measurements: List of Measurement objects, one per run at this load.
+  """
+
+  def __init__(self, load):
+    self.load = load
+    self.measurements = []
+
+  @property
+  def throughput(self):
+    """Median throughput across measurements."""
+    return _Median([m.throughput for m in self.measurements])
+
+  @property
+  def latency(self):
+    """Median latency across measurements, or None if most runs failed."""
+    latencies = [m.latency for m in self.measurements]
+    if latencies.count(None) * 2 >= len(latencies):
+      return None
+    # Failed runs sort above every successful one.
+    return _Median([float('inf') if l is None else l for l in latencies])
+
+  @property
+  def samples(self):
+    """Samples from every measurement, in the order measured."""
+    return [s for m in self.measurements for s in m.samples]
+
+  def __repr__(self):
+    return '<LoadPoint load={0} throughput={1} latency={2} runs={3}>'.format(
+        self.load, self.throughput, self.latency, len(self.measurements))
+
+
+class _Search(object):
+  """Measures and caches LoadPoints on behalf of the search functions."""
+
+  def __init__(self, measure, latency_limit, noise_margin, max_retries):
+    self._measure = measure
+    self._latency_limit = latency_limit
+    self._noise_margin = (FLAGS.load_search_noise_margin
+                          if noise_margin is None else noise_margin)
+    self._max_retries = (FLAGS.load_search_max_retries
+                         if max_retries is None else max_retries)
+    self._points = collections.OrderedDict()
+
+  def _AddMeasurement(self, point):
+    measurement = self._measure(point.load)
+    point.measurements.append(measurement)
+    logging.info('Load %d: throughput %s, latency %s.', point.load,
+                 measurement.throughput, measurement.latency)
+
+  def _CanRetry(self, point):
+    return len(point.measurements) <= self._max_retries
+
+  def _NearLimit(self, point):
+    latency = point.latency
+    if self._latency_limit is None or latency is None:
+      return False
+    return (abs(latency - self._latency_limit) <=
+            self._noise_margin * self._latency_limit)
+
+  def Measure(self, load):
+    """Returns the LoadPoint for 'load', measuring it if necessary."""
+    point = self._points.get(load)
+    if point is None:
+      point = self._points[load] = LoadPoint(load)
+      self._AddMeasurement(point)
+      while self._NearLimit(point) and self._CanRetry(point):
+        logging.info('Load %d is within noise of the latency limit; '
+                     'repeating it.', load)
+        self._AddMeasurement(point)
+    return point
+
+  def MeetsLimit(self, point):
+    return MeetsLatencyLimit(point.latency, self._latency_limit)
+
+  def Objective(self, point):
+    return point.throughput if self.MeetsLimit(point) else float('-inf')
+
+  def Compare(self, point1, point2):
+    """Compares the objective at two points, repeating runs when close.
+
+    Callers resolve ties in favor of the lower load, so only a higher load
+    that looks better by less than the noise margin is worth repeating runs
+    for. Equal results are not repeated, which keeps plateaus cheap.
+
+    Returns:
+      A positive number if point1 is better, a negative one if point2 is
+      better, and 0 if they are within noise of each other.
+    """
+    if point1 is point2:
+      return 0
+    lower, higher = sorted((point1, point2), key=lambda p: p.load)
+    while True:
+      objective1, objective2 = self.Objective(point1), self.Objective(point2)
+      if (objective1 == float('-inf') or objective2 == float('-inf') or
+          abs(objective1 - objective2) >
+          self._noise_margin * max(abs(objective1), abs(objective2))):
+        return cmp(objective1, objective2)
+      if self.Objective(higher) <= self.Objective(lower):
+        return 0
+      candidates = [p for p in (point1, point2) if self._CanRetry(p)]
+      if not candidates:
+        return 0
+      retry = min(candidates, key=lambda p: len(p.measurements))
+      logging.info('Loads %d and %d are within noise of each other; '
+                   'repeating load %d.', point1.load, point2.load, retry.load)
+      self._AddMeasurement(retry)
+
+  def Result(self):
+    points = self._points.values()
+    feasible = [p for p in points if self.MeetsLimit(p)]
+    # On a plateau, prefer the smallest load that reaches the peak.
+    best = (max(feasible, key=lambda p: (p.throughput, -p.load))
+            if feasible else None)
+    return SearchResult(best=best, points=points)
+
+
+def _CheckLoadRange(min_load, max_load, resolution):
+  if min_load < 1 or max_load < min_load:
+    raise ValueError(
+        'Invalid load range: [{0}, {1}].'.format(min_load, max_load))
+  if resolution < 1:
+    raise ValueError('Resolution must be at least 1, got {0}.'.format(
+        resolution))
+
+
+def MaxThroughputUnderLatencyLimit(measure, min_load, max_load, latency_limit,
+                                   resolution=1, noise_margin=None,
+                                   max_retries=None):
+  """Finds the highest throughput whose latency stays within a limit.
+
+  Assumes that latency does not decrease as load increases. The load is
+  doubled from min_load until a point misses the latency limit, then the
+  boundary is bisected. The doubling phase also stops early once throughput
+  stops rising by more than the noise margin, since past that point extra
+  load only adds latency.
+
+  Args:
+    measure: Function taking an int load and returning a Measurement.
+    min_load: int. Smallest load to try. Must be at least 1.
+    max_load: int. Largest load to try.
+    latency_limit: Number. Largest acceptable latency, in the units of
+        Measurement.latency.
+    resolution: int. Stop once the loads bracketing the latency limit are
+        this close.
+    noise_margin: float. Relative difference within which two values are
+        treated as noise. Defaults to --load_search_noise_margin.
+    max_retries: int. Maximum number of repeat runs at one load. Defaults to
+        --load_search_max_retries.
+
+  Returns:
+    SearchResult.
+  """
+  _CheckLoadRange(min_load, max_load, resolution)
+  search = _Search(measure, latency_limit, noise_margin, max_retries)
+  lower = search.Measure(min_load)
+  if not search.MeetsLimit(lower):
+    logging.warning('Latency limit exceeded at the minimum load %d.',
+                    min_load)
+    return search.Result()
+
+  upper = None
+  while lower.load < max_load:
+    point = search.Measure(min(lower.load * 2, max_load))
+    if not search.MeetsLimit(point):
+      upper = point
+      break
+    if search.Compare(point, lower) <= 0:
+      logging.info('Throughput stopped increasing at load %d.', point.load)
+      return search.Result()
+    lower = point
+
+  if upper is not None:
+    while upper.load - lower.load > resolution:
+      point = search.Measure((lower.load + upper.load) // 2)
+      if search.MeetsLimit(point):
+        lower = point
+      else:
+        upper = point
+  return search.Result()
+
+
+def FindKnee(measure, min_load, max_load, latency_limit=None, resolution=1,
+             log_scale=False, noise_margin=None, max_retries=None):
+  """Finds the load with the highest throughput by golden-section search.
+
+  Assumes throughput is unimodal in load: it rises to a peak and then
+  flattens or falls. When two loads are within noise of each other the
+  search moves toward the lower one, so on a plateau it converges on the
+  smallest load that reaches the peak throughput.
+
+  Args:
+    measure: Function taking an int load and returning a Measurement.
+    min_load: int. Smallest load to try. Must be at least 1.
+    max_load: int. Largest load to try.
+    latency_limit: Number or None. If set, points whose latency exceeds it
+        are treated as worse than any point that meets it.
+    resolution: int. Stop once the search interval is this narrow.
+    log_scale: boolean. If True, search over log(load) rather than load,
+        which suits ranges that span orders of magnitude.
+    noise_margin: float. Relative difference within which two values are
+        treated as noise. Defaults to --load_search_noise_margin.
+    max_retries: int. Maximum number of repeat runs at one load. Defaults to
+        --load_search_max_retries.
+
+  Returns:
+    SearchResult.
+  """
+  _CheckLoadRange(min_load, max_load, resolution)
+  search = _Search(measure, latency_limit, noise_margin, max_retries)
+  if log_scale:
+    to_x, to_load = math.log, lambda x: int(round(math.exp(x)))
+  else:
+    to_x, to_load = float, lambda x: int(round(x))
+
+  a, b = to_x(min_load), to_x(max_load)
+  c = b - _INVERSE_GOLDEN_RATIO * (b - a)
+  d = a + _INVERSE_GOLDEN_RATIO * (b - a)
+  while (to_load(b) - to_load(a) > resolution and
+         to_load(c) != to_load(d)):
+    point_c, point_d = search.Measure(to_load(c)), search.Measure(to_load(d))
+    if search.Compare(point_c, point_d) >= 0:
+      b, d = d, c
+      c = b - _INVERSE_GOLDEN_RATIO * (b - a)
+    else:
+      a, c = c, d
+      d = a + _INVERSE_GOLDEN_RATIO * (b - a)
+
+  # The interior points never reach the ends of the interval, which is where
+  # the peak lies when throughput is monotonic over the whole range.
+  search.Measure(to_load(a))
+  search.Measure(to_load(b))
+  return search.Result()
@@ -20,8 +20,30 @@ others in the
 same project.
 """
 
+import re
+
 from perfkitbenchmarker import context
 from perfkitbenchmarker import errors
+from perfkitbenchmarker import flags
+
+FLAGS = flags.FLAGS
+
+
+def GetNameSuffix():
+  """Returns a suffix for the names of network resources.
+
+  The suffix contains the run URI and the UID of the benchmark of the current
+  thread, so that benchmarks running concurrently (see
+  --max_concurrent_benchmarks) create separate networks and firewall rules,
+  and one of them deleting its own does not affect the others. It only
+  contains lowercase letters, digits and dashes.
+  """
+  benchmark_spec = context.GetThreadBenchmarkSpec()
+  if benchmark_spec is None:
+    raise errors.Error('GetNameSuffix called in a thread without a '
+                       'BenchmarkSpec.')
+  return re.sub('[^a-z0-9]+', '-',
+                '%s-%s' % (FLAGS.run_uri, benchmark_spec.uid.lower()))
 
 
 class BaseFirewall(object):
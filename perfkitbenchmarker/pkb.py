@@ -56,14 +56,18 @@ all: PerfKitBenchmarker will run all of the above stages (provision,
 """
 
 import collections
+import contextlib
 import getpass
 import itertools
 import logging
+import os
 import sys
+import threading
 import uuid
 
 from perfkitbenchmarker import archive
 from perfkitbenchmarker import linux_benchmarks
+from perfkitbenchmarker import linux_packages
 from perfkitbenchmarker import benchmark_sets
 from perfkitbenchmarker import benchmark_spec
 from perfkitbenchmarker import benchmark_status
@@ -72,13 +76,17 @@ from perfkitbenchmarker import disk
 from perfkitbenchmarker import errors
 from perfkitbenchmarker import events
 from perfkitbenchmarker import flags
+from perfkitbenchmarker import flags_validators
 from perfkitbenchmarker import log_util
+from perfkitbenchmarker import rate_limiter
+from perfkitbenchmarker import resource_graph
 from perfkitbenchmarker import static_virtual_machine
 from perfkitbenchmarker import timing_util
 from perfkitbenchmarker import traces
 from perfkitbenchmarker import version
 from perfkitbenchmarker import vm_util
 from perfkitbenchmarker import windows_benchmarks
+from perfkitbenchmarker import windows_packages
 from perfkitbenchmarker.publisher import SampleCollector
 
 STAGE_ALL = 'all'
@@ -90,6 +98,8 @@ STAGE_TEARDOWN = 'teardown'
 LOG_FILE_NAME = 'pkb.log'
 REQUIRED_INFO = ['scratch_disk', 'num_machines']
 REQUIRED_EXECUTABLES = frozenset(['ssh', 'ssh-keygen', 'scp', 'openssl'])
+# Flags handled by gflags itself that print the help text and exit.
+_HELP_FLAGS = frozenset(['?', 'help', 'helpshort', 'helpxml'])
 FLAGS = flags.FLAGS
 
 flags.DEFINE_list('ssh_options', [], 'Additional options to pass to ssh.')
@@ -175,11 +185,24 @@ flags.DEFINE_bool('install_packages', None,
                   'packages installed.')
 flags.DEFINE_bool(
     'stop_after_benchmark_failure', False,
-    'Determines response when running multiple benchmarks serially and a '
-    'benchmark run fails. When True, no further benchmarks are scheduled, and '
-    'execution ends. When False, benchmarks continue to be scheduled. Does not '
-    'apply to keyboard interrupts, which will always prevent further '
-    'benchmarks from being scheduled.')
+    'Determines response when running multiple benchmarks and a benchmark run '
+    'fails. When True, no further benchmarks are scheduled, and execution ends '
+    'once the benchmarks that are already running finish. When False, '
+    'benchmarks continue to be scheduled. Does not apply to keyboard '
+    'interrupts, which will always prevent further benchmarks from being '
+    'scheduled.')
+flags.DEFINE_integer(
+    'max_concurrent_benchmarks', 1,
+    'The maximum number of benchmarks to run at the same time. Each benchmark '
+    'provisions and tears down its own resources, so only benchmarks that do '
+    'not depend on each other should be run concurrently. The default of 1 '
+    'runs benchmarks serially.', lower_bound=1)
+flags.DEFINE_list(
+    'max_concurrent_vms', [],
+    'A list of CLOUD:COUNT pairs (e.g. "GCP:100,AWS:50") capping the total '
+    'number of VMs that may be provisioned at the same time in each cloud by '
+    'concurrently running benchmarks. A benchmark is held back until its VMs '
+    'fit under the cap, and fails if it needs more VMs than the cap allows.')
 
 # Support for using a proxy in the cloud environment.
 flags.DEFINE_string('http_proxy', '',
@@ -195,6 +218,116 @@ flags.DEFINE_string('ftp_proxy', '',
 MAX_RUN_URI_LENGTH = 8
 
 
+def _ParseVmCaps(pairs):
+  """Parses the value of --max_concurrent_vms.
+
+  Args:
+    pairs: list of strings of the form CLOUD:COUNT.
+
+  Returns:
+    dict mapping cloud name to the maximum number of concurrent VMs.
+
+  Raises:
+    ValueError: If a pair is malformed or names an unknown cloud.
+  """
+  caps = {}
+  for pair in pairs:
+    cloud, sep, count = pair.partition(':')
+    if not sep or cloud not in benchmark_spec.VALID_CLOUDS:
+      raise ValueError('Invalid CLOUD:COUNT pair "%s".' % pair)
+    caps[cloud] = int(count)
+  return caps
+
+
+def _ValidateVmCapsFlag(pairs):
+  try:
+    _ParseVmCaps(pairs)
+  except ValueError as e:
+    raise flags_validators.Error('%s Valid clouds are: %s' % (
+        e, ', '.join(benchmark_spec.VALID_CLOUDS)))
+  return True
+
+
+flags.RegisterValidator('max_concurrent_vms', _ValidateVmCapsFlag)
+
+
+class _VmCapTracker(object):
+  """Blocks benchmarks until their VMs fit under --max_concurrent_vms.
+
+  Attributes:
+    caps: dict mapping cloud name to the maximum number of VMs that may be
+        reserved at the same time. Clouds without an entry are not capped.
+  """
+
+  def __init__(self, caps):
+    self.caps = caps
+    self._reserved = collections.Counter()
+    self._condition = threading.Condition()
+
+  def _Fits(self, vm_counts):
+    return all(self._reserved[cloud] + count <= self.caps[cloud]
+               for cloud, count in vm_counts.iteritems() if cloud in self.caps)
+
+  @contextlib.contextmanager
+  def Reserve(self, vm_counts):
+    """Reserves VMs for the duration of the enclosed block.
+
+    Args:
+      vm_counts: dict mapping cloud name to the number of VMs needed.
+
+    Raises:
+      errors.Config.InvalidValue: If more VMs are needed in a cloud than its
+          cap allows, in which case waiting would never succeed.
+    """
+    for cloud, count in vm_counts.iteritems():
+      if count > self.caps.get(cloud, count):
+        raise errors.Config.InvalidValue(
+            '%s VMs are required in %s, but --max_concurrent_vms only allows '
+            '%s.' % (count, cloud, self.caps[cloud]))
+    with self._condition:
+      if not self._Fits(vm_counts):
+        logging.info('Waiting for VMs to be released: need %s, %s in use.',
+                     dict(vm_counts), dict(self._reserved))
+      while not self._Fits(vm_counts):
+        self._condition.wait()
+      self._reserved.update(vm_counts)
+    try:
+      yield
+    finally:
+      with self._condition:
+        self._reserved.subtract(vm_counts)
+        self._condition.notify_all()
+
+
+def _GetVmCountsByCloud(benchmark_config):
+  """Returns the number of VMs a benchmark config provisions in each cloud.
+
+  The cloud and VM count of each group are resolved as in
+  BenchmarkSpec.ConstructVirtualMachines.
+
+  Args:
+    benchmark_config: dict. The benchmark's config, as returned by GetConfig.
+
+  Returns:
+    collections.Counter mapping cloud name to number of VMs.
+  """
+  merged_flags = configs.GetMergedFlags(benchmark_config)
+  counts = collections.Counter()
+  for group_spec in benchmark_config.get(benchmark_spec.VM_GROUPS,
+                                         {}).itervalues():
+    vm_count = group_spec.get(benchmark_spec.VM_COUNT,
+                              benchmark_spec.DEFAULT_COUNT)
+    if vm_count is None:
+      vm_count = merged_flags.num_vms
+    if (not merged_flags[benchmark_spec.CLOUD].present and
+        benchmark_spec.CLOUD in group_spec):
+      cloud = group_spec[benchmark_spec.CLOUD]
+    else:
+      cloud = merged_flags.cloud
+    counts[cloud] += vm_count
+  return counts
+
+
 events.initialization_complete.connect(traces.RegisterAll)
 
 
@@ -252,13 +385,18 @@ def DoRunPhase(benchmark, name, spec, collector, timer):
   logging.info('Running benchmark %s', name)
   events.before_phase.send(events.RUN_PHASE, benchmark_spec=spec)
   spec.StartBackgroundWorkload()
+  trace_samples = []
   try:
     with timer.Measure('Benchmark Run'):
       samples = benchmark.Run(spec)
   finally:
-    events.after_phase.send(events.RUN_PHASE, benchmark_spec=spec)
+    for _, receiver_samples in events.after_phase.send(events.RUN_PHASE,
+                                                       benchmark_spec=spec):
+      trace_samples.extend(receiver_samples or ())
     spec.StopBackgroundWorkload()
   collector.AddSamples(samples, name, spec)
+  if trace_samples:
+    collector.AddSamples(trace_samples, name, spec)
 
 
 def DoCleanupPhase(benchmark, name, spec, timer):
@@ -293,6 +431,40 @@ def DoTeardownPhase(name, spec, timer):
     spec.Delete()
 
 
+def _PublishResourceIntervals(spec, collector, benchmark_name, benchmark_uid):
+  """Adds samples for the resource intervals of a spec and writes a timeline.
+
+  The samples break down 'Resource Provisioning' and 'Resource Teardown' per
+  resource. The intervals are then cleared, so that a later stage does not
+  publish them again. Errors are logged rather than raised, so that they do
+  not hide the error that failed the benchmark, if any.
+
+  Args:
+    spec: The BenchmarkSpec whose resource_intervals to publish.
+    collector: The SampleCollector object to add samples to.
+    benchmark_name: string. Name of the benchmark.
+    benchmark_uid: string. Identifier of this run of the benchmark.
+  """
+  try:
+    collector.AddSamples(
+        resource_graph.GenerateSamples(
+            spec.resource_intervals,
+            timing_util.RuntimeMeasurementsEnabled(),
+            timing_util.TimestampMeasurementsEnabled()),
+        benchmark_name, spec)
+    if spec.resource_intervals:
+      timeline_path = os.path.join(
+          vm_util.GetTempDir(),
+          '{0}-{1}-timeline.json'.format(benchmark_uid, FLAGS.run_stage))
+      resource_graph.WriteTimeline(spec.resource_intervals, timeline_path)
+      logging.info('Resource timeline written to %s. Open it with '
+                   'chrome://tracing.', timeline_path)
+  except Exception:
+    logging.exception('Could not publish the resource intervals of %s.',
+                      benchmark_name)
+  del spec.resource_intervals[:]
+
+
 def RunBenchmark(benchmark, collector, sequence_number, total_benchmarks,
                  benchmark_config, benchmark_uid):
   """Runs a single benchmark and adds the results to the collector.
@@ -325,6 +497,7 @@ def RunBenchmark(benchmark, collector, sequence_number, total_benchmarks,
 
     end_to_end_timer = timing_util.IntervalTimer()
     detailed_timer = timing_util.IntervalTimer()
+    api_counters = rate_limiter.GetCounters()
     spec = None
     try:
       with end_to_end_timer.Measure('End to End'):
@@ -375,6 +548,9 @@ def RunBenchmark(benchmark, collector, sequence_number, total_benchmarks,
       collector.AddSamples(
           detailed_timer.GenerateSamples(include_runtimes, include_timestamps),
           benchmark_name, spec)
+      # Calls of this benchmark, and of any benchmark running concurrently.
+      collector.AddSamples(rate_limiter.GenerateSamples(since=api_counters),
+                           benchmark_name, spec)
 
     except:
       # Resource cleanup (below) can take a long time. Log the error to give
@@ -390,10 +566,54 @@ def RunBenchmark(benchmark, collector, sequence_number, total_benchmarks,
       if spec:
         if FLAGS.run_stage in [STAGE_ALL, STAGE_TEARDOWN]:
           spec.Delete()
+        # Also when the benchmark failed, since the timeline then shows which
+        # resource failed or held up the others.
+        _PublishResourceIntervals(spec, collector, benchmark_name,
+                                  benchmark_uid)
         # Pickle spec to save final resource state.
         spec.PickleSpec()
 
 
+def _RunBenchmarkAndUpdateStatus(run_args, run_status_list, vm_caps,
+                                 stop_scheduling):
+  """Runs a single benchmark and records whether it succeeded.
+
+  Exceptions raised by the benchmark are logged rather than propagated, so
+  that a failure does not affect benchmarks running concurrently.
+
+  Args:
+    run_args: tuple. Arguments to pass to RunBenchmark.
+    run_status_list: list of [benchmark_name, benchmark_uid, status]. The
+        status is updated in place.
+    vm_caps: _VmCapTracker. Reserves the benchmark's VMs while it runs.
+    stop_scheduling: threading.Event. If set, the benchmark is skipped. Set
+        when no further benchmarks should be started.
+  """
+  (benchmark_module, _, sequence_number, total_benchmarks, benchmark_config,
+   benchmark_uid) = run_args
+  benchmark_name = benchmark_module.BENCHMARK_NAME
+  if stop_scheduling.is_set():
+    return
+  try:
+    run_status_list[2] = benchmark_status.FAILED
+    if FLAGS.run_stage in [STAGE_ALL, STAGE_PROVISION]:
+      vm_counts = _GetVmCountsByCloud(benchmark_config)
+    else:
+      vm_counts = {}
+    with vm_caps.Reserve(vm_counts):
+      RunBenchmark(*run_args)
+    run_status_list[2] = benchmark_status.SUCCEEDED
+  except BaseException as e:
+    msg = 'Benchmark {0}/{1} {2} (UID: {3}) failed.'.format(
+        sequence_number, total_benchmarks, benchmark_name, benchmark_uid)
+    if (isinstance(e, KeyboardInterrupt) or
+        FLAGS.stop_after_benchmark_failure):
+      logging.error('%s Execution will not continue.', msg)
+      stop_scheduling.set()
+    else:
+      logging.error('%s Execution will continue.', msg)
+
+
 def _LogCommandLineFlags():
   result = []
   for flag in FLAGS.FlagDict().values():
@@ -491,25 +711,24 @@ def RunBenchmarks(publish=True):
     args.append((benchmark_module, collector, i + 1, total_benchmarks,
                  benchmark_module.GetConfig(user_config), benchmark_uid))
 
+  vm_caps = _VmCapTracker(_ParseVmCaps(FLAGS.max_concurrent_vms))
+  stop_scheduling = threading.Event()
   try:
-    for run_args, run_status_list in zip(args, run_status_lists):
-      benchmark_module, _, sequence_number, _, _, benchmark_uid = run_args
-      benchmark_name = benchmark_module.BENCHMARK_NAME
-      try:
-        run_status_list[2] = benchmark_status.FAILED
-        RunBenchmark(*run_args)
-        run_status_list[2] = benchmark_status.SUCCEEDED
-      except BaseException as e:
-        msg = 'Benchmark {0}/{1} {2} (UID: {3}) failed.'.format(
-            sequence_number, total_benchmarks, benchmark_name, benchmark_uid)
-        if (isinstance(e, KeyboardInterrupt) or
-            FLAGS.stop_after_benchmark_failure):
-          logging.error('%s Execution will not continue.', msg)
-          break
-        else:
-          logging.error('%s Execution will continue.', msg)
+    if FLAGS.max_concurrent_benchmarks > 1:
+      # Each thread inherits this thread's log context and sets its own
+      # BenchmarkSpec, so log labels and benchmark-specific flags stay
+      # separate between concurrently running benchmarks.
+      vm_util.RunParallelThreads(
+          [(_RunBenchmarkAndUpdateStatus,
+            (run_args, run_status_list, vm_caps, stop_scheduling), {})
+           for run_args, run_status_list in zip(args, run_status_lists)],
+          FLAGS.max_concurrent_benchmarks)
+    else:
+      for run_args, run_status_list in zip(args, run_status_lists):
+        _RunBenchmarkAndUpdateStatus(run_args, run_status_list, vm_caps,
+                                     stop_scheduling)
   finally:
-    if collector.samples:
+    if collector.sample_count:
       collector.PublishSamples()
 
     if run_status_lists:
@@ -533,8 +752,9 @@ def RunBenchmarks(publish=True):
 def _GenerateBenchmarkDocumentation():
   """Generates benchmark documentation to show in --help."""
   benchmark_docs = []
-  for benchmark_module in (linux_benchmarks.BENCHMARKS +
-                           windows_benchmarks.BENCHMARKS):
+  windows_benchmark_modules = windows_benchmarks.VALID_BENCHMARKS.LoadAll()
+  for benchmark_module in (linux_benchmarks.VALID_BENCHMARKS.LoadAll() +
+                           windows_benchmark_modules):
     benchmark_config = configs.LoadMinimalConfig(
         benchmark_module.BENCHMARK_CONFIG, benchmark_module.BENCHMARK_NAME)
     vm_groups = benchmark_config['vm_groups']
@@ -552,7 +772,7 @@ def _GenerateBenchmarkDocumentation():
 
 
     name = benchmark_module.BENCHMARK_NAME
-    if benchmark_module in windows_benchmarks.BENCHMARKS:
+    if benchmark_module in windows_benchmark_modules:
       name += ' (Windows)'
     benchmark_docs.append('%s: %s (%s VMs%s)' %
                           (name,
@@ -562,30 +782,74 @@ def _GenerateBenchmarkDocumentation():
   return '\n\t'.join(benchmark_docs)
 
 
+def _LoadAllModules():
+  """Imports all benchmark and package modules, defining all of their flags.
+
+  Benchmark and package modules are otherwise only imported when they are
+  looked up, which happens after flags are parsed.
+  """
+  for registry in (linux_benchmarks.VALID_BENCHMARKS,
+                   windows_benchmarks.VALID_BENCHMARKS,
+                   linux_packages.PACKAGES, windows_packages.PACKAGES):
+    registry.LoadAll()
+
+
+def _IsHelpRequested(argv):
+  """Returns whether 'argv' contains one of the gflags help flags."""
+  for arg in argv[1:]:
+    if arg == '--':
+      break
+    if arg.startswith('-') and arg.lstrip('-').split('=')[0] in _HELP_FLAGS:
+      return True
+  return False
+
+
+def _ParseFlags(argv):
+  """Parses 'argv', importing all benchmark and package modules if needed.
+
+  Flags defined by benchmark and package modules are unknown until the
+  modules are imported. If 'argv' contains any unknown flag, all modules are
+  imported and 'argv' is parsed again, so such flags can still be specified
+  without paying for importing every module on each run.
+
+  Returns:
+    The unparsed arguments.
+  """
+  try:
+    return FLAGS(argv)
+  except flags.UnrecognizedFlagError:
+    FLAGS.Reset()
+    _LoadAllModules()
+    return FLAGS(argv)
+
+
 def Main(argv=sys.argv):
   logging.basicConfig(level=logging.INFO)
 
-  # TODO: Verify if there is other way of appending additional help
-  # message.
-  # Inject more help documentation
-  # The following appends descriptions of the benchmarks and descriptions of
-  # the benchmark sets to the help text.
-  benchmark_sets_list = [
-      '%s:  %s' %
-      (set_name, benchmark_sets.BENCHMARK_SETS[set_name]['message'])
-      for set_name in benchmark_sets.BENCHMARK_SETS]
-  sys.modules['__main__'].__doc__ = (
-      'PerfKitBenchmarker version: {version}\n\n{doc}\n'
-      'Benchmarks (default requirements):\n'
-      '\t{benchmark_doc}').format(
-          version=version.VERSION,
-          doc=__doc__,
-          benchmark_doc=_GenerateBenchmarkDocumentation())
-  sys.modules['__main__'].__doc__ += ('\n\nBenchmark Sets:\n\t%s'
-                                      % '\n\t'.join(benchmark_sets_list))
+  if _IsHelpRequested(argv):
+    # Every flag should be listed in the help text.
+    _LoadAllModules()
+    # TODO: Verify if there is other way of appending additional help
+    # message.
+    # Inject more help documentation
+    # The following appends descriptions of the benchmarks and descriptions of
+    # the benchmark sets to the help text.
+    benchmark_sets_list = [
+        '%s:  %s' %
+        (set_name, benchmark_sets.BENCHMARK_SETS[set_name]['message'])
+        for set_name in benchmark_sets.BENCHMARK_SETS]
+    sys.modules['__main__'].__doc__ = (
+        'PerfKitBenchmarker version: {version}\n\n{doc}\n'
+        'Benchmarks (default requirements):\n'
+        '\t{benchmark_doc}').format(
+            version=version.VERSION,
+            doc=__doc__,
+            benchmark_doc=_GenerateBenchmarkDocumentation())
+    sys.modules['__main__'].__doc__ += ('\n\nBenchmark Sets:\n\t%s'
+                                        % '\n\t'.join(benchmark_sets_list))
 
   try:
-    argv = FLAGS(argv)  # parse flags
+    argv = _ParseFlags(argv)
   except flags.FlagsError as e:
     logging.error(
         '%s\nUsage: %s ARGS\n%s', e, sys.argv[0], FLAGS)
@@ -30,6 +30,7 @@ from perfkitbenchmarker import flags
 from perfkitbenchmarker import network
 from perfkitbenchmarker import resource
 from perfkitbenchmarker import vm_util
+from perfkitbenchmarker.providers.aws import aws_poller
 from perfkitbenchmarker.providers.aws import util
 
 FLAGS = flags.FLAGS
@@ -125,16 +126,7 @@ class AwsVpc(resource.BaseResource):
 
   def _Exists(self):
     """Returns true if the VPC exists."""
-    describe_cmd = util.AWS_PREFIX + [
-        'ec2',
-        'describe-vpcs',
-        '--region=%s' % self.region,
-        '--filter=Name=vpc-id,Values=%s' % self.id]
-    stdout, _ = util.IssueRetryableCommand(describe_cmd)
-    response = json.loads(stdout)
-    vpcs = response['Vpcs']
-    assert len(vpcs) < 2, 'Too many VPCs.'
-    return len(vpcs) > 0
+    return bool(aws_poller.Describe(aws_poller.VPC, self.region, self.id))
 
   def _EnableDnsHostnames(self):
     """Sets the enableDnsHostnames attribute of this VPC to True.
@@ -226,16 +218,7 @@ class AwsSubnet(resource.BaseResource):
 
   def _Exists(self):
     """Returns true if the subnet exists."""
-    describe_cmd = util.AWS_PREFIX + [
-        'ec2',
-        'describe-subnets',
-        '--region=%s' % self.region,
-        '--filter=Name=subnet-id,Values=%s' % self.id]
-    stdout, _ = util.IssueRetryableCommand(describe_cmd)
-    response = json.loads(stdout)
-    subnets = response['Subnets']
-    assert len(subnets) < 2, 'Too many subnets.'
-    return len(subnets) > 0
+    return bool(aws_poller.Describe(aws_poller.SUBNET, self.region, self.id))
 
 
 class AwsInternetGateway(resource.BaseResource):
@@ -270,16 +253,8 @@ class AwsInternetGateway(resource.BaseResource):
 
   def _Exists(self):
     """Returns true if the internet gateway exists."""
-    describe_cmd = util.AWS_PREFIX + [
-        'ec2',
-        'describe-internet-gateways',
-        '--region=%s' % self.region,
-        '--filter=Name=internet-gateway-id,Values=%s' % self.id]
-    stdout, _ = util.IssueRetryableCommand(describe_cmd)
-    response = json.loads(stdout)
-    internet_gateways = response['InternetGateways']
-    assert len(internet_gateways) < 2, 'Too many internet gateways.'
-    return len(internet_gateways) > 0
+    return bool(aws_poller.Describe(aws_poller.INTERNET_GATEWAY, self.region,
+                                    self.id))
 
   def Attach(self, vpc_id):
     """Attaches the internetgateway to the VPC."""
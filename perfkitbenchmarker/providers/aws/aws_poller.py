@@ -0,0 +1,141 @@
+# Copyright 2016 PerfKitBenchmarker Authors. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Shares "aws ec2 describe-*" commands between AWS resources of a region.
+
+Resources wait for their creation and deletion on their own threads, and each
+used to poll its status with its own describe command. With hundreds of VMs,
+that is hundreds of AWS CLI processes and API calls per polling round, which
+also get the run throttled by the EC2 API.
+
+Describe answers from a sweep describing, in one command, every resource of
+the same kind and region that was ever described. Concurrent callers share a
+sweep: a caller reuses the result of the latest sweep if that sweep started
+after the caller asked, and otherwise runs a new sweep, during which other
+callers wait.
+"""
+
+import collections
+import json
+import threading
+
+from perfkitbenchmarker.providers.aws import util
+
+# Maximum number of values of a describe filter.
+_MAX_FILTER_VALUES = 200
+
+INSTANCE = 'instance'
+VPC = 'vpc'
+SUBNET = 'subnet'
+INTERNET_GATEWAY = 'internet-gateway'
+
+# How to describe a kind of resource. 'describe' is the describe command,
+# 'id_filter' the filter on the ID of the resources, 'get_resources' returns
+# the resource descriptions of a describe response, and 'id_key' is the key
+# of the resource ID in a description.
+_Kind = collections.namedtuple(
+    '_Kind', ['describe', 'id_filter', 'get_resources', 'id_key'])
+
+_KINDS = {
+    INSTANCE: _Kind(
+        'describe-instances', 'instance-id',
+        lambda response: [instance
+                          for reservation in response['Reservations']
+                          for instance in reservation['Instances']],
+        'InstanceId'),
+    VPC: _Kind('describe-vpcs', 'vpc-id',
+               lambda response: response['Vpcs'], 'VpcId'),
+    SUBNET: _Kind('describe-subnets', 'subnet-id',
+                  lambda response: response['Subnets'], 'SubnetId'),
+    INTERNET_GATEWAY: _Kind(
+        'describe-internet-gateways', 'internet-gateway-id',
+        lambda response: response['InternetGateways'], 'InternetGatewayId'),
+}
+
+
+class _Poller(object):
+  """Sweeps over the resources of one kind in one region.
+
+  Attributes:
+    lock: threading.Lock. Held during a sweep.
+    resource_ids: set of strings. IDs of the resources to describe.
+    sweeps_started: int. Number of sweeps started.
+    swept: int. Number of the latest successful sweep, or 0 if there is none.
+    resources: dict mapping resource ID to the description of the resource
+        in the latest successful sweep.
+  """
+
+  def __init__(self):
+    self.lock = threading.Lock()
+    self.resource_ids = set()
+    self.sweeps_started = 0
+    self.swept = 0
+    self.resources = {}
+
+
+_lock = threading.Lock()
+# Maps (kind, region) to _Poller.
+_pollers = {}
+
+
+def _Sweep(kind, region, resource_ids):
+  """Describes resources of one kind in a region.
+
+  Returns:
+    dict mapping resource ID to the description of the resource, for the
+    resources that were found.
+  """
+  kind = _KINDS[kind]
+  resources = {}
+  for i in xrange(0, len(resource_ids), _MAX_FILTER_VALUES):
+    describe_cmd = util.AWS_PREFIX + [
+        'ec2',
+        kind.describe,
+        '--region=%s' % region,
+        '--filters',
+        'Name=%s,Values=%s' % (
+            kind.id_filter,
+            ','.join(resource_ids[i:i + _MAX_FILTER_VALUES]))]
+    stdout, _ = util.IssueRetryableCommand(describe_cmd)
+    for resource in kind.get_resources(json.loads(stdout)):
+      resources[resource[kind.id_key]] = resource
+  return resources
+
+
+def Describe(kind, region, resource_id):
+  """Returns the description of an AWS resource, or None if it is not found.
+
+  The description is the one returned by the EC2 API, e.g. an element of
+  "Vpcs" in the response of "aws ec2 describe-vpcs". It is at least as recent
+  as the call.
+
+  Args:
+    kind: string. Kind of the resource: INSTANCE, VPC, SUBNET or
+        INTERNET_GATEWAY.
+    region: string. Region of the resource.
+    resource_id: string. ID of the resource.
+  """
+  with _lock:
+    poller = _pollers.setdefault((kind, region), _Poller())
+    poller.resource_ids.add(resource_id)
+    # A sweep that already started may not include resource_id.
+    needed_sweep = poller.sweeps_started + 1
+  with poller.lock:
+    if poller.swept < needed_sweep:
+      with _lock:
+        poller.sweeps_started += 1
+        sweep = poller.sweeps_started
+        resource_ids = sorted(poller.resource_ids)
+      poller.resources = _Sweep(kind, region, resource_ids)
+      poller.swept = sweep
+    return poller.resources.get(resource_id)
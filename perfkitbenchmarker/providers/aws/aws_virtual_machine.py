@@ -32,6 +32,7 @@ from perfkitbenchmarker import vm_util
 from perfkitbenchmarker import windows_virtual_machine
 from perfkitbenchmarker.providers.aws import aws_disk
 from perfkitbenchmarker.providers.aws import aws_network
+from perfkitbenchmarker.providers.aws import aws_poller
 from perfkitbenchmarker.providers.aws import util
 
 FLAGS = flags.FLAGS
@@ -195,16 +196,12 @@ class AwsVirtualMachine(virtual_machine.BaseVirtualMachine):
   @vm_util.Retry()
   def _PostCreate(self):
     """Get the instance's data and tag it."""
-    describe_cmd = util.AWS_PREFIX + [
-        'ec2',
-        'describe-instances',
-        '--region=%s' % self.region,
-        '--instance-ids=%s' % self.id]
     logging.info('Getting instance %s public IP. This will fail until '
                  'a public IP is available, but will be retried.', self.id)
-    stdout, _ = util.IssueRetryableCommand(describe_cmd)
-    response = json.loads(stdout)
-    instance = response['Reservations'][0]['Instances'][0]
+    instance = aws_poller.Describe(aws_poller.INSTANCE, self.region, self.id)
+    if not instance:
+      raise errors.Resource.RetryableCreationError(
+          'Instance %s not found.' % self.id)
     self.ip_address = instance['PublicIpAddress']
     self.internal_ip = instance['PrivateIpAddress']
     if util.IsRegion(self.zone):
@@ -266,20 +263,10 @@ class AwsVirtualMachine(virtual_machine.BaseVirtualMachine):
 
   def _Exists(self):
     """Returns true if the VM exists."""
-    describe_cmd = util.AWS_PREFIX + [
-        'ec2',
-        'describe-instances',
-        '--region=%s' % self.region,
-        '--filter=Name=instance-id,Values=%s' % self.id]
-    stdout, _ = util.IssueRetryableCommand(describe_cmd)
-    response = json.loads(stdout)
-    reservations = response['Reservations']
-    assert len(reservations) < 2, 'Too many reservations.'
-    if not reservations:
+    instance = aws_poller.Describe(aws_poller.INSTANCE, self.region, self.id)
+    if not instance:
       return False
-    instances = reservations[0]['Instances']
-    assert len(instances) == 1, 'Wrong number of instances.'
-    status = instances[0]['State']['Name']
+    status = instance['State']['Name']
     assert status in INSTANCE_KNOWN_STATUSES, status
     return status in INSTANCE_EXISTS_STATUSES
 
@@ -16,6 +16,7 @@
 
 import re
 import string
+import threading
 
 from perfkitbenchmarker import errors
 from perfkitbenchmarker import flags
@@ -41,9 +42,46 @@ def GetRegionFromZone(zone_or_region):
   return zone_or_region[:-1]
 
 
+class _TagBatch(object):
+  """Resources tagged by one create-tags command.
+
+  Attributes:
+    resource_ids: list of strings. IDs of the resources to tag.
+    error: Exception raised by the command, if any.
+    done: threading.Event. Set once the command has completed.
+  """
+
+  def __init__(self):
+    self.resource_ids = []
+    self.error = None
+    self.done = threading.Event()
+
+
+_tag_condition = threading.Condition()
+# Maps (region, tags) to the batch accumulating resources while a command
+# with the same tags is in flight.
+_pending_tag_batches = {}
+# Set of the (region, tags) whose create-tags command is in flight.
+_tags_in_flight = set()
+
+
+def _CreateTags(resource_ids, region, tags):
+  tag_cmd = AWS_PREFIX + [
+      'ec2',
+      'create-tags',
+      '--region=%s' % region,
+      '--resources'] + resource_ids + ['--tags']
+  for key, value in tags:
+    tag_cmd.append('Key={0},Value={1}'.format(key, value))
+  IssueRetryableCommand(tag_cmd)
+
+
 def AddTags(resource_id, region, **kwargs):
   """Adds tags to an AWS resource created by PerfKitBenchmarker.
 
+  Resources tagged with the same tags while a create-tags command for these
+  tags is in flight are tagged together by the next command.
+
   Args:
     resource_id: An extant AWS resource to operate on.
     region: The AWS region 'resource_id' was created in.
@@ -52,15 +90,33 @@ def AddTags(resource_id, region, **kwargs):
   if not kwargs:
     return
 
-  tag_cmd = AWS_PREFIX + [
-      'ec2',
-      'create-tags',
-      '--region=%s' % region,
-      '--resources', resource_id,
-      '--tags']
-  for key, value in kwargs.iteritems():
-    tag_cmd.append('Key={0},Value={1}'.format(key, value))
-  IssueRetryableCommand(tag_cmd)
+  key = (region, tuple(sorted(kwargs.iteritems())))
+  with _tag_condition:
+    batch = _pending_tag_batches.get(key)
+    is_leader = batch is None
+    if is_leader:
+      batch = _pending_tag_batches[key] = _TagBatch()
+    batch.resource_ids.append(resource_id)
+    if is_leader:
+      while key in _tags_in_flight:
+        _tag_condition.wait()
+      del _pending_tag_batches[key]
+      _tags_in_flight.add(key)
+  if not is_leader:
+    batch.done.wait()
+    if batch.error:
+      raise batch.error
+    return
+  try:
+    _CreateTags(batch.resource_ids, region, key[1])
+  except Exception as e:
+    batch.error = e
+    raise
+  finally:
+    with _tag_condition:
+      _tags_in_flight.remove(key)
+      _tag_condition.notify_all()
+    batch.done.set()
 
 
 def AddDefaultTags(resource_id, region):
@@ -78,7 +134,8 @@ def AddDefaultTags(resource_id, region):
   AddTags(resource_id, region, **tags)
 
 
-@vm_util.Retry()
+@vm_util.Retry(poll_interval=vm_util.RETRYABLE_COMMAND_BACKOFF,
+               max_poll_interval=vm_util.POLL_INTERVAL)
 def IssueRetryableCommand(cmd, env=None):
   """Tries running the provided command until it succeeds or times out.
 
@@ -60,7 +60,7 @@ class CloudStackNetwork(network.BaseNetwork):
     assert nw_off, "Network offering not found"
 
     self.network_offering_id = nw_off['id']
-    self.network_name = 'perfkit-network-%s' % FLAGS.run_uri
+    self.network_name = 'perfkit-network-%s' % network.GetNameSuffix()
 
     self.is_vpc = FLAGS.cs_use_vpc
     self.vpc_id = None
@@ -72,7 +72,7 @@ class CloudStackNetwork(network.BaseNetwork):
         assert vpc_off, "Use VPC specified but VPC offering not found"
 
         self.vpc_offering_id = vpc_off['id']
-        self.vpc_name = 'perfkit-vpc-%s' % FLAGS.run_uri
+        self.vpc_name = 'perfkit-vpc-%s' % network.GetNameSuffix()
 
 
   @vm_util.Retry(max_retries=3)
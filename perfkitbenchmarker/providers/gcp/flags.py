@@ -35,3 +35,12 @@ flags.DEFINE_string(
     'https://cloud.google.com/sdk/gcloud/reference/compute/disks/create')
 flags.DEFINE_string('gce_network_name', None, 'The name of an already created '
                     'network to use instead of creating a new one.')
+flags.DEFINE_float('gce_create_batch_window', 2,
+                   'Seconds during which the commands creating (or deleting) '
+                   'GCE VMs that only differ by name are accumulated, to be '
+                   'issued as a single gcloud command. 0 issues one command '
+                   'per VM.', lower_bound=0)
+flags.DEFINE_float('gce_status_cache_ttl', 5,
+                   'Seconds during which the VMs of a zone share the result '
+                   'of one "gcloud compute instances list" to check their '
+                   'status and IP addresses.', lower_bound=0)
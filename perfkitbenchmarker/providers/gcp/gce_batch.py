@@ -0,0 +1,185 @@
+# Copyright 2016 PerfKitBenchmarker Authors. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Shares gcloud commands between GCE VMs that are provisioned concurrently.
+
+VMs are created and deleted on their own threads, and each used to issue its
+own "gcloud compute instances create", "delete" and "describe" commands. With
+hundreds of VMs, that is hundreds of gcloud processes and API calls.
+
+IssueInstancesCommand accumulates, for --gce_create_batch_window seconds,
+the create or delete commands of VMs that differ only by the instance name,
+and issues them as one command naming every instance.
+
+GetInstance answers status queries from one "gcloud compute instances list"
+per zone, whose result is shared by all VMs of the zone for
+--gce_status_cache_ttl seconds. Creating or deleting instances invalidates
+the listing of their zone.
+"""
+
+import json
+import logging
+import threading
+import time
+
+from perfkitbenchmarker import flags
+from perfkitbenchmarker.providers.gcp import util
+
+FLAGS = flags.FLAGS
+
+
+class _Batch(object):
+  """Instances whose command is issued at once.
+
+  Attributes:
+    command: util.GcloudCommand. The command of the first instance.
+    names: list of strings. Names of the instances.
+    result: (stdout, stderr, retcode) tuple of the batched command.
+    error: Exception raised by the batched command, if any.
+    done: threading.Event. Set once the batched command has completed.
+  """
+
+  def __init__(self, command):
+    self.command = command
+    self.names = []
+    self.result = None
+    self.error = None
+    self.done = threading.Event()
+
+
+class _ZoneListing(object):
+  """Cached result of listing the instances of a zone.
+
+  Attributes:
+    lock: threading.Lock. Held while listing the zone.
+    instances: dict mapping instance name to its description.
+    listed_at: float. Time the listing started, or None if it never ran.
+    invalidated_at: float. Time instances of the zone were last created or
+        deleted.
+  """
+
+  def __init__(self):
+    self.lock = threading.Lock()
+    self.instances = {}
+    self.listed_at = None
+    self.invalidated_at = 0
+
+  def IsFresh(self, now):
+    return (self.listed_at is not None and
+            self.listed_at > self.invalidated_at and
+            now - self.listed_at < FLAGS.gce_status_cache_ttl)
+
+
+_lock = threading.Lock()
+# Maps batch keys to the batch accumulating instances.
+_open_batches = {}
+# Maps (project, zone) to _ZoneListing.
+_zone_listings = {}
+
+
+def _GetBatchKey(command):
+  """Returns a key equal for commands that differ only by instance name."""
+  return repr((command.args[:-1], command.flags.items(),
+               command.additional_flags))
+
+
+def _GetZoneListing(project, zone):
+  with _lock:
+    return _zone_listings.setdefault((project, zone), _ZoneListing())
+
+
+def _InvalidateZone(project, zone):
+  _GetZoneListing(project, zone).invalidated_at = time.time()
+
+
+def IssueInstancesCommand(command, project, zone):
+  """Issues a gcloud command on one instance, batched with similar commands.
+
+  Args:
+    command: util.GcloudCommand. A command whose last arg is the name of an
+        instance, e.g. "compute instances create <name>".
+    project: string. Project of the instance.
+    zone: string. Zone of the instance.
+
+  Returns:
+    A tuple of stdout, stderr, and retcode from running the command. When the
+    command was batched, they are those of the batched command, which may
+    have failed for other instances only.
+  """
+  if not FLAGS.gce_create_batch_window:
+    try:
+      return command.Issue()
+    finally:
+      _InvalidateZone(project, zone)
+  key = _GetBatchKey(command)
+  with _lock:
+    batch = _open_batches.get(key)
+    is_leader = batch is None
+    if is_leader:
+      batch = _open_batches[key] = _Batch(command)
+    batch.names.append(command.args[-1])
+  if not is_leader:
+    batch.done.wait()
+    if batch.error:
+      raise batch.error
+    return batch.result
+  time.sleep(FLAGS.gce_create_batch_window)
+  with _lock:
+    del _open_batches[key]
+  command.args[-1:] = batch.names
+  if len(batch.names) > 1:
+    logging.info('Issuing "%s" for %d instances.',
+                 ' '.join(command.args[:-len(batch.names)]),
+                 len(batch.names))
+  try:
+    batch.result = command.Issue()
+  except Exception as e:
+    batch.error = e
+    raise
+  finally:
+    _InvalidateZone(project, zone)
+    batch.done.set()
+  return batch.result
+
+
+def _ListInstances(resource, project, zone):
+  """Returns the instances of this run in a zone, keyed by name."""
+  command = util.GcloudCommand(resource, 'compute', 'instances', 'list')
+  command.flags.pop('zone', None)
+  command.flags['zones'] = zone
+  command.flags['filter'] = 'name ~ ^pkb-%s-' % FLAGS.run_uri
+  stdout, _, retcode = command.Issue(suppress_warning=True)
+  if retcode:
+    return None
+  try:
+    return {instance['name']: instance for instance in json.loads(stdout)}
+  except ValueError:
+    return None
+
+
+def GetInstance(vm):
+  """Returns the description of a VM's instance, or None if it is not found.
+
+  Args:
+    vm: GceVirtualMachine.
+  """
+  listing = _GetZoneListing(vm.project, vm.zone)
+  with listing.lock:
+    if not listing.IsFresh(time.time()):
+      listed_at = time.time()
+      instances = _ListInstances(vm, vm.project, vm.zone)
+      if instances is None:
+        return None
+      listing.instances = instances
+      listing.listed_at = listed_at
+    return listing.instances.get(vm.name)
@@ -102,7 +102,7 @@ class GceFirewall(network.BaseFirewall):
       return
     with self._lock:
       firewall_name = ('perfkit-firewall-%s-%d' %
-                       (FLAGS.run_uri, port))
+                       (network.GetNameSuffix(), port))
       key = (vm.project, port)
       if key in self.firewall_rules:
         return
@@ -167,9 +167,11 @@ class GceNetwork(network.BaseNetwork):
   def __init__(self, network_spec):
     super(GceNetwork, self).__init__(network_spec)
     self.project = network_spec.project
-    name = FLAGS.gce_network_name or 'pkb-network-%s' % FLAGS.run_uri
+    # Benchmarks running concurrently each create their own network.
+    suffix = network.GetNameSuffix()
+    name = FLAGS.gce_network_name or 'pkb-network-%s' % suffix
     self.network_resource = GceNetworkResource(name, self.project)
-    firewall_name = 'default-internal-%s' % FLAGS.run_uri
+    firewall_name = 'default-internal-%s' % suffix
     self.default_firewall_rule = GceFirewallRule(
         firewall_name, self.project, ALLOW_ALL, name, NETWORK_RANGE)
 
@@ -25,7 +25,9 @@ operate on the VM: boot, shutdown, etc.
 """
 
 import json
+import os
 import re
+import threading
 import yaml
 
 from perfkitbenchmarker import disk
@@ -38,6 +40,7 @@ from perfkitbenchmarker import vm_util
 from perfkitbenchmarker import windows_virtual_machine
 from perfkitbenchmarker.configs import option_decoders
 from perfkitbenchmarker.configs import spec
+from perfkitbenchmarker.providers.gcp import gce_batch
 from perfkitbenchmarker.providers.gcp import gce_disk
 from perfkitbenchmarker.providers.gcp import gce_network
 from perfkitbenchmarker.providers.gcp import util
@@ -50,6 +53,30 @@ UBUNTU_IMAGE = 'ubuntu-14-04'
 RHEL_IMAGE = 'rhel-7'
 WINDOWS_IMAGE = 'windows-2012-r2'
 
+# Paths of the files holding the sshKeys metadata of VMs, keyed by user name
+# and public key file.
+_ssh_keys_files = {}
+_ssh_keys_files_lock = threading.Lock()
+
+
+def _GetSshKeysFile(user_name, public_key_path):
+  """Returns the path of a file holding the sshKeys metadata of VMs.
+
+  VMs with the same user and key share the file, so that their create commands
+  only differ by the instance name and can be batched.
+  """
+  with _ssh_keys_files_lock:
+    key = user_name, public_key_path
+    if key not in _ssh_keys_files:
+      with open(public_key_path) as f:
+        public_key = f.read().rstrip('\n')
+      path = os.path.join(vm_util.GetTempDir(),
+                          'key-metadata-%d' % len(_ssh_keys_files))
+      with open(path, 'w') as f:
+        f.write('%s:%s\n' % (user_name, public_key))
+      _ssh_keys_files[key] = path
+    return _ssh_keys_files[key]
+
 
 class MemoryDecoder(option_decoders.StringDecoder):
   """Verifies and decodes a config option value specifying a memory size."""
@@ -254,7 +281,7 @@ class GceVirtualMachine(virtual_machine.BaseVirtualMachine):
     self.project = vm_spec.project
     self.network = gce_network.GceNetwork.GetNetwork(self)
     self.firewall = gce_network.GceFirewall.GetFirewall()
-    events.sample_created.connect(self.AnnotateSample, weak=False)
+    events.samples_created.connect(self.AnnotateSamples, weak=False)
 
   def _GenerateCreateCommand(self, ssh_keys_path):
     """Generates a command to create the VM instance.
@@ -297,15 +324,14 @@ class GceVirtualMachine(virtual_machine.BaseVirtualMachine):
     return cmd
 
   def _Create(self):
-    """Create a GCE VM instance."""
-    with open(self.ssh_public_key) as f:
-      public_key = f.read().rstrip('\n')
-    with vm_util.NamedTemporaryFile(dir=vm_util.GetTempDir(),
-                                    prefix='key-metadata') as tf:
-      tf.write('%s:%s\n' % (self.user_name, public_key))
-      tf.close()
-      create_cmd = self._GenerateCreateCommand(tf.name)
-      create_cmd.Issue()
+    """Create a GCE VM instance.
+
+    Concurrent creations of VMs with the same configuration are issued as a
+    single command (see gce_batch).
+    """
+    create_cmd = self._GenerateCreateCommand(
+        _GetSshKeysFile(self.user_name, self.ssh_public_key))
+    gce_batch.IssueInstancesCommand(create_cmd, self.project, self.zone)
 
   def _CreateDependencies(self):
     super(GceVirtualMachine, self)._CreateDependencies()
@@ -317,10 +343,10 @@ class GceVirtualMachine(virtual_machine.BaseVirtualMachine):
   @vm_util.Retry()
   def _PostCreate(self):
     """Get the instance's data."""
-    getinstance_cmd = util.GcloudCommand(self, 'compute', 'instances',
-                                         'describe', self.name)
-    stdout, _, _ = getinstance_cmd.Issue()
-    response = json.loads(stdout)
+    response = gce_batch.GetInstance(self)
+    if response is None:
+      raise errors.Resource.RetryableCreationError(
+          'Instance %s is not listed yet.' % self.name)
     network_interface = response['networkInterfaces'][0]
     self.internal_ip = network_interface['networkIP']
     self.ip_address = network_interface['accessConfigs'][0]['natIP']
@@ -329,18 +355,11 @@ class GceVirtualMachine(virtual_machine.BaseVirtualMachine):
     """Delete a GCE VM instance."""
     delete_cmd = util.GcloudCommand(self, 'compute', 'instances', 'delete',
                                     self.name)
-    delete_cmd.Issue()
+    gce_batch.IssueInstancesCommand(delete_cmd, self.project, self.zone)
 
   def _Exists(self):
     """Returns true if the VM exists."""
-    getinstance_cmd = util.GcloudCommand(self, 'compute', 'instances',
-                                         'describe', self.name)
-    stdout, _, _ = getinstance_cmd.Issue(suppress_warning=True)
-    try:
-      json.loads(stdout)
-    except ValueError:
-      return False
-    return True
+    return gce_batch.GetInstance(self) is not None
 
   def CreateScratchDisk(self, disk_spec):
     """Create a VM's scratch disk.
@@ -391,8 +410,9 @@ class GceVirtualMachine(virtual_machine.BaseVirtualMachine):
                                      for key, value in kwargs.iteritems())
     cmd.Issue()
 
-  def AnnotateSample(self, unused_sender, benchmark_spec, sample):
-    sample['metadata']['preemptible'] = self.preemptible
+  def AnnotateSamples(self, unused_sender, benchmark_spec, samples):
+    for sample in samples:
+      sample['metadata']['preemptible'] = self.preemptible
 
   def GetMachineTypeDict(self):
     """Returns a dict containing properties that specify the machine type.
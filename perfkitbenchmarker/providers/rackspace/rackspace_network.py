@@ -52,7 +52,7 @@ class RackspaceSecurityGroup(network.BaseFirewall):
             return
         with self._lock:
             firewall_name = ('perfkit-firewall-%s-%d-%d' %
-                             (FLAGS.run_uri, port, self.sg_counter))
+                             (network.GetNameSuffix(), port, self.sg_counter))
             self.sg_counter += 1
             if firewall_name in self.firewall_names:
                 return
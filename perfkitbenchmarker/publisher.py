@@ -15,17 +15,23 @@
 """Classes to collect and publish performance samples to various sinks."""
 
 import abc
+import collections
 import io
 import itertools
 import json
 import logging
 import operator
+import os
 import pprint
+import Queue
 import sys
+import threading
 import time
 import uuid
+import weakref
 
 from perfkitbenchmarker import disk
+from perfkitbenchmarker import errors
 from perfkitbenchmarker import events
 from perfkitbenchmarker import flags
 from perfkitbenchmarker import version
@@ -85,7 +91,34 @@ flags.DEFINE_multistring(
     'by separating each pair by commas. This option can be repeated multiple '
     'times.')
 
+flags.DEFINE_boolean(
+    'publish_incrementally', False,
+    'If true, samples are published in batches by a background thread as '
+    'benchmarks produce them instead of all at once at the end of the run, '
+    'and are not kept in memory. The JSON results file is appended to and '
+    'synced after every batch. The end-of-run summary is built from a spill '
+    'file in the run temporary directory.')
+flags.DEFINE_integer(
+    'publish_batch_size', 1000,
+    'Maximum number of samples sent to a remote publisher (BigQuery, Cloud '
+    'Storage) in one request. Only applicable when --publish_incrementally is '
+    'specified.', lower_bound=1)
+flags.DEFINE_integer(
+    'publish_batch_interval', 60,
+    'Maximum number of seconds a sample waits before being sent to a remote '
+    'publisher (BigQuery, Cloud Storage). Only applicable when '
+    '--publish_incrementally is specified.', lower_bound=0)
+
 DEFAULT_JSON_OUTPUT_NAME = 'perfkitbenchmarker_results.json'
+SPILL_FILE_NAME = 'perfkitbenchmarker_samples.spill.json'
+# Maximum number of annotated samples waiting to be published. AddSamples
+# blocks when the queue is full, unless the publishing thread has stopped.
+SAMPLE_QUEUE_SIZE = 10000
+# Maximum time in seconds that the publishing thread waits for a new sample
+# before checking whether a remote publisher's batch is due.
+_QUEUE_POLL_INTERVAL = 1
+# Put on the sample queue to stop the publishing thread.
+_END_OF_SAMPLES = object()
 DEFAULT_CREDENTIALS_JSON = 'credentials.json'
 GCS_OBJECT_NAME_LENGTH = 20
 
@@ -99,10 +132,168 @@ def GetLabelsFromDict(metadata):
   Returns:
     A string of labels in the format that Perfkit uses.
   """
-  labels = []
-  for k, v in metadata.iteritems():
-    labels.append('|%s:%s|' % (k, v))
-  return ','.join(labels)
+  if isinstance(metadata, LayeredMetadata):
+    return metadata.GetLabels()
+  return _FormatLabels(metadata.iteritems())
+
+
+def _FormatLabels(items):
+  return ','.join('|%s:%s|' % (k, v) for k, v in items)
+
+
+def _Intern(value):
+  return intern(value) if type(value) is str else value
+
+
+def _JsonDefault(value):
+  """Serializes metadata mappings which are not dicts (see LayeredMetadata)."""
+  if isinstance(value, collections.Mapping):
+    return dict(value.iteritems())
+  raise TypeError('{0!r} is not JSON serializable'.format(value))
+
+
+def _JsonReprDefault(value):
+  """Like _JsonDefault, but serializes any other value as its repr."""
+  if isinstance(value, collections.Mapping):
+    return dict(value.iteritems())
+  return repr(value)
+
+
+def _ReprCircularValues(value):
+  """Replaces the values of a mapping that JSON cannot encode by their repr."""
+  if isinstance(value, collections.Mapping):
+    return dict((key, _ReprCircularValues(item))
+                for key, item in value.iteritems())
+  try:
+    json.dumps(value, default=_JsonReprDefault)
+  except ValueError:
+    # E.g. a circular reference.
+    return repr(value)
+  return value
+
+
+def _DumpSpilledSample(sample):
+  """Returns the line of the spill file holding 'sample'.
+
+  Values that cannot be serialized are written as their repr, so that the
+  sample still reaches the publishers that read the spill file.
+  """
+  try:
+    return json.dumps(sample, separators=(',', ':'), default=_JsonDefault)
+  except (TypeError, ValueError):
+    logging.warning('Sample %r is not JSON serializable. Writing the repr of '
+                    'the values that are not.', sample, exc_info=True)
+  return json.dumps(_ReprCircularValues(sample), separators=(',', ':'),
+                    default=_JsonReprDefault)
+
+
+class _SharedMetadata(dict):
+  """Metadata shared by many samples. Never modified once shared.
+
+  Attributes:
+    labels: string. The dict formatted by GetLabelsFromDict, or None if it has
+        not been formatted yet.
+  """
+
+  __slots__ = ('labels',)
+
+  def __init__(self, *args, **kwargs):
+    super(_SharedMetadata, self).__init__(*args, **kwargs)
+    self.labels = None
+
+
+class LayeredMetadata(collections.MutableMapping):
+  """The metadata of a sample, layered over metadata shared between samples.
+
+  Most of the metadata of a sample describes the benchmark spec rather than
+  the sample itself, and is the same for every sample of a benchmark. Rather
+  than copying it into each sample, every sample keeps a reference to one
+  shared dict, and only stores its own keys. Publishers can treat it like any
+  other mapping.
+
+  Keys of the shared dict take precedence over the sample's original keys, as
+  if the shared dict had been used to update a copy of them. Keys set later
+  are stored with the sample, and take precedence over the shared dict. The
+  shared dict is never modified: deleting one of its keys gives the sample its
+  own copy of it.
+  """
+
+  __slots__ = ('_own', '_shared')
+
+  def __init__(self, metadata, shared):
+    if not isinstance(shared, _SharedMetadata):
+      shared = _SharedMetadata(shared)
+    self._own = {_Intern(k): _Intern(v) for k, v in metadata.iteritems()
+                 if k not in shared}
+    self._shared = shared
+
+  def __getitem__(self, key):
+    try:
+      return self._own[key]
+    except KeyError:
+      return self._shared[key]
+
+  def __setitem__(self, key, value):
+    self._own[key] = value
+
+  def __delitem__(self, key):
+    if key in self._shared:
+      self._shared = _SharedMetadata(self._shared)
+      del self._shared[key]
+      self._own.pop(key, None)
+    else:
+      del self._own[key]
+
+  def __contains__(self, key):
+    return key in self._own or key in self._shared
+
+  def __iter__(self):
+    return self.iterkeys()
+
+  def __len__(self):
+    return len(self._own) + sum(1 for key in self._shared
+                                if key not in self._own)
+
+  def __repr__(self):
+    return repr(dict(self.iteritems()))
+
+  def iterkeys(self):
+    own = self._own
+    return itertools.chain(
+        own, itertools.ifilterfalse(own.__contains__, self._shared))
+
+  def iteritems(self):
+    own = self._own
+    if not any(key in self._shared for key in own):
+      return itertools.chain(own.iteritems(), self._shared.iteritems())
+    return itertools.chain(
+        own.iteritems(),
+        ((k, v) for k, v in self._shared.iteritems() if k not in own))
+
+  def keys(self):
+    return list(self.iterkeys())
+
+  def items(self):
+    return list(self.iteritems())
+
+  def copy(self):
+    result = LayeredMetadata({}, self._shared)
+    result._own = self._own.copy()
+    return result
+
+  def GetLabels(self):
+    """Returns the metadata formatted by GetLabelsFromDict."""
+    own = self._own
+    shared = self._shared
+    if any(key in shared for key in own):
+      return _FormatLabels(self.iteritems())
+    if shared.labels is None:
+      shared.labels = _FormatLabels(shared.iteritems())
+    if not own:
+      return shared.labels
+    if not shared.labels:
+      return _FormatLabels(own.iteritems())
+    return _FormatLabels(own.iteritems()) + ',' + shared.labels
 
 
 class MetadataProvider(object):
@@ -121,16 +312,36 @@ class MetadataProvider(object):
       benchmark_spec: BenchmarkSpec. The benchmark specification.
 
     Returns:
-      Updated 'metadata'.
+      Updated copy of 'metadata'. A dict, or another mutable mapping such as
+      a LayeredMetadata.
     """
     raise NotImplementedError()
 
 
 class DefaultMetadataProvider(MetadataProvider):
-  """Adds default metadata to samples."""
+  """Adds default metadata to samples.
+
+  The metadata only depends on the benchmark spec and flags, so it is computed
+  once per benchmark spec, and shared by all of its samples through a
+  LayeredMetadata.
+  """
+
+  def __init__(self):
+    self._spec_metadata = weakref.WeakKeyDictionary()
+    # Benchmarks running concurrently may add samples at the same time.
+    self._lock = threading.Lock()
 
   def AddMetadata(self, metadata, benchmark_spec):
-    metadata = metadata.copy()
+    with self._lock:
+      spec_metadata = self._spec_metadata.get(benchmark_spec)
+      if spec_metadata is None:
+        spec_metadata = self._GetSpecMetadata(benchmark_spec)
+        self._spec_metadata[benchmark_spec] = spec_metadata
+    return LayeredMetadata(metadata, spec_metadata)
+
+  def _GetSpecMetadata(self, benchmark_spec):
+    """Returns a dict of the metadata of all samples of 'benchmark_spec'."""
+    metadata = {}
     metadata['perfkitbenchmarker_version'] = version.VERSION
     for name, vms in benchmark_spec.vm_groups.iteritems():
       if len(vms) == 0:
@@ -180,27 +391,42 @@ class DefaultMetadataProvider(MetadataProvider):
         logging.error('Bad metadata flag format. Skipping "%s".', pair)
         continue
 
-    return metadata
+    return _SharedMetadata(
+        (_Intern(k), _Intern(v)) for k, v in metadata.iteritems())
 
 
 DEFAULT_METADATA_PROVIDERS = [DefaultMetadataProvider()]
 
 
 class SamplePublisher(object):
-  """An object that can publish performance samples."""
+  """An object that can publish performance samples.
+
+  Attributes:
+    incremental: boolean. Whether PublishSamples may be called repeatedly with
+        successive batches of samples, each call adding to the samples
+        already published. Publishers that are not incremental are called
+        once with all samples.
+    batched: boolean. Whether each call to PublishSamples is costly (e.g. a
+        remote upload), so that incremental batches should be accumulated up
+        to --publish_batch_size samples or --publish_batch_interval seconds.
+  """
 
   __metaclass__ = abc.ABCMeta
 
+  incremental = False
+  batched = False
+
   @abc.abstractmethod
   def PublishSamples(self, samples):
     """Publishes 'samples'.
 
-    PublishSamples will be called exactly once. Calling
-    SamplePublisher.PublishSamples multiple times may result in data being
-    overwritten.
+    Unless the publisher is incremental, PublishSamples will be called exactly
+    once. Calling SamplePublisher.PublishSamples multiple times may result in
+    data being overwritten.
 
     Args:
-      samples: list of dicts to publish.
+      samples: list of dicts to publish. Publishers that are not incremental
+          may instead be passed an iterable that can only be iterated once.
     """
     raise NotImplementedError()
 
@@ -278,14 +504,14 @@ class PrettyPrintStreamPublisher(SamplePublisher):
                  'PerfKitBenchmarker Results Summary' +
                  dashes + '\n')
 
+    key = operator.itemgetter('test')
+    samples = sorted(samples, key=key)
     if not samples:
       logging.debug('Pretty-printing results to %s:\n%s', self.stream,
                     result.getvalue())
       self.stream.write(result.getvalue())
       return
 
-    key = operator.itemgetter('test')
-    samples = sorted(samples, key=key)
     globally_constant_keys = self._FindConstantMetadataKeys(samples)
 
     for benchmark, test_samples in itertools.groupby(samples, key):
@@ -362,16 +588,22 @@ class NewlineDelimitedJSONPublisher(SamplePublisher):
   If 'collapse_labels' is True, metadata is converted to a flat string with key
   'labels' via GetLabelsFromDict.
 
+  The first call to PublishSamples opens 'file_path' with 'mode'; later calls
+  append to it. The file is synced to disk after every call.
+
   Attributes:
     file_path: string. Destination path to write samples.
     mode: Open mode for 'file_path'. Set to 'a' to append.
     collapse_labels: boolean. If true, collapse sample metadata.
   """
 
+  incremental = True
+
   def __init__(self, file_path, mode='wb', collapse_labels=True):
     self.file_path = file_path
     self.mode = mode
     self.collapse_labels = collapse_labels
+    self._published = False
 
   def __repr__(self):
     return '<{0} file_path="{1}" mode="{2}">'.format(
@@ -380,12 +612,16 @@ class NewlineDelimitedJSONPublisher(SamplePublisher):
   def PublishSamples(self, samples):
     logging.info('Publishing %d samples to %s', len(samples),
                  self.file_path)
-    with open(self.file_path, self.mode) as fp:
+    mode = 'ab' if self._published else self.mode
+    with open(self.file_path, mode) as fp:
       for sample in samples:
         sample = sample.copy()
         if self.collapse_labels:
           sample['labels'] = GetLabelsFromDict(sample.pop('metadata', {}))
-        fp.write(json.dumps(sample) + '\n')
+        fp.write(json.dumps(sample, default=_JsonDefault) + '\n')
+      fp.flush()
+      os.fsync(fp.fileno())
+    self._published = True
 
 
 class BigQueryPublisher(SamplePublisher):
@@ -402,6 +638,9 @@ class BigQueryPublisher(SamplePublisher):
       private key. Must be specified if service_account is specified.
   """
 
+  incremental = True
+  batched = True
+
   def __init__(self, bigquery_table, project_id=None, bq_path='bq',
                service_account=None, service_account_private_key_file=None):
     self.bigquery_table = bigquery_table
@@ -466,6 +705,9 @@ class CloudStoragePublisher(SamplePublisher):
     gsutil_path: string. The path to the 'gsutil' tool.
   """
 
+  incremental = True
+  batched = True
+
   def __init__(self, bucket, gsutil_path='gsutil'):
     self.bucket = bucket
     self.gsutil_path = gsutil_path
@@ -497,8 +739,16 @@ class SampleCollector(object):
   Supports incorporating additional metadata into samples, and publishing
   results via any number of SamplePublishers.
 
+  By default, samples are kept in memory and published at the end of the run.
+  If 'incremental' is True, annotated samples are instead put on a bounded
+  queue that a background thread drains: each batch is appended to a spill
+  file and passed to the incremental publishers as it arrives (batched
+  publishers accumulate samples until a size or age threshold is reached).
+  Publishers that are not incremental are called once by PublishSamples with
+  the samples read back from the spill file.
+
   Attributes:
-    samples: A list of Sample objects.
+    samples: A list of Sample objects. Always empty if 'incremental' is True.
     metadata_providers: A list of MetadataProvider objects. Metadata providers
       to use.  Defaults to DEFAULT_METADATA_PROVIDERS.
     publishers: A list of SamplePublisher objects. If not specified, defaults to
@@ -506,10 +756,19 @@ class SampleCollector(object):
       a BigQueryPublisher if FLAGS.bigquery_table is specified, and a
       CloudStoragePublisher if FLAGS.cloud_storage_bucket is specified. See
       SampleCollector._DefaultPublishers.
+    incremental: boolean. Whether samples are published as they are added.
+      Defaults to FLAGS.publish_incrementally.
+    spill_path: string. Path of the file that incrementally published samples
+      are written to. Defaults to a file in the run temporary directory.
+    sample_count: int. Number of samples added so far.
     run_uri: A unique tag for the run.
   """
-  def __init__(self, metadata_providers=None, publishers=None):
+  def __init__(self, metadata_providers=None, publishers=None,
+               incremental=None, spill_path=None):
     self.samples = []
+    self.sample_count = 0
+    # Benchmarks running concurrently may add samples at the same time.
+    self._samples_lock = threading.Lock()
 
     if metadata_providers is not None:
       self.metadata_providers = metadata_providers
@@ -523,6 +782,20 @@ class SampleCollector(object):
 
     logging.debug('Using publishers: {0}'.format(self.publishers))
 
+    if incremental is None:
+      incremental = FLAGS.publish_incrementally
+    self.incremental = incremental
+    self.spill_path = spill_path
+    if self.incremental:
+      self.spill_path = spill_path or vm_util.PrependTempDir(SPILL_FILE_NAME)
+      self._queue = Queue.Queue(maxsize=SAMPLE_QUEUE_SIZE)
+      # sys.exc_info() of the error that stopped the publishing thread.
+      self._publisher_error = None
+      self._publisher_thread = threading.Thread(
+          target=self._RunPublisherThread, name='SamplePublisher')
+      self._publisher_thread.daemon = True
+      self._publisher_thread.start()
+
   @classmethod
   def _DefaultPublishers(cls):
     """Gets a list of default publishers."""
@@ -553,6 +826,7 @@ class SampleCollector(object):
       benchmark: string. The name of the benchmark.
       benchmark_spec: BenchmarkSpec. Benchmark specification.
     """
+    annotated_samples = []
     for s in samples:
       # Annotate the sample.
       sample = dict(s.asdict())
@@ -567,11 +841,130 @@ class SampleCollector(object):
       sample['owner'] = FLAGS.owner
       sample['run_uri'] = benchmark_spec.uuid
       sample['sample_uri'] = str(uuid.uuid4())
-      events.sample_created.send(benchmark_spec=benchmark_spec,
-                                 sample=sample)
-      self.samples.append(sample)
+      annotated_samples.append(sample)
+    events.samples_created.send(benchmark_spec=benchmark_spec,
+                                samples=annotated_samples)
+    if events.sample_created.receivers:
+      for sample in annotated_samples:
+        events.sample_created.send(benchmark_spec=benchmark_spec,
+                                   sample=sample)
+    with self._samples_lock:
+      self.sample_count += len(annotated_samples)
+      if not self.incremental:
+        self.samples.extend(annotated_samples)
+    if self.incremental:
+      for sample in annotated_samples:
+        self._PutOnQueue(sample)
+
+  def _RaisePublisherError(self):
+    """Raises the error that stopped the publishing thread, if any."""
+    if self._publisher_error:
+      exc_type, exc_value, exc_traceback = self._publisher_error
+      raise exc_type, exc_value, exc_traceback
+
+  def _PutOnQueue(self, item):
+    """Puts an item on the queue, unless the publishing thread has stopped.
+
+    Raises:
+      The error that stopped the publishing thread, or errors.Error if it
+      stopped without one.
+    """
+    while True:
+      try:
+        self._queue.put(item, timeout=_QUEUE_POLL_INTERVAL)
+        return
+      except Queue.Full:
+        if not self._publisher_thread.is_alive():
+          self._RaisePublisherError()
+          raise errors.Error('The sample publishing thread has stopped.')
+
+  def _PublishBatch(self, publisher, samples):
+    """Publishes a batch of samples, logging rather than raising errors."""
+    try:
+      publisher.PublishSamples(samples)
+    except Exception:
+      logging.exception('Failed to publish %d samples via %r.', len(samples),
+                        publisher)
+
+  def _RunPublisherThread(self):
+    """Runs _PublishFromQueue, recording the error that stops it, if any."""
+    try:
+      self._PublishFromQueue()
+    except Exception:
+      logging.exception('Publishing samples failed.')
+      self._publisher_error = sys.exc_info()
+
+  def _PublishFromQueue(self):
+    """Publishes samples from the queue until _END_OF_SAMPLES is received.
+
+    Runs in a background thread when 'incremental' is True.
+    """
+    publishers = [p for p in self.publishers if p.incremental]
+    pending = collections.defaultdict(list)
+    last_publish_times = dict.fromkeys(range(len(publishers)), time.time())
+    done = False
+    with open(self.spill_path, 'wb') as spill_file:
+      while not done:
+        batch = []
+        try:
+          # Block for the first sample, then take whatever else is queued.
+          item = self._queue.get(timeout=_QUEUE_POLL_INTERVAL)
+          while True:
+            if item is _END_OF_SAMPLES:
+              done = True
+              break
+            batch.append(item)
+            if len(batch) >= FLAGS.publish_batch_size:
+              break
+            item = self._queue.get_nowait()
+        except Queue.Empty:
+          pass
+
+        for sample in batch:
+          spill_file.write(_DumpSpilledSample(sample) + '\n')
+        spill_file.flush()
+
+        now = time.time()
+        for i, publisher in enumerate(publishers):
+          pending[i].extend(batch)
+          if not pending[i]:
+            continue
+          if (done or not publisher.batched or
+              len(pending[i]) >= FLAGS.publish_batch_size or
+              now - last_publish_times[i] >= FLAGS.publish_batch_interval):
+            self._PublishBatch(publisher, pending.pop(i))
+            last_publish_times[i] = now
+
+  def _ReadSpillFile(self):
+    """Yields the samples written to the spill file."""
+    with open(self.spill_path) as spill_file:
+      for line in spill_file:
+        yield json.loads(line)
 
   def PublishSamples(self):
-    """Publish samples via all registered publishers."""
-    for publisher in self.publishers:
-      publisher.PublishSamples(self.samples)
+    """Publish samples via all registered publishers.
+
+    If 'incremental' is True, this waits for queued samples to be published
+    and stops the publishing thread. No samples may be added afterwards. The
+    publishers that are not incremental are passed an iterator over the spill
+    file, so that the samples are not all read into memory here.
+
+    Raises:
+      The error that stopped the publishing thread, if any, after the
+      samples written to the spill file were published.
+    """
+    if not self.incremental:
+      for publisher in self.publishers:
+        publisher.PublishSamples(self.samples)
+      return
+
+    if self._publisher_thread.is_alive():
+      self._PutOnQueue(_END_OF_SAMPLES)
+    # Joining with a timeout keeps the wait interruptable.
+    while self._publisher_thread.is_alive():
+      self._publisher_thread.join(_QUEUE_POLL_INTERVAL)
+    remaining_publishers = [p for p in self.publishers if not p.incremental]
+    if remaining_publishers and self.sample_count:
+      for publisher in remaining_publishers:
+        publisher.PublishSamples(self._ReadSpillFile())
+    self._RaisePublisherError()
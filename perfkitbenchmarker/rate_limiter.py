@@ -0,0 +1,309 @@
+# Copyright 2016 PerfKitBenchmarker Authors. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Limits the rate of the commands PKB issues to cloud provider APIs.
+
+When hundreds of VMs are provisioned at once, their threads all call the
+cloud CLIs in lockstep, the cloud throttles the calls, and provisioning takes
+longer. vm_util.IssueCommand passes every command through Acquire, which
+delays cloud CLI commands so that each API stays within a token bucket:
+calls run at up to --cloud_api_read_qps or --cloud_api_mutate_qps calls per
+second, with bursts of up to --cloud_api_burst calls.
+
+There is one bucket per API, i.e. per cloud provider and class of call.
+Calls that only read state (describe, list, get, show) are in the 'read'
+class, and all other calls in the 'mutate' class, since clouds usually limit
+them separately.
+
+A call that failed because the cloud throttled it empties the bucket of its
+API, so that the next calls of every thread wait. vm_util.Retry also backs
+off longer after a throttled call, see WasLastCallThrottled.
+
+The number of calls, throttles, waits and retries of each API are reported
+by GenerateSamples.
+"""
+
+import collections
+import logging
+import os
+import re
+import threading
+import time
+
+from perfkitbenchmarker import flags
+from perfkitbenchmarker import sample
+
+flags.DEFINE_float('cloud_api_read_qps', 20,
+                   'Maximum rate, in calls per second, of the calls PKB '
+                   'makes to read the state of resources through the API of '
+                   'a cloud provider (e.g. "aws ec2 describe-instances"). '
+                   'Set it to 0 to not limit the rate.',
+                   lower_bound=0)
+flags.DEFINE_float('cloud_api_mutate_qps', 5,
+                   'Maximum rate, in calls per second, of the calls PKB '
+                   'makes to create, modify or delete resources through the '
+                   'API of a cloud provider (e.g. "gcloud compute instances '
+                   'create"). Set it to 0 to not limit the rate.',
+                   lower_bound=0)
+flags.DEFINE_integer('cloud_api_burst', 10,
+                     'Maximum number of calls PKB makes to an API of a cloud '
+                     'provider in a burst, when it made no call for a while. '
+                     'Applies to --cloud_api_read_qps and '
+                     '--cloud_api_mutate_qps.',
+                     lower_bound=1)
+
+FLAGS = flags.FLAGS
+
+READ = 'read'
+MUTATE = 'mutate'
+
+# Maps the executable of the CLI of a cloud provider to the provider.
+_CLI_PROVIDERS = {
+    'aliyuncli': 'AliCloud',
+    'aws': 'AWS',
+    'azure': 'Azure',
+    'gcloud': 'GCP',
+    'kubectl': 'Kubernetes',
+    'nova': 'OpenStack',
+}
+
+# Prefixes of the subcommands and operations that only read state.
+_READ_OPERATIONS = re.compile(r'(describe|list|get|show)([-_]|$)')
+
+# Errors of the cloud providers when they throttle calls.
+_THROTTLING_ERRORS = re.compile(
+    r'Throttl|RequestLimitExceeded|Rate exceeded|rate ?limit ?exceeded|'
+    r'TooManyRequests|Too Many Requests|\b429\b', re.IGNORECASE)
+
+Api = collections.namedtuple('Api', ['provider', 'api_class'])
+
+
+class TokenBucket(object):
+  """Spaces out calls to at most 'qps' per second, with bursts of 'burst'.
+
+  Attributes:
+    qps: float. Number of tokens added per second.
+    burst: int. Maximum number of tokens.
+  """
+
+  def __init__(self, qps, burst):
+    self.qps = qps
+    self.burst = burst
+    self._tokens = float(burst)
+    self._updated_at = time.time()
+    self._lock = threading.Lock()
+
+  def _Refill(self):
+    now = time.time()
+    self._tokens = min(self.burst,
+                       self._tokens + (now - self._updated_at) * self.qps)
+    self._updated_at = now
+
+  def Reserve(self):
+    """Takes a token.
+
+    Tokens are reserved in order: when there are none, the bucket goes into
+    debt, and the caller must wait until the tokens reserved before it and
+    its own are added.
+
+    Returns:
+      float. Number of seconds to wait before using the token.
+    """
+    with self._lock:
+      self._Refill()
+      self._tokens -= 1
+      return max(0., -self._tokens / self.qps)
+
+  def Empty(self):
+    """Removes the available tokens, e.g. after a call was throttled."""
+    with self._lock:
+      self._Refill()
+      self._tokens = min(self._tokens, 0.)
+
+
+class _ApiState(object):
+  """Rate limit and counters of an API.
+
+  Attributes:
+    bucket: TokenBucket, or None if the rate is not limited.
+    calls: int. Number of calls.
+    throttles: int. Number of calls that failed because they were throttled.
+    waits: int. Number of calls delayed by the rate limit.
+    wait_time: float. Total time calls were delayed, in seconds.
+    retries: int. Number of calls retried by vm_util.Retry after they failed.
+  """
+
+  def __init__(self, qps, burst):
+    self.bucket = TokenBucket(qps, burst) if qps else None
+    self.calls = 0
+    self.throttles = 0
+    self.waits = 0
+    self.wait_time = 0.
+    self.retries = 0
+
+
+class _ThreadState(threading.local):
+  """The last API call of a thread.
+
+  Attributes:
+    api: Api of the last call, or None if there is none.
+    throttled: boolean. Whether the last call was throttled.
+  """
+
+  def __init__(self):
+    self.api = None
+    self.throttled = False
+
+
+_lock = threading.Lock()
+# Maps Api to _ApiState.
+_apis = {}
+_thread_state = _ThreadState()
+
+
+def GetApi(cmd):
+  """Returns the cloud provider API a command calls, or None.
+
+  Args:
+    cmd: list of strings. A command, as passed to vm_util.IssueCommand.
+  """
+  if not cmd:
+    return None
+  provider = _CLI_PROVIDERS.get(os.path.basename(cmd[0]))
+  if not provider:
+    return None
+  operations = [arg for arg in cmd[1:] if not arg.startswith('-')]
+  if any(_READ_OPERATIONS.match(operation) for operation in operations):
+    return Api(provider, READ)
+  return Api(provider, MUTATE)
+
+
+def _GetApiState(api):
+  with _lock:
+    if api not in _apis:
+      qps = (FLAGS.cloud_api_read_qps if api.api_class == READ
+             else FLAGS.cloud_api_mutate_qps)
+      _apis[api] = _ApiState(qps, FLAGS.cloud_api_burst)
+    return _apis[api]
+
+
+def Acquire(cmd):
+  """Waits until a command may call a cloud API.
+
+  Args:
+    cmd: list of strings. A command, as passed to vm_util.IssueCommand.
+
+  Returns:
+    The Api called by the command, or None if it calls none.
+  """
+  api = GetApi(cmd)
+  _thread_state.api = api
+  _thread_state.throttled = False
+  if not api:
+    return None
+  state = _GetApiState(api)
+  wait_time = state.bucket.Reserve() if state.bucket else 0
+  with _lock:
+    state.calls += 1
+    if wait_time:
+      state.waits += 1
+      state.wait_time += wait_time
+  if wait_time:
+    logging.debug('Waiting %.2fs to call the %s %s API.', wait_time,
+                  api.provider, api.api_class)
+    time.sleep(wait_time)
+  return api
+
+
+def RecordResult(api, retcode, stderr):
+  """Records the result of a command that called a cloud API.
+
+  Args:
+    api: Api returned by Acquire for the command, or None.
+    retcode: int. Return code of the command.
+    stderr: string. Error output of the command.
+  """
+  if not api or not retcode or not _THROTTLING_ERRORS.search(stderr):
+    return
+  logging.warning('The %s %s API throttled a call.', api.provider,
+                  api.api_class)
+  _thread_state.throttled = True
+  state = _GetApiState(api)
+  with _lock:
+    state.throttles += 1
+  if state.bucket:
+    state.bucket.Empty()
+
+
+def ClearLastCall():
+  """Forgets the last API call of the current thread."""
+  _thread_state.api = None
+  _thread_state.throttled = False
+
+
+def WasLastCallThrottled():
+  """Returns whether the last API call of the current thread was throttled."""
+  return _thread_state.throttled
+
+
+def RecordRetry():
+  """Records that the last API call of the current thread is being retried."""
+  if _thread_state.api:
+    state = _GetApiState(_thread_state.api)
+    with _lock:
+      state.retries += 1
+
+
+def GetCounters():
+  """Returns the counters of each API.
+
+  Returns:
+    dict mapping Api to a dict mapping counter name to value.
+  """
+  with _lock:
+    return {api: {'calls': state.calls,
+                  'throttles': state.throttles,
+                  'waits': state.waits,
+                  'wait_time': state.wait_time,
+                  'retries': state.retries}
+            for api, state in _apis.iteritems()}
+
+
+def GenerateSamples(since=None):
+  """Generates samples of the counters of each API.
+
+  Args:
+    since: dict returned by GetCounters. If set, the samples count the calls
+        made since GetCounters returned it.
+
+  Returns:
+    A list of Samples, sorted by API.
+  """
+  since = since or {}
+  samples = []
+  for api, counters in sorted(GetCounters().iteritems()):
+    previous = since.get(api, {})
+    delta = {name: value - previous.get(name, 0)
+             for name, value in counters.iteritems()}
+    if not delta['calls']:
+      continue
+    metadata = {'cloud': api.provider, 'api_class': api.api_class}
+    for name, metric, unit in (
+        ('calls', 'Calls', 'count'),
+        ('throttles', 'Throttled Calls', 'count'),
+        ('retries', 'Retried Calls', 'count'),
+        ('waits', 'Rate Limited Calls', 'count'),
+        ('wait_time', 'Rate Limit Wait Time', 'seconds')):
+      samples.append(sample.Sample('Cloud API ' + metric, delta[name], unit,
+                                   metadata))
+  return samples
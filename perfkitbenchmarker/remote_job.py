@@ -0,0 +1,150 @@
+# Copyright 2016 PerfKitBenchmarker Authors. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Handles to long-running commands started in the background on VMs.
+
+A job is started with BaseLinuxMixin.StartRemoteJob, which returns as soon as
+the command has been launched. Rather than dedicating a controller thread to
+each job, as RobustRemoteCommand does, callers poll many jobs at once:
+
+  jobs = [vm.StartRemoteJob(command) for vm in vms]
+  results = remote_job.WaitForJobs(jobs)
+
+PollJobs issues a single status command to each VM, whatever the number of
+jobs running on it, and the output of a running job can be fetched
+incrementally with BaseLinuxMixin.ReadRemoteJobOutput.
+"""
+
+import collections
+import logging
+import time
+
+from perfkitbenchmarker import errors
+from perfkitbenchmarker import flags
+from perfkitbenchmarker import vm_util
+
+FLAGS = flags.FLAGS
+
+# Seconds to wait between two status sweeps in WaitForJobs.
+POLL_INTERVAL = 10
+
+# Maximum number of VMs whose jobs are polled or finished concurrently.
+MAX_CONCURRENT_VMS = 50
+
+
+class RemoteJob(object):
+  """A command running in the background on a VM.
+
+  Attributes:
+    vm: The VM running the command.
+    command: string. The command.
+    stdout_file: string. Path on the VM of the file receiving the stdout of
+        the command.
+    stderr_file: string. Path on the VM of the file receiving its stderr.
+    status_file: string. Path on the VM of the file receiving its exit status.
+    wrapper_log: string. Path on the VM of the log of the wrapper script.
+    wrapper_pid_file: string. Path on the VM of the file holding the PID of
+        the wrapper script, which tells a job whose wrapper failed before
+        creating 'status_file' from one that is starting.
+    retcode: int. The exit status of the command, or None while it is running.
+    stdout_offset: int. Number of bytes of stdout already fetched by
+        ReadRemoteJobOutput.
+  """
+
+  def __init__(self, vm, command, file_base):
+    self.vm = vm
+    self.command = command
+    self.stdout_file = file_base + '.stdout'
+    self.stderr_file = file_base + '.stderr'
+    self.status_file = file_base + '.status'
+    self.wrapper_log = file_base + '.log'
+    self.wrapper_pid_file = file_base + '.wrapper_pid'
+    self.retcode = None
+    self.stdout_offset = 0
+
+  def __repr__(self):
+    return '<RemoteJob %r on %s>' % (self.command, self.vm)
+
+  @property
+  def done(self):
+    """Whether the command has exited, as of the last status sweep."""
+    return self.retcode is not None
+
+
+def _UpdateStatuses(vm, jobs):
+  vm.UpdateRemoteJobStatuses(jobs)
+
+
+def PollJobs(jobs):
+  """Updates the status of jobs that were running.
+
+  Issues one command per VM, concurrently across VMs, whatever the number of
+  jobs running on each VM.
+
+  Args:
+    jobs: list of RemoteJob.
+
+  Returns:
+    The list of jobs in 'jobs' that are done.
+  """
+  running = [job for job in jobs if not job.done]
+  if running:
+    jobs_by_vm = collections.OrderedDict()
+    for job in running:
+      jobs_by_vm.setdefault(job.vm, []).append(job)
+    vm_util.RunThreaded(_UpdateStatuses,
+                        [(vm_and_jobs, {})
+                         for vm_and_jobs in jobs_by_vm.iteritems()],
+                        max_concurrent_threads=MAX_CONCURRENT_VMS)
+  return [job for job in jobs if job.done]
+
+
+def WaitForJobs(jobs, poll_interval=POLL_INTERVAL, should_log=False,
+                timeout=None):
+  """Waits for jobs to complete, then collects their output.
+
+  Args:
+    jobs: list of RemoteJob.
+    poll_interval: float. Seconds to wait between two status sweeps.
+    should_log: bool. Whether to log the output of the commands at the info
+        level rather than the debug level.
+    timeout: float. Seconds after which to stop waiting. Defaults to
+        --default_timeout. If -1, waits until the jobs complete.
+
+  Returns:
+    A list with the (stdout, stderr) of each job, in order of 'jobs'.
+
+  Raises:
+    errors.VmUtil.ThreadException: When a command failed. The output of the
+        other commands is still collected and their files deleted.
+    errors.VirtualMachine.RemoteCommandError: When the jobs did not complete
+        within 'timeout'. They are left running.
+  """
+  if timeout is None:
+    timeout = FLAGS.default_timeout
+  deadline = time.time() + timeout if timeout >= 0 else float('inf')
+  while True:
+    num_done = len(PollJobs(jobs))
+    if num_done == len(jobs):
+      break
+    if time.time() >= deadline:
+      raise errors.VirtualMachine.RemoteCommandError(
+          '%d of %d remote jobs did not complete within %s seconds: %s' % (
+              len(jobs) - num_done, len(jobs), timeout,
+              [job for job in jobs if not job.done]))
+    logging.info('Waiting for %d of %d remote jobs.',
+                 len(jobs) - num_done, len(jobs))
+    time.sleep(poll_interval)
+  return vm_util.RunThreaded(
+      lambda job: job.vm.FinishRemoteJob(job, should_log=should_log),
+      list(jobs), max_concurrent_threads=MAX_CONCURRENT_VMS)
@@ -0,0 +1,247 @@
+# Copyright 2016 PerfKitBenchmarker Authors. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Runs operations on interdependent resources in dependency order.
+
+A ResourceGraph holds one node per resource operation (creating a network,
+deleting a VM, ...) and the nodes it must wait for. Every node runs in its own
+thread as soon as all of its dependencies have finished, so independent
+branches of the graph never wait for each other: the network of one region
+can be deleted while VMs in another region are still shutting down.
+
+The start and stop time of every node that ran is recorded as an Interval,
+which can be turned into samples with GenerateSamples, and into a timeline
+with WriteTimeline. MeasureInterval records Intervals of operations that do
+not run in a graph.
+"""
+
+import collections
+import contextlib
+import json
+import logging
+import threading
+import time
+
+from perfkitbenchmarker import sample
+from perfkitbenchmarker import vm_util
+
+# Maximum number of nodes run at the same time, the default of
+# vm_util.RunThreaded. Each may run a cloud CLI process.
+MAX_CONCURRENT_NODES = 200
+# How often a node waiting for its dependencies checks for cancellation.
+_CANCELLATION_POLL_INTERVAL = 1
+
+# The time span of a single node.
+#
+# kind: string. Kind of resource, e.g. 'VM' or 'Network'.
+# operation: string. What was done to it, e.g. 'Create' or 'Delete'.
+# name: string. Identifies the resource among those of the same kind.
+# start_time: float. Unix timestamp when the operation started.
+# stop_time: float. Unix timestamp when the operation finished.
+# succeeded: boolean. Whether the operation completed without raising.
+Interval = collections.namedtuple('Interval', [
+    'kind', 'operation', 'name', 'start_time', 'stop_time', 'succeeded'])
+
+
+@contextlib.contextmanager
+def MeasureInterval(intervals, kind, operation, name):
+  """Appends the Interval of the enclosed block to a list.
+
+  Args:
+    intervals: list of Interval to append to.
+    kind: string. Kind of resource, e.g. 'VM'.
+    operation: string. What the block does to the resource, e.g. 'Create'.
+    name: string. Identifies the resource among those of the same kind.
+  """
+  start_time = time.time()
+  succeeded = False
+  try:
+    yield
+    succeeded = True
+  finally:
+    intervals.append(Interval(kind, operation, name, start_time, time.time(),
+                              succeeded))
+
+
+class _Node(object):
+  """A single operation in a ResourceGraph."""
+
+  def __init__(self, kind, name, func, dependencies):
+    self.kind = kind
+    self.name = name
+    self.func = func
+    self.dependencies = list(dependencies)
+    self.done = threading.Event()
+    self.succeeded = False
+
+  def __str__(self):
+    return '{0} {1}'.format(self.kind, self.name)
+
+
+class ResourceGraph(object):
+  """A set of resource operations and the order they must run in.
+
+  Attributes:
+    operation: string. What the graph does to its resources, e.g. 'Create'.
+    intervals: list of Interval. One per node that ran, in completion order.
+  """
+
+  def __init__(self, operation, skip_dependents_of_failures):
+    """Initializes the graph.
+
+    Args:
+      operation: string. What the graph does to its resources, e.g. 'Create'.
+      skip_dependents_of_failures: boolean. If True, a node whose dependency
+          failed is not run. Creation graphs want this; deletion graphs
+          usually want to attempt everything anyway.
+    """
+    self.operation = operation
+    self.intervals = []
+    self._skip_dependents_of_failures = skip_dependents_of_failures
+    self._nodes = []
+
+  def AddNode(self, kind, name, func, dependencies=()):
+    """Adds an operation to the graph.
+
+    Since dependencies must already be part of the graph, the graph is
+    acyclic by construction.
+
+    Args:
+      kind: string. Kind of resource, e.g. 'VM'.
+      name: string. Identifies the resource among those of the same kind.
+      func: Function taking no arguments that performs the operation.
+      dependencies: iterable of nodes previously returned by AddNode that must
+          finish before func is called.
+
+    Returns:
+      The new node, to be passed as a dependency of later nodes.
+    """
+    node = _Node(kind, name, func, dependencies)
+    self._nodes.append(node)
+    return node
+
+  def _WaitForDependencies(self, node):
+    """Returns whether the node may run once its dependencies finished."""
+    for dependency in node.dependencies:
+      # Waiting with a timeout keeps the wait interruptable.
+      while (not dependency.done.wait(_CANCELLATION_POLL_INTERVAL) and
+             not vm_util.IsCallCancelled()):
+        pass
+      if vm_util.IsCallCancelled():
+        break
+    if vm_util.IsCallCancelled():
+      logging.info('Not running %s of %s: another operation failed.',
+                   self.operation, node)
+      return False
+    failed = [str(d) for d in node.dependencies if not d.succeeded]
+    if failed and self._skip_dependents_of_failures:
+      logging.warning('Not running %s of %s because %s of %s failed.',
+                      self.operation, node, self.operation, ', '.join(failed))
+      return False
+    return True
+
+  def _RunNode(self, node):
+    try:
+      if not self._WaitForDependencies(node):
+        return
+      with MeasureInterval(self.intervals, node.kind, self.operation,
+                           node.name):
+        node.func()
+      node.succeeded = True
+    finally:
+      node.done.set()
+
+  def Run(self, fail_fast=False):
+    """Runs every node, each as soon as its dependencies have finished.
+
+    Args:
+      fail_fast: boolean. If True, nodes that have not started yet are
+          abandoned once any node fails, and running ones are cancelled
+          (see vm_util.IsCallCancelled).
+
+    Raises:
+      errors.VmUtil.ThreadException: When any operation raised an exception.
+    """
+    # Nodes were added after their dependencies, so starting them in order
+    # never leaves a node waiting on one that has not been started, even when
+    # waiting nodes take up all of the MAX_CONCURRENT_NODES threads.
+    vm_util.RunThreaded(self._RunNode, self._nodes,
+                        max_concurrent_threads=min(len(self._nodes) or 1,
+                                                   MAX_CONCURRENT_NODES),
+                        fail_fast=fail_fast)
+
+
+def GenerateSamples(intervals, include_runtime, include_timestamps):
+  """Generates samples for the intervals recorded by ResourceGraph.Run.
+
+  The metric names only contain the kind of resource and the operation, e.g.
+  'VM Delete Runtime', so that they can be compared across runs. The resource
+  name is included as metadata.
+
+  Args:
+    intervals: iterable of Interval.
+    include_runtime: boolean. Whether to include elapsed time samples.
+    include_timestamps: boolean. Whether to include start and stop timestamp
+        samples.
+
+  Returns:
+    A list of Samples, in the order of the intervals.
+  """
+  samples = []
+  for interval in intervals:
+    name = '{0} {1}'.format(interval.kind, interval.operation)
+    metadata = {'resource': interval.name, 'succeeded': interval.succeeded}
+    if include_runtime:
+      samples.append(sample.Sample(
+          name + ' Runtime', interval.stop_time - interval.start_time,
+          'seconds', metadata))
+    if include_timestamps:
+      samples.append(sample.Sample(
+          name + ' Start Timestamp', interval.start_time, 'seconds', metadata))
+      samples.append(sample.Sample(
+          name + ' Stop Timestamp', interval.stop_time, 'seconds', metadata))
+  return samples
+
+
+def WriteTimeline(intervals, path):
+  """Writes intervals as a timeline, with one row per resource.
+
+  The file is in the JSON trace event format, which Gantt-style viewers such
+  as chrome://tracing and Perfetto display. Each resource name is a row, on
+  which the intervals of the operations on the resource are nested, e.g. the
+  steps of the creation of a VM within the creation of the VM.
+
+  Args:
+    intervals: iterable of Interval.
+    path: string. Path of the file to write.
+  """
+  events = []
+  rows = {}
+  for interval in sorted(intervals, key=lambda i: i.start_time):
+    if interval.name not in rows:
+      rows[interval.name] = len(rows)
+      events.append({'name': 'thread_name', 'ph': 'M', 'pid': 0,
+                     'tid': rows[interval.name],
+                     'args': {'name': interval.name}})
+    events.append({
+        'name': '{0} {1}'.format(interval.kind, interval.operation),
+        'cat': interval.kind,
+        'ph': 'X',
+        'pid': 0,
+        'tid': rows[interval.name],
+        'ts': interval.start_time * 1e6,
+        'dur': (interval.stop_time - interval.start_time) * 1e6,
+        'args': {'succeeded': interval.succeeded}})
+  with open(path, 'w') as timeline_file:
+    json.dump({'traceEvents': events, 'displayTimeUnit': 'ms'},
+              timeline_file)
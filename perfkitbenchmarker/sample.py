@@ -15,6 +15,9 @@
 
 import collections
 import time
+
+from perfkitbenchmarker import histogram
+
 PERCENTILES_LIST = [0.1, 1, 5, 10, 50, 90, 95, 99, 99.9]
 
 _SAMPLE_FIELDS = 'metric', 'value', 'unit', 'metadata', 'timestamp'
@@ -24,11 +27,15 @@ def PercentileCalculator(numbers):
   """Computes percentiles, stddev and mean on a set of numbers
 
   Args:
-    numbers: The set of numbers to compute percentiles for.
+    numbers: The set of numbers to compute percentiles for, or a
+        histogram.Histogram they were recorded in. Percentiles of a histogram
+        are the lower bounds of the buckets they fall in.
 
   Returns:
     A dictionary of percentiles.
   """
+  if isinstance(numbers, histogram.Histogram):
+    return _HistogramPercentiles(numbers)
   numbers_sorted = sorted(numbers)
   count = len(numbers_sorted)
   total = sum(numbers_sorted)
@@ -50,6 +57,20 @@ def PercentileCalculator(numbers):
   return result
 
 
+def _HistogramPercentiles(numbers):
+  """Implements PercentileCalculator for a histogram.Histogram."""
+  result = {}
+  if not numbers.total_count:
+    return result
+  values = numbers.ValuesAtQuantiles(
+      float(percentile) / 100 for percentile in PERCENTILES_LIST)
+  for percentile, value in zip(PERCENTILES_LIST, values):
+    result['p%s' % str(percentile)] = value
+  result['average'] = numbers.Mean()
+  result['stddev'] = numbers.StandardDeviation()
+  return result
+
+
 class Sample(collections.namedtuple('Sample', _SAMPLE_FIELDS)):
   """A performance sample.
 
@@ -0,0 +1,107 @@
+#!/usr/bin/env python2
+#
+# Copyright 2016 PerfKitBenchmarker Authors. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+# -*- coding: utf-8 -*-
+
+"""Reports the status of commands started by execute_command.py.
+
+Unlike "wait_for_command.py", never blocks: for each status file given as an
+argument, prints one line to stdout, in the order of the arguments, holding
+either the exit status of the wrapped command or "running" if the command has
+not completed yet. A command whose status file is not locked but empty was
+interrupted and is reported with exit status 1, as "wait_for_command.py" would.
+
+Each status file may be followed by a comma and the path of a file holding
+the PID of the "execute_command.py" process, e.g. "cmd.status,cmd.pid". The
+status file of such a command does not exist until that process creates it.
+If the process has exited, or the PID file is missing, without creating the
+status file, the command never started and is reported with exit status 1.
+
+*Runs on the guest VM. Supports Python 2.6, 2.7, and 3.x.*
+"""
+
+import errno
+import fcntl
+import optparse
+import os
+import sys
+
+RUNNING = 'running'
+
+
+def _IsRunning(pid_path):
+  """Returns whether the process whose PID is in a file is running."""
+  try:
+    with open(pid_path, 'r') as pid_file:
+      pid = int(pid_file.read())
+  except (IOError, ValueError):
+    return False
+  try:
+    os.kill(pid, 0)
+  except OSError as e:
+    return e.errno == errno.EPERM
+  return True
+
+
+def GetStatus(path, wrapper_pid_path=None):
+  """Returns the exit status of a command, or RUNNING if it has not exited.
+
+  Args:
+    path: string. Path of the status file of the command.
+    wrapper_pid_path: string. Path of the file holding the PID of the
+        "execute_command.py" process running the command. If None, a missing
+        status file means that the command has not started yet.
+  """
+  try:
+    status = open(path, 'r')
+  except IOError as e:
+    if e.errno != errno.ENOENT:
+      raise
+    # execute_command.py creates the status file shortly after it is started,
+    # already locked.
+    if wrapper_pid_path is None or _IsRunning(wrapper_pid_path):
+      return RUNNING
+    # It may have created the status file just before exiting.
+    if os.path.exists(path):
+      return GetStatus(path)
+    return 1
+  try:
+    try:
+      fcntl.lockf(status, fcntl.LOCK_SH | fcntl.LOCK_NB)
+    except IOError as e:
+      if e.errno in (errno.EACCES, errno.EAGAIN):
+        return RUNNING
+      raise
+    return_code_str = status.read()
+  finally:
+    status.close()
+  if return_code_str:
+    return int(return_code_str)
+  return 1
+
+
+def main():
+  p = optparse.OptionParser(usage='%prog STATUS_FILE[,PID_FILE]...')
+  _, args = p.parse_args()
+  if not args:
+    p.print_usage()
+    return 1
+  for arg in args:
+    sys.stdout.write('{0}\n'.format(GetStatus(*arg.split(',', 1))))
+  return 0
+
+if __name__ == '__main__':
+  sys.exit(main())
@@ -20,8 +20,9 @@
 
 Simplifies executing long-running commands on a remote host.
 The status file (as specified by --status) is exclusively locked until the
-child process running the user-specified command exits.
-This command will fail if the status file cannot be successfully locked.
+child process running the user-specified command exits. It is locked under a
+temporary name and then renamed, so that it is never seen unlocked and empty
+while the command starts, which would look like an interrupted command.
 
 To await completion, "wait_for_command.py" acquires a shared lock on the
 status file, which blocks until the process completes.
@@ -32,6 +33,7 @@ status file, which blocks until the process completes.
 import fcntl
 import logging
 import optparse
+import os
 import sys
 import subprocess
 
@@ -66,13 +68,16 @@ def main():
     sys.stderr.write(msg)
     return 1
 
-  with open(options.status, 'w+') as status:
-    with open(options.stdout, 'w') as stdout:
-      with open(options.stderr, 'w') as stderr:
-        logging.info('Acquiring lock on %s', options.status)
+  temp_status_path = '{0}.{1}.tmp'.format(options.status, os.getpid())
+  with open(options.stdout, 'w') as stdout:
+    with open(options.stderr, 'w') as stderr:
+      with open(temp_status_path, 'w+') as status:
+        logging.info('Acquiring lock on %s', temp_status_path)
         # Non-blocking exclusive lock acquisition; will raise an IOError if
         # acquisition fails, which is desirable here.
         fcntl.lockf(status, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        # The lock belongs to the file, not to its name.
+        os.rename(temp_status_path, options.status)
 
         # Initialize the status to 99; will be filled with the exit status
         # on subprocess completion.
@@ -20,17 +20,29 @@
    Note: it is intentional that this test script is NOT dependant on the PKB
    package so we do not have to copy the entire PKB package to test VM just to
    run this script.
+
+   The boto based scenarios can also be run against a local S3-compatible
+   server (e.g. moto_server or minio) to test the script itself:
+
+     object_storage_api_tests.py --storage_provider=S3 --bucket=test \
+         --host=localhost --port=5000 --nouse_https --path_style \
+         --scenario=MultiStreamThroughput
 """
 
 import json
 import logging
+from multiprocessing.pool import Pool
+from multiprocessing.pool import ThreadPool
+import os
 import sys
+from threading import Lock
 from threading import Thread
 import string
 import random
 import time
 
 import boto
+from boto.s3.connection import OrdinaryCallingFormat
 import gflags as flags
 import gcs_oauth2_boto_plugin  # noqa
 from azure.storage.blob import BlobService
@@ -43,6 +55,17 @@ flags.DEFINE_enum(
 
 flags.DEFINE_string('host', None, 'The hostname of the storage endpoint.')
 
+flags.DEFINE_integer('port', None, 'The port of the storage endpoint. Only '
+                     'applicable to GCS and S3.')
+
+flags.DEFINE_boolean('use_https', True, 'Whether to connect to the storage '
+                     'endpoint over HTTPS. Only applicable to GCS and S3.')
+
+flags.DEFINE_boolean('path_style', False, 'Whether to put the bucket name in '
+                     'the request path rather than in the hostname. Needed by '
+                     'most local S3-compatible servers. Only applicable to GCS '
+                     'and S3.')
+
 flags.DEFINE_string('bucket', None,
                     'The name of the bucket to test with. Caller is '
                     'responsible to create an empty bucket for a particular '
@@ -57,16 +80,42 @@ flags.DEFINE_string('azure_key', None,
 
 flags.DEFINE_enum(
     'scenario', 'OneByteRW', ['OneByteRW', 'ListConsistency',
-                              'SingleStreamThroughput', 'CleanupBucket'],
+                              'SingleStreamThroughput',
+                              'MultiStreamThroughput', 'CleanupBucket'],
     'The various scenarios to run. OneByteRW: read and write of single byte. '
     'ListConsistency: List-after-write and list-after-update consistency. '
     'SingleStreamThroughput: Throughput of single stream large object RW. '
+    'MultiStreamThroughput: Aggregate and per-stream throughput of many '
+    'concurrent streams of large object RW. '
     'CleanupBucket: Cleans up everything in a given bucket.')
 
 flags.DEFINE_integer('iterations', 1, 'The number of iterations to run for the '
                      'particular test scenario. Currently only applicable to '
                      'the ListConsistency scenario, ignored in others.')
 
+flags.DEFINE_integer('num_streams', 10, 'The number of concurrent streams in '
+                     'the MultiStreamThroughput scenario.', lower_bound=1)
+
+flags.DEFINE_integer('objects_per_stream', 5, 'The number of objects each '
+                     'stream writes and then reads in the '
+                     'MultiStreamThroughput scenario.', lower_bound=1)
+
+flags.DEFINE_integer('object_size_bytes', 100 * 1024 * 1024, 'The size of '
+                     'each object in the MultiStreamThroughput scenario.',
+                     lower_bound=1)
+
+flags.DEFINE_integer('part_size_bytes', 8 * 1024 * 1024, 'The part size in '
+                     'the MultiStreamThroughput scenario. Objects are written '
+                     'with multipart uploads (S3) or blocks (Azure) and read '
+                     'with ranged GETs of this size. GCS objects are always '
+                     'written with a single request. 0 disables parts.',
+                     lower_bound=0)
+
+flags.DEFINE_enum('stream_pool', 'thread', ['thread', 'process'],
+                  'Whether the streams of the MultiStreamThroughput scenario '
+                  'run in a pool of threads or of processes. Processes avoid '
+                  'contention on the interpreter lock for checksums and TLS.')
+
 STORAGE_TO_SCHEMA_DICT = {'GCS': 'gs', 'S3': 's3', 'AZURE': 'azure'}
 
 # If more than 5% of our upload or download operations fail for an iteration,
@@ -114,6 +163,18 @@ LARGE_OBJECT_COUNT = 100
 
 LARGE_OBJECT_FAILURE_TOLERANCE = 0.1
 
+# Names of the directions measured by the throughput benchmarks.
+UPLOAD = 'upload'
+DOWNLOAD = 'download'
+
+# Random payload bytes are generated in blocks of this size (1 MiB).
+PAYLOAD_BLOCK_SIZE_BYTES = 1024 * 1024
+
+# Maps each possible byte value to an ASCII letter, so that random bytes can
+# be turned into a printable payload with a single str.translate call.
+_PAYLOAD_TRANSLATION_TABLE = ''.join(
+    string.ascii_letters[i % len(string.ascii_letters)] for i in range(256))
+
 # A global variable initialized once for Azure Blob Service
 _AZURE_BLOB_SERVICE = None
 
@@ -167,6 +228,99 @@ def PercentileCalculator(numbers):
   return result
 
 
+class PayloadPool(object):
+  """A pool of random printable bytes that object payloads are sliced from.
+
+  The pool is generated in bulk from os.urandom, and grown on demand to the
+  largest payload size requested so far. Payloads are read-only memoryview
+  slices of the pool, so writing many objects (possibly from many threads)
+  does not generate or copy any data.
+
+  Attributes:
+    generation_time: float. Total seconds spent generating payload bytes.
+  """
+
+  def __init__(self):
+    self._lock = Lock()
+    self._pool = b''
+    self._view = memoryview(self._pool)
+    self.generation_time = 0.0
+
+  def Get(self, size):
+    """Returns a memoryview of 'size' random printable bytes."""
+    with self._lock:
+      if len(self._pool) < size:
+        start_time = time.time()
+        blocks = [self._pool]
+        remaining = size - len(self._pool)
+        while remaining > 0:
+          block_size = min(remaining, PAYLOAD_BLOCK_SIZE_BYTES)
+          blocks.append(
+              os.urandom(block_size).translate(_PAYLOAD_TRANSLATION_TABLE))
+          remaining -= block_size
+        self._pool = b''.join(blocks)
+        self._view = memoryview(self._pool)
+        self.generation_time += time.time() - start_time
+      return self._view[:size]
+
+
+class PayloadReader(object):
+  """A read-only file-like object over a payload memoryview.
+
+  Upload APIs read from it in chunks, so a payload never has to be copied in
+  full.
+  """
+
+  def __init__(self, payload):
+    self._payload = payload
+    self._position = 0
+
+  def __len__(self):
+    return len(self._payload)
+
+  def read(self, size=-1):
+    end = len(self._payload)
+    if size is not None and size >= 0:
+      end = min(end, self._position + size)
+    data = self._payload[self._position:end].tobytes()
+    self._position = max(self._position, end)
+    return data
+
+  def seek(self, offset, whence=os.SEEK_SET):
+    if whence == os.SEEK_CUR:
+      offset += self._position
+    elif whence == os.SEEK_END:
+      offset += len(self._payload)
+    self._position = max(0, offset)
+
+  def tell(self):
+    return self._position
+
+
+# The payload pool shared by all writes in this process.
+_PAYLOAD_POOL = PayloadPool()
+
+
+def _ConnectUri(storage_uri, host_to_connect=None):
+  """Connects a boto storage URI to the endpoint selected by the flags.
+
+  Args:
+    storage_uri: The boto storage URI to connect.
+    host_to_connect: An optional endpoint string to connect to.
+  """
+  connection_args = {}
+  if host_to_connect is not None:
+    connection_args['host'] = host_to_connect
+  if FLAGS.port is not None:
+    connection_args['port'] = FLAGS.port
+  if not FLAGS.use_https:
+    connection_args['is_secure'] = False
+  if FLAGS.path_style:
+    connection_args['calling_format'] = OrdinaryCallingFormat()
+  if connection_args:
+    storage_uri.connect(**connection_args)
+
+
 def _ListObjects(storage_schema, bucket, prefix, host_to_connect=None):
   """List objects under a bucket given a prefix.
 
@@ -183,8 +337,7 @@ def _ListObjects(storage_schema, bucket, prefix, host_to_connect=None):
   bucket_list_result = None
   if _useBotoApi(storage_schema):
     bucket_uri = boto.storage_uri(bucket, storage_schema)
-    if host_to_connect is not None:
-      bucket_uri.connect(host=host_to_connect)
+    _ConnectUri(bucket_uri, host_to_connect)
 
     bucket_list_result = bucket_uri.list_bucket(prefix=prefix)
   else:
@@ -216,8 +369,7 @@ def DeleteObjects(storage_schema, bucket, objects_to_delete,
       if _useBotoApi(storage_schema):
         object_path = '%s/%s' % (bucket, object_name)
         object_uri = boto.storage_uri(object_path, storage_schema)
-        if host_to_connect is not None:
-          object_uri.connect(host=host_to_connect)
+        _ConnectUri(object_uri, host_to_connect)
 
         object_uri.delete_key()
       else:
@@ -246,7 +398,8 @@ def CleanupBucket(storage_schema):
 
 def WriteObjects(storage_schema, bucket, object_prefix, count,
                  size, objects_written, latency_results=None,
-                 bandwidth_results=None, host_to_connect=None):
+                 bandwidth_results=None, host_to_connect=None,
+                 payload_pool=None):
   """Write a number of objects to a storage provider.
 
   Args:
@@ -265,18 +418,10 @@ def WriteObjects(storage_schema, bucket, object_prefix, count,
         bandwidth numbers, in bytes per second, for each object that is
         successfully written.
     host_to_connect: An optional endpoint string to connect to.
+    payload_pool: An optional PayloadPool to take the payload from. Defaults
+        to a pool shared by the whole process.
   """
-  payload_bytes = bytearray(size)
-  # Use a while loop to fill up the byte array which is by default 100MB in size
-  # don't use a for...range(100M), range(100M) will create a list of 100mm items
-  # with each item being the default object size of 30 bytes or so, it will lead
-  # to out of memory error.
-  i = 0
-  while i < size:
-    payload_bytes[i] = ord(random.choice(string.letters))
-    i += 1
-
-  payload_string = payload_bytes.decode('ascii')
+  payload = (payload_pool or _PAYLOAD_POOL).Get(size)
 
   for i in range(count):
     object_name = '%s_%d' % (object_prefix, i)
@@ -293,13 +438,12 @@ def WriteObjects(storage_schema, bucket, object_prefix, count,
       if _useBotoApi(storage_schema):
         object_path = '%s/%s' % (bucket, object_name)
         object_uri = boto.storage_uri(object_path, storage_schema)
-        if host_to_connect is not None:
-          object_uri.connect(host=host_to_connect)
+        _ConnectUri(object_uri, host_to_connect)
 
-        object_uri.set_contents_from_string(payload_string)
+        object_uri.set_contents_from_file(PayloadReader(payload), size=size)
       else:
-        _AZURE_BLOB_SERVICE.put_block_blob_from_bytes(bucket, object_name,
-                                                      bytes(payload_bytes))
+        _AZURE_BLOB_SERVICE.put_block_blob_from_file(
+            bucket, object_name, PayloadReader(payload), count=size)
 
       latency = time.time() - start_time
 
@@ -335,7 +479,7 @@ def ReadObjects(storage_schema, bucket, objects_to_read, latency_results=None,
       if _useBotoApi(storage_schema):
         object_path = '%s/%s' % (bucket, object_name)
         object_uri = boto.storage_uri(object_path, storage_schema)
-        object_uri.connect(host=host_to_connect)
+        _ConnectUri(object_uri, host_to_connect)
         object_uri.new_key().get_contents_as_string()
       else:
         _AZURE_BLOB_SERVICE.get_blob_to_bytes(bucket, object_name)
@@ -478,10 +622,18 @@ def SingleStreamThroughputBenchmark(storage_schema, host_to_connect=None):
   write_bandwidth = []
   objects_written = []
 
+  # Generate the payload up front, so its cost is reported on its own rather
+  # than being mixed into the transfer measurements.
+  payload_pool = PayloadPool()
+  payload_pool.Get(LARGE_OBJECT_SIZE_BYTES)
+  logging.info('Single stream payload generation time in seconds: %f',
+               payload_pool.generation_time)
+
   WriteObjects(storage_schema, FLAGS.bucket, object_prefix,
                LARGE_OBJECT_COUNT, LARGE_OBJECT_SIZE_BYTES, objects_written,
                bandwidth_results=write_bandwidth,
-               host_to_connect=host_to_connect)
+               host_to_connect=host_to_connect,
+               payload_pool=payload_pool)
 
   try:
     if len(objects_written) < LARGE_OBJECT_COUNT * (
@@ -518,6 +670,228 @@ def SingleStreamThroughputBenchmark(storage_schema, host_to_connect=None):
                   host_to_connect=host_to_connect)
 
 
+def _WriteObjectInParts(storage_schema, bucket, object_name, payload,
+                        part_size, host_to_connect=None):
+  """Writes one object, in parts of 'part_size' bytes where supported.
+
+  Args:
+    storage_schema: The address schema identifying a storage. e.g., "gs"
+    bucket: Name of the bucket to write to.
+    object_name: Name of the object to write.
+    payload: A memoryview of the bytes to write.
+    part_size: The size of each part in bytes. 0 writes a single part.
+    host_to_connect: An optional endpoint string to connect to.
+  """
+  size = len(payload)
+  part_offsets = range(0, size, part_size or size)
+  if _useBotoApi(storage_schema):
+    if storage_schema != 's3' or len(part_offsets) == 1:
+      object_uri = boto.storage_uri('%s/%s' % (bucket, object_name),
+                                    storage_schema)
+      _ConnectUri(object_uri, host_to_connect)
+      object_uri.set_contents_from_file(PayloadReader(payload), size=size)
+      return
+    bucket_uri = boto.storage_uri(bucket, storage_schema)
+    _ConnectUri(bucket_uri, host_to_connect)
+    bucket_object = bucket_uri.get_bucket(validate=False)
+    upload = bucket_object.initiate_multipart_upload(object_name)
+    try:
+      parts_xml = []
+      for part_number, offset in enumerate(part_offsets, 1):
+        part = payload[offset:offset + part_size]
+        key = upload.upload_part_from_file(PayloadReader(part), part_number,
+                                           size=len(part))
+        parts_xml.append('<Part><PartNumber>%d</PartNumber><ETag>%s</ETag>'
+                         '</Part>' % (part_number, key.etag))
+      # Complete the upload from the ETags of the parts, rather than with
+      # upload.complete_upload(), which lists the parts first.
+      bucket_object.complete_multipart_upload(
+          object_name, upload.id,
+          '<CompleteMultipartUpload>%s</CompleteMultipartUpload>' %
+          ''.join(parts_xml))
+    except:
+      upload.cancel_upload()
+      raise
+  else:
+    block_ids = []
+    for part_number, offset in enumerate(part_offsets):
+      # Azure requires all block IDs of a blob to have the same length.
+      block_id = '%08d' % part_number
+      _AZURE_BLOB_SERVICE.put_block(
+          bucket, object_name,
+          payload[offset:offset + (part_size or size)].tobytes(), block_id)
+      block_ids.append(block_id)
+    _AZURE_BLOB_SERVICE.put_block_list(bucket, object_name, block_ids)
+
+
+def _ReadObjectInParts(storage_schema, bucket, object_name, size, part_size,
+                       host_to_connect=None):
+  """Reads one object with ranged GETs of 'part_size' bytes.
+
+  Args:
+    storage_schema: The address schema identifying a storage. e.g., "gs"
+    bucket: Name of the bucket to read from.
+    object_name: Name of the object to read.
+    size: The size of the object in bytes.
+    part_size: The size of each ranged GET in bytes. 0 reads the whole object
+        with a single request.
+
+  Returns:
+    The number of bytes read.
+  """
+  bytes_read = 0
+  for offset in range(0, size, part_size or size):
+    byte_range = 'bytes=%d-%d' % (offset,
+                                  min(size, offset + (part_size or size)) - 1)
+    if _useBotoApi(storage_schema):
+      object_uri = boto.storage_uri('%s/%s' % (bucket, object_name),
+                                    storage_schema)
+      _ConnectUri(object_uri, host_to_connect)
+      data = object_uri.new_key().get_contents_as_string(
+          headers={'Range': byte_range})
+    else:
+      data = _AZURE_BLOB_SERVICE.get_blob(bucket, object_name,
+                                          x_ms_range=byte_range)
+    bytes_read += len(data)
+  return bytes_read
+
+
+def _RunStream(args):
+  """Runs one stream of the MultiStreamThroughput benchmark.
+
+  The stream transfers each of its objects in turn. It runs in a pool worker,
+  so it takes a single tuple of arguments and returns its results rather than
+  appending them to shared lists.
+
+  Args:
+    args: A tuple of (direction, storage_schema, bucket, object_names,
+        object_size, part_size, host_to_connect).
+
+  Returns:
+    A tuple of (names of objects transferred, bytes transferred, start time,
+    end time).
+  """
+  (direction, storage_schema, bucket, object_names, object_size, part_size,
+   host_to_connect) = args
+  if direction == UPLOAD:
+    payload = _PAYLOAD_POOL.Get(object_size)
+  objects_transferred = []
+  bytes_transferred = 0
+  start_time = time.time()
+  for object_name in object_names:
+    try:
+      if direction == UPLOAD:
+        _WriteObjectInParts(storage_schema, bucket, object_name, payload,
+                            part_size, host_to_connect)
+        bytes_transferred += object_size
+      else:
+        bytes_transferred += _ReadObjectInParts(
+            storage_schema, bucket, object_name, object_size, part_size,
+            host_to_connect)
+      objects_transferred.append(object_name)
+    except:
+      logging.exception('Caught exception during %s of object %s.',
+                        direction, object_name)
+  return objects_transferred, bytes_transferred, start_time, time.time()
+
+
+def _RunStreams(pool, direction, storage_schema, per_stream_objects,
+                object_size, part_size, host_to_connect):
+  """Runs one stream per list of objects concurrently, and logs the results.
+
+  Args:
+    pool: The thread or process pool to run the streams in.
+    direction: UPLOAD or DOWNLOAD.
+    storage_schema: The address schema identifying a storage. e.g., "gs"
+    per_stream_objects: A list of lists of names of objects, one per stream.
+    object_size: The size of each object in bytes.
+    part_size: The size of each part in bytes.
+    host_to_connect: An optional endpoint string to connect to.
+
+  Returns:
+    A list of lists of names of the objects transferred, one per stream.
+
+  Raises:
+    LowAvailabilityError: when too many of the transfers failed.
+  """
+  stream_results = pool.map(
+      _RunStream,
+      [(direction, storage_schema, FLAGS.bucket, object_names, object_size,
+        part_size, host_to_connect) for object_names in per_stream_objects],
+      chunksize=1)
+
+  transferred = [result[0] for result in stream_results]
+  expected_count = sum(len(object_names)
+                       for object_names in per_stream_objects)
+  transferred_count = sum(len(object_names) for object_names in transferred)
+  if transferred_count < expected_count * (1 - LARGE_OBJECT_FAILURE_TOLERANCE):
+    raise LowAvailabilityError('Failed to %s required number of objects, '
+                               'exiting.' % direction)
+
+  per_stream_bandwidth = [
+      bytes_transferred / (end_time - start_time)
+      for _, bytes_transferred, start_time, end_time in stream_results
+      if bytes_transferred and end_time > start_time]
+  total_bytes = sum(result[1] for result in stream_results)
+  wall_time = (max(result[3] for result in stream_results) -
+               min(result[2] for result in stream_results))
+  logging.info('Multi stream %s aggregate throughput in Bps: %f', direction,
+               total_bytes / wall_time if wall_time > 0 else 0.0)
+  logging.info('Multi stream %s per-stream throughput in Bps: %s', direction,
+               json.dumps(PercentileCalculator(per_stream_bandwidth),
+                          sort_keys=True))
+  return transferred
+
+
+def MultiStreamThroughputBenchmark(storage_schema, host_to_connect=None):
+  """ A benchmark test for multi stream upload and download throughput.
+
+  FLAGS.num_streams streams each write FLAGS.objects_per_stream objects of
+  FLAGS.object_size_bytes bytes concurrently, and then read them back
+  concurrently, in parts of FLAGS.part_size_bytes bytes. Both the aggregate
+  throughput across all streams and the percentiles of the per-stream
+  throughputs are reported.
+
+  Args:
+    storage_schema: The schema of the storage provider to use, e.g., "gs"
+    host_to_connect: An optional host endpoint to connect to.
+
+  Raises:
+    LowAvailabilityError: when the storage provider has failed a high number of
+        our RW requests that exceeds a threshold (>10%), we raise this error
+        instead of collecting performance numbers from this run.
+  """
+  object_prefix = 'pkb_multi_stream_%f' % time.time()
+  per_stream_objects = [
+      ['%s_%d_%d' % (object_prefix, stream, i)
+       for i in range(FLAGS.objects_per_stream)]
+      for stream in range(FLAGS.num_streams)]
+
+  # Generate the payload before starting the pool, so that it is reported
+  # separately and, with a process pool, shared copy-on-write by the workers.
+  _PAYLOAD_POOL.Get(FLAGS.object_size_bytes)
+  logging.info('Multi stream payload generation time in seconds: %f',
+               _PAYLOAD_POOL.generation_time)
+
+  pool_class = ThreadPool if FLAGS.stream_pool == 'thread' else Pool
+  pool = pool_class(FLAGS.num_streams)
+  objects_written = []
+  try:
+    per_stream_written = _RunStreams(
+        pool, UPLOAD, storage_schema, per_stream_objects,
+        FLAGS.object_size_bytes, FLAGS.part_size_bytes, host_to_connect)
+    objects_written = sum(per_stream_written, [])
+    _RunStreams(pool, DOWNLOAD, storage_schema, per_stream_written,
+                FLAGS.object_size_bytes, FLAGS.part_size_bytes,
+                host_to_connect)
+  finally:
+    pool.close()
+    pool.join()
+    DeleteObjects(storage_schema, FLAGS.bucket,
+                  objects_written or sum(per_stream_objects, []),
+                  host_to_connect=host_to_connect)
+
+
 def OneByteRWBenchmark(storage_schema, host_to_connect=None):
   """ A benchmark test for one byte object read and write. It uploads and
   downloads ONE_BYTE_OBJECT_COUNT number of 1-byte objects to the storage
@@ -807,6 +1181,8 @@ def Main(argv=sys.argv):
     return 0
   elif FLAGS.scenario == 'SingleStreamThroughput':
     return SingleStreamThroughputBenchmark(storage_schema, host_to_connect)
+  elif FLAGS.scenario == 'MultiStreamThroughput':
+    return MultiStreamThroughputBenchmark(storage_schema, host_to_connect)
   elif FLAGS.scenario == 'CleanupBucket':
     return CleanupBucket(storage_schema)
 
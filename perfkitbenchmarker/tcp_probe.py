@@ -0,0 +1,243 @@
+# Copyright 2016 PerfKitBenchmarker Authors. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Waits for TCP ports of remote hosts to accept connections.
+
+Waiting for a VM to boot by retrying SSH commands forks an ssh process per
+attempt, each of which can block for its whole connect timeout. WaitForPort
+instead tries non-blocking TCP connections. The connections of every waiting
+thread are multiplexed by a single thread on one poll or select loop.
+
+A host that refuses connections is probed again after a short interval,
+which doubles after each failed attempt, up to _MAX_PROBE_INTERVAL seconds.
+An attempt that was neither accepted nor refused within _CONNECT_TIMEOUT
+seconds, e.g. because the host does not exist yet, is abandoned and counts as
+a failed attempt.
+"""
+
+import errno
+import logging
+import select
+import socket
+import threading
+import time
+
+from perfkitbenchmarker import errors
+
+# Bounds of the interval between the connection attempts to a host.
+_MIN_PROBE_INTERVAL = .1
+_MAX_PROBE_INTERVAL = 1
+# Time after which a connection attempt is abandoned.
+_CONNECT_TIMEOUT = 2
+# Maximum time the select loop waits without checking for new probes.
+_MAX_SELECT_TIMEOUT = .1
+
+# connect_ex errors meaning that the connection is being established.
+_IN_PROGRESS_ERRORS = frozenset(
+    [errno.EINPROGRESS, errno.EWOULDBLOCK, errno.EALREADY,
+     getattr(errno, 'WSAEWOULDBLOCK', errno.EWOULDBLOCK)])
+
+
+class _Probe(object):
+  """Connection attempts to one port of one host.
+
+  Attributes:
+    address_info: tuple of the family, socktype, proto, canonname and
+        sockaddr of the port, as returned by socket.getaddrinfo.
+    deadline: float. Time at which to stop probing.
+    open_time: float. Time at which the port accepted a connection, or None.
+    done: threading.Event. Set when the port accepted a connection or the
+        deadline passed.
+    sock: socket.socket of the attempt in progress, or None.
+  """
+
+  def __init__(self, address_info, deadline):
+    self.address_info = address_info
+    self.deadline = deadline
+    self.open_time = None
+    self.done = threading.Event()
+    self.sock = None
+    self._attempts = 0
+    self._next_attempt_time = 0
+    self._attempt_deadline = None
+
+  def GetNextEventTime(self):
+    """Returns the next time at which Update has something to do."""
+    if self.sock:
+      return min(self._attempt_deadline, self.deadline)
+    return min(self._next_attempt_time, self.deadline)
+
+  def _Close(self):
+    self.sock.close()
+    self.sock = None
+
+  def _Succeed(self, now):
+    self._Close()
+    self.open_time = now
+    self.done.set()
+
+  def _Fail(self, now):
+    """Ends the attempt in progress, if any, and schedules the next one."""
+    if self.sock:
+      self._Close()
+    self._attempts += 1
+    self._next_attempt_time = now + min(
+        _MAX_PROBE_INTERVAL, _MIN_PROBE_INTERVAL * 2 ** (self._attempts - 1))
+
+  def _Connect(self, now):
+    family, socktype, proto, _, address = self.address_info
+    try:
+      self.sock = socket.socket(family, socktype, proto)
+    except socket.error as e:
+      logging.debug('Cannot probe %s: %s', address, e)
+      self._Fail(now)
+      return
+    self.sock.setblocking(0)
+    self._attempt_deadline = now + _CONNECT_TIMEOUT
+    error = self.sock.connect_ex(address)
+    if not error:
+      self._Succeed(now)
+    elif error not in _IN_PROGRESS_ERRORS:
+      self._Fail(now)
+
+  def Update(self, now):
+    """Starts or abandons an attempt, or gives up, depending on the time."""
+    if now >= self.deadline:
+      if self.sock:
+        self._Close()
+      self.done.set()
+    elif self.sock is None:
+      if now >= self._next_attempt_time:
+        self._Connect(now)
+    elif now >= self._attempt_deadline:
+      self._Fail(now)
+
+  def OnSelected(self, now):
+    """Ends the attempt in progress, which select reported as complete."""
+    if self.sock.getsockopt(socket.SOL_SOCKET, socket.SO_ERROR):
+      self._Fail(now)
+    else:
+      self._Succeed(now)
+
+
+class _Prober(object):
+  """Runs the probes of all threads on one select loop."""
+
+  def __init__(self):
+    self._condition = threading.Condition()
+    self._probes = []
+    self._thread = None
+
+  def Add(self, probe):
+    with self._condition:
+      self._probes.append(probe)
+      if not self._thread:
+        self._thread = threading.Thread(target=self._Run,
+                                        name='tcp_probe')
+        self._thread.daemon = True
+        self._thread.start()
+      self._condition.notify()
+
+  def _Run(self):
+    while True:
+      with self._condition:
+        self._probes = [p for p in self._probes if not p.done.is_set()]
+        while not self._probes:
+          self._condition.wait()
+        probes = list(self._probes)
+      try:
+        self._Step(probes)
+      except Exception:
+        logging.exception('Probing TCP ports failed.')
+        for probe in probes:
+          probe.deadline = 0
+          probe.Update(time.time())
+
+  def _Step(self, probes):
+    """Updates probes, then waits for their connection attempts."""
+    now = time.time()
+    for probe in probes:
+      probe.Update(now)
+    probes = [p for p in probes if not p.done.is_set()]
+    if not probes:
+      return
+    timeout = max(0, min(_MAX_SELECT_TIMEOUT,
+                         min(p.GetNextEventTime() for p in probes) - now))
+    socks = {p.sock: p for p in probes if p.sock}
+    if not socks:
+      time.sleep(timeout)
+      return
+    completed = _SelectCompleted(socks.keys(), timeout)
+    now = time.time()
+    for sock in completed:
+      socks[sock].OnSelected(now)
+
+
+def _SelectCompleted(socks, timeout):
+  """Waits for connection attempts to complete, successfully or not.
+
+  Args:
+    socks: list of sockets with a connection attempt in progress.
+    timeout: float. Maximum time to wait, in seconds.
+
+  Returns:
+    The sockets whose connection attempt completed.
+  """
+  # poll is not limited to file descriptors below FD_SETSIZE, but is not
+  # available on Windows.
+  if hasattr(select, 'poll'):
+    poller = select.poll()
+    socks_by_fd = {}
+    for sock in socks:
+      socks_by_fd[sock.fileno()] = sock
+      poller.register(sock, select.POLLOUT)
+    return [socks_by_fd[fd] for fd, _ in poller.poll(timeout * 1000)]
+  # Failed connections are reported as writable, or on Windows as
+  # exceptional.
+  _, writable, exceptional = select.select([], socks, socks, timeout)
+  return set(writable) | set(exceptional)
+
+
+_prober = _Prober()
+
+
+def WaitForPort(host, port, timeout):
+  """Waits until a TCP port of a host accepts connections.
+
+  Args:
+    host: string. Host name or IP address.
+    port: int. TCP port.
+    timeout: float. Maximum time to wait, in seconds.
+
+  Returns:
+    float. The time at which the port accepted a connection.
+
+  Raises:
+    errors.VirtualMachine.VmStateError: If the host name cannot be resolved,
+        or the port did not accept a connection before the timeout.
+  """
+  deadline = time.time() + timeout
+  # Resolved here rather than on the select loop, which must not block.
+  try:
+    address_info = socket.getaddrinfo(host, port, 0, socket.SOCK_STREAM)[0]
+  except socket.error as e:
+    raise errors.VirtualMachine.VmStateError(
+        'Cannot resolve %s: %s' % (host, e))
+  probe = _Probe(address_info, deadline)
+  _prober.Add(probe)
+  probe.done.wait()
+  if probe.open_time is None:
+    raise errors.VirtualMachine.VmStateError(
+        'Port %s of %s did not accept connections within %s seconds.' % (
+            port, host, timeout))
+  return probe.open_time
@@ -16,17 +16,29 @@
 http://dag.wiee.rs/home-made/dstat/
 """
 
+import array
+import csv
 import functools
+import json
 import logging
 import os
 import posixpath
+import random
+import re
 import threading
+import time
 import uuid
 
 from perfkitbenchmarker import events
 from perfkitbenchmarker import flags
+from perfkitbenchmarker import sample
 from perfkitbenchmarker import vm_util
 
+try:
+  import numpy
+except ImportError:
+  numpy = None
+
 flags.DEFINE_boolean('dstat', False,
                      'Run dstat (http://dag.wiee.rs/home-made/dstat/) '
                      'on each VM to collect system performance metrics during '
@@ -38,6 +50,250 @@ flags.DEFINE_string('dstat_output', None,
                     'Output directory for dstat output. '
                     'Only applicable when --dstat is specified. '
                     'Default: run temporary directory.')
+flags.DEFINE_boolean('dstat_publish', False,
+                     'Whether to publish summary statistics (mean, p50, p95, '
+                     'p99 and max) of each dstat column as samples. Only '
+                     'applicable when --dstat is specified.')
+flags.DEFINE_string('dstat_publish_regex', None,
+                    'If specified, only dstat columns whose name (e.g. '
+                    '"total cpu usage:usr") matches this regular expression '
+                    'are published. Only applicable when --dstat_publish is '
+                    'specified.')
+flags.DEFINE_boolean('dstat_timeseries', False,
+                     'Whether to convert each dstat CSV file into a columnar '
+                     'NumPy (.npy) time series covering the run phase. '
+                     'Requires NumPy on the machine running PKB. Only '
+                     'applicable when --dstat is specified.')
+
+# Number of values per column kept for estimating percentiles. Columns with
+# more rows than this are uniformly sampled, which keeps memory use bounded
+# regardless of the length of the run.
+RESERVOIR_SIZE = 10000
+
+# Statistics published for each dstat column, in order.
+SUMMARY_STATISTICS = ('mean', 'p50', 'p95', 'p99', 'max')
+
+_EPOCH_COLUMN = 'epoch'
+
+
+class _ColumnSummary(object):
+  """Running summary statistics of a single dstat column.
+
+  The mean and max are exact. Percentiles are computed from a fixed-size
+  uniform sample of the values (reservoir sampling), so they are exact as long
+  as the column has no more than 'reservoir_size' values.
+  """
+
+  def __init__(self, reservoir_size=RESERVOIR_SIZE, seed=0):
+    self.count = 0
+    self.total = 0.0
+    self.max = None
+    self._reservoir_size = reservoir_size
+    self._reservoir = array.array('d')
+    self._random = random.Random(seed)
+
+  def Add(self, value):
+    self.count += 1
+    self.total += value
+    if self.max is None or value > self.max:
+      self.max = value
+    if len(self._reservoir) < self._reservoir_size:
+      self._reservoir.append(value)
+    else:
+      index = self._random.randint(0, self.count - 1)
+      if index < self._reservoir_size:
+        self._reservoir[index] = value
+
+  def Statistics(self):
+    """Returns a dict mapping each of SUMMARY_STATISTICS to its value."""
+    values = sorted(self._reservoir)
+
+    def Percentile(percentile):
+      return values[min(len(values) - 1,
+                        int(len(values) * percentile / 100.0))]
+
+    return {'mean': self.total / self.count,
+            'p50': Percentile(50),
+            'p95': Percentile(95),
+            'p99': Percentile(99),
+            'max': self.max}
+
+
+def _ParseValue(value):
+  try:
+    return float(value)
+  except ValueError:
+    return None
+
+
+def _ReadColumnNames(reader):
+  """Consumes the dstat CSV preamble and header rows from 'reader'.
+
+  dstat writes a few lines of free-form information about the host, followed
+  by two header rows: one naming the groups of columns (e.g. "total cpu
+  usage"), with empty cells for columns belonging to the preceding group, and
+  one naming the individual columns (e.g. "usr").
+
+  Args:
+    reader: csv.reader over a dstat CSV file.
+
+  Returns:
+    list of strings. One name per column, of the form 'group:column', except
+    for the epoch column, which is named 'epoch'.
+
+  Raises:
+    ValueError: if the header rows are not found.
+  """
+  for row in reader:
+    if row and row[0] == _EPOCH_COLUMN:
+      group_row = row
+      break
+  else:
+    raise ValueError('dstat CSV is missing its header rows.')
+  column_row = next(reader, None)
+  if not column_row:
+    raise ValueError('dstat CSV is missing its column header row.')
+  names = []
+  group = None
+  for i, column in enumerate(column_row):
+    if i < len(group_row) and group_row[i]:
+      group = group_row[i]
+    if group == _EPOCH_COLUMN and column == _EPOCH_COLUMN:
+      names.append(_EPOCH_COLUMN)
+    else:
+      names.append('{0}:{1}'.format(group, column))
+  return names
+
+
+def _IterRows(reader, num_columns, start_time=None, end_time=None):
+  """Yields the rows of a dstat CSV as lists of floats (or None if missing).
+
+  Rows are read one at a time, so arbitrarily large files can be processed.
+  Rows with the wrong number of cells (e.g. a partial last line written while
+  dstat was being killed) and rows outside [start_time, end_time] are skipped.
+  """
+  for row in reader:
+    if len(row) != num_columns:
+      continue
+    values = [_ParseValue(value) for value in row]
+    epoch = values[0]
+    if epoch is None:
+      continue
+    if start_time is not None and epoch < start_time:
+      continue
+    if end_time is not None and epoch > end_time:
+      continue
+    yield values
+
+
+def SummarizeCsv(path, start_time=None, end_time=None, column_regex=None):
+  """Computes summary statistics of each column of a dstat CSV file.
+
+  Args:
+    path: string. Path to a CSV file written by 'dstat --epoch --output'.
+    start_time: float. Optional. Rows with an earlier epoch are ignored.
+    end_time: float. Optional. Rows with a later epoch are ignored.
+    column_regex: string. Optional. Only columns whose name matches this
+      regular expression are summarized.
+
+  Returns:
+    list of (column name, statistics dict) pairs, in file order. Columns
+    without any values are omitted.
+  """
+  pattern = re.compile(column_regex) if column_regex else None
+  with open(path, 'rb') as csv_file:
+    reader = csv.reader(csv_file)
+    names = _ReadColumnNames(reader)
+    indices = [i for i, name in enumerate(names)
+               if name != _EPOCH_COLUMN and
+               (pattern is None or pattern.search(name))]
+    summaries = [_ColumnSummary() for _ in indices]
+    for values in _IterRows(reader, len(names), start_time, end_time):
+      for i, summary in zip(indices, summaries):
+        if values[i] is not None:
+          summary.Add(values[i])
+  return [(names[i], summary.Statistics())
+          for i, summary in zip(indices, summaries) if summary.count]
+
+
+def CreateSamples(summaries, metadata=None):
+  """Converts the output of SummarizeCsv into a list of samples.
+
+  Args:
+    summaries: list of (column name, statistics dict) pairs.
+    metadata: dict. Optional. Metadata added to every sample.
+
+  Returns:
+    list of sample.Sample objects, one per column and statistic. The metric
+    is 'dstat <column name> <statistic>'.
+  """
+  samples = []
+  for name, statistics in summaries:
+    for statistic in SUMMARY_STATISTICS:
+      sample_metadata = {'dstat_column': name, 'statistic': statistic}
+      sample_metadata.update(metadata or {})
+      samples.append(sample.Sample(
+          'dstat {0} {1}'.format(name, statistic), statistics[statistic],
+          '', sample_metadata))
+  return samples
+
+
+def WriteTimeSeries(path, output_prefix, start_time, end_time):
+  """Converts a dstat CSV file into a columnar NumPy time series.
+
+  Two files are written:
+    <output_prefix>.npy: a 2-D float64 array with one row per dstat row
+        between 'start_time' and 'end_time'. It is stored in column-major
+        (Fortran) order, so each column is contiguous on disk and can be
+        loaded cheaply with numpy.load(..., mmap_mode='r'). Column 0 holds
+        the number of seconds since 'start_time'; missing values are NaN.
+    <output_prefix>.json: the column names and the phase boundaries.
+
+  The CSV file is read twice (once to count rows, once to fill a
+  memory-mapped array), so memory use does not depend on the file size.
+
+  Args:
+    path: string. Path to a CSV file written by 'dstat --epoch --output'.
+    output_prefix: string. Path, without extension, of the files to write.
+    start_time: float. Start of the phase, in seconds since the epoch.
+    end_time: float. End of the phase, in seconds since the epoch.
+
+  Returns:
+    string. Path to the .npy file.
+
+  Raises:
+    ImportError: if NumPy is not installed.
+  """
+  if numpy is None:
+    raise ImportError('NumPy is required to write dstat time series.')
+  with open(path, 'rb') as csv_file:
+    reader = csv.reader(csv_file)
+    names = _ReadColumnNames(reader)
+    num_rows = sum(1 for _ in _IterRows(reader, len(names), start_time,
+                                        end_time))
+  array_path = output_prefix + '.npy'
+  time_series = numpy.lib.format.open_memmap(
+      array_path, mode='w+', dtype=numpy.float64,
+      shape=(num_rows, len(names)), fortran_order=True)
+  with open(path, 'rb') as csv_file:
+    reader = csv.reader(csv_file)
+    _ReadColumnNames(reader)
+    rows = _IterRows(reader, len(names), start_time, end_time)
+    for i, values in enumerate(rows):
+      if i == num_rows:
+        break
+      values[0] -= start_time
+      time_series[i] = [numpy.nan if v is None else v for v in values]
+  time_series.flush()
+  del time_series
+
+  names[0] = 'seconds_since_phase_start'
+  with open(output_prefix + '.json', 'w') as metadata_file:
+    json.dump({'columns': names,
+               'phase': events.RUN_PHASE,
+               'phase_start': start_time,
+               'phase_end': end_time}, metadata_file, indent=2)
+  return array_path
 
 
 class _DStatCollector(object):
@@ -46,19 +302,29 @@ class _DStatCollector(object):
   Installs and runs dstat on a collection of VMs.
   """
 
-  def __init__(self, interval=None, output_directory=None):
+  def __init__(self, interval=None, output_directory=None, publish=False,
+               publish_regex=None, timeseries=False):
     """Runs dstat on 'vms'.
 
     Start dstat collection via `Start`. Stop via `Stop`.
 
     Args:
       interval: Optional int. Interval in seconds in which to collect samples.
+      output_directory: Optional string. Directory the CSV files are copied to.
+      publish: boolean. Whether `Stop` returns summary samples of each column.
+      publish_regex: Optional string. Only columns matching this regular
+        expression are published.
+      timeseries: boolean. Whether to write a NumPy time series of each CSV.
     """
     self.interval = interval
     self.output_directory = output_directory or vm_util.GetTempDir()
+    self.publish = publish
+    self.publish_regex = publish_regex
+    self.timeseries = timeseries
     self._lock = threading.Lock()
     self._pids = {}
     self._file_names = {}
+    self._start_times = {}
 
     if not os.path.isdir(self.output_directory):
       raise IOError('dstat output directory does not exist: {0}'.format(
@@ -90,11 +356,16 @@ class _DStatCollector(object):
       self._pids[vm.name] = stdout.strip()
       self._file_names[vm.name] = dstat_file
 
-  def _StopOnVm(self, vm):
-    """Stop dstat on 'vm', copy the results to the run temporary directory."""
+  def _StopOnVm(self, vm, start_time=None, end_time=None):
+    """Stop dstat on 'vm', copy the results to the run temporary directory.
+
+    Returns:
+      list of summary samples for 'vm' if publishing is enabled, else an empty
+      list.
+    """
     if vm.name not in self._pids:
       logging.warn('No dstat PID for %s', vm.name)
-      return
+      return []
     else:
       with self._lock:
         pid = self._pids.pop(vm.name)
@@ -105,6 +376,26 @@ class _DStatCollector(object):
       vm.PullFile(self.output_directory, file_name)
     except:
       logging.exception('Failed fetching dstat result from %s.', vm.name)
+      return []
+    return self._AnalyzeFile(
+        vm, os.path.join(self.output_directory, posixpath.basename(file_name)),
+        start_time, end_time)
+
+  def _AnalyzeFile(self, vm, local_path, start_time, end_time):
+    """Summarizes and converts a dstat CSV file pulled from 'vm'."""
+    samples = []
+    try:
+      if self.publish:
+        summaries = SummarizeCsv(local_path, start_time, end_time,
+                                 self.publish_regex)
+        samples = CreateSamples(summaries, {'vm_name': vm.name,
+                                            'phase': events.RUN_PHASE})
+      if self.timeseries and start_time is not None:
+        WriteTimeSeries(local_path, os.path.splitext(local_path)[0],
+                        start_time, end_time)
+    except (IOError, ValueError):
+      logging.exception('Failed analyzing dstat result from %s.', vm.name)
+    return samples
 
   def Start(self, sender, benchmark_spec):
     """Install and start dstat on all VMs in 'benchmark_spec'."""
@@ -112,10 +403,23 @@ class _DStatCollector(object):
                                      str(uuid.uuid4())[:8])
     start_on_vm = functools.partial(self._StartOnVm, suffix=suffix)
     vm_util.RunThreaded(start_on_vm, benchmark_spec.vms)
+    with self._lock:
+      self._start_times[benchmark_spec.uid] = time.time()
 
   def Stop(self, sender, benchmark_spec):
-    """Stop dstat on all VMs in 'benchmark_spec', fetch results."""
-    vm_util.RunThreaded(self._StopOnVm, benchmark_spec.vms)
+    """Stop dstat on all VMs in 'benchmark_spec', fetch results.
+
+    Returns:
+      list of summary samples for all VMs in 'benchmark_spec'. Empty unless
+      publishing is enabled.
+    """
+    end_time = time.time()
+    with self._lock:
+      start_time = self._start_times.pop(benchmark_spec.uid, None)
+    stop_on_vm = functools.partial(self._StopOnVm, start_time=start_time,
+                                   end_time=end_time)
+    results = vm_util.RunThreaded(stop_on_vm, benchmark_spec.vms)
+    return [s for vm_samples in results for s in vm_samples or ()]
 
 
 def Register(parsed_flags):
@@ -132,7 +436,15 @@ def Register(parsed_flags):
 
   if not os.path.isdir(output_directory):
     os.makedirs(output_directory)
+  timeseries = parsed_flags.dstat_timeseries
+  if timeseries and numpy is None:
+    logging.warning('--dstat_timeseries requires NumPy, which is not '
+                    'installed. dstat time series will not be written.')
+    timeseries = False
   collector = _DStatCollector(interval=parsed_flags.dstat_interval,
-                              output_directory=output_directory)
+                              output_directory=output_directory,
+                              publish=parsed_flags.dstat_publish,
+                              publish_regex=parsed_flags.dstat_publish_regex,
+                              timeseries=timeseries)
   events.before_phase.connect(collector.Start, events.RUN_PHASE, weak=False)
   events.after_phase.connect(collector.Stop, events.RUN_PHASE, weak=False)
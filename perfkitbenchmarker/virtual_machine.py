@@ -302,6 +302,8 @@ class BaseOsMixin(object):
 
   Attributes:
     bootable_time: The time when the VM finished booting.
+    port_open_time: The time when the port used to run commands on the VM
+        (e.g. SSH) first accepted connections, or None if it was not probed.
     hostname: The VM's hostname.
     remote_access_ports: A list of ports which must be opened on the firewall
         in order to access the VM.
@@ -315,6 +317,7 @@ class BaseOsMixin(object):
     self._installed_packages = set()
 
     self.bootable_time = None
+    self.port_open_time = None
     self.hostname = None
 
     # Ports that will be opened by benchmark_spec to permit access to the VM.
@@ -371,7 +374,7 @@ class BaseOsMixin(object):
     """Waits until VM is has booted.
 
     Implementations of this method should set the 'bootable_time' attribute
-    and the 'hostname' attribute.
+    and the 'hostname' attribute, and may set the 'port_open_time' attribute.
     """
     raise NotImplementedError()
 
@@ -412,6 +415,22 @@ class BaseOsMixin(object):
     """Perform OS specific setup on any local disks that exist."""
     pass
 
+  def OpenSshConnections(self):
+    """Opens any persistent connections used to run remote commands.
+
+    This will be called once the VM has booted. The default implementation
+    is a noop.
+    """
+    pass
+
+  def CloseSshConnections(self):
+    """Closes any persistent connections used to run remote commands.
+
+    This will be called once before the VM is deleted. The default
+    implementation is a noop.
+    """
+    pass
+
   def PushFile(self, source_path, remote_path=''):
     """Copies a file or a directory to the VM.
 
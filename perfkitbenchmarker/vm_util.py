@@ -14,6 +14,7 @@
 
 """Set of utility functions for working with virtual machines."""
 
+from collections import deque
 from collections import namedtuple
 from concurrent import futures
 import contextlib
@@ -37,6 +38,7 @@ from perfkitbenchmarker import data
 from perfkitbenchmarker import errors
 from perfkitbenchmarker import flags
 from perfkitbenchmarker import log_util
+from perfkitbenchmarker import rate_limiter
 from perfkitbenchmarker import regex_util
 
 FLAGS = flags.FLAGS
@@ -53,12 +55,22 @@ VM_TMP_DIR = '/tmp/pkb'
 
 # Default timeout for issuing a command.
 DEFAULT_TIMEOUT = 300
+# Time after which StartSshControlMaster gives up connecting.
+SSH_MASTER_TIMEOUT = 60
+# Minimum time between two checks that an SSH master connection is running.
+SSH_MASTER_CHECK_INTERVAL = 60
 
 # Defaults for retrying commands.
 POLL_INTERVAL = 30
 TIMEOUT = 1200
 FUZZ = .5
 MAX_RETRIES = -1
+# Initial time between the tries of IssueRetryableCommand. It doubles after
+# each try, up to POLL_INTERVAL.
+RETRYABLE_COMMAND_BACKOFF = 1
+# Bounds of the backoff of Retry after a call throttled by a cloud API.
+THROTTLE_BACKOFF = 1
+MAX_THROTTLE_BACKOFF = 60
 
 WINDOWS = 'nt'
 PASSWORD_LENGTH = 15
@@ -67,6 +79,12 @@ OUTPUT_STDOUT = 0
 OUTPUT_STDERR = 1
 OUTPUT_EXIT_CODE = 2
 
+# Number of trailing bytes of stdout and stderr kept by IssueCommand when
+# stdout is streamed to a callback.
+OUTPUT_TAIL_SIZE = 64 * 1024
+# Size of the reads of stderr by IssueCommand when stdout is streamed.
+_OUTPUT_READ_SIZE = 64 * 1024
+
 flags.DEFINE_integer('default_timeout', TIMEOUT, 'The default timeout for '
                      'retryable commands in seconds.')
 flags.DEFINE_integer('burn_cpu_seconds', 0,
@@ -77,6 +95,20 @@ flags.DEFINE_integer('burn_cpu_threads', 1, 'Number of threads to use to '
 flags.DEFINE_integer('background_cpu_threads', None,
                      'Number of threads of background cpu usage while '
                      'running a benchmark')
+flags.DEFINE_boolean('ssh_reuse_connections', True,
+                     'Whether to multiplex SSH commands and copies to a VM '
+                     'over a single persistent master connection instead of '
+                     'performing a full handshake for every invocation. Not '
+                     'supported when running PKB on Windows.')
+flags.DEFINE_string('ssh_control_path', None,
+                    'Overrides the ControlPath used for SSH master '
+                    'connections. Defaults to a socket per host in the run '
+                    'temporary directory. Only applicable when '
+                    '--ssh_reuse_connections is set.')
+flags.DEFINE_string('ssh_control_persist', '30m',
+                    'How long an idle SSH master connection stays open, in '
+                    'the format accepted by the ControlPersist ssh option. '
+                    'Only applicable when --ssh_reuse_connections is set.')
 
 
 class IpAddressSubset(object):
@@ -178,6 +210,8 @@ def GetSshOptions(ssh_key_filename):
       '-o', 'ServerAliveCountMax=10',
       '-i', ssh_key_filename
   ]
+  if SshConnectionReuseEnabled():
+    options.extend(GetSshControlOptions())
   options.extend(FLAGS.ssh_options)
   if FLAGS.log_level == 'debug':
     options.append('-v')
@@ -185,6 +219,89 @@ def GetSshOptions(ssh_key_filename):
   return options
 
 
+def SshConnectionReuseEnabled():
+  """Returns whether SSH commands should share a master connection."""
+  return FLAGS.ssh_reuse_connections and not RunningOnWindows()
+
+
+def GetSshControlOptions():
+  """Returns the SSH options that enable connection multiplexing.
+
+  ssh and scp invocations reuse the authenticated connection of the master
+  started by StartSshControlMaster for the same user, host and port, skipping
+  the TCP and key exchange handshakes. They connect directly if there is no
+  master.
+
+  Invocations never become the master themselves: a master started by
+  IssueCommand would inherit its stderr pipe and keep it open, so that
+  IssueCommand would wait for the master to exit.
+  """
+  # %C is a hash of the local host, remote user, host and port, which keeps
+  # the socket path short enough for the unix domain socket length limit.
+  control_path = FLAGS.ssh_control_path or os.path.join(GetTempDir(), '%C')
+  return [
+      '-o', 'ControlMaster=no',
+      '-o', 'ControlPath=%s' % control_path
+  ]
+
+
+def StartSshControlMaster(user_host, port, ssh_key_filename,
+                          timeout=SSH_MASTER_TIMEOUT):
+  """Starts a master connection reused by the ssh and scp invocations.
+
+  The master goes to the background once it is connected, and stays there
+  until it has been idle for FLAGS.ssh_control_persist or is stopped with
+  'ssh -O exit'. Its stdin, stdout and stderr are closed so that it does not
+  hold the pipes of any command.
+
+  Args:
+    user_host: string. The user and host to connect to, as 'user@host'.
+    port: int. The SSH port of the host.
+    ssh_key_filename: string. Path to the private key.
+    timeout: int. Time after which to give up connecting, in seconds.
+
+  Returns:
+    Whether the master is running.
+  """
+  # ssh uses the first value of each option, so the ControlMaster option
+  # must come before the ones returned by GetSshOptions.
+  cmd = ['ssh', '-f', '-N', '-o', 'ControlMaster=yes',
+         '-o', 'ControlPersist=%s' % FLAGS.ssh_control_persist,
+         '-p', str(port), user_host]
+  cmd.extend(GetSshOptions(ssh_key_filename))
+  logging.info('Running: %s', ' '.join(cmd))
+  with open(os.devnull, 'r+') as devnull:
+    process = subprocess.Popen(cmd, stdin=devnull, stdout=devnull,
+                               stderr=devnull, close_fds=True)
+  timer = threading.Timer(timeout, process.kill)
+  timer.start()
+  try:
+    retcode = process.wait()
+  finally:
+    timer.cancel()
+  if retcode:
+    logging.info('Could not start an SSH master connection to %s. Got return '
+                 'code (%s).', user_host, retcode)
+  return not retcode
+
+
+def CheckSshControlMaster(user_host, port, ssh_key_filename):
+  """Returns whether the master connection to a host is running.
+
+  Only talks to the local master process ('ssh -O check'), so it does not
+  connect to the host.
+
+  Args:
+    user_host: string. The user and host of the master, as 'user@host'.
+    port: int. The SSH port of the host.
+    ssh_key_filename: string. Path to the private key.
+  """
+  cmd = ['ssh', '-O', 'check', '-p', str(port), user_host]
+  cmd.extend(GetSshOptions(ssh_key_filename))
+  _, _, retcode = IssueCommand(cmd, suppress_warning=True)
+  return not retcode
+
+
 def _GetCallString(target_arg_tuple):
   """Returns the string representation of a function call."""
   target, args, kwargs = target_arg_tuple
@@ -209,15 +326,115 @@ def _GetCallString(target_arg_tuple):
 #       an exception was raised.
 #   traceback: None if the call was executed successfully, or the traceback
 #       string if the call raised an exception.
+#   duration: float. Wall time of the call in seconds.
 ThreadCallResult = namedtuple('ThreadCallResult', [
-    'call_id', 'return_value', 'traceback'])
+    'call_id', 'return_value', 'traceback', 'duration'])
+
+# Upper bound on the number of threads in the shared pool. Calls that cannot
+# get a pooled thread run in the thread that submitted them.
+MAX_POOL_THREADS = 1024
+
+
+class _ThreadPool(object):
+  """Long-lived pool of daemon threads shared by every RunParallelThreads call.
+
+  Threads are started on demand and reused once idle, so repeated fan-outs do
+  not pay for thread creation. The pool never queues work behind busy
+  threads: a call either gets an idle thread, a new thread, or is refused.
+  Refusing instead of queueing keeps nested RunParallelThreads calls, whose
+  submitting threads are themselves pool threads, from deadlocking.
+  """
+
+  def __init__(self, max_threads):
+    self._max_threads = max_threads
+    self._lock = threading.Lock()
+    self._work = Queue.Queue()
+    self._thread_count = 0
+    # Idle threads not yet promised to a submitted work item.
+    self._available = 0
+
+  def _Worker(self):
+    while True:
+      func = self._work.get()
+      func()
+      with self._lock:
+        self._available += 1
+
+  def Submit(self, func):
+    """Runs func() on a pool thread.
+
+    Args:
+      func: Function taking no arguments. It must not raise.
+
+    Returns:
+      True if func was handed to a pool thread, False if the pool is at its
+      thread limit and the caller must run func itself.
+    """
+    with self._lock:
+      if self._available:
+        self._available -= 1
+      elif self._thread_count < self._max_threads:
+        self._thread_count += 1
+        thread = threading.Thread(target=self._Worker,
+                                  name='pkb-pool-{0}'.format(
+                                      self._thread_count))
+        thread.daemon = True
+        thread.start()
+      else:
+        return False
+    self._work.put(func)
+    return True
+
+
+_thread_pool = _ThreadPool(MAX_POOL_THREADS)
+
+
+class _CancellationToken(object):
+  """Marks the calls of a fail-fast RunParallelThreads call as cancelled.
+
+  Tokens nest: a call started by RunParallelThreads from within another
+  RunParallelThreads call is cancelled when either call is.
+  """
+
+  def __init__(self, parent=None):
+    self._parent = parent
+    self._event = threading.Event()
+
+  def Cancel(self):
+    self._event.set()
+
+  def IsCancelled(self):
+    return self._event.is_set() or (self._parent is not None and
+                                    self._parent.IsCancelled())
+
+
+class _ThreadData(threading.local):
+  def __init__(self):
+    self.cancellation_token = None
+
+
+_thread_local = _ThreadData()
+
+
+def IsCallCancelled():
+  """Returns whether the current thread's RunParallelThreads call is cancelled.
+
+  Long-running calls made through RunThreaded or RunParallelThreads with
+  fail_fast=True may check this to give up early once another call in the
+  same fan-out has failed. Functions decorated with Retry check it before
+  every retry.
+  """
+  token = _thread_local.cancellation_token
+  return token is not None and token.IsCancelled()
 
 
 def _ExecuteThreadCall(target_arg_tuple, call_id, queue, parent_log_context,
-                       parent_benchmark_spec):
+                       parent_benchmark_spec, cancellation_token):
   """Function invoked in another thread by RunParallelThreads.
 
   Executes a specified function call and captures the traceback upon exception.
+  The thread's log context, benchmark spec and cancellation token are restored
+  afterwards, since the thread is reused for other calls.
 
   Args:
     target_arg_tuple: (target, args, kwargs) tuple containing the function to
@@ -227,25 +444,58 @@ def _ExecuteThreadCall(target_arg_tuple, call_id, queue, parent_log_context,
     queue: Queue. Receives a ThreadCallResult.
     parent_log_context: ThreadLogContext of the parent thread.
     parent_benchmark_spec: BenchmarkSpec of the parent thread.
+    cancellation_token: _CancellationToken of the RunParallelThreads call.
   """
   target, args, kwargs = target_arg_tuple
+  saved_log_context = log_util.GetThreadLogContext()
+  saved_benchmark_spec = context.GetThreadBenchmarkSpec()
+  saved_cancellation_token = _thread_local.cancellation_token
+  start_time = time.time()
   try:
     log_context = log_util.ThreadLogContext(parent_log_context)
     log_util.SetThreadLogContext(log_context)
     context.SetThreadBenchmarkSpec(parent_benchmark_spec)
-    queue.put(ThreadCallResult(call_id, target(*args, **kwargs), None))
+    _thread_local.cancellation_token = cancellation_token
+    result = ThreadCallResult(call_id, target(*args, **kwargs), None,
+                              time.time() - start_time)
   except:
-    queue.put(ThreadCallResult(call_id, None, traceback.format_exc()))
-
-
-def RunParallelThreads(target_arg_tuples, max_concurrency):
+    result = ThreadCallResult(call_id, None, traceback.format_exc(),
+                              time.time() - start_time)
+  finally:
+    log_util.SetThreadLogContext(saved_log_context)
+    context.SetThreadBenchmarkSpec(saved_benchmark_spec)
+    _thread_local.cancellation_token = saved_cancellation_token
+  queue.put(result)
+
+
+def _LogCallDurations(target_arg_tuples, durations, elapsed):
+  """Logs timing statistics for the calls of a RunParallelThreads call."""
+  if len(durations) < 2:
+    return
+  slowest_call_id = max(durations, key=durations.get)
+  sorted_durations = sorted(durations.itervalues())
+  logging.debug(
+      'Ran %d of %d calls in %.2fs. Per call: min %.2fs, median %.2fs, '
+      'max %.2fs (%s).', len(durations), len(target_arg_tuples), elapsed,
+      sorted_durations[0], sorted_durations[len(sorted_durations) // 2],
+      sorted_durations[-1],
+      _GetCallString(target_arg_tuples[slowest_call_id]))
+
+
+def RunParallelThreads(target_arg_tuples, max_concurrency, fail_fast=False):
   """Executes function calls concurrently in separate threads.
 
+  The calls run on a pool of threads shared by the whole run (see
+  _ThreadPool). Each call inherits the calling thread's log context and
+  benchmark spec.
+
   Args:
     target_arg_tuples: list of (target, args, kwargs) tuples. Each tuple
         contains the function to call and the arguments to pass it.
-    max_concurrency: int or None. The maximum number of concurrent new
-        threads.
+    max_concurrency: int or None. The maximum number of concurrent calls.
+    fail_fast: boolean. If True, once a call fails no further calls are
+        started, and calls already running are cancelled (see
+        IsCallCancelled). The calls already running are still waited for.
 
   Returns:
     list of function return values in the order corresponding to the order of
@@ -258,49 +508,61 @@ def RunParallelThreads(target_arg_tuples, max_concurrency):
   queue = Queue.Queue()
   log_context = log_util.GetThreadLogContext()
   benchmark_spec = context.GetThreadBenchmarkSpec()
+  cancellation_token = _CancellationToken(_thread_local.cancellation_token)
   max_concurrency = min(max_concurrency, len(target_arg_tuples))
   results = [None] * len(target_arg_tuples)
+  durations = {}
   error_strings = []
-  for call_id in xrange(max_concurrency):
-    target_arg_tuple = target_arg_tuples[call_id]
-    thread = threading.Thread(
-        target=_ExecuteThreadCall,
-        args=(target_arg_tuple, call_id, queue, log_context, benchmark_spec))
-    thread.daemon = True
-    thread.start()
-  active_thread_count = max_concurrency
-  next_call_id = max_concurrency
-  while active_thread_count:
+  start_time = time.time()
+
+  def StartCall(call_id):
+    call = functools.partial(
+        _ExecuteThreadCall, target_arg_tuples[call_id], call_id, queue,
+        log_context, benchmark_spec, cancellation_token)
+    if not _thread_pool.Submit(call):
+      call()
+
+  next_call_id = 0
+  active_call_count = 0
+  while next_call_id < max_concurrency:
+    StartCall(next_call_id)
+    next_call_id += 1
+    active_call_count += 1
+  while active_call_count:
     try:
       # Using a timeout makes this wait interruptable.
-      call_id, result, stacktrace = queue.get(block=True, timeout=1000)
+      call_id, result, stacktrace, duration = queue.get(block=True,
+                                                        timeout=1000)
     except Queue.Empty:
       continue
+    active_call_count -= 1
     results[call_id] = result
+    durations[call_id] = duration
     if stacktrace:
       msg = ('Exception occurred while calling {0}:{1}{2}'.format(
           _GetCallString(target_arg_tuples[call_id]), os.linesep, stacktrace))
       logging.error(msg)
       error_strings.append(msg)
-    if next_call_id == len(target_arg_tuples):
-      active_thread_count -= 1
-    else:
-      target_arg_tuple = target_arg_tuples[next_call_id]
-      thread = threading.Thread(
-          target=_ExecuteThreadCall,
-          args=(target_arg_tuple, next_call_id, queue, log_context,
-                benchmark_spec))
-      thread.daemon = True
-      thread.start()
+      if fail_fast:
+        cancellation_token.Cancel()
+    if (next_call_id < len(target_arg_tuples) and
+        not cancellation_token.IsCancelled()):
+      StartCall(next_call_id)
       next_call_id += 1
+      active_call_count += 1
+  _LogCallDurations(target_arg_tuples, durations, time.time() - start_time)
   if error_strings:
+    not_started = len(target_arg_tuples) - next_call_id
+    if not_started:
+      error_strings.append('{0} calls were not started.'.format(not_started))
     raise errors.VmUtil.ThreadException(
         'The following exceptions occurred during threaded execution:'
         '{0}{1}'.format(os.linesep, os.linesep.join(error_strings)))
   return results
 
 
-def RunThreaded(target, thread_params, max_concurrent_threads=200):
+def RunThreaded(target, thread_params, max_concurrent_threads=200,
+                fail_fast=False):
   """Runs the target method in parallel threads.
 
   The method starts up threads with one arg from thread_params as the first arg.
@@ -311,6 +573,8 @@ def RunThreaded(target, thread_params, max_concurrent_threads=200):
         in the list can either be a singleton or a (args, kwargs) tuple/list.
         Usually this is a list of VMs.
     max_concurrent_threads: The maximum number of concurrent threads to allow.
+    fail_fast: If True, stop starting new calls once one call has failed, and
+        cancel the calls already running. See RunParallelThreads.
 
   Returns:
     List of the same length as thread_params. Contains the return value from
@@ -353,7 +617,8 @@ def RunThreaded(target, thread_params, max_concurrent_threads=200):
                          for args, kwargs in thread_params]
 
   return RunParallelThreads(target_arg_tuples,
-                            max_concurrency=max_concurrent_threads)
+                            max_concurrency=max_concurrent_threads,
+                            fail_fast=fail_fast)
 
 
 def _ExecuteProcCall(target_arg_tuple):
@@ -424,11 +689,27 @@ def RunParallelProcesses(target_arg_tuples, max_concurrency=None):
   return results
 
 
+def _GetFullJitterBackoff(base, cap, attempt):
+  """Returns a random sleep time of a capped exponential backoff.
+
+  Args:
+    base: float. Maximum sleep time after the first attempt, in seconds.
+    cap: float. Maximum sleep time after any attempt, in seconds.
+    attempt: int. Number of the attempt that failed, starting at 1.
+  """
+  return random.uniform(0, min(cap, base * 2 ** (attempt - 1)))
+
+
 def Retry(poll_interval=POLL_INTERVAL, max_retries=MAX_RETRIES,
           timeout=None, fuzz=FUZZ, log_errors=True,
-          retryable_exceptions=None):
+          retryable_exceptions=None, max_poll_interval=None):
   """A function decorator that will retry when exceptions are thrown.
 
+  When the last cloud API call of a failed try was throttled (see
+  rate_limiter), the next try waits for a capped exponential backoff with
+  full jitter between THROTTLE_BACKOFF and MAX_THROTTLE_BACKOFF seconds,
+  which grows with the number of throttled tries, instead of poll_interval.
+
   Args:
     poll_interval: The time between tries in seconds. This is the maximum poll
         interval when fuzz is specified.
@@ -446,6 +727,10 @@ def Retry(poll_interval=POLL_INTERVAL, max_retries=MAX_RETRIES,
     retryable_exceptions: A tuple of exceptions that should be retried. By
         default, this is None, which indicates that all exceptions should
         be retried.
+    max_poll_interval: If set, the time between tries doubles after each try,
+        starting at poll_interval, up to max_poll_interval seconds, and the
+        sleep time is drawn uniformly between 0 and that time (full jitter).
+        fuzz is then ignored.
 
   Returns:
     A function that wraps functions in retry logic. It can be
@@ -466,28 +751,124 @@ def Retry(poll_interval=POLL_INTERVAL, max_retries=MAX_RETRIES,
         deadline = float('inf')
 
       tries = 0
+      throttled_tries = 0
       while True:
+        rate_limiter.ClearLastCall()
         try:
           tries += 1
           return f(*args, **kwargs)
         except retryable_exceptions as e:
-          fuzz_multiplier = 1 - fuzz + random.random() * fuzz
-          sleep_time = poll_interval * fuzz_multiplier
+          if rate_limiter.WasLastCallThrottled():
+            throttled_tries += 1
+            sleep_time = _GetFullJitterBackoff(
+                THROTTLE_BACKOFF, MAX_THROTTLE_BACKOFF, throttled_tries)
+          elif max_poll_interval is not None:
+            sleep_time = _GetFullJitterBackoff(poll_interval,
+                                               max_poll_interval, tries)
+          else:
+            fuzz_multiplier = 1 - fuzz + random.random() * fuzz
+            sleep_time = poll_interval * fuzz_multiplier
           if ((time.time() + sleep_time) >= deadline or
               (max_retries >= 0 and tries > max_retries)):
             raise e
+          elif IsCallCancelled():
+            logging.info('Not retrying %s: another call in the same '
+                         'fan-out failed.', f.__name__)
+            raise e
           else:
             if log_errors:
               logging.error('Got exception running %s: %s', f.__name__, e)
+            rate_limiter.RecordRetry()
             time.sleep(sleep_time)
     return WrappedFunction
   return Wrap
 
 
+class _OutputTail(object):
+  """The last 'max_size' bytes of a stream of output.
+
+  Attributes:
+    max_size: int. Maximum number of bytes kept.
+    size: int. Total number of bytes appended.
+  """
+
+  def __init__(self, max_size):
+    self.max_size = max_size
+    self.size = 0
+    self._chunks = deque()
+    self._kept_size = 0
+
+  def Append(self, data):
+    self.size += len(data)
+    self._chunks.append(data)
+    self._kept_size += len(data)
+    while self._kept_size - len(self._chunks[0]) >= self.max_size:
+      self._kept_size -= len(self._chunks.popleft())
+
+  def GetValue(self):
+    value = ''.join(self._chunks)[-self.max_size:]
+    if self.size > len(value):
+      value = '[{0} bytes omitted]\n{1}'.format(self.size - len(value), value)
+    return value
+
+
+def _StreamOutput(process, input, stdout_callback):
+  """Streams the stdout of 'process' to a callback, line by line.
+
+  stdin is written and stderr read in separate threads, so that the process
+  cannot block on a full pipe. If the callback raises, the process is killed
+  and waited for before the exception propagates.
+
+  Returns:
+    A tuple of the tails (see _OutputTail) of stdout and stderr.
+  """
+  stdout_tail = _OutputTail(OUTPUT_TAIL_SIZE)
+  stderr_tail = _OutputTail(OUTPUT_TAIL_SIZE)
+
+  def WriteInput():
+    try:
+      if input:
+        process.stdin.write(input)
+      process.stdin.close()
+    except IOError:
+      # The process exited without reading all of its input.
+      pass
+
+  def ReadStderr():
+    read = functools.partial(process.stderr.read, _OUTPUT_READ_SIZE)
+    for chunk in iter(read, ''):
+      stderr_tail.Append(chunk)
+
+  threads = [threading.Thread(target=WriteInput),
+             threading.Thread(target=ReadStderr)]
+  for thread in threads:
+    thread.daemon = True
+    thread.start()
+  try:
+    for line in iter(process.stdout.readline, ''):
+      stdout_tail.Append(line)
+      stdout_callback(line)
+  except:
+    # The callback failed: stop the process, which closes its stderr and
+    # stdin so that the threads finish too.
+    if process.poll() is None:
+      process.kill()
+    raise
+  finally:
+    for thread in threads:
+      thread.join()
+    process.wait()
+  return stdout_tail.GetValue(), stderr_tail.GetValue()
+
+
 def IssueCommand(cmd, force_info_log=False, suppress_warning=False,
-                 env=None, timeout=DEFAULT_TIMEOUT, input=None):
+                 env=None, timeout=DEFAULT_TIMEOUT, input=None,
+                 stdout_callback=None):
   """Tries running the provided command once.
 
+  Commands calling the API of a cloud provider are delayed as needed to stay
+  within its rate limit, see rate_limiter.
+
   Args:
     cmd: A list of strings such as is given to the subprocess.Popen()
         constructor.
@@ -506,12 +887,19 @@ def IssueCommand(cmd, force_info_log=False, suppress_warning=False,
         return code will indicate an error, and stdout and stderr will
         contain what had already been written to them before the process was
         killed.
+    input: string. Written to the command's stdin.
+    stdout_callback: A callable. If specified, stdout is not buffered:
+        stdout_callback is called with each line of stdout as soon as it is
+        read (e.g. the write method of a file, or a parser consuming the output
+        incrementally), and only the last OUTPUT_TAIL_SIZE bytes of stdout and
+        stderr are kept for the returned values and the log.
 
   Returns:
     A tuple of stdout, stderr, and retcode from running the provided command.
   """
   logging.debug('Environment variables: %s' % env)
 
+  api = rate_limiter.Acquire(cmd)
   full_cmd = ' '.join(cmd)
   logging.info('Running: %s', full_cmd)
 
@@ -529,7 +917,10 @@ def IssueCommand(cmd, force_info_log=False, suppress_warning=False,
   timer.start()
 
   try:
-    stdout, stderr = process.communicate(input)
+    if stdout_callback:
+      stdout, stderr = _StreamOutput(process, input, stdout_callback)
+    else:
+      stdout, stderr = process.communicate(input)
   finally:
     timer.cancel()
 
@@ -543,6 +934,7 @@ def IssueCommand(cmd, force_info_log=False, suppress_warning=False,
   else:
     logging.debug(debug_text)
 
+  rate_limiter.RecordResult(api, process.returncode, stderr)
   return stdout, stderr, process.returncode
 
 
@@ -567,7 +959,8 @@ def IssueBackgroundCommand(cmd, stdout_path, stderr_path, env=None):
                    stdout=outfile, stderr=errfile, close_fds=True)
 
 
-@Retry()
+@Retry(poll_interval=RETRYABLE_COMMAND_BACKOFF,
+       max_poll_interval=POLL_INTERVAL)
 def IssueRetryableCommand(cmd, env=None):
   """Tries running the provided command until it succeeds or times out.
 
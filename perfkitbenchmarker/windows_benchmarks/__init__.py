@@ -11,20 +11,17 @@
 # WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
 # See the License for the specific language governing permissions and
 # limitations under the License.
-"""Contains benchmark imports and a list of benchmarks.
+"""Contains a dictionary of benchmark names and modules.
 
 All modules within this package are considered benchmarks, and are loaded
-dynamically. Add non-benchmark code to other packages.
+dynamically when they are first looked up. Add non-benchmark code to other
+packages.
 """
 
 from perfkitbenchmarker import import_util
 
 
-def _LoadBenchmarks():
-  return list(import_util.LoadModulesForPath(__path__, __name__))
-
-
-BENCHMARKS = _LoadBenchmarks()
-
-VALID_BENCHMARKS = {module.BENCHMARK_NAME: module
-                    for module in BENCHMARKS}
+# Maps benchmark names (BENCHMARK_NAME) to benchmark modules. Modules are only
+# imported when they are looked up.
+VALID_BENCHMARKS = import_util.LazyModuleDict(__path__, __name__,
+                                              key_attribute='BENCHMARK_NAME')
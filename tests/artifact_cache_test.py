@@ -0,0 +1,194 @@
+# Copyright 2016 PerfKitBenchmarker Authors. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Tests for perfkitbenchmarker.artifact_cache."""
+
+import hashlib
+import io
+import mimetools
+import os
+import shutil
+import StringIO
+import tarfile
+import tempfile
+import unittest
+import urllib2
+
+import mock
+
+from perfkitbenchmarker import artifact_cache
+from perfkitbenchmarker import errors
+
+_URL = 'http://example.com/dist/tool-1.0.tar.gz'
+
+
+def _TarGz(content):
+  """Returns a .tar.gz archive holding one file with 'content'."""
+  buf = io.BytesIO()
+  with tarfile.open(fileobj=buf, mode='w:gz') as archive:
+    info = tarfile.TarInfo('tool-1.0/README')
+    info.size = len(content)
+    archive.addfile(info, io.BytesIO(content))
+  return buf.getvalue()
+
+
+_CONTENT = _TarGz('tool 1.0 content')
+_SHA256 = hashlib.sha256(_CONTENT).hexdigest()
+
+
+def _Response(content, content_length=None):
+  """Returns a fake urllib2 response."""
+  headers = 'Content-Length: %d\n\n' % (content_length or len(content))
+  return urllib2.addinfourl(StringIO.StringIO(content),
+                            mimetools.Message(StringIO.StringIO(headers)), _URL)
+
+
+class ArtifactTestCase(unittest.TestCase):
+
+  def testRemotePath(self):
+    self.assertEqual('/tmp/pkb/tool-1.0.tar.gz',
+                     artifact_cache.Artifact(_URL).remote_path)
+    self.assertEqual('/tmp/pkb/tool.tgz',
+                     artifact_cache.Artifact(_URL + '?x=1',
+                                             filename='tool.tgz').remote_path)
+
+
+class GetArtifactTestCase(unittest.TestCase):
+
+  def setUp(self):
+    self.cache_dir = tempfile.mkdtemp()
+    self.addCleanup(shutil.rmtree, self.cache_dir)
+    p = mock.patch(artifact_cache.__name__ + '.FLAGS')
+    self.flags = p.start()
+    self.addCleanup(p.stop)
+    self.flags.artifact_cache_dir = self.cache_dir
+    self.flags.artifact_cache_offline = False
+    p = mock.patch(artifact_cache.__name__ + '.urllib2.urlopen',
+                   side_effect=lambda *args, **kwargs: _Response(_CONTENT))
+    self.urlopen = p.start()
+    self.addCleanup(p.stop)
+
+  def _Read(self, path):
+    with open(path) as f:
+      return f.read()
+
+  def testDownloadsOnce(self):
+    artifact = artifact_cache.Artifact(_URL)
+    path = artifact_cache.GetArtifact(artifact)
+    self.assertEqual(os.path.join(self.cache_dir, 'sha256', _SHA256), path)
+    self.assertEqual(_CONTENT, self._Read(path))
+    self.assertEqual(path, artifact_cache.GetArtifact(
+        artifact_cache.Artifact(_URL)))
+    self.assertEqual(1, self.urlopen.call_count)
+
+  def testVerifiesChecksum(self):
+    artifact = artifact_cache.Artifact(_URL, sha256='0' * 64)
+    with self.assertRaises(errors.Setup.ArtifactChecksumError):
+      artifact_cache.GetArtifact(artifact)
+    self.assertEqual([], os.listdir(os.path.join(self.cache_dir, 'sha256')))
+    self.assertEqual(_CONTENT, self._Read(artifact_cache.GetArtifact(
+        artifact_cache.Artifact(_URL, sha256=_SHA256.upper()))))
+
+  def testTruncatedDownload(self):
+    self.urlopen.side_effect = lambda *args, **kwargs: _Response(
+        _CONTENT[:-10], content_length=len(_CONTENT))
+    with self.assertRaises(errors.Setup.MissingArtifactError):
+      artifact_cache.GetArtifact(artifact_cache.Artifact(_URL))
+    self.assertEqual([], os.listdir(os.path.join(self.cache_dir, 'sha256')))
+
+  def testCorruptArchive(self):
+    # Without a Content-Length, the archive itself shows the truncation.
+    content = _CONTENT[:len(_CONTENT) // 2]
+    self.urlopen.side_effect = lambda *args, **kwargs: urllib2.addinfourl(
+        StringIO.StringIO(content),
+        mimetools.Message(StringIO.StringIO('\n')), _URL)
+    with self.assertRaises(errors.Setup.ArtifactChecksumError):
+      artifact_cache.GetArtifact(artifact_cache.Artifact(_URL))
+    self.assertEqual([], os.listdir(os.path.join(self.cache_dir, 'sha256')))
+
+  def testWarnsWithoutChecksum(self):
+    with mock.patch(artifact_cache.__name__ + '.logging') as logging:
+      artifact_cache.GetArtifact(artifact_cache.Artifact(_URL))
+      self.assertEqual(1, logging.warning.call_count)
+      artifact_cache.GetArtifact(artifact_cache.Artifact(
+          'http://mirror/tool-1.0.tar.gz', sha256=_SHA256))
+      self.assertEqual(1, logging.warning.call_count)
+
+  def testDownloadFailure(self):
+    self.urlopen.side_effect = urllib2.URLError('unreachable')
+    with self.assertRaises(errors.Setup.MissingArtifactError):
+      artifact_cache.GetArtifact(artifact_cache.Artifact(_URL))
+
+  def testOffline(self):
+    self.flags.artifact_cache_offline = True
+    with self.assertRaises(errors.Setup.MissingArtifactError):
+      artifact_cache.GetArtifact(artifact_cache.Artifact(_URL))
+    # A file named after its checksum is found whatever its URL.
+    os.makedirs(os.path.join(self.cache_dir, 'sha256'))
+    with open(os.path.join(self.cache_dir, 'sha256', _SHA256), 'w') as f:
+      f.write(_CONTENT)
+    path = artifact_cache.GetArtifact(
+        artifact_cache.Artifact('http://mirror/tool.tgz', sha256=_SHA256))
+    self.assertEqual(_CONTENT, self._Read(path))
+    self.assertEqual(0, self.urlopen.call_count)
+
+
+class BuildCacheTestCase(unittest.TestCase):
+
+  def setUp(self):
+    self.cache_dir = tempfile.mkdtemp()
+    self.addCleanup(shutil.rmtree, self.cache_dir)
+    p = mock.patch(artifact_cache.__name__ + '.FLAGS')
+    p.start().artifact_cache_dir = self.cache_dir
+    self.addCleanup(p.stop)
+
+  def testBuildKey(self):
+    key = artifact_cache.GetBuildKey('fio', '2.2', 'GCP', 'debian', None,
+                                     'x86_64')
+    self.assertTrue(key.startswith('fio/'))
+    self.assertEqual(key, artifact_cache.GetBuildKey('fio', '2.2', 'GCP',
+                                                     'debian', None, 'x86_64'))
+    self.assertNotEqual(key, artifact_cache.GetBuildKey(
+        'fio', '2.3', 'GCP', 'debian', None, 'x86_64'))
+    self.assertNotEqual(key, artifact_cache.GetBuildKey(
+        'fio', '2.2', 'GCP', 'debian', None, 'aarch64'))
+    self.assertNotEqual(key, artifact_cache.GetBuildKey(
+        'fio', '2.2', 'GCP', 'debian', None,
+        'x86_64\nmodel name\t: Intel(R) Xeon(R) CPU @ 2.30GHz'))
+
+  def testStoreBuild(self):
+    key = artifact_cache.GetBuildKey('fio', '2.2', 'GCP', 'debian', None,
+                                     'x86_64')
+    self.assertIsNone(artifact_cache.FindBuild(key))
+
+    def Pull(path):
+      with open(path, 'w') as f:
+        f.write('build')
+    path = artifact_cache.StoreBuild(key, Pull)
+    self.assertEqual(path, artifact_cache.FindBuild(key))
+    with open(path) as f:
+      self.assertEqual('build', f.read())
+
+  def testFailedPull(self):
+    key = artifact_cache.GetBuildKey('fio', '2.2', 'GCP', 'debian', None,
+                                     'x86_64')
+
+    def Pull(unused_path):
+      raise IOError('scp failed')
+    with self.assertRaises(IOError):
+      artifact_cache.StoreBuild(key, Pull)
+    self.assertIsNone(artifact_cache.FindBuild(key))
+
+
+if __name__ == '__main__':
+  unittest.main()
@@ -25,6 +25,7 @@ from perfkitbenchmarker import context
 from perfkitbenchmarker import virtual_machine
 from perfkitbenchmarker.providers.aws import aws_disk
 from perfkitbenchmarker.providers.aws import aws_network
+from perfkitbenchmarker.providers.aws import aws_poller
 from perfkitbenchmarker.providers.aws import aws_virtual_machine
 from perfkitbenchmarker.providers.aws import util
 
@@ -63,8 +64,11 @@ class AwsVpcExistsTestCase(unittest.TestCase):
                    'util.IssueRetryableCommand')
     p.start()
     self.addCleanup(p.stop)
+    p = mock.patch.dict(aws_poller._pollers, clear=True)
+    p.start()
+    self.addCleanup(p.stop)
     self.vpc = aws_network.AwsVpc('region')
-    self.vpc.id = 'vpc-foo'
+    self.vpc.id = 'vpc-2289a647'
 
   def testVpcDeleted(self):
     response = '{"Vpcs": [] }'
@@ -94,6 +98,9 @@ class AwsVirtualMachineExistsTestCase(unittest.TestCase):
                    'util.IssueRetryableCommand')
     p.start()
     self.addCleanup(p.stop)
+    p = mock.patch.dict(aws_poller._pollers, clear=True)
+    p.start()
+    self.addCleanup(p.stop)
 
     # VM Creation depends on there being a BenchmarkSpec.
     self.spec = benchmark_spec.BenchmarkSpec({}, 'name', 'benchmark_uid')
@@ -102,7 +109,7 @@ class AwsVirtualMachineExistsTestCase(unittest.TestCase):
     self.vm = aws_virtual_machine.AwsVirtualMachine(
         virtual_machine.BaseVmSpec('test_vm_spec.AWS', zone='us-east-1a',
                                    machine_type='c3.large'))
-    self.vm.id = 'i-foo'
+    self.vm.id = 'i-8ed83d71'
     path = os.path.join(os.path.dirname(__file__),
                         'data', 'aws-describe-instance.json')
     with open(path) as f:
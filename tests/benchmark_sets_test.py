@@ -28,7 +28,7 @@ class BenchmarkSetsTestCase(unittest.TestCase):
   def setUp(self):
     # create set of valid benchmark names from the benchmark directory
     self.valid_benchmark_names = set()
-    for benchmark_module in linux_benchmarks.BENCHMARKS:
+    for benchmark_module in linux_benchmarks.VALID_BENCHMARKS.LoadAll():
         self.valid_benchmark_names.add(benchmark_module.BENCHMARK_NAME)
 
     self.valid_benchmark_set_names = set()
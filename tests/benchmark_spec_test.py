@@ -13,14 +13,21 @@
 # limitations under the License.
 """Tests for perfkitbenchmarker.benchmark_spec."""
 
+import itertools
+import threading
+import time
 import unittest
+
+import mock
 import mock_flags
 
 from perfkitbenchmarker import benchmark_spec
 from perfkitbenchmarker import configs
 from perfkitbenchmarker import context
 from perfkitbenchmarker import errors
+from perfkitbenchmarker import resource_graph
 from perfkitbenchmarker import static_virtual_machine as static_vm
+from perfkitbenchmarker import vm_util
 from perfkitbenchmarker.providers.aws import aws_virtual_machine as aws_vm
 from perfkitbenchmarker.providers.gcp import gce_virtual_machine as gce_vm
 from perfkitbenchmarker.linux_benchmarks import iperf_benchmark
@@ -140,6 +147,147 @@ class ConstructVmsTestCase(unittest.TestCase):
       spec.ConstructVirtualMachines()
 
 
+class ResourceGraphTestCase(unittest.TestCase):
+
+  def setUp(self):
+    self.addCleanup(context.SetThreadBenchmarkSpec, None)
+    config = configs.LoadConfig(SIMPLE_CONFIG, {}, NAME)
+    self.spec = benchmark_spec.BenchmarkSpec(config, NAME, UID)
+    self.order = []
+    self.lock = threading.Lock()
+
+  def _Mock(self, name, **kwargs):
+    mock_object = mock.MagicMock(**kwargs)
+    mock_object.name = name
+    for method in ('Create', 'Delete', 'DeleteScratchDisks',
+                   'DisallowAllPorts'):
+      getattr(mock_object, method).side_effect = (
+          lambda method=method: self._Record(name, method))
+    return mock_object
+
+  def _Record(self, name, method):
+    with self.lock:
+      self.order.append((name, method))
+
+  def _AddResources(self):
+    net_a = self._Mock('net-a', CLOUD='GCP')
+    net_b = self._Mock('net-b', CLOUD='GCP')
+    self.spec.networks = {('GCP', 'a'): net_a, ('GCP', 'b'): net_b}
+    self.spec.firewalls = {'GCP': self._Mock('fw')}
+    self.spec.vms = [
+        self._Mock('vm-a', CLOUD='GCP', network=net_a, is_static=False),
+        self._Mock('vm-b', CLOUD='GCP', network=net_b, is_static=False)]
+
+  def _AssertBefore(self, first, second):
+    self.assertLess(self.order.index(first), self.order.index(second))
+
+  def testDeleteOrder(self):
+    self._AddResources()
+    self.spec.Delete()
+    self.assertEqual(len(self.order), 7)
+    for vm, net in (('vm-a', 'net-a'), ('vm-b', 'net-b')):
+      self._AssertBefore((vm, 'Delete'), (vm, 'DeleteScratchDisks'))
+      self._AssertBefore((vm, 'Delete'), ('fw', 'DisallowAllPorts'))
+      self._AssertBefore((vm, 'DeleteScratchDisks'), (net, 'Delete'))
+      self._AssertBefore(('fw', 'DisallowAllPorts'), (net, 'Delete'))
+    self.assertTrue(self.spec.deleted)
+    self.assertEqual(
+        sorted((i.kind, i.name) for i in self.spec.resource_intervals),
+        [('Firewall', 'GCP'), ('Network', 'net-a'), ('Network', 'net-b'),
+         ('Scratch Disks', 'vm-a'), ('Scratch Disks', 'vm-b'),
+         ('VM', 'vm-a'), ('VM', 'vm-b')])
+    self.assertEqual(
+        len(resource_graph.GenerateSamples(self.spec.resource_intervals,
+                                           True, False)), 7)
+
+  def testDeleteContinuesAfterFailure(self):
+    self._AddResources()
+    self.spec.vms[0].Delete.side_effect = ValueError()
+    self.spec.Delete()
+    self.assertIn(('net-a', 'Delete'), self.order)
+    self.assertTrue(self.spec.deleted)
+
+  def testProvisionSkipsVmsOfFailedNetwork(self):
+    self._AddResources()
+    started = threading.Event()
+    cancelled = threading.Event()
+
+    def CreateNetworkA():
+      # Fails once the other network is being created.
+      self.assertTrue(started.wait(10))
+      raise ValueError()
+
+    def CreateNetworkB():
+      # Finishes only once the failure of the other network cancelled it.
+      started.set()
+      for _ in xrange(1000):
+        if vm_util.IsCallCancelled():
+          cancelled.set()
+          return
+        time.sleep(.01)
+
+    self.spec.networks[('GCP', 'a')].Create.side_effect = CreateNetworkA
+    self.spec.networks[('GCP', 'b')].Create.side_effect = CreateNetworkB
+    prepared = []
+    with mock.patch.object(self.spec, 'PrepareVm', prepared.append):
+      with self.assertRaises(errors.VmUtil.ThreadException):
+        self.spec.Provision()
+    self.assertTrue(cancelled.is_set())
+    # Neither VM was prepared: the network of one failed, and the creation of
+    # the other was cancelled.
+    self.assertEqual([], prepared)
+
+  def _PrepareVm(self, vm):
+    # Create starts at 100 and everything after it happens at 130.
+    times = itertools.chain([100.], itertools.repeat(130.))
+    with mock.patch(benchmark_spec.__name__ + '.time.time',
+                    side_effect=times):
+      self.spec.PrepareVm(vm)
+
+  def _Intervals(self):
+    return [(i.operation, i.name, i.succeeded)
+            for i in self.spec.resource_intervals]
+
+  def testPrepareVmSteps(self):
+    vm = self._Mock('vm', disk_specs=[mock.MagicMock(), mock.MagicMock()],
+                    create_start_time=105., create_end_time=120.)
+    self._PrepareVm(vm)
+    self.assertEqual(
+        [('Create Dependencies', 'vm', True),
+         ('Create Instance', 'vm', True),
+         ('Post Create', 'vm', True),
+         ('Allow Remote Access Ports', 'vm', True),
+         ('Wait For Boot', 'vm', True),
+         ('Open SSH Connections', 'vm', True),
+         ('Add Metadata', 'vm', True),
+         ('Startup', 'vm', True),
+         ('Create Scratch Disk', 'vm', True),
+         ('Create Scratch Disk', 'vm', True),
+         ('Prepare Environment', 'vm', True)],
+        self._Intervals())
+    self.assertEqual(
+        [(100., 105.), (105., 120.), (120., 130.)],
+        [(i.start_time, i.stop_time)
+         for i in self.spec.resource_intervals[:3]])
+
+  def testPrepareVmFailure(self):
+    vm = self._Mock('vm', disk_specs=[], create_start_time=105.,
+                    create_end_time=None)
+    vm.Create.side_effect = ValueError()
+    with self.assertRaises(ValueError):
+      self._PrepareVm(vm)
+    self.assertEqual(
+        [('Create Dependencies', 'vm', True),
+         ('Create Instance', 'vm', False)],
+        self._Intervals())
+    vm.WaitForBootCompletion.side_effect = ValueError()
+    vm.Create.side_effect = None
+    del self.spec.resource_intervals[:]
+    with self.assertRaises(ValueError):
+      self.spec.PrepareVm(vm)
+    self.assertEqual(('Wait For Boot', 'vm', False), self._Intervals()[-1])
+
+
 class BenchmarkSupportTestCase(unittest.TestCase):
 
   def setUp(self):
@@ -0,0 +1,109 @@
+# Copyright 2016 PerfKitBenchmarker Authors. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Tests for perfkitbenchmarker.broadcast."""
+
+import hashlib
+import os
+import tempfile
+import unittest
+
+import mock
+
+from perfkitbenchmarker import broadcast
+from perfkitbenchmarker import errors
+
+_CONTENT = 'index'
+_REMOTE_PATH = '/scratch/index.tar.gz'
+
+
+class _TestVm(object):
+  """A VM whose files are held in a dict."""
+
+  def __init__(self, name, copies):
+    self.name = name
+    self.files = {}
+    self.corrupt_sends = False
+    self._copies = copies
+
+  def __repr__(self):
+    return self.name
+
+  def PushFile(self, source_path, remote_path):
+    with open(source_path) as f:
+      self.files[remote_path] = f.read()
+    self._copies.append(('controller', self.name))
+
+  def MoveFile(self, target, source_path, remote_path):
+    content = self.files[source_path]
+    target.files[remote_path] = 'corrupt' if self.corrupt_sends else content
+    self._copies.append((self.name, target.name))
+
+  def RemoteCommand(self, command):
+    path = command.split()[-1]
+    if path not in self.files:
+      raise errors.VirtualMachine.RemoteCommandError('No such file.')
+    return '%s  %s\n' % (hashlib.sha256(self.files[path]).hexdigest(),
+                         path), ''
+
+
+class BroadcastFileTestCase(unittest.TestCase):
+
+  def setUp(self):
+    p = mock.patch(broadcast.__name__ + '.FLAGS')
+    p.start().broadcast_fanout = 2
+    self.addCleanup(p.stop)
+    fd, self.local_path = tempfile.mkstemp()
+    self.addCleanup(os.remove, self.local_path)
+    with os.fdopen(fd, 'w') as f:
+      f.write(_CONTENT)
+    self.copies = []
+    self.vms = [_TestVm('vm%d' % i, self.copies) for i in xrange(7)]
+
+  def _Senders(self):
+    return [sender for sender, _ in self.copies]
+
+  def testFromController(self):
+    broadcast.BroadcastFile(self.vms, self.local_path, _REMOTE_PATH)
+    for vm in self.vms:
+      self.assertEqual(_CONTENT, vm.files[_REMOTE_PATH])
+    self.assertEqual(2, self._Senders().count('controller'))
+    self.assertEqual(7, len(self.copies))
+
+  def testFromVm(self):
+    source = self.vms[0]
+    source.files['/tmp/index'] = _CONTENT
+    broadcast.BroadcastFile(self.vms, '/tmp/index', _REMOTE_PATH,
+                            source_vm=source)
+    self.assertNotIn(_REMOTE_PATH, source.files)
+    for vm in self.vms[1:]:
+      self.assertEqual(_CONTENT, vm.files[_REMOTE_PATH])
+    self.assertEqual(6, len(self.copies))
+    # The number of VMs holding the file doubles each round, so the source
+    # sends it in each of the 3 rounds.
+    self.assertEqual(3, self._Senders().count('vm0'))
+
+  def testFallsBackToDirectCopy(self):
+    self.vms[0].corrupt_sends = True
+    broadcast.BroadcastFile(self.vms, self.local_path, _REMOTE_PATH)
+    for vm in self.vms:
+      self.assertEqual(_CONTENT, vm.files[_REMOTE_PATH])
+    self.assertGreater(self._Senders().count('controller'), 2)
+
+  def testFewVms(self):
+    broadcast.BroadcastFile(self.vms[:2], self.local_path, _REMOTE_PATH)
+    self.assertEqual(['controller', 'controller'], self._Senders())
+
+
+if __name__ == '__main__':
+  unittest.main()
@@ -13,6 +13,9 @@
 # limitations under the License.
 """Tests for perfkitbenchmarker.configs."""
 
+import os
+import shutil
+import tempfile
 import unittest
 import yaml
 
@@ -68,8 +71,8 @@ a:
 class ConfigsTestCase(unittest.TestCase):
 
   def testLoadAllDefaultConfigs(self):
-    all_benchmarks = (linux_benchmarks.BENCHMARKS +
-                      windows_benchmarks.BENCHMARKS)
+    all_benchmarks = (linux_benchmarks.VALID_BENCHMARKS.LoadAll() +
+                      windows_benchmarks.VALID_BENCHMARKS.LoadAll())
     for benchmark_module in all_benchmarks:
       self.assertIsInstance(benchmark_module.GetConfig({}), dict)
 
@@ -129,3 +132,51 @@ class ConfigsTestCase(unittest.TestCase):
     config = configs.GetUserConfig()
     self.assertEqual(config['a']['vm_groups']['default']['vm_count'], 5)
     self.assertEqual(config['a']['flags']['flag'], 'value')
+
+
+class MinimalConfigCacheTestCase(unittest.TestCase):
+
+  def setUp(self):
+    temp_dir = tempfile.mkdtemp()
+    self.addCleanup(shutil.rmtree, temp_dir)
+    for name, value in (
+        ('MINIMAL_CONFIG_CACHE_FILE', os.path.join(temp_dir, 'cache.json')),
+        ('_minimal_config_cache', None)):
+      p = mock.patch.object(configs, name, value)
+      p.start()
+      self.addCleanup(p.stop)
+    p = mock.patch.object(configs.vm_util, 'TEMP_DIR', temp_dir)
+    p.start()
+    self.addCleanup(p.stop)
+
+  def _LoadWithCountedParses(self, config=CONFIG_A):
+    with mock.patch.object(configs.yaml, 'load', wraps=yaml.load) as load:
+      result = configs.LoadMinimalConfig(config, CONFIG_NAME)
+    return result, load.call_count
+
+  def testCachedAcrossRuns(self):
+    config, parses = self._LoadWithCountedParses()
+    self.assertEqual(1, parses)
+    # Simulate a new run, which only has the file.
+    configs._minimal_config_cache = None
+    cached_config, parses = self._LoadWithCountedParses()
+    self.assertEqual(0, parses)
+    self.assertEqual(config, cached_config)
+    self.assertIsInstance(cached_config['flags']['flag1'], str)
+
+  def testReturnsCopies(self):
+    config, _ = self._LoadWithCountedParses()
+    config['flags']['flag1'] = 'modified'
+    cached_config, _ = self._LoadWithCountedParses()
+    self.assertEqual('old_value', cached_config['flags']['flag1'])
+
+  def testConfigChange(self):
+    self._LoadWithCountedParses()
+    _, parses = self._LoadWithCountedParses(VALID_CONFIG)
+    self.assertEqual(1, parses)
+
+  def testConstantsChange(self):
+    self._LoadWithCountedParses()
+    with mock.patch.object(configs.os.path, 'getmtime', return_value=0):
+      _, parses = self._LoadWithCountedParses()
+    self.assertEqual(1, parses)
@@ -22,8 +22,10 @@ from perfkitbenchmarker import benchmark_spec
 from perfkitbenchmarker import context
 from perfkitbenchmarker import errors
 from perfkitbenchmarker import vm_util
+from perfkitbenchmarker.providers.gcp import gce_batch
 from perfkitbenchmarker.providers.gcp import gce_virtual_machine
 from tests import mock_flags
+from tests.providers.gcp import fake_gcloud
 
 
 _COMPONENT = 'test_component'
@@ -213,6 +215,16 @@ class GceVirtualMachineTestCase(unittest.TestCase):
     self.assertEqual(vm.GetMachineTypeDict(), {'cpus': 1, 'memory_mib': 1024,
                                                'preemptible': True})
 
+  def testAnnotateSamples(self):
+    spec = gce_virtual_machine.GceVmSpec(
+        _COMPONENT, machine_type='test_machine_type', preemptible=True)
+    vm = gce_virtual_machine.GceVirtualMachine(spec)
+    samples = [{'metadata': {}}, {'metadata': {'foo': 'bar'}}]
+    vm.AnnotateSamples(None, benchmark_spec=None, samples=samples)
+    self.assertEqual([{'metadata': {'preemptible': True}},
+                      {'metadata': {'foo': 'bar', 'preemptible': True}}],
+                     samples)
+
 
 class GCEVMFlagsTestCase(unittest.TestCase):
 
@@ -259,6 +271,28 @@ class GCEVMFlagsTestCase(unittest.TestCase):
       self.assertIn('--image-project bar',
                     ' '.join(issue_command.call_args[0][0]))
 
+  def testBatchedProvisioning(self):
+    gcloud = fake_gcloud.FakeGcloud()
+    with self._PatchCriticalObjects() as (unused_issue, mocked_flags), \
+        mock.patch(vm_util.__name__ + '.IssueCommand', gcloud), \
+        mock.patch.dict(gce_batch._zone_listings, clear=True), \
+        mock.patch.object(gce_virtual_machine.gce_network.GceFirewall,
+                          'GetFirewall'):
+      mocked_flags.gce_create_batch_window = 0.1
+      mocked_flags.gce_status_cache_ttl = 60
+      vm_spec = gce_virtual_machine.GceVmSpec(
+          'test_vm_spec.GCP', mocked_flags, image='image', zone='zone',
+          machine_type='test_machine_type')
+      vms = [gce_virtual_machine.DebianBasedGceVirtualMachine(vm_spec)
+             for _ in xrange(4)]
+      vm_util.RunThreaded(lambda vm: vm.Create(), vms)
+      self.assertEqual(1, gcloud.CountCommands('create'))
+      self.assertEqual(1, gcloud.CountCommands('list'))
+      self.assertEqual(4, len(set(vm.ip_address for vm in vms)))
+      vm_util.RunThreaded(lambda vm: vm.Delete(), vms)
+      self.assertEqual(1, gcloud.CountCommands('delete'))
+      self.assertEqual({}, gcloud.instances)
+
 
 if __name__ == '__main__':
   unittest.main()
@@ -0,0 +1,138 @@
+# Copyright 2016 PerfKitBenchmarker Authors. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Tests for perfkitbenchmarker.histogram."""
+
+import random
+import unittest
+
+from perfkitbenchmarker import histogram
+
+
+class HistogramTestCase(unittest.TestCase):
+
+  def testLinearRangeIsExact(self):
+    h = histogram.FromBuckets([(0, 3), (7, 1), (7, 1), (2047, 2)])
+    self.assertEqual([(0, 3), (7, 2), (2047, 2)], list(h.Buckets()))
+    self.assertEqual(7, h.total_count)
+
+  def testRelativeErrorIsBounded(self):
+    h = histogram.Histogram(precision_bits=4)
+    values = [random.randint(0, 10 ** 9) for _ in range(1000)]
+    for value in values:
+      h.Record(value)
+    lower_bounds = [lower_bound for lower_bound, _ in h.Buckets()]
+    for value in values:
+      lower_bound = max(b for b in lower_bounds if b <= value)
+      self.assertLessEqual(value - lower_bound, value * 2 ** -3)
+
+  def testBucketBoundaries(self):
+    h = histogram.Histogram(precision_bits=2)
+    for value in range(32):
+      h.Record(value)
+    self.assertEqual(
+        [(0, 1), (1, 1), (2, 1), (3, 1), (4, 2), (6, 2), (8, 4), (12, 4),
+         (16, 8), (24, 8)],
+        list(h.Buckets()))
+
+  def testUnit(self):
+    h = histogram.Histogram(unit=0.5)
+    h.Record(1.2)
+    h.Record(1.6)
+    self.assertEqual([(1.0, 1), (1.5, 1)], list(h.Buckets()))
+
+  def testValuesAtQuantiles(self):
+    h = histogram.FromBuckets([(1, 99), (4, 1)])
+    self.assertEqual([4, 1, 1, 1],
+                     h.ValuesAtQuantiles([0.995, 0, 0.5, 0.99]))
+    self.assertEqual([4], h.ValuesAtQuantiles([1]))
+
+  def testEvenlyWeightedValues(self):
+    h = histogram.FromBuckets([(x, 1) for x in range(1, 101)])
+    self.assertEqual([50, 75, 90, 95, 99, 100],
+                     h.ValuesAtQuantiles([.5, .75, .9, .95, .99, 1]))
+
+  def testLowWeight(self):
+    h = histogram.FromBuckets([(1, 99), (4, 1)])
+    self.assertEqual([1] * 100, h.ValuesAtQuantiles(
+        [i / 100.0 for i in range(100)]))
+    self.assertEqual([4], h.ValuesAtQuantiles([0.995]))
+
+  def testMidWeight(self):
+    h = histogram.FromBuckets([(0, 1), (1.2, 98), (4, 1)], unit=0.1)
+    for value in h.ValuesAtQuantiles([i / 100.0 for i in range(2, 99)]):
+      self.assertAlmostEqual(1.2, value)
+    self.assertAlmostEqual(4, h.ValuesAtQuantiles([0.995])[0])
+
+  def testFromBucketsRejectsValuesBetweenUnits(self):
+    with self.assertRaises(ValueError):
+      histogram.FromBuckets([(1, 1), (1.5, 1)])
+    with self.assertRaises(ValueError):
+      histogram.FromBuckets([(0.25, 1)], unit=0.5)
+
+  def testInvalidQueries(self):
+    with self.assertRaises(ValueError):
+      histogram.Histogram().ValuesAtQuantiles([0.5])
+    with self.assertRaises(ValueError):
+      histogram.FromBuckets([(1, 1)]).ValuesAtQuantiles([1.5])
+    with self.assertRaises(ValueError):
+      histogram.Histogram().Record(-1)
+
+  def testMeanAndStandardDeviation(self):
+    h = histogram.FromBuckets([(2, 1), (4, 3)])
+    self.assertEqual(3.5, h.Mean())
+    self.assertAlmostEqual(1.0, h.StandardDeviation())
+    self.assertIsNone(histogram.Histogram().Mean())
+
+  def testMerge(self):
+    h1 = histogram.FromBuckets([(1, 2), (5000, 1)])
+    h2 = histogram.FromBuckets([(1, 1), (3, 4)])
+    h1.Merge(h2)
+    self.assertEqual([(1, 3), (3, 4), (5000, 1)], list(h1.Buckets()))
+    self.assertEqual(8, h1.total_count)
+    self.assertEqual(5015, h1.total)
+
+  def testMergeDifferentLayouts(self):
+    with self.assertRaises(ValueError):
+      histogram.Histogram(precision_bits=3).Merge(histogram.Histogram())
+
+  def testSerializationRoundTrip(self):
+    h = histogram.Histogram(precision_bits=5, unit=0.25)
+    for value in (0, 0.3, 17, 123456.75):
+      h.Record(value, 3)
+    restored = histogram.Deserialize(h.Serialize())
+    self.assertEqual(list(h.Buckets()), list(restored.Buckets()))
+    self.assertEqual(h.total_count, restored.total_count)
+    self.assertEqual(h.total, restored.total)
+    self.assertEqual(h.total_of_squares, restored.total_of_squares)
+    self.assertEqual(h.Serialize(), restored.Serialize())
+
+  def testMergingSerializedHistogramsIsExact(self):
+    clients = [histogram.FromBuckets([(i, 1), (i * 100, 2)])
+               for i in range(10)]
+    combined = histogram.Histogram()
+    for client in clients:
+      combined.Merge(histogram.Deserialize(client.Serialize()))
+    expected = histogram.FromBuckets(
+        [bucket for client in clients for bucket in client.Buckets()])
+    self.assertEqual(list(expected.Buckets()), list(combined.Buckets()))
+
+  def testDeserializeInvalid(self):
+    with self.assertRaises(ValueError):
+      histogram.Deserialize('{}')
+    with self.assertRaises(ValueError):
+      histogram.Deserialize('not json')
+
+
+if __name__ == '__main__':
+  unittest.main()
@@ -0,0 +1,83 @@
+# Copyright 2016 PerfKitBenchmarker Authors. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Tests for perfkitbenchmarker.import_util."""
+
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+from perfkitbenchmarker import import_util
+
+_PACKAGE_NAME = 'pkb_import_util_test_package'
+_MODULES = {
+    '__init__': '',
+    'literal_benchmark': "BENCHMARK_NAME = 'literal'\n",
+    'computed_benchmark': "BENCHMARK_NAME = 'comp' + 'uted'\n",
+}
+
+
+class LazyModuleDictTestCase(unittest.TestCase):
+
+  def setUp(self):
+    temp_dir = tempfile.mkdtemp()
+    self.addCleanup(shutil.rmtree, temp_dir)
+    self.package_dir = os.path.join(temp_dir, _PACKAGE_NAME)
+    os.mkdir(self.package_dir)
+    for name, source in _MODULES.iteritems():
+      with open(os.path.join(self.package_dir, name + '.py'), 'w') as fp:
+        fp.write(source)
+    sys.path.insert(0, temp_dir)
+    self.addCleanup(sys.path.remove, temp_dir)
+    self.addCleanup(self._UnloadPackage)
+
+  def _UnloadPackage(self):
+    for name in list(sys.modules):
+      if name.startswith(_PACKAGE_NAME):
+        del sys.modules[name]
+
+  def _IsImported(self, module_name):
+    return '%s.%s' % (_PACKAGE_NAME, module_name) in sys.modules
+
+  def testKeyedByModuleName(self):
+    modules = import_util.LazyModuleDict([self.package_dir], _PACKAGE_NAME)
+    self.assertEqual(['computed_benchmark', 'literal_benchmark'],
+                     list(modules))
+    self.assertIn('literal_benchmark', modules)
+    self.assertFalse(self._IsImported('literal_benchmark'))
+    self.assertEqual('literal', modules['literal_benchmark'].BENCHMARK_NAME)
+    self.assertTrue(self._IsImported('literal_benchmark'))
+    self.assertFalse(self._IsImported('computed_benchmark'))
+
+  def testKeyedByAttribute(self):
+    modules = import_util.LazyModuleDict([self.package_dir], _PACKAGE_NAME,
+                                         key_attribute='BENCHMARK_NAME')
+    self.assertEqual(['computed', 'literal'], sorted(modules))
+    # Only the module without a literal name had to be imported.
+    self.assertFalse(self._IsImported('literal_benchmark'))
+    self.assertTrue(self._IsImported('computed_benchmark'))
+    self.assertNotIn('literal_benchmark', modules)
+    with self.assertRaises(KeyError):
+      modules['literal_benchmark']
+
+  def testLoadAll(self):
+    modules = import_util.LazyModuleDict([self.package_dir], _PACKAGE_NAME)
+    self.assertEqual(2, len(modules.LoadAll()))
+    self.assertTrue(self._IsImported('literal_benchmark'))
+    self.assertTrue(self._IsImported('computed_benchmark'))
+
+
+if __name__ == '__main__':
+  unittest.main()
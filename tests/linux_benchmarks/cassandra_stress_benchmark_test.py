@@ -0,0 +1,97 @@
+# Copyright 2016 PerfKitBenchmarker Authors. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Tests for cassandra_stress_benchmark."""
+
+import os
+import shutil
+import tempfile
+import unittest
+
+import mock
+
+from perfkitbenchmarker import errors
+from perfkitbenchmarker import vm_util
+from perfkitbenchmarker.linux_benchmarks import cassandra_stress_benchmark
+
+DATA_DIR = os.path.join(os.path.dirname(__file__), '..', 'data')
+
+
+def _DataPath(name):
+  return os.path.join(DATA_DIR, name)
+
+
+class ParseResultFileTestCase(unittest.TestCase):
+
+  def testParseResultFile(self):
+    with open(_DataPath('cassandra-stress-output.txt')) as f:
+      results, intervals = cassandra_stress_benchmark.ParseResultFile(f)
+    self.assertEqual(34092, results['op rate'])
+    self.assertEqual(22.0, results['latency 99th percentile'])
+    self.assertEqual(132.5, results['latency max'])
+    self.assertEqual(200000, results['Total partitions'])
+    self.assertEqual(5, results['Total operation time'])
+    self.assertEqual(6, len(intervals))
+    self.assertEqual((1.0, 29110), intervals[0])
+    self.assertEqual((5.9, 34925), intervals[-1])
+
+  def testMissingResults(self):
+    with self.assertRaises(errors.Benchmarks.RunError):
+      cassandra_stress_benchmark.ParseResultFile(['Results:',
+                                                  'op rate : 5'])
+
+
+class CollectResultsTestCase(unittest.TestCase):
+
+  def setUp(self):
+    self.temp_dir = tempfile.mkdtemp()
+    self.addCleanup(shutil.rmtree, self.temp_dir)
+    p = mock.patch(vm_util.__name__ + '.GetTempDir',
+                   return_value=self.temp_dir)
+    p.start()
+    self.addCleanup(p.stop)
+
+    self.loader_vms = []
+    for i in (1, 2):
+      vm = mock.MagicMock(hostname='loader%d' % i)
+      shutil.copy(_DataPath('cassandra-stress-output.txt'),
+                  os.path.join(self.temp_dir,
+                               'loader%d.stress_results.txt' % i))
+      self.loader_vms.append(vm)
+    self.spec = mock.MagicMock(vm_groups={
+        cassandra_stress_benchmark.CLIENT_GROUP: self.loader_vms})
+
+  def _CollectResults(self):
+    samples = cassandra_stress_benchmark.CollectResults(self.spec, {})
+    return {s.metric: s for s in samples if s.metric != 'interval op rate'}
+
+  def testAveragesLoaderLatencies(self):
+    samples = self._CollectResults()
+    self.assertEqual(68184, samples['op rate'].value)
+    self.assertEqual(22.0, samples['latency 99th percentile'].value)
+    self.assertEqual('mean_of_loaders',
+                     samples['op rate'].metadata['latency_aggregation'])
+    for vm in self.loader_vms:
+      self.assertEqual(1, vm.PullFile.call_count)
+
+  def testSumsIntervalOpRates(self):
+    samples = cassandra_stress_benchmark.CollectResults(self.spec, {})
+    intervals = [(s.metadata['interval_end'], s.value) for s in samples
+                 if s.metric == 'interval op rate']
+    self.assertEqual(6, len(intervals))
+    self.assertEqual((1, 2 * 29110), intervals[0])
+    self.assertEqual((6, 2 * 34925), intervals[-1])
+
+
+if __name__ == '__main__':
+  unittest.main()
@@ -0,0 +1,74 @@
+# Copyright 2015 PerfKitBenchmarker Authors. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Tests for object_storage_service_benchmark."""
+
+import json
+import unittest
+
+from perfkitbenchmarker import flags_validators
+from perfkitbenchmarker.linux_benchmarks import (
+    object_storage_service_benchmark as benchmark)
+
+
+def _PercentileJson(value):
+  return json.dumps({percentile: value
+                     for percentile in benchmark.PERCENTILES_LIST})
+
+
+class ParseMultiStreamResultsTestCase(unittest.TestCase):
+
+  def testParsesResults(self):
+    raw_result = '\n'.join([
+        'INFO:root:Multi stream payload generation time in seconds: 0.5',
+        'INFO:root:Multi stream upload aggregate throughput in Bps: 1000000',
+        'INFO:root:Multi stream upload per-stream throughput in Bps: ' +
+        _PercentileJson(250000),
+        'INFO:root:Multi stream download aggregate throughput in Bps: 2000000',
+        'INFO:root:Multi stream download per-stream throughput in Bps: ' +
+        _PercentileJson(500000)])
+    results = []
+    benchmark._ParseMultiStreamResults(results, raw_result, {'num_streams': 4})
+
+    self.assertEqual(2 * (1 + len(benchmark.PERCENTILES_LIST)), len(results))
+    metrics = dict((s.metric, s.value) for s in results)
+    self.assertEqual(8.0, metrics['multi stream upload throughput Mbps'])
+    self.assertEqual(
+        2.0, metrics['multi stream upload per-stream throughput Mbps p50'])
+    self.assertEqual(16.0, metrics['multi stream download throughput Mbps'])
+    self.assertEqual(
+        4.0, metrics['multi stream download per-stream throughput Mbps p99'])
+    self.assertEqual({'num_streams': 4}, results[0].metadata)
+
+  def testMissingResults(self):
+    with self.assertRaisesRegexp(ValueError, 'MultiStreamThroughput'):
+      benchmark._ParseMultiStreamResults(
+          [], 'INFO:root:Multi stream upload aggregate throughput in Bps: 1',
+          {})
+
+
+
+class ValidateMultistreamPartSizeTestCase(unittest.TestCase):
+
+  def testValidSizes(self):
+    for part_size_mb in (0, 5, 8, 100):
+      self.assertTrue(benchmark._ValidateMultistreamPartSize(part_size_mb))
+
+  def testTooSmallForS3(self):
+    for part_size_mb in (1, 4):
+      with self.assertRaisesRegexp(flags_validators.Error, 'at least 5 MiB'):
+        benchmark._ValidateMultistreamPartSize(part_size_mb)
+
+
+if __name__ == '__main__':
+  unittest.main()
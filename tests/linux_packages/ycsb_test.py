@@ -114,33 +114,6 @@ class DetailedResultParserTestCase(unittest.TestCase):
     self.assertEqual(385, percentiles['p99'])
 
 
-class WeightedQuantileTestCase(unittest.TestCase):
-
-  def testEvenlyWeightedSamples(self):
-    x = range(1, 101)  # 1-100
-    weights = [1 for _ in x]
-    self.assertEqual(50, ycsb._WeightedQuantile(x, weights, 0.50))
-    self.assertEqual(75, ycsb._WeightedQuantile(x, weights, 0.75))
-    self.assertEqual(90, ycsb._WeightedQuantile(x, weights, 0.90))
-    self.assertEqual(95, ycsb._WeightedQuantile(x, weights, 0.95))
-    self.assertEqual(99, ycsb._WeightedQuantile(x, weights, 0.99))
-    self.assertEqual(100, ycsb._WeightedQuantile(x, weights, 1))
-
-  def testLowWeight(self):
-    x = [1, 4]
-    weights = [99, 1]
-    for i in xrange(100):
-      self.assertEqual(1, ycsb._WeightedQuantile(x, weights, i / 100.0))
-    self.assertEqual(4, ycsb._WeightedQuantile(x, weights, 0.995))
-
-  def testMidWeight(self):
-    x = [0, 1.2, 4]
-    weights = [1, 98, 1]
-    for i in xrange(2, 99):
-      self.assertAlmostEqual(1.2, ycsb._WeightedQuantile(x, weights, i / 100.0))
-    self.assertEqual(4, ycsb._WeightedQuantile(x, weights, 0.995))
-
-
 class ParseWorkloadTestCase(unittest.TestCase):
 
   def testParsesEmptyString(self):
@@ -220,6 +193,21 @@ class CombineResultsTestCase(unittest.TestCase):
     self.assertEqual({'Operations': 196, 'Return=0': 194, 'Return=-1': 2},
                      read_stats)
 
+  def testHistogramsCombined(self):
+    def Result(histogram):
+      return {'client': '', 'command_line': '',
+              'groups': {'read': {'group': 'read', 'statistics': {},
+                                  'histogram': histogram}}}
+    r1 = Result([(0, 10), (2, 1), (1000, 1)])
+    r2 = Result([(1, 5), (2, 2)])
+    r2_copy = copy.deepcopy(r2)
+    combined = ycsb._CombineResults([r1, r2])
+    self.assertEqual([(0, 10), (1, 5), (2, 3), (1000, 1)],
+                     combined['groups']['read']['histogram'])
+    self.assertEqual(r2_copy, r2)
+    self.assertEqual([(0, 10), (2, 1), (1000, 1)],
+                     r1['groups']['read']['histogram'])
+
   def testDropUnaggregatedFromSingleResult(self):
     r = {
         'client': '',
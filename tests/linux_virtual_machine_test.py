@@ -0,0 +1,402 @@
+# Copyright 2016 PerfKitBenchmarker Authors. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Tests for perfkitbenchmarker.linux_virtual_machine."""
+
+import threading
+import unittest
+
+import mock
+
+from perfkitbenchmarker import artifact_cache
+from perfkitbenchmarker import context
+from perfkitbenchmarker import errors
+from perfkitbenchmarker import linux_packages
+from perfkitbenchmarker import linux_virtual_machine
+from perfkitbenchmarker import tcp_probe
+from perfkitbenchmarker import vm_util
+
+
+class _Package(object):
+  """A PerfKit package module recording when it is installed."""
+
+  def __init__(self, name, installed, dependencies=(), apt_packages=None):
+    self.name = name
+    self.DEPENDENCIES = dependencies
+    if apt_packages:
+      self.APT_PACKAGES = apt_packages
+    self._installed = installed
+
+  def AptInstall(self, vm):
+    if hasattr(self, 'APT_PACKAGES'):
+      vm.InstallPackages(self.APT_PACKAGES)
+    self._installed.append(self.name)
+
+
+class _TestVm(linux_virtual_machine.DebianMixin):
+
+  CLOUD = 'Test'
+
+  def __init__(self, name='vm0'):
+    super(_TestVm, self).__init__()
+    self.name = name
+    self.image = None
+    self.install_packages = True
+    self._apt_updated = True
+    self.RemoteCommand = mock.MagicMock(return_value=('', ''))
+
+
+class InstallBatchTestCase(unittest.TestCase):
+
+  def setUp(self):
+    self.installed = []
+    packages = {
+        'wget': _Package('wget', self.installed, apt_packages='wget'),
+        'jdk': _Package('jdk', self.installed, apt_packages='openjdk-7-jdk'),
+        'ant': _Package('ant', self.installed, ('wget',)),
+        'tool': _Package('tool', self.installed, ('ant', 'jdk'),
+                         'libaio1 wget'),
+        'other': _Package('other', self.installed, ('wget',)),
+    }
+    p = mock.patch.object(linux_packages, 'PACKAGES', packages)
+    p.start()
+    self.addCleanup(p.stop)
+    self.vm = _TestVm()
+
+  def _AptCommands(self):
+    return [c[0][0] for c in self.vm.RemoteCommand.call_args_list
+            if 'apt-get' in c[0][0]]
+
+  def testGetPackageClosure(self):
+    self.assertEqual(['wget', 'ant', 'jdk', 'tool', 'other'],
+                     linux_virtual_machine._GetPackageClosure(['tool',
+                                                               'other']))
+
+  def testCircularDependency(self):
+    linux_packages.PACKAGES['wget'].DEPENDENCIES = ('tool',)
+    with self.assertRaises(ValueError):
+      linux_virtual_machine._GetPackageClosure(['tool'])
+
+  def testSingleOsPackageTransaction(self):
+    self.vm.InstallBatch(['tool', 'other'])
+    commands = self._AptCommands()
+    self.assertEqual(1, len(commands))
+    self.assertTrue(commands[0].endswith(
+        'install wget openjdk-7-jdk libaio1'))
+    self.assertItemsEqual(['wget', 'ant', 'jdk', 'tool', 'other'],
+                          self.installed)
+    self.assertLess(self.installed.index('ant'), self.installed.index('tool'))
+    self.assertLess(self.installed.index('wget'), self.installed.index('ant'))
+
+  def testInstallsDependencies(self):
+    self.vm.Install('ant')
+    self.assertEqual(['wget', 'ant'], self.installed)
+    self.vm.Install('tool')
+    self.assertEqual(['wget', 'ant', 'jdk', 'tool'], self.installed)
+    self.assertEqual(2, len(self._AptCommands()))
+    self.assertTrue(self._AptCommands()[1].endswith(
+        'install openjdk-7-jdk libaio1'))
+
+  def testInstallPackagesOnce(self):
+    self.vm.InstallPackages('wget curl')
+    self.vm.InstallPackages('curl')
+    self.assertEqual(1, len(self._AptCommands()))
+
+  def testInstallPackagesNotPermitted(self):
+    self.vm.install_packages = False
+    self.vm.InstallBatch(['tool'])
+    self.assertEqual([], self.installed)
+    self.assertEqual(0, self.vm.RemoteCommand.call_count)
+
+  def testRecordsIntervals(self):
+    spec = mock.MagicMock(resource_intervals=[])
+    context.SetThreadBenchmarkSpec(spec)
+    self.addCleanup(context.SetThreadBenchmarkSpec, None)
+    self.vm.InstallBatch(['ant'])
+    self.assertItemsEqual(
+        [('OS Packages', 'Install', 'vm0'),
+         ('Package', 'Install', 'wget on vm0'),
+         ('Package', 'Install', 'ant on vm0')],
+        [(i.kind, i.operation, i.name) for i in spec.resource_intervals])
+
+  @mock.patch(artifact_cache.__name__ + '.GetArtifact',
+              side_effect=lambda artifact: '/cache/' + artifact.filename)
+  def testPushesArtifactsBeforeInstalling(self, unused_get_artifact):
+    artifact = artifact_cache.Artifact('http://example.com/ant.tar.gz')
+    linux_packages.PACKAGES['ant'].ARTIFACTS = (artifact,)
+    linux_packages.PACKAGES['wget'].APT_ARTIFACTS = (artifact,)
+    linux_packages.PACKAGES['jdk'].YUM_ARTIFACTS = (
+        artifact_cache.Artifact('http://example.com/jdk.rpm'),)
+    self.vm.PushFile = mock.MagicMock(
+        side_effect=lambda *unused_args: self.assertEqual([], self.installed))
+    self.vm.InstallBatch(['ant', 'jdk'])
+    self.vm.PushFile.assert_called_once_with('/cache/ant.tar.gz',
+                                             artifact.remote_path)
+
+  def testIndependentPackagesInstallConcurrently(self):
+    # 'jdk' and 'ant' only depend on packages installed beforehand, so each
+    # waits for the other to have started.
+    barrier = [threading.Event(), threading.Event()]
+    packages = linux_packages.PACKAGES
+    for i, name in enumerate(('jdk', 'ant')):
+      def AptInstall(vm, i=i, install=packages[name].AptInstall):
+        barrier[i].set()
+        self.assertTrue(barrier[1 - i].wait(5))
+        install(vm)
+      packages[name].AptInstall = AptInstall
+    self.vm.Install('wget')
+    self.vm.Install('tool')
+    self.assertEqual('tool', self.installed[-1])
+
+
+_CPU = ('x86_64\n'
+        'flags\t\t: fpu vme de pse tsc avx2\n'
+        'model name\t: Intel(R) Xeon(R) CPU @ 2.30GHz (Haswell)\n')
+
+
+class CachedBuildTestCase(unittest.TestCase):
+
+  def setUp(self):
+    p = mock.patch(linux_virtual_machine.__name__ + '.FLAGS')
+    self.flags = p.start()
+    self.addCleanup(p.stop)
+    self.flags.build_cache = True
+    self.builds = {}
+    for name in ('FindBuild', 'StoreBuild'):
+      p = mock.patch(artifact_cache.__name__ + '.' + name,
+                     getattr(self, '_' + name))
+      p.start()
+      self.addCleanup(p.stop)
+    self.built_on = []
+    self.installed_on = []
+
+  def _FindBuild(self, key):
+    return self.builds.get(key)
+
+  def _StoreBuild(self, key, pull):
+    pull('/cache/build.tar.gz')
+    self.builds[key] = '/cache/build.tar.gz'
+
+  def _Vm(self, name, cpu=_CPU):
+    vm = _TestVm(name)
+    vm.RemoteCommand.return_value = cpu, ''
+    vm.PushFile = mock.MagicMock()
+    vm.PullFile = mock.MagicMock()
+    return vm
+
+  def _CachedBuild(self, vm, version='1.0'):
+    vm.CachedBuild('tool', version, ['/tmp/pkb/tool', '/usr/local/bin/tool'],
+                   lambda vm: self.built_on.append(vm.name),
+                   lambda vm: self.installed_on.append(vm.name))
+
+  def _Commands(self, vm):
+    return [c[0][0] for c in vm.RemoteCommand.call_args_list]
+
+  def testBuildsOnce(self):
+    vms = [self._Vm('vm0'), self._Vm('vm1')]
+    for vm in vms:
+      self._CachedBuild(vm)
+    self.assertEqual(['vm0'], self.built_on)
+    self.assertEqual(['vm0', 'vm1'], self.installed_on)
+    self.assertIn('cd / && sudo tar -czf /tmp/pkb/tool-build.tar.gz '
+                  'tmp/pkb/tool usr/local/bin/tool', self._Commands(vms[0]))
+    vms[0].PullFile.assert_called_once_with('/cache/build.tar.gz',
+                                            '/tmp/pkb/tool-build.tar.gz')
+    vms[1].PushFile.assert_called_once_with('/cache/build.tar.gz',
+                                            '/tmp/pkb/tool-build.tar.gz')
+    self.assertIn('sudo tar -xzf /tmp/pkb/tool-build.tar.gz -C /',
+                  self._Commands(vms[1]))
+
+  def testNewVersionIsBuilt(self):
+    self._CachedBuild(self._Vm('vm0'))
+    self._CachedBuild(self._Vm('vm1'), version='2.0')
+    self.assertEqual(['vm0', 'vm1'], self.built_on)
+
+  def testOtherCpuIsBuilt(self):
+    self._CachedBuild(self._Vm('vm0'))
+    self._CachedBuild(self._Vm('vm1', cpu=_CPU.replace('Haswell', 'Skylake')))
+    self.assertEqual(['vm0', 'vm1'], self.built_on)
+
+  def testDisabled(self):
+    self.flags.build_cache = False
+    vm = self._Vm('vm0')
+    self._CachedBuild(vm)
+    self._CachedBuild(vm)
+    self.assertEqual(['vm0', 'vm0'], self.built_on)
+    self.assertEqual(0, vm.RemoteCommand.call_count)
+    self.assertEqual({}, self.builds)
+
+
+class PackageDependenciesTestCase(unittest.TestCase):
+
+  def testDependenciesAreKnownPackages(self):
+    for package_name, package in linux_packages.PACKAGES.iteritems():
+      for dependency in getattr(package, 'DEPENDENCIES', ()):
+        self.assertIn(dependency, linux_packages.PACKAGES, package_name)
+
+  def testHpccClosure(self):
+    closure = linux_virtual_machine._GetPackageClosure(['hpcc'])
+    self.assertItemsEqual(
+        ['build_tools', 'fortran', 'wget', 'openmpi', 'openblas', 'hpcc'],
+        closure)
+    self.assertEqual('hpcc', closure[-1])
+
+  @mock.patch.object(artifact_cache, 'GetArtifact')
+  def testOsPackagesOfHpccInOneCommand(self, unused_get_artifact):
+    vm = _TestVm()
+    vm.CachedBuild = mock.Mock()
+    vm.PushFile = mock.Mock()
+    vm.InstallBatch(['hpcc'])
+    commands = [c[0][0] for c in vm.RemoteCommand.call_args_list
+                if 'apt-get' in c[0][0] and ' install ' in c[0][0]]
+    self.assertEqual(1, len(commands))
+    self.assertIn('gfortran', commands[0])
+
+
+class SshControlMasterTestCase(unittest.TestCase):
+
+  def setUp(self):
+    self.now = [1000.]
+    self.master_running = True
+    for name, kwargs in (
+        ('time.time', {'side_effect': lambda: self.now[0]}),
+        ('vm_util.SshConnectionReuseEnabled', {'return_value': True}),
+        ('vm_util.StartSshControlMaster', {'return_value': True}),
+        ('vm_util.CheckSshControlMaster',
+         {'side_effect': lambda *args: self.master_running}),
+        ('vm_util.IssueCommand', {'return_value': ('', '', 0)})):
+      p = mock.patch(linux_virtual_machine.__name__ + '.' + name, **kwargs)
+      setattr(self, name.split('.')[-1], p.start())
+      self.addCleanup(p.stop)
+    self.vm = linux_virtual_machine.DebianMixin()
+    self.vm.name = 'vm0'
+    self.vm.user_name = 'perfkit'
+    self.vm.ip_address = '10.0.0.1'
+    self.vm.ssh_private_key = 'key'
+
+  def testNotStartedBeforeOpen(self):
+    self.vm.RemoteHostCommand('hostname')
+    self.vm.RemoteHostCopy('file')
+    self.assertFalse(self.StartSshControlMaster.called)
+    self.assertEqual(2, self.IssueCommand.call_count)
+
+  def testStartedOnce(self):
+    self.vm.OpenSshConnections()
+    self.StartSshControlMaster.assert_called_once_with('perfkit@10.0.0.1', 22,
+                                                       'key')
+    self.now[0] += vm_util.SSH_MASTER_CHECK_INTERVAL - 1
+    for _ in xrange(3):
+      self.vm.RemoteHostCommand('hostname')
+    self.assertEqual(1, self.StartSshControlMaster.call_count)
+    self.assertFalse(self.CheckSshControlMaster.called)
+
+  def testRestartedWhenGone(self):
+    self.vm.OpenSshConnections()
+    self.now[0] += vm_util.SSH_MASTER_CHECK_INTERVAL
+    self.vm.RemoteHostCommand('hostname')
+    self.assertEqual(1, self.CheckSshControlMaster.call_count)
+    self.assertEqual(1, self.StartSshControlMaster.call_count)
+    self.master_running = False
+    self.now[0] += vm_util.SSH_MASTER_CHECK_INTERVAL
+    self.vm.RemoteHostCommand('hostname')
+    self.assertEqual(2, self.CheckSshControlMaster.call_count)
+    self.assertEqual(2, self.StartSshControlMaster.call_count)
+
+  def testCheckedAfterSshFailure(self):
+    self.vm.OpenSshConnections()
+    self.IssueCommand.side_effect = [('', '', 255), ('vm0\n', '', 0)]
+    self.assertEqual(('vm0\n', ''), self.vm.RemoteHostCommand('hostname'))
+    self.assertEqual(1, self.CheckSshControlMaster.call_count)
+
+  def testNotRestartedAfterClose(self):
+    self.vm.OpenSshConnections()
+    self.vm.CloseSshConnections()
+    self.now[0] += vm_util.SSH_MASTER_CHECK_INTERVAL
+    self.vm.RemoteHostCommand('hostname')
+    self.assertEqual(1, self.StartSshControlMaster.call_count)
+    self.assertFalse(self.CheckSshControlMaster.called)
+
+
+class WaitForBootCompletionTestCase(unittest.TestCase):
+
+  def setUp(self):
+    p = mock.patch(linux_virtual_machine.__name__ + '.FLAGS')
+    self.flags = p.start()
+    self.addCleanup(p.stop)
+    self.flags.boot_tcp_probe = True
+    self.flags.default_timeout = 60
+    self.flags.ssh_options = []
+    p = mock.patch(tcp_probe.__name__ + '.WaitForPort', return_value=100.)
+    self.wait_for_port = p.start()
+    self.addCleanup(p.stop)
+    self.vm = _TestVm()
+    self.vm.ip_address = '10.0.0.1'
+    self.vm.RemoteHostCommand = mock.MagicMock(return_value=('vm0\n', ''))
+
+  def testProbesPortBeforeSsh(self):
+    self.vm.WaitForBootCompletion()
+    self.wait_for_port.assert_called_once_with('10.0.0.1', 22, 60)
+    self.assertEqual(100., self.vm.port_open_time)
+    self.assertGreater(self.vm.bootable_time, 100.)
+    self.assertEqual('vm0', self.vm.hostname)
+    self.assertEqual(1, self.vm.RemoteHostCommand.call_count)
+
+  def testRetriesSsh(self):
+    self.vm.RemoteHostCommand.side_effect = [
+        errors.VirtualMachine.RemoteCommandError(), ('vm0\n', '')]
+    with mock.patch(vm_util.__name__ + '.time.sleep'):
+      self.vm.WaitForBootCompletion()
+    self.assertEqual(2, self.vm.RemoteHostCommand.call_count)
+    self.assertEqual(1, self.wait_for_port.call_count)
+
+  def testProbeDisabled(self):
+    self.flags.boot_tcp_probe = False
+    self.vm.WaitForBootCompletion()
+    self.assertFalse(self.wait_for_port.called)
+    self.assertIsNone(self.vm.port_open_time)
+    self.assertIsNotNone(self.vm.bootable_time)
+
+  def testProbeSkippedWithSshOptions(self):
+    self.flags.ssh_options = ['ProxyCommand=ssh -W %h:%p bastion']
+    self.vm.WaitForBootCompletion()
+    self.assertFalse(self.wait_for_port.called)
+    self.assertEqual('vm0', self.vm.hostname)
+
+  def testSshTriedAfterProbeFailure(self):
+    self.wait_for_port.side_effect = errors.VirtualMachine.VmStateError(
+        'Port 22 of 10.0.0.1 did not accept connections within 60 seconds.')
+    self.vm.WaitForBootCompletion()
+    self.assertIsNone(self.vm.port_open_time)
+    self.assertEqual('vm0', self.vm.hostname)
+
+  def testSshGetsRemainingTimeout(self):
+    now = [1000.]
+    timeouts = []
+
+    def WaitForPort(*unused_args):
+      now[0] += 45
+      return now[0]
+
+    def Retry(**kwargs):
+      timeouts.append(kwargs['timeout'])
+      return lambda f: f
+    self.wait_for_port.side_effect = WaitForPort
+    with mock.patch(vm_util.__name__ + '.Retry', side_effect=Retry):
+      with mock.patch(linux_virtual_machine.__name__ + '.time.time',
+                      side_effect=lambda: now[0]):
+        self.vm.WaitForBootCompletion()
+    self.assertEqual([15.], timeouts)
+
+
+if __name__ == '__main__':
+  unittest.main()
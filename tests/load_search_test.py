@@ -0,0 +1,169 @@
+# Copyright 2016 PerfKitBenchmarker Authors. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Tests for perfkitbenchmarker.load_search."""
+
+import unittest
+
+from perfkitbenchmarker import load_search
+
+
+class _FakeSystem(object):
+  """A system whose throughput saturates at 'capacity' requests/sec.
+
+  Each unit of load issues 10 requests/sec. Latency is 1ms until the system
+  saturates and then grows with the queue.
+  """
+
+  def __init__(self, capacity, noise=None):
+    self.capacity = capacity
+    self.noise = list(noise or [])
+    self.loads = []
+
+  def __call__(self, load):
+    self.loads.append(load)
+    offered = 10.0 * load
+    throughput = min(offered, self.capacity)
+    if self.noise:
+      throughput *= self.noise.pop(0)
+    latency = 1.0 * max(1.0, offered / self.capacity)
+    return load_search.Measurement(throughput, latency, [load])
+
+
+class MeetsLatencyLimitTestCase(unittest.TestCase):
+
+  def testLimitIsInclusive(self):
+    self.assertTrue(load_search.MeetsLatencyLimit(0.5, 1.0))
+    self.assertTrue(load_search.MeetsLatencyLimit(1.0, 1.0))
+    self.assertFalse(load_search.MeetsLatencyLimit(1.01, 1.0))
+
+  def testMissingValues(self):
+    self.assertFalse(load_search.MeetsLatencyLimit(None, 1.0))
+    self.assertFalse(load_search.MeetsLatencyLimit(None, None))
+    self.assertTrue(load_search.MeetsLatencyLimit(100.0, None))
+
+
+class MaxThroughputUnderLatencyLimitTestCase(unittest.TestCase):
+
+  def _Search(self, system, latency_limit, **kwargs):
+    kwargs.setdefault('noise_margin', 0.01)
+    kwargs.setdefault('max_retries', 0)
+    return load_search.MaxThroughputUnderLatencyLimit(
+        system, 1, 128, latency_limit, **kwargs)
+
+  def testBisectsLatencyBoundary(self):
+    # Saturates at load 50; latency reaches 1.5ms at load 75.
+    system = _FakeSystem(500.0)
+    result = self._Search(system, 1.5, noise_margin=0.0)
+    # The first load to reach the peak is reported, but the bisection still
+    # has to find the latency boundary to rule out higher throughput.
+    self.assertEqual(64, result.best.load)
+    self.assertEqual(500.0, result.best.throughput)
+    self.assertEqual([1, 2, 4, 8, 16, 32, 64, 128, 96, 80, 72, 76, 74, 75],
+                     system.loads)
+    self.assertEqual(system.loads, [p.load for p in result.points])
+
+  def testStopsWhenThroughputStopsIncreasing(self):
+    system = _FakeSystem(200.0)
+    # Equal results at a higher load are not worth repeating.
+    result = self._Search(system, 10.0, max_retries=2)
+    self.assertEqual([1, 2, 4, 8, 16, 32, 64], system.loads)
+    self.assertEqual(200.0, result.best.throughput)
+    self.assertEqual(32, result.best.load)
+
+  def testMaxLoadMeetsLimit(self):
+    system = _FakeSystem(1e6)
+    result = self._Search(system, 1.0)
+    self.assertEqual(128, result.best.load)
+
+  def testMinLoadMissesLimit(self):
+    result = self._Search(_FakeSystem(1.0), 1.0)
+    self.assertIsNone(result.best)
+    self.assertEqual(1, len(result.points))
+
+  def testRepeatsRunsNearLimit(self):
+    system = _FakeSystem(1e6)
+    result = load_search.MaxThroughputUnderLatencyLimit(
+        system, 1, 1, 1.0, noise_margin=0.1, max_retries=2)
+    self.assertEqual([1, 1, 1], system.loads)
+    self.assertEqual(3, len(result.best.measurements))
+    self.assertEqual([1, 1, 1], result.best.samples)
+
+  def testFailedRunsMissLimit(self):
+    result = load_search.MaxThroughputUnderLatencyLimit(
+        lambda load: load_search.Measurement(10.0, None, []), 1, 8, 1.0,
+        max_retries=0)
+    self.assertIsNone(result.best)
+
+  def testInvalidRange(self):
+    with self.assertRaises(ValueError):
+      self._Search(_FakeSystem(1.0), 1.0, resolution=0)
+    with self.assertRaises(ValueError):
+      load_search.MaxThroughputUnderLatencyLimit(_FakeSystem(1.0), 0, 8, 1.0)
+
+
+class FindKneeTestCase(unittest.TestCase):
+
+  def _PeakedSystem(self, peak):
+    loads = []
+
+    def Measure(load):
+      loads.append(load)
+      return load_search.Measurement(1000.0 - abs(load - peak) * 10.0, 1.0,
+                                     [])
+    return Measure, loads
+
+  def testFindsPeak(self):
+    measure, loads = self._PeakedSystem(37)
+    result = load_search.FindKnee(measure, 1, 100, noise_margin=0.0,
+                                  max_retries=0)
+    self.assertEqual(37, result.best.load)
+    self.assertLess(len(loads), 15)
+    self.assertEqual(len(loads), len(set(loads)))
+
+  def testLogScale(self):
+    measure, loads = self._PeakedSystem(6)
+    result = load_search.FindKnee(measure, 1, 128, log_scale=True,
+                                  noise_margin=0.0, max_retries=0)
+    self.assertEqual(6, result.best.load)
+    self.assertLess(len(loads), 12)
+
+  def testMonotonicThroughputReachesMaxLoad(self):
+    result = load_search.FindKnee(_FakeSystem(1e6), 1, 100, noise_margin=0.0,
+                                  max_retries=0)
+    self.assertEqual(100, result.best.load)
+
+  def testConvergesOnStartOfPlateau(self):
+    result = load_search.FindKnee(_FakeSystem(200.0), 1, 100, resolution=2,
+                                  noise_margin=0.01, max_retries=0)
+    self.assertEqual(200.0, result.best.throughput)
+    self.assertEqual(20, result.best.load)
+
+  def testLatencyLimit(self):
+    result = load_search.FindKnee(_FakeSystem(200.0), 1, 100,
+                                  latency_limit=1.0, noise_margin=0.01,
+                                  max_retries=0)
+    self.assertEqual(20, result.best.load)
+
+  def testNoisyComparisonIsRepeated(self):
+    # The first measurement at the upper interior load is low enough to be
+    # within noise of the lower one; repeating it shows the upper is better.
+    system = _FakeSystem(1e6, noise=[1.0, 0.65])
+    result = load_search.FindKnee(system, 1, 100, noise_margin=0.05,
+                                  max_retries=2)
+    self.assertEqual([39, 62, 39, 62, 77], system.loads[:5])
+    self.assertGreater(result.best.load, 77)
+
+
+if __name__ == '__main__':
+  unittest.main()
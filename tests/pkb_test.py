@@ -0,0 +1,239 @@
+# Copyright 2016 PerfKitBenchmarker Authors. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Tests for perfkitbenchmarker.pkb."""
+
+import json
+import os
+import shutil
+import tempfile
+import threading
+import unittest
+
+import mock
+
+from perfkitbenchmarker import benchmark_spec
+from perfkitbenchmarker import benchmark_status
+from perfkitbenchmarker import errors
+from perfkitbenchmarker import flags
+from perfkitbenchmarker import pkb
+from perfkitbenchmarker import resource_graph
+from perfkitbenchmarker import timing_util
+from perfkitbenchmarker import vm_util
+from tests import mock_flags
+
+
+class ParseVmCapsTestCase(unittest.TestCase):
+
+  def testValid(self):
+    self.assertEqual(pkb._ParseVmCaps(['GCP:10', 'AWS:5']),
+                     {'GCP': 10, 'AWS': 5})
+
+  def testEmpty(self):
+    self.assertEqual(pkb._ParseVmCaps([]), {})
+
+  def testMissingCount(self):
+    with self.assertRaises(ValueError):
+      pkb._ParseVmCaps(['GCP'])
+
+  def testUnknownCloud(self):
+    with self.assertRaises(ValueError):
+      pkb._ParseVmCaps(['Nimbus:3'])
+
+
+class VmCapTrackerTestCase(unittest.TestCase):
+
+  def testUncappedCloud(self):
+    tracker = pkb._VmCapTracker({'GCP': 1})
+    with tracker.Reserve({'AWS': 100}):
+      pass
+
+  def testExceedsCap(self):
+    tracker = pkb._VmCapTracker({'GCP': 2})
+    with self.assertRaises(errors.Config.InvalidValue):
+      with tracker.Reserve({'GCP': 3}):
+        pass
+
+  def testBlocksUntilReleased(self):
+    tracker = pkb._VmCapTracker({'GCP': 3})
+    second_reserved = threading.Event()
+
+    def ReserveSecond():
+      with tracker.Reserve({'GCP': 2}):
+        second_reserved.set()
+
+    with tracker.Reserve({'GCP': 2}):
+      thread = threading.Thread(target=ReserveSecond)
+      thread.start()
+      self.assertFalse(second_reserved.wait(0.1))
+    thread.join(5)
+    self.assertTrue(second_reserved.is_set())
+
+
+class GetVmCountsByCloudTestCase(unittest.TestCase):
+
+  def setUp(self):
+    self.flags = mock_flags.PatchTestCaseFlags(self)
+    self.flags['cloud'].value = 'GCP'
+    self.flags['num_vms'].value = 4
+    p = mock.patch(pkb.configs.__name__ + '.GetMergedFlags',
+                   return_value=self.flags)
+    p.start()
+    self.addCleanup(p.stop)
+
+  def testGroups(self):
+    config = {'vm_groups': {
+        'default': {},
+        'clients': {'vm_count': None},
+        'servers': {'vm_count': 2, 'cloud': 'AWS'}}}
+    self.assertEqual(pkb._GetVmCountsByCloud(config), {'GCP': 5, 'AWS': 2})
+
+  def testCloudFlagOverridesGroup(self):
+    self.flags.cloud = 'Azure'
+    config = {'vm_groups': {'servers': {'vm_count': 2, 'cloud': 'AWS'}}}
+    self.assertEqual(pkb._GetVmCountsByCloud(config), {'Azure': 2})
+
+
+class RunBenchmarkTestCase(unittest.TestCase):
+
+  def setUp(self):
+    self.flags = mock_flags.PatchTestCaseFlags(self)
+    self.flags.run_stage = pkb.STAGE_ALL
+    self.flags.timing_measurements = [timing_util.MEASUREMENTS_RUNTIMES]
+    self.temp_dir = tempfile.mkdtemp()
+    self.addCleanup(shutil.rmtree, self.temp_dir)
+    p = mock.patch(vm_util.__name__ + '.GetTempDir',
+                   return_value=self.temp_dir)
+    p.start()
+    self.addCleanup(p.stop)
+    self.spec = mock.Mock(resource_intervals=[], always_call_cleanup=False)
+    self.spec.Delete.side_effect = lambda: self.spec.resource_intervals.append(
+        resource_graph.Interval('VM', 'Delete', 'vm0', 30., 40., True))
+    p = mock.patch(benchmark_spec.__name__ + '.BenchmarkSpec',
+                   return_value=self.spec)
+    p.start()
+    self.addCleanup(p.stop)
+    self.collector = mock.Mock()
+
+  def _Samples(self):
+    return [s for args, _ in self.collector.AddSamples.call_args_list
+            for s in args[0]]
+
+  def testPublishesIntervalsOfFailedProvisioning(self):
+    def Provision(unused_name, spec, unused_timer):
+      spec.resource_intervals.append(
+          resource_graph.Interval('VM', 'Create', 'vm0', 10., 20., False))
+      raise errors.Error('Quota exceeded.')
+    benchmark = mock.Mock(spec=['BENCHMARK_NAME'], BENCHMARK_NAME='ping')
+    with mock.patch(pkb.__name__ + '.DoProvisionPhase',
+                    side_effect=Provision):
+      with self.assertRaises(errors.Error):
+        pkb.RunBenchmark(benchmark, self.collector, 1, 1, {}, 'ping0')
+    self.assertEqual(['VM Create Runtime', 'VM Delete Runtime'],
+                     [s.metric for s in self._Samples()])
+    with open(os.path.join(self.temp_dir,
+                           'ping0-all-timeline.json')) as f:
+      events = json.load(f)['traceEvents']
+    self.assertEqual(['VM Create', 'VM Delete'],
+                     [e['name'] for e in events if e['ph'] == 'X'])
+    self.assertEqual([], self.spec.resource_intervals)
+
+
+class RunBenchmarkAndUpdateStatusTestCase(unittest.TestCase):
+
+  def setUp(self):
+    self.flags = mock_flags.PatchTestCaseFlags(self)
+    self.flags.run_stage = pkb.STAGE_RUN
+    self.flags.stop_after_benchmark_failure = False
+    benchmark_module = mock.Mock(BENCHMARK_NAME='ping')
+    self.run_args = (benchmark_module, None, 1, 1, {}, 'ping0')
+    self.status = ['ping', 'ping0', benchmark_status.SKIPPED]
+    self.stop = threading.Event()
+    p = mock.patch(pkb.__name__ + '.RunBenchmark')
+    self.run_benchmark = p.start()
+    self.addCleanup(p.stop)
+
+  def _Run(self):
+    pkb._RunBenchmarkAndUpdateStatus(self.run_args, self.status,
+                                     pkb._VmCapTracker({}), self.stop)
+
+  def testSuccess(self):
+    self._Run()
+    self.assertEqual(self.status[2], benchmark_status.SUCCEEDED)
+    self.assertFalse(self.stop.is_set())
+
+  def testFailureContinues(self):
+    self.run_benchmark.side_effect = Exception()
+    self._Run()
+    self.assertEqual(self.status[2], benchmark_status.FAILED)
+    self.assertFalse(self.stop.is_set())
+
+  def testFailureStops(self):
+    self.flags.stop_after_benchmark_failure = True
+    self.run_benchmark.side_effect = Exception()
+    self._Run()
+    self.assertEqual(self.status[2], benchmark_status.FAILED)
+    self.assertTrue(self.stop.is_set())
+
+  def testKeyboardInterruptStops(self):
+    self.run_benchmark.side_effect = KeyboardInterrupt()
+    self._Run()
+    self.assertTrue(self.stop.is_set())
+
+  def testSkippedAfterStop(self):
+    self.stop.set()
+    self._Run()
+    self.assertEqual(self.status[2], benchmark_status.SKIPPED)
+    self.assertFalse(self.run_benchmark.called)
+
+
+
+class IsHelpRequestedTestCase(unittest.TestCase):
+
+  def testHelpFlags(self):
+    for flag in ('--help', '-help', '-?', '--helpshort', '--helpxml=true'):
+      self.assertTrue(pkb._IsHelpRequested(['pkb.py', '--benchmarks=ping',
+                                            flag]), flag)
+
+  def testNoHelpFlag(self):
+    self.assertFalse(pkb._IsHelpRequested(['pkb.py', '--benchmarks=help']))
+    self.assertFalse(pkb._IsHelpRequested(['pkb.py', '--', '--help']))
+
+
+class ParseFlagsTestCase(unittest.TestCase):
+
+  def setUp(self):
+    p = mock.patch(pkb.__name__ + '._LoadAllModules')
+    self.load_all_modules = p.start()
+    self.addCleanup(p.stop)
+    p = mock.patch(pkb.__name__ + '.FLAGS')
+    self.flags = p.start()
+    self.addCleanup(p.stop)
+
+  def testKnownFlags(self):
+    self.flags.return_value = ['pkb.py']
+    self.assertEqual(['pkb.py'], pkb._ParseFlags(['pkb.py', '--benchmarks=a']))
+    self.assertFalse(self.load_all_modules.called)
+
+  def testUnknownFlagLoadsAllModules(self):
+    self.flags.side_effect = [
+        flags.UnrecognizedFlagError('fio_jobfile', '--fio_jobfile=a'),
+        ['pkb.py']]
+    self.assertEqual(['pkb.py'], pkb._ParseFlags(['pkb.py', '--fio_jobfile=a']))
+    self.load_all_modules.assert_called_once_with()
+    self.flags.Reset.assert_called_once_with()
+    self.assertEqual(2, self.flags.call_count)
+
+
+if __name__ == '__main__':
+  unittest.main()
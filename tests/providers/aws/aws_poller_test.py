@@ -0,0 +1,122 @@
+# Copyright 2016 PerfKitBenchmarker Authors. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Tests for perfkitbenchmarker.providers.aws.aws_poller."""
+
+import json
+import threading
+import unittest
+
+import mock
+
+from perfkitbenchmarker import vm_util
+from perfkitbenchmarker.providers.aws import aws_poller
+from perfkitbenchmarker.providers.aws import util
+
+
+class _FakeEc2(object):
+  """Answers describe-vpcs and describe-instances commands from a set of IDs.
+
+  Attributes:
+    commands: list of lists of strings. The commands issued, in order.
+    existing_ids: set of strings. IDs of the existing resources.
+    blocking: threading.Event. Commands block until it is set.
+  """
+
+  def __init__(self, existing_ids):
+    self.commands = []
+    self.existing_ids = existing_ids
+    self.blocking = threading.Event()
+    self.blocking.set()
+
+  def __call__(self, cmd):
+    self.commands.append(cmd)
+    self.blocking.wait()
+    ids = [i for i in cmd[-1].split('Values=')[1].split(',')
+           if i in self.existing_ids]
+    if cmd[4] == 'describe-instances':
+      response = {'Reservations': [
+          {'Instances': [{'InstanceId': i, 'State': {'Name': 'running'}}]}
+          for i in ids]}
+    else:
+      response = {'Vpcs': [{'VpcId': i} for i in ids]}
+    return json.dumps(response), ''
+
+
+class DescribeTestCase(unittest.TestCase):
+
+  def setUp(self):
+    p = mock.patch.dict(aws_poller._pollers, clear=True)
+    p.start()
+    self.addCleanup(p.stop)
+    self.ec2 = _FakeEc2({'i-1', 'i-2', 'vpc-1'})
+    p = mock.patch(util.__name__ + '.IssueRetryableCommand', self.ec2)
+    p.start()
+    self.addCleanup(p.stop)
+
+  def _Describe(self, resource_id):
+    kind = aws_poller.VPC if resource_id.startswith('vpc') else (
+        aws_poller.INSTANCE)
+    return aws_poller.Describe(kind, 'us-east-1', resource_id)
+
+  def testDescribe(self):
+    self.assertEqual({'VpcId': 'vpc-1'}, self._Describe('vpc-1'))
+    self.assertIsNone(self._Describe('vpc-2'))
+    self.assertEqual('i-1', self._Describe('i-1')['InstanceId'])
+    self.assertEqual(
+        ['describe-vpcs', 'describe-vpcs', 'describe-instances'],
+        [cmd[4] for cmd in self.ec2.commands])
+    # Each sweep describes every resource described before.
+    self.assertEqual('Name=vpc-id,Values=vpc-1,vpc-2',
+                     self.ec2.commands[1][-1])
+
+  def testConcurrentCallersShareSweeps(self):
+    self.ec2.blocking.clear()
+    # The first sweep starts before the other IDs are known.
+    first = threading.Thread(target=self._Describe, args=('i-1',))
+    first.start()
+    while not self.ec2.commands:
+      first.join(0.01)
+    ids = ['i-%d' % i for i in xrange(2, 10)]
+    threads = [threading.Thread(target=self._Describe, args=(i,))
+               for i in ids]
+    for thread in threads:
+      thread.start()
+    poller = aws_poller._pollers[aws_poller.INSTANCE, 'us-east-1']
+    while len(poller.resource_ids) < 9:
+      first.join(0.01)
+    self.ec2.blocking.set()
+    for thread in [first] + threads:
+      thread.join()
+    self.assertEqual(2, len(self.ec2.commands))
+    self.assertEqual('Name=instance-id,Values=' + ','.join(['i-1'] + ids),
+                     self.ec2.commands[1][-1])
+
+  def testSweepsAreChunked(self):
+    vm_util.RunThreaded(self._Describe,
+                        ['i-%03d' % i for i in xrange(250)])
+    last_sweep = [cmd[-1] for cmd in self.ec2.commands[-2:]]
+    self.assertEqual([200, 50],
+                     [len(values.split('Values=')[1].split(','))
+                      for values in last_sweep])
+
+  def testFailedSweep(self):
+    with mock.patch(util.__name__ + '.IssueRetryableCommand',
+                    side_effect=ValueError()):
+      with self.assertRaises(ValueError):
+        self._Describe('i-1')
+    self.assertEqual('i-1', self._Describe('i-1')['InstanceId'])
+
+
+if __name__ == '__main__':
+  unittest.main()
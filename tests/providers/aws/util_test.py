@@ -0,0 +1,88 @@
+# Copyright 2016 PerfKitBenchmarker Authors. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Tests for perfkitbenchmarker.providers.aws.util."""
+
+import threading
+import unittest
+
+import mock
+
+from perfkitbenchmarker.providers.aws import util
+
+
+class AddTagsTestCase(unittest.TestCase):
+
+  def setUp(self):
+    self.commands = []
+    self.blocking = threading.Event()
+    self.blocking.set()
+    p = mock.patch(util.__name__ + '.IssueRetryableCommand',
+                   side_effect=self._IssueCommand)
+    self.issue_command = p.start()
+    self.addCleanup(p.stop)
+
+  def _IssueCommand(self, cmd):
+    self.commands.append(cmd)
+    self.blocking.wait()
+    return '', ''
+
+  def _Resources(self, cmd):
+    return cmd[cmd.index('--resources') + 1:cmd.index('--tags')]
+
+  def testAddTags(self):
+    util.AddTags('i-1', 'us-east-1', owner='me', run='abc')
+    self.assertEqual(
+        ['aws', '--output', 'json', 'ec2', 'create-tags',
+         '--region=us-east-1', '--resources', 'i-1', '--tags',
+         'Key=owner,Value=me', 'Key=run,Value=abc'],
+        self.commands[0])
+
+  def testNoTags(self):
+    util.AddTags('i-1', 'us-east-1')
+    self.assertEqual([], self.commands)
+
+  def testBatchesWhileInFlight(self):
+    self.blocking.clear()
+    first = threading.Thread(target=util.AddTags, args=('i-1', 'us-east-1'),
+                             kwargs={'owner': 'me'})
+    first.start()
+    while not self.commands:
+      first.join(0.01)
+    threads = [threading.Thread(target=util.AddTags,
+                                args=('i-%d' % i, 'us-east-1'),
+                                kwargs={'owner': 'me'})
+               for i in xrange(2, 6)]
+    for thread in threads:
+      thread.start()
+    while sum(len(batch.resource_ids)
+              for batch in util._pending_tag_batches.values()) < 4:
+      first.join(0.01)
+    self.blocking.set()
+    for thread in [first] + threads:
+      thread.join()
+    self.assertEqual(2, len(self.commands))
+    self.assertEqual(['i-1'], self._Resources(self.commands[0]))
+    self.assertItemsEqual(['i-2', 'i-3', 'i-4', 'i-5'],
+                          self._Resources(self.commands[1]))
+
+  def testFailure(self):
+    self.issue_command.side_effect = ValueError()
+    with self.assertRaises(ValueError):
+      util.AddTags('i-1', 'us-east-1', owner='me')
+    self.assertEqual({}, util._pending_tag_batches)
+    self.assertEqual(set(), util._tags_in_flight)
+
+
+if __name__ == '__main__':
+  unittest.main()
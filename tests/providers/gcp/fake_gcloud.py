@@ -0,0 +1,108 @@
+# Copyright 2016 PerfKitBenchmarker Authors. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""A stand-in for gcloud that keeps GCE instances in memory.
+
+Patch vm_util.IssueCommand with a FakeGcloud to test code issuing "gcloud
+compute instances" commands offline:
+
+  gcloud = fake_gcloud.FakeGcloud()
+  with mock.patch(vm_util.__name__ + '.IssueCommand', gcloud):
+    ...
+  self.assertEqual(1, gcloud.CountCommands('create'))
+"""
+
+import json
+import re
+import threading
+
+
+def _ParseCommand(cmd):
+  """Splits a gcloud command into its non-flag args and a dict of flags."""
+  args = []
+  flags = {}
+  i = 1
+  while i < len(cmd):
+    if cmd[i].startswith('--'):
+      if i + 1 < len(cmd) and not cmd[i + 1].startswith('--'):
+        flags[cmd[i][2:]] = cmd[i + 1]
+        i += 2
+      else:
+        flags[cmd[i][2:]] = True
+        i += 1
+    else:
+      args.append(cmd[i])
+      i += 1
+  return args, flags
+
+
+class FakeGcloud(object):
+  """Callable replacing vm_util.IssueCommand for gcloud instance commands.
+
+  Attributes:
+    commands: list of (args, flags) tuples. The commands issued, in order.
+    instances: dict mapping (zone, name) to the description of an instance.
+    failing_names: set of strings. Names of the instances that "create" fails
+        to create.
+  """
+
+  def __init__(self):
+    self.commands = []
+    self.instances = {}
+    self.failing_names = set()
+    self._lock = threading.Lock()
+
+  def CountCommands(self, operation):
+    """Returns the number of "compute instances <operation>" commands."""
+    return sum(1 for args, _ in self.commands
+               if args[:3] == ['compute', 'instances', operation])
+
+  def __call__(self, cmd, **kwargs):
+    args, flags = _ParseCommand(cmd)
+    with self._lock:
+      self.commands.append((args, flags))
+      operation, names = args[2], args[3:]
+      return getattr(self, '_' + operation.capitalize())(names, flags)
+
+  def _Create(self, names, flags):
+    retcode = 0
+    for name in names:
+      if name in self.failing_names or (flags['zone'], name) in self.instances:
+        retcode = 1
+        continue
+      number = len(self.instances) + 1
+      self.instances[flags['zone'], name] = {
+          'name': name,
+          'zone': flags['zone'],
+          'networkInterfaces': [{
+              'networkIP': '10.0.0.%d' % number,
+              'accessConfigs': [{'natIP': '104.0.0.%d' % number}]}]}
+    return '', '', retcode
+
+  def _Delete(self, names, flags):
+    for name in names:
+      self.instances.pop((flags['zone'], name), None)
+    return '', '', 0
+
+  def _Describe(self, names, flags):
+    instance = self.instances.get((flags['zone'], names[0]))
+    if not instance:
+      return '', 'not found', 1
+    return json.dumps(instance), '', 0
+
+  def _List(self, unused_names, flags):
+    pattern = re.match(r'name ~ (.*)', flags['filter']).group(1)
+    instances = [instance for (zone, name), instance
+                 in sorted(self.instances.iteritems())
+                 if zone == flags['zones'] and re.match(pattern, name)]
+    return json.dumps(instances), '', 0
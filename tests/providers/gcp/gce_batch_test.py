@@ -0,0 +1,123 @@
+# Copyright 2016 PerfKitBenchmarker Authors. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Tests for perfkitbenchmarker.providers.gcp.gce_batch."""
+
+import unittest
+
+import mock
+
+from perfkitbenchmarker import vm_util
+from perfkitbenchmarker.providers.gcp import gce_batch
+from perfkitbenchmarker.providers.gcp import util
+from tests.providers.gcp import fake_gcloud
+
+
+class _Instance(object):
+
+  def __init__(self, name, zone='us-central1-a', machine_type='n1-standard-1'):
+    self.name = name
+    self.zone = zone
+    self.project = 'project'
+    self.machine_type = machine_type
+
+
+class GceBatchTestCase(unittest.TestCase):
+
+  def setUp(self):
+    p = mock.patch(gce_batch.__name__ + '.FLAGS')
+    self.flags = p.start()
+    self.addCleanup(p.stop)
+    self.flags.gce_create_batch_window = 0.1
+    self.flags.gce_status_cache_ttl = 60
+    self.flags.run_uri = 'abc'
+    p = mock.patch(util.__name__ + '.FLAGS')
+    util_flags = p.start()
+    self.addCleanup(p.stop)
+    util_flags.gcloud_path = 'gcloud'
+    util_flags.additional_gcloud_flags = None
+    p = mock.patch.dict(gce_batch._zone_listings, clear=True)
+    p.start()
+    self.addCleanup(p.stop)
+    self.gcloud = fake_gcloud.FakeGcloud()
+    p = mock.patch(vm_util.__name__ + '.IssueCommand', self.gcloud)
+    p.start()
+    self.addCleanup(p.stop)
+
+  def _Create(self, instance):
+    cmd = util.GcloudCommand(instance, 'compute', 'instances', 'create',
+                             instance.name)
+    cmd.flags['machine-type'] = instance.machine_type
+    return gce_batch.IssueInstancesCommand(cmd, instance.project,
+                                           instance.zone)
+
+  def _Delete(self, instance):
+    cmd = util.GcloudCommand(instance, 'compute', 'instances', 'delete',
+                             instance.name)
+    return gce_batch.IssueInstancesCommand(cmd, instance.project,
+                                           instance.zone)
+
+  def testBatchesCreation(self):
+    instances = [_Instance('pkb-abc-%d' % i) for i in xrange(5)]
+    instances.append(_Instance('pkb-abc-5', machine_type='n1-standard-2'))
+    vm_util.RunThreaded(self._Create, instances)
+    self.assertEqual(2, self.gcloud.CountCommands('create'))
+    self.assertItemsEqual(
+        [['pkb-abc-%d' % i for i in xrange(5)], ['pkb-abc-5']],
+        [sorted(args[3:]) for args, _ in self.gcloud.commands])
+    self.assertEqual(6, len(self.gcloud.instances))
+
+  def testWithoutBatching(self):
+    self.flags.gce_create_batch_window = 0
+    vm_util.RunThreaded(self._Create,
+                        [_Instance('pkb-abc-%d' % i) for i in xrange(3)])
+    self.assertEqual(3, self.gcloud.CountCommands('create'))
+
+  def testOneListingPerZone(self):
+    instances = [_Instance('pkb-abc-%d' % i) for i in xrange(4)]
+    instances.append(_Instance('pkb-abc-4', zone='europe-west1-b'))
+    vm_util.RunThreaded(self._Create, instances)
+    found = vm_util.RunThreaded(gce_batch.GetInstance, instances)
+    self.assertEqual([i.name for i in instances], [f['name'] for f in found])
+    self.assertEqual(2, self.gcloud.CountCommands('list'))
+    self.assertIsNone(gce_batch.GetInstance(_Instance('pkb-abc-9')))
+    self.assertEqual(2, self.gcloud.CountCommands('list'))
+
+  def testCreationInvalidatesListing(self):
+    instance = _Instance('pkb-abc-0')
+    self.assertIsNone(gce_batch.GetInstance(instance))
+    self._Create(instance)
+    self.assertIsNotNone(gce_batch.GetInstance(instance))
+    self._Delete(instance)
+    self.assertIsNone(gce_batch.GetInstance(instance))
+    self.assertEqual(3, self.gcloud.CountCommands('list'))
+
+  def testExpiredListing(self):
+    self.flags.gce_status_cache_ttl = 0
+    instance = _Instance('pkb-abc-0')
+    self._Create(instance)
+    gce_batch.GetInstance(instance)
+    gce_batch.GetInstance(instance)
+    self.assertEqual(2, self.gcloud.CountCommands('list'))
+
+  def testPartialFailure(self):
+    self.gcloud.failing_names.add('pkb-abc-1')
+    instances = [_Instance('pkb-abc-%d' % i) for i in xrange(3)]
+    results = vm_util.RunThreaded(self._Create, instances)
+    self.assertEqual([1, 1, 1], [retcode for _, _, retcode in results])
+    found = [gce_batch.GetInstance(instance) for instance in instances]
+    self.assertEqual([True, False, True], [bool(f) for f in found])
+
+
+if __name__ == '__main__':
+  unittest.main()
@@ -0,0 +1,62 @@
+# Copyright 2016 PerfKitBenchmarker Authors. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Tests for perfkitbenchmarker.providers.gcp.gce_network."""
+
+import unittest
+
+import mock
+
+from perfkitbenchmarker import context
+from perfkitbenchmarker import network
+from perfkitbenchmarker.providers.gcp import gce_network
+
+
+class GceNetworkNameTestCase(unittest.TestCase):
+
+  def setUp(self):
+    p = mock.patch(network.__name__ + '.FLAGS')
+    flags = p.start()
+    self.addCleanup(p.stop)
+    flags.run_uri = 'abc123'
+    p = mock.patch(gce_network.__name__ + '.FLAGS')
+    self.flags = p.start()
+    self.addCleanup(p.stop)
+    self.flags.gce_network_name = None
+    self.addCleanup(context.SetThreadBenchmarkSpec, None)
+
+  def _CreateNetwork(self, benchmark_uid):
+    context.SetThreadBenchmarkSpec(mock.Mock(uid=benchmark_uid))
+    return gce_network.GceNetwork(
+        gce_network.GceNetworkSpec(project='project'))
+
+  def testNamesAreUniquePerBenchmark(self):
+    first = self._CreateNetwork('cluster_boot0')
+    second = self._CreateNetwork('cluster_boot1')
+    self.assertEqual('pkb-network-abc123-cluster-boot0',
+                     first.network_resource.name)
+    self.assertEqual('default-internal-abc123-cluster-boot0',
+                     first.default_firewall_rule.name)
+    self.assertNotEqual(first.network_resource.name,
+                        second.network_resource.name)
+    self.assertNotEqual(first.default_firewall_rule.name,
+                        second.default_firewall_rule.name)
+
+  def testExistingNetwork(self):
+    self.flags.gce_network_name = 'default'
+    self.assertEqual('default',
+                     self._CreateNetwork('iperf0').network_resource.name)
+
+
+if __name__ == '__main__':
+  unittest.main()
@@ -16,6 +16,7 @@
 import collections
 import io
 import json
+import os
 import re
 import tempfile
 import uuid
@@ -23,6 +24,7 @@ import unittest
 
 import mock
 
+from perfkitbenchmarker import events
 from perfkitbenchmarker import publisher
 from perfkitbenchmarker import sample
 from perfkitbenchmarker import vm_util
@@ -90,6 +92,14 @@ class NewlineDelimitedJSONPublisherTestCase(unittest.TestCase):
     self.assertDictEqual({'test': 'testa', 'labels': '|key:value|,|foo:bar|'},
                          d)
 
+  def testLaterCallsAppend(self):
+    self.instance.PublishSamples([{'test': 'testa', 'metadata': {}}])
+    self.instance.PublishSamples([{'test': 'testb', 'metadata': {}}])
+    result = [json.loads(i) for i in self.fp]
+    self.assertListEqual([{u'test': u'testa', u'labels': u''},
+                          {u'test': u'testb', u'labels': u''}],
+                         result)
+
   def testJSONRecordPerLine(self):
     samples = [{'test': 'testa', 'metadata': {'key': 'val'}},
                {'test': 'testb', 'metadata': {'key2': 'val2'}}]
@@ -101,6 +111,58 @@ class NewlineDelimitedJSONPublisherTestCase(unittest.TestCase):
                           {u'test': u'testb', u'labels': u'|key2:val2|'}],
                          result)
 
+  def testLayeredMetadataWithoutCollapsedLabels(self):
+    self.instance.collapse_labels = False
+    metadata = publisher.LayeredMetadata({'key': 'val'}, {'cloud': 'GCP'})
+    self.instance.PublishSamples([{'test': 'testa', 'metadata': metadata}])
+    self.assertDictEqual(
+        {u'test': u'testa', u'metadata': {u'key': u'val', u'cloud': u'GCP'}},
+        json.load(self.fp))
+
+
+class LayeredMetadataTestCase(unittest.TestCase):
+
+  def setUp(self):
+    self.shared = {'cloud': 'GCP', 'zone': 'us-central1-a'}
+    self.metadata = publisher.LayeredMetadata(
+        {'zone': 'sample-zone', 'threads': 4}, self.shared)
+
+  def testSharedKeysTakePrecedence(self):
+    self.assertEqual(
+        {'cloud': 'GCP', 'zone': 'us-central1-a', 'threads': 4},
+        dict(self.metadata))
+    self.assertEqual(3, len(self.metadata))
+
+  def testSetItemDoesNotModifySharedDict(self):
+    self.metadata['zone'] = 'other-zone'
+    self.metadata['preemptible'] = True
+    self.assertEqual('other-zone', self.metadata['zone'])
+    self.assertTrue(self.metadata['preemptible'])
+    self.assertEqual({'cloud': 'GCP', 'zone': 'us-central1-a'}, self.shared)
+
+  def testDelItemDoesNotModifySharedDict(self):
+    del self.metadata['cloud']
+    del self.metadata['threads']
+    self.assertEqual({'zone': 'us-central1-a'}, dict(self.metadata))
+    self.assertEqual({'cloud': 'GCP', 'zone': 'us-central1-a'}, self.shared)
+    with self.assertRaises(KeyError):
+      del self.metadata['cloud']
+
+  def testGetLabelsFromDict(self):
+    self.assertEqual(
+        set(['|cloud:GCP|', '|zone:us-central1-a|', '|threads:4|']),
+        set(publisher.GetLabelsFromDict(self.metadata).split(',')))
+    self.metadata['zone'] = 'other-zone'
+    self.assertEqual(
+        set(['|cloud:GCP|', '|zone:other-zone|', '|threads:4|']),
+        set(publisher.GetLabelsFromDict(self.metadata).split(',')))
+
+  def testCopy(self):
+    copied = self.metadata.copy()
+    copied['threads'] = 8
+    self.assertEqual(4, self.metadata['threads'])
+    self.assertEqual(8, copied['threads'])
+
 
 class BigQueryPublisherTestCase(unittest.TestCase):
 
@@ -223,6 +285,115 @@ class SampleCollectorTestCase(unittest.TestCase):
         },
         self.instance.samples[0])
 
+  def _ConnectReceiver(self, signal):
+    receiver = mock.Mock()
+    signal.connect(receiver, weak=False)
+    self.addCleanup(signal.disconnect, receiver)
+    return receiver
+
+  def testSamplesCreatedIsSentOncePerBatch(self):
+    receiver = self._ConnectReceiver(events.samples_created)
+    self.instance.AddSamples([self.sample, self.sample], self.benchmark,
+                             self.benchmark_spec)
+    receiver.assert_called_once_with(None, benchmark_spec=self.benchmark_spec,
+                                     samples=self.instance.samples)
+
+  def testSampleCreatedIsSentPerSample(self):
+    receiver = self._ConnectReceiver(events.sample_created)
+    self.instance.AddSamples([self.sample, self.sample], self.benchmark,
+                             self.benchmark_spec)
+    self.assertEqual(
+        [mock.call(None, benchmark_spec=self.benchmark_spec, sample=s)
+         for s in self.instance.samples],
+        receiver.call_args_list)
+
+
+class IncrementalSampleCollectorTestCase(unittest.TestCase):
+
+  def setUp(self):
+    p = mock.patch(publisher.__name__ + '.FLAGS')
+    self.mock_flags = p.start()
+    self.addCleanup(p.stop)
+    self.mock_flags.configure_mock(publish_batch_size=2,
+                                   publish_batch_interval=3600,
+                                   product_name='PerfKitBenchmarker',
+                                   official=False, owner='owner')
+    spill_file = tempfile.NamedTemporaryFile(prefix='perfkit-test-',
+                                             suffix='.json')
+    self.addCleanup(spill_file.close)
+    self.final_publisher = mock.Mock(incremental=False)
+    self.streaming_publisher = mock.Mock(incremental=True, batched=False)
+    self.batched_publisher = mock.Mock(incremental=True, batched=True)
+    self.instance = publisher.SampleCollector(
+        metadata_providers=[],
+        publishers=[self.final_publisher, self.streaming_publisher,
+                    self.batched_publisher],
+        incremental=True, spill_path=spill_file.name)
+    self.benchmark_spec = mock.MagicMock(uuid='uuid')
+
+  def _PublishedMetrics(self, mock_publisher):
+    return [[s['metric'] for s in call[0][0]]
+            for call in mock_publisher.PublishSamples.call_args_list]
+
+  def testPublishSamples(self):
+    samples = [sample.Sample(str(i), i, 'oz') for i in range(5)]
+    self.instance.AddSamples(samples, 'test', self.benchmark_spec)
+    self.instance.PublishSamples()
+
+    self.assertEqual(self.instance.samples, [])
+    self.assertEqual(self.instance.sample_count, 5)
+    all_metrics = [str(i) for i in range(5)]
+    self.assertEqual(self._PublishedMetrics(self.final_publisher),
+                     [all_metrics])
+    # Incremental publishers receive every sample exactly once, in batches of
+    # at most publish_batch_size samples.
+    for incremental_publisher in (self.streaming_publisher,
+                                  self.batched_publisher):
+      batches = self._PublishedMetrics(incremental_publisher)
+      self.assertEqual(sum(batches, []), all_metrics)
+      self.assertTrue(all(len(batch) <= 2 for batch in batches))
+
+  def testPublisherErrorIsLogged(self):
+    self.streaming_publisher.PublishSamples.side_effect = ValueError()
+    self.instance.AddSamples([sample.Sample('a', 1, 'oz')], 'test',
+                             self.benchmark_spec)
+    self.instance.PublishSamples()
+    self.assertEqual(self._PublishedMetrics(self.batched_publisher), [['a']])
+    self.assertEqual(self._PublishedMetrics(self.final_publisher), [['a']])
+
+  def testUnserializableSampleIsSpilled(self):
+    circular = []
+    circular.append(circular)
+    spilled = []
+    self.final_publisher.PublishSamples.side_effect = spilled.extend
+    self.instance.AddSamples(
+        [sample.Sample('a', 1, 'oz', {'object': object}),
+         sample.Sample('b', 2, 'oz', {'circular': circular}),
+         sample.Sample('c', 3, 'oz')], 'test', self.benchmark_spec)
+    self.instance.PublishSamples()
+
+    self.assertEqual(['a', 'b', 'c'], [s['metric'] for s in spilled])
+    self.assertEqual(1, spilled[0]['value'])
+    self.assertEqual(repr(object), spilled[0]['metadata']['object'])
+    self.assertEqual(2, spilled[1]['value'])
+    self.assertEqual(repr(circular), spilled[1]['metadata']['circular'])
+
+  @mock.patch(publisher.__name__ + '._QUEUE_POLL_INTERVAL', .01)
+  @mock.patch(publisher.__name__ + '.SAMPLE_QUEUE_SIZE', 1)
+  def testPublishingThreadFailure(self):
+    self.instance.PublishSamples()
+    # The spill file cannot be created, which stops the publishing thread.
+    collector = publisher.SampleCollector(
+        metadata_providers=[], publishers=[self.streaming_publisher],
+        incremental=True,
+        spill_path=os.path.join(tempfile.gettempdir(), 'missing', 'spill'))
+    samples = [sample.Sample(str(i), i, 'oz') for i in range(3)]
+    # AddSamples raises the error instead of waiting for room on the queue.
+    with self.assertRaises(IOError):
+      collector.AddSamples(samples, 'test', self.benchmark_spec)
+    with self.assertRaises(IOError):
+      collector.PublishSamples()
+
 
 class DefaultMetadataProviderTestCase(unittest.TestCase):
 
@@ -269,7 +440,7 @@ class DefaultMetadataProviderTestCase(unittest.TestCase):
     result = instance.AddMetadata(input_metadata, self.mock_spec)
     self.assertIsNot(input_metadata, result,
                      msg='Input metadata was not copied.')
-    self.assertDictEqual(expected, result)
+    self.assertDictEqual(expected, dict(result))
 
   def testAddMetadata_ScratchDiskUndefined(self):
     del self.mock_spec.scratch_disk
@@ -321,6 +492,16 @@ class DefaultMetadataProviderTestCase(unittest.TestCase):
                     data_disk_0_foo='bar')
     self._RunTest(self.mock_spec, expected)
 
+  def testSpecMetadataIsComputedOnce(self):
+    instance = publisher.DefaultMetadataProvider()
+    first = instance.AddMetadata({'a': 1}, self.mock_spec)
+    second = instance.AddMetadata({'b': 2}, self.mock_spec)
+    self.assertEqual(1, self.mock_vm.GetMachineTypeDict.call_count)
+    meta = self.default_meta.copy()
+    meta.pop('num_striped_disks')
+    self.assertEqual(dict(meta, a=1), dict(first))
+    self.assertEqual(dict(meta, b=2), dict(second))
+
   def testDiskLegacyDiskType(self):
     self.mock_disk.configure_mock(disk_type='disk-type',
                                   metadata={'foo': 'bar',
@@ -0,0 +1,196 @@
+# Copyright 2016 PerfKitBenchmarker Authors. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Tests for perfkitbenchmarker.rate_limiter."""
+
+import unittest
+
+import mock
+
+from perfkitbenchmarker import rate_limiter
+from perfkitbenchmarker import vm_util
+
+_DESCRIBE = ['aws', '--output', 'json', 'ec2', 'describe-instances',
+             '--region=us-east-1']
+_CREATE = ['/usr/bin/gcloud', 'compute', 'instances', 'create', 'pkb-vm',
+           '--zone', 'us-central1-a']
+_THROTTLED = ('An error occurred (RequestLimitExceeded) when calling the '
+              'DescribeInstances operation: Request limit exceeded.')
+
+
+class _Clock(object):
+  """Replaces time.time and time.sleep."""
+
+  def __init__(self):
+    self.now = 1000.
+    self.sleeps = []
+
+  def Time(self):
+    return self.now
+
+  def Sleep(self, seconds):
+    self.sleeps.append(seconds)
+    self.now += seconds
+
+
+class TokenBucketTestCase(unittest.TestCase):
+
+  def setUp(self):
+    self.clock = _Clock()
+    p = mock.patch(rate_limiter.__name__ + '.time.time', self.clock.Time)
+    p.start()
+    self.addCleanup(p.stop)
+
+  def testBurst(self):
+    bucket = rate_limiter.TokenBucket(qps=2, burst=3)
+    self.assertEqual([0, 0, 0, .5, 1.],
+                     [bucket.Reserve() for _ in xrange(5)])
+
+  def testRefill(self):
+    bucket = rate_limiter.TokenBucket(qps=2, burst=3)
+    for _ in xrange(3):
+      bucket.Reserve()
+    self.clock.now += 1
+    self.assertEqual([0, 0, .5], [bucket.Reserve() for _ in xrange(3)])
+    self.clock.now += 100
+    self.assertEqual([0, 0, 0, .5], [bucket.Reserve() for _ in xrange(4)])
+
+  def testEmpty(self):
+    bucket = rate_limiter.TokenBucket(qps=2, burst=3)
+    bucket.Empty()
+    self.assertEqual(.5, bucket.Reserve())
+
+
+class GetApiTestCase(unittest.TestCase):
+
+  def testAws(self):
+    self.assertEqual(rate_limiter.Api('AWS', rate_limiter.READ),
+                     rate_limiter.GetApi(_DESCRIBE))
+    self.assertEqual(
+        rate_limiter.Api('AWS', rate_limiter.MUTATE),
+        rate_limiter.GetApi(['aws', 'ec2', 'run-instances', '--count', '1']))
+
+  def testGcloud(self):
+    self.assertEqual(rate_limiter.Api('GCP', rate_limiter.MUTATE),
+                     rate_limiter.GetApi(_CREATE))
+    self.assertEqual(
+        rate_limiter.Api('GCP', rate_limiter.READ),
+        rate_limiter.GetApi(['gcloud', 'compute', 'instances', 'list']))
+
+  def testOtherCommand(self):
+    self.assertIsNone(rate_limiter.GetApi(['ssh', 'host', 'list']))
+    self.assertIsNone(rate_limiter.GetApi([]))
+
+
+class RateLimiterTestCase(unittest.TestCase):
+
+  def setUp(self):
+    p = mock.patch(rate_limiter.__name__ + '.FLAGS')
+    flags = p.start()
+    self.addCleanup(p.stop)
+    flags.cloud_api_read_qps = 10
+    flags.cloud_api_mutate_qps = 0
+    flags.cloud_api_burst = 2
+    p = mock.patch.dict(rate_limiter._apis, clear=True)
+    p.start()
+    self.addCleanup(p.stop)
+    self.clock = _Clock()
+    p = mock.patch.multiple(rate_limiter.__name__ + '.time',
+                            time=self.clock.Time, sleep=self.clock.Sleep)
+    p.start()
+    self.addCleanup(p.stop)
+    rate_limiter.ClearLastCall()
+
+  def _Counters(self, command):
+    return rate_limiter.GetCounters()[rate_limiter.GetApi(command)]
+
+  def testAcquire(self):
+    for _ in xrange(4):
+      rate_limiter.Acquire(_DESCRIBE)
+      rate_limiter.Acquire(_CREATE)
+    # Sleeping refills the bucket, so each call beyond the burst waits for
+    # one token.
+    self.assertEqual([.1, .1], [round(s, 6) for s in self.clock.sleeps])
+    self.assertEqual(
+        {'calls': 4, 'throttles': 0, 'waits': 2, 'wait_time': .2,
+         'retries': 0},
+        {name: round(value, 6)
+         for name, value in self._Counters(_DESCRIBE).iteritems()})
+    self.assertEqual(4, self._Counters(_CREATE)['calls'])
+    self.assertIsNone(rate_limiter.Acquire(['echo']))
+
+  def testThrottle(self):
+    api = rate_limiter.Acquire(_DESCRIBE)
+    rate_limiter.RecordResult(api, 255, _THROTTLED)
+    self.assertTrue(rate_limiter.WasLastCallThrottled())
+    rate_limiter.RecordRetry()
+    # The bucket was emptied.
+    rate_limiter.Acquire(_DESCRIBE)
+    self.assertEqual([.1], self.clock.sleeps)
+    self.assertFalse(rate_limiter.WasLastCallThrottled())
+    counters = self._Counters(_DESCRIBE)
+    self.assertEqual(1, counters['throttles'])
+    self.assertEqual(1, counters['retries'])
+
+  def testOtherFailure(self):
+    api = rate_limiter.Acquire(_DESCRIBE)
+    rate_limiter.RecordResult(api, 255, 'InvalidInstanceID.NotFound')
+    self.assertFalse(rate_limiter.WasLastCallThrottled())
+    rate_limiter.RecordResult(api, 0, '')
+    self.assertFalse(rate_limiter.WasLastCallThrottled())
+
+  def testRetryBacksOffAfterThrottle(self):
+    tries = []
+
+    @vm_util.Retry(poll_interval=0, max_retries=3, timeout=-1)
+    def ThrottledTwice():
+      tries.append(None)
+      api = rate_limiter.Acquire(_CREATE)
+      if len(tries) <= 2:
+        rate_limiter.RecordResult(api, 1, '429 Too Many Requests')
+        raise ValueError()
+
+    with mock.patch(vm_util.__name__ + '.time.sleep') as sleep:
+      with mock.patch(vm_util.__name__ + '._GetFullJitterBackoff',
+                      return_value=7) as backoff:
+        ThrottledTwice()
+    self.assertEqual([mock.call(7), mock.call(7)], sleep.mock_calls)
+    self.assertEqual(
+        [mock.call(vm_util.THROTTLE_BACKOFF, vm_util.MAX_THROTTLE_BACKOFF, 1),
+         mock.call(vm_util.THROTTLE_BACKOFF, vm_util.MAX_THROTTLE_BACKOFF, 2)],
+        backoff.mock_calls)
+    counters = self._Counters(_CREATE)
+    self.assertEqual(2, counters['throttles'])
+    self.assertEqual(2, counters['retries'])
+
+  def testGenerateSamples(self):
+    rate_limiter.Acquire(_DESCRIBE)
+    since = rate_limiter.GetCounters()
+    for _ in xrange(3):
+      rate_limiter.Acquire(_DESCRIBE)
+    samples = rate_limiter.GenerateSamples(since=since)
+    self.assertEqual(
+        ['Cloud API Calls', 'Cloud API Throttled Calls',
+         'Cloud API Retried Calls', 'Cloud API Rate Limited Calls',
+         'Cloud API Rate Limit Wait Time'],
+        [s.metric for s in samples])
+    self.assertEqual(3, samples[0].value)
+    self.assertEqual(2, samples[3].value)
+    self.assertEqual({'cloud': 'AWS', 'api_class': 'read'},
+                     samples[0].metadata)
+    self.assertEqual([], rate_limiter.GenerateSamples(
+        since=rate_limiter.GetCounters()))
+
+
+if __name__ == '__main__':
+  unittest.main()
@@ -0,0 +1,254 @@
+# Copyright 2016 PerfKitBenchmarker Authors. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Tests for perfkitbenchmarker.remote_job."""
+
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import unittest
+
+import mock
+
+from perfkitbenchmarker import errors
+from perfkitbenchmarker import linux_virtual_machine
+from perfkitbenchmarker import remote_job
+from perfkitbenchmarker.scripts import command_status
+
+SCRIPTS_DIR = os.path.dirname(command_status.__file__)
+
+
+class _TestVm(linux_virtual_machine.DebianMixin):
+
+  def __init__(self, name):
+    super(_TestVm, self).__init__()
+    self.name = name
+    self.PushDataFile = mock.MagicMock()
+    self.RemoteCommand = mock.MagicMock(return_value=('', ''))
+
+  def __repr__(self):
+    return self.name
+
+
+class StartRemoteJobTestCase(unittest.TestCase):
+
+  def testStartsInBackground(self):
+    vm = _TestVm('vm')
+    job = vm.StartRemoteJob(['sleep', '100'])
+    self.assertEqual('sleep 100', job.command)
+    self.assertFalse(job.done)
+    self.assertEqual(3, vm.PushDataFile.call_count)
+    command = vm.RemoteCommand.call_args[0][0]
+    self.assertTrue(command.startswith('nohup python '))
+    self.assertIn("--command 'sleep 100'", command)
+    self.assertIn('--status ' + job.status_file, command)
+    self.assertTrue(command.endswith(
+        ' 2>&1 & echo $! > ' + job.wrapper_pid_file))
+
+  def testRobustRemoteCommand(self):
+    vm = _TestVm('vm')
+    vm.RemoteCommand.side_effect = [('', ''), ('out', 'err')]
+    self.assertEqual(('out', 'err'), vm.RobustRemoteCommand('ls'))
+    wait_command = vm.RemoteCommand.call_args_list[1][0][0]
+    self.assertIn('wait_for_command.py', wait_command)
+    self.assertTrue(wait_command.endswith(' --delete'))
+
+
+class PollJobsTestCase(unittest.TestCase):
+
+  def setUp(self):
+    self.vms = [_TestVm('vm0'), _TestVm('vm1')]
+    self.jobs = [vm.StartRemoteJob('loader %d' % i)
+                 for vm in self.vms for i in xrange(3)]
+    for vm in self.vms:
+      vm.RemoteCommand.reset_mock()
+
+  def testOneCommandPerVm(self):
+    self.vms[0].RemoteCommand.return_value = '0\nrunning\n2\n', ''
+    self.vms[1].RemoteCommand.return_value = 'running\nrunning\nrunning\n', ''
+    done = remote_job.PollJobs(self.jobs)
+    self.assertEqual([self.jobs[0], self.jobs[2]], done)
+    self.assertEqual(2, self.jobs[2].retcode)
+    for vm in self.vms:
+      self.assertEqual(1, vm.RemoteCommand.call_count)
+    command = self.vms[0].RemoteCommand.call_args[0][0]
+    self.assertIn('command_status.py', command)
+    for job in self.jobs[:3]:
+      self.assertIn('%s,%s' % (job.status_file, job.wrapper_pid_file),
+                    command)
+
+  def testSkipsJobsThatAreDone(self):
+    for job in self.jobs[:3]:
+      job.retcode = 0
+    self.vms[1].RemoteCommand.return_value = '1\n0\n0\n', ''
+    self.assertEqual(self.jobs, remote_job.PollJobs(self.jobs))
+    self.assertEqual(0, self.vms[0].RemoteCommand.call_count)
+
+  def testUnexpectedOutput(self):
+    self.vms[0].RemoteCommand.return_value = '0\n', ''
+    with self.assertRaises(errors.VirtualMachine.RemoteCommandError):
+      self.vms[0].UpdateRemoteJobStatuses(self.jobs[:3])
+
+  @mock.patch(remote_job.__name__ + '.time.sleep')
+  def testWaitForJobs(self, sleep):
+    vm = self.vms[0]
+    jobs = self.jobs[:2]
+    vm.RemoteCommand.side_effect = [('running\nrunning\n', ''),
+                                    ('running\n0\n', ''),
+                                    ('0\n', ''),
+                                    ('out0', ''), ('out1', '')]
+    self.assertEqual([('out0', ''), ('out1', '')],
+                     remote_job.WaitForJobs(jobs, poll_interval=3))
+    self.assertEqual([mock.call(3), mock.call(3)], sleep.call_args_list)
+    self.assertEqual(5, vm.RemoteCommand.call_count)
+
+  def testWaitForJobsTimeout(self):
+    now = [1000.]
+
+    def Sleep(unused_seconds):
+      now[0] += 20
+    self.vms[0].RemoteCommand.side_effect = [
+        ('running\n0\n', ''), ('running\n', ''), ('running\n', '')]
+    with mock.patch(remote_job.__name__ + '.time.sleep',
+                    side_effect=Sleep) as sleep:
+      with mock.patch(remote_job.__name__ + '.time.time',
+                      side_effect=lambda: now[0]):
+        with self.assertRaises(errors.VirtualMachine.RemoteCommandError):
+          remote_job.WaitForJobs(self.jobs[:2], poll_interval=3, timeout=30)
+    self.assertEqual(2, sleep.call_count)
+    self.assertEqual(3, self.vms[0].RemoteCommand.call_count)
+
+
+class ReadRemoteJobOutputTestCase(unittest.TestCase):
+
+  def testFetchesIncrementally(self):
+    vm = _TestVm('vm')
+    job = vm.StartRemoteJob('loader')
+
+    def RemoteCommand(command, stdout_callback):
+      for line in lines:
+        stdout_callback(line)
+      return ''.join(lines)[-4:], ''
+    vm.RemoteCommand.side_effect = RemoteCommand
+
+    lines = ['a\n', 'bc\n']
+    self.assertEqual('a\nbc\n', vm.ReadRemoteJobOutput(job))
+    self.assertIn('tail -c +1 ' + job.stdout_file,
+                  vm.RemoteCommand.call_args[0][0])
+    lines = ['def\n']
+    received = []
+    self.assertEqual('def\n', vm.ReadRemoteJobOutput(job, received.append))
+    self.assertEqual(['def\n'], received)
+    self.assertIn('tail -c +6 ', vm.RemoteCommand.call_args[0][0])
+    self.assertEqual(9, job.stdout_offset)
+
+  def testKeepsPartialLine(self):
+    vm = _TestVm('vm')
+    job = vm.StartRemoteJob('loader')
+
+    def RemoteCommand(command, stdout_callback):
+      for line in lines:
+        stdout_callback(line)
+      return ''.join(lines), ''
+    vm.RemoteCommand.side_effect = RemoteCommand
+
+    lines = ['a\n', 'b']
+    received = []
+    self.assertEqual('a\n', vm.ReadRemoteJobOutput(job, received.append))
+    self.assertEqual(2, job.stdout_offset)
+    lines = ['bc\n', 'd']
+    self.assertEqual('bc\n', vm.ReadRemoteJobOutput(job))
+    self.assertEqual(5, job.stdout_offset)
+    # Once the job is done, the last line is complete.
+    job.retcode = 0
+    lines = ['d']
+    self.assertEqual('d', vm.ReadRemoteJobOutput(job, received.append))
+    self.assertEqual(['a\n', 'd'], received)
+    self.assertEqual(6, job.stdout_offset)
+
+
+class CommandStatusScriptTestCase(unittest.TestCase):
+
+  def setUp(self):
+    self.temp_dir = tempfile.mkdtemp()
+    self.addCleanup(shutil.rmtree, self.temp_dir)
+
+  def _Path(self, name):
+    return os.path.join(self.temp_dir, name)
+
+  def _Execute(self, command, **kwargs):
+    return subprocess.Popen(
+        [sys.executable, os.path.join(SCRIPTS_DIR, 'execute_command.py'),
+         '--stdout', self._Path('stdout'), '--stderr', self._Path('stderr'),
+         '--status', self._Path('status'), '--pid', self._Path('pid'),
+         '--command', command], stderr=open(os.devnull, 'w'), **kwargs)
+
+  def testCompleted(self):
+    self._Execute('exit 3').wait()
+    self.assertEqual(3, command_status.GetStatus(self._Path('status')))
+
+  def testRunning(self):
+    process = self._Execute('read line', stdin=subprocess.PIPE)
+    # The status file is locked as soon as it exists.
+    while not os.path.exists(self._Path('status')):
+      time.sleep(0.001)
+    self.assertEqual(command_status.RUNNING,
+                     command_status.GetStatus(self._Path('status')))
+    process.communicate('\n')
+    self.assertEqual(0, command_status.GetStatus(self._Path('status')))
+    self.assertItemsEqual(['pid', 'status', 'stderr', 'stdout'],
+                          os.listdir(self.temp_dir))
+
+  def testNotStarted(self):
+    self.assertEqual(command_status.RUNNING,
+                     command_status.GetStatus(self._Path('status')))
+
+  def testInterrupted(self):
+    open(self._Path('status'), 'w').close()
+    self.assertEqual(1, command_status.GetStatus(self._Path('status')))
+
+  def testWrapperStarting(self):
+    with open(self._Path('pid'), 'w') as f:
+      f.write(str(os.getpid()))
+    self.assertEqual(command_status.RUNNING, command_status.GetStatus(
+        self._Path('status'), self._Path('pid')))
+
+  def testWrapperNeverStarts(self):
+    # Launched as StartRemoteJob does, but execute_command.py fails before
+    # creating the status file: --command is missing.
+    subprocess.check_call(
+        '{python} {script} --stdout {stdout} --stderr {stderr} '
+        '--status {status} 1> {log} 2>&1 & echo $! > {pid}; wait'.format(
+            python=sys.executable,
+            script=os.path.join(SCRIPTS_DIR, 'execute_command.py'),
+            stdout=self._Path('stdout'), stderr=self._Path('stderr'),
+            status=self._Path('status'), log=self._Path('log'),
+            pid=self._Path('pid')), shell=True)
+    self.assertFalse(os.path.exists(self._Path('status')))
+    self.assertEqual(1, command_status.GetStatus(self._Path('status'),
+                                                 self._Path('pid')))
+    output = subprocess.check_output(
+        [sys.executable, os.path.join(SCRIPTS_DIR, 'command_status.py'),
+         '%s,%s' % (self._Path('status'), self._Path('pid'))])
+    self.assertEqual('1\n', output)
+
+  def testMissingPidFile(self):
+    self.assertEqual(1, command_status.GetStatus(self._Path('status'),
+                                                 self._Path('pid')))
+
+
+if __name__ == '__main__':
+  unittest.main()
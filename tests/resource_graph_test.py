@@ -0,0 +1,172 @@
+# Copyright 2016 PerfKitBenchmarker Authors. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Tests for perfkitbenchmarker.resource_graph."""
+
+import json
+import os
+import tempfile
+import threading
+import time
+import unittest
+
+import mock
+
+from perfkitbenchmarker import errors
+from perfkitbenchmarker import resource_graph
+
+
+def _RaiseValueError():
+  raise ValueError()
+
+
+class ResourceGraphTestCase(unittest.TestCase):
+
+  def setUp(self):
+    self.order = []
+
+  def _Record(self, name, wait_for=None):
+    def Func():
+      if wait_for:
+        self.assertTrue(wait_for.wait(5), '{0} waited too long'.format(name))
+      self.order.append(name)
+    return Func
+
+  def testDependenciesRunFirst(self):
+    graph = resource_graph.ResourceGraph('Delete', False)
+    vm = graph.AddNode('VM', 'vm', self._Record('vm'))
+    disk = graph.AddNode('Disk', 'disk', self._Record('disk'), [vm])
+    graph.AddNode('Network', 'net', self._Record('net'), [vm, disk])
+    graph.Run()
+    self.assertEqual(self.order, ['vm', 'disk', 'net'])
+
+  def testIndependentBranchesDoNotWait(self):
+    # vm1 only finishes once net2 is deleted, which would deadlock if net2
+    # waited for every VM rather than only its own.
+    net2_deleted = threading.Event()
+    graph = resource_graph.ResourceGraph('Delete', False)
+    vm1 = graph.AddNode('VM', 'vm1', self._Record('vm1', net2_deleted))
+    vm2 = graph.AddNode('VM', 'vm2', self._Record('vm2'))
+    graph.AddNode('Network', 'net1', self._Record('net1'), [vm1])
+    graph.AddNode('Network', 'net2', lambda: (self.order.append('net2'),
+                                              net2_deleted.set()), [vm2])
+    graph.Run()
+    self.assertEqual(self.order, ['vm2', 'net2', 'vm1', 'net1'])
+
+  def testSkipDependentsOfFailures(self):
+    graph = resource_graph.ResourceGraph('Create', True)
+    net = graph.AddNode('Network', 'net', _RaiseValueError)
+    graph.AddNode('VM', 'vm', self._Record('vm'), [net])
+    with self.assertRaises(errors.VmUtil.ThreadException):
+      graph.Run()
+    self.assertEqual(self.order, [])
+    self.assertEqual([(i.name, i.succeeded) for i in graph.intervals],
+                     [('net', False)])
+
+  def testRunDependentsOfFailures(self):
+    graph = resource_graph.ResourceGraph('Delete', False)
+    vm = graph.AddNode('VM', 'vm', _RaiseValueError)
+    graph.AddNode('Network', 'net', self._Record('net'), [vm])
+    with self.assertRaises(errors.VmUtil.ThreadException):
+      graph.Run()
+    self.assertEqual(self.order, ['net'])
+
+  def testFailFastAbandonsWaitingNodes(self):
+    never = threading.Event()
+    graph = resource_graph.ResourceGraph('Create', True)
+    slow = graph.AddNode('VM', 'slow', lambda: never.wait(0.5))
+    graph.AddNode('VM', 'bad', _RaiseValueError)
+    graph.AddNode('Disk', 'disk', self._Record('disk'), [slow])
+    with self.assertRaises(errors.VmUtil.ThreadException):
+      graph.Run(fail_fast=True)
+    self.assertEqual(self.order, [])
+
+  @mock.patch(resource_graph.__name__ + '.MAX_CONCURRENT_NODES', 2)
+  def testConcurrencyIsCapped(self):
+    lock = threading.Lock()
+    running = []
+    max_running = []
+
+    def Func():
+      with lock:
+        running.append(None)
+        max_running.append(len(running))
+      time.sleep(.01)
+      with lock:
+        running.pop()
+
+    graph = resource_graph.ResourceGraph('Create', True)
+    vms = [graph.AddNode('VM', 'vm%d' % i, Func) for i in xrange(4)]
+    # Waiting nodes take up the threads too, and do not block their
+    # dependencies.
+    graph.AddNode('Disk', 'disk', self._Record('disk'), vms)
+    graph.Run()
+    self.assertEqual(self.order, ['disk'])
+    self.assertEqual(2, max(max_running))
+
+  def testEmptyGraph(self):
+    resource_graph.ResourceGraph('Delete', False).Run()
+
+  def testGenerateSamples(self):
+    intervals = [
+        resource_graph.Interval('VM', 'Delete', 'vm1', 10.0, 15.0, True),
+        resource_graph.Interval('Network', 'Delete', 'net', 15.0, 17.5,
+                                False)]
+    samples = resource_graph.GenerateSamples(intervals, True, False)
+    self.assertEqual(
+        [(s.metric, s.value, s.unit, s.metadata) for s in samples],
+        [('VM Delete Runtime', 5.0, 'seconds',
+          {'resource': 'vm1', 'succeeded': True}),
+         ('Network Delete Runtime', 2.5, 'seconds',
+          {'resource': 'net', 'succeeded': False})])
+    samples = resource_graph.GenerateSamples(intervals[:1], False, True)
+    self.assertEqual([(s.metric, s.value) for s in samples],
+                     [('VM Delete Start Timestamp', 10.0),
+                      ('VM Delete Stop Timestamp', 15.0)])
+
+
+  def testMeasureInterval(self):
+    intervals = []
+    with resource_graph.MeasureInterval(intervals, 'VM', 'Startup', 'vm1'):
+      pass
+    with self.assertRaises(ValueError):
+      with resource_graph.MeasureInterval(intervals, 'VM', 'Boot', 'vm1'):
+        raise ValueError()
+    self.assertEqual([('Startup', True), ('Boot', False)],
+                     [(i.operation, i.succeeded) for i in intervals])
+    self.assertLessEqual(intervals[0].start_time, intervals[0].stop_time)
+
+  def testWriteTimeline(self):
+    intervals = [
+        resource_graph.Interval('VM', 'Wait For Boot', 'vm1', 12.0, 15.0,
+                                True),
+        resource_graph.Interval('VM', 'Create', 'vm1', 10.0, 16.0, True),
+        resource_graph.Interval('Network', 'Create', 'net', 9.0, 10.0,
+                                False)]
+    fd, path = tempfile.mkstemp()
+    os.close(fd)
+    self.addCleanup(os.remove, path)
+    resource_graph.WriteTimeline(intervals, path)
+    with open(path) as timeline_file:
+      events = json.load(timeline_file)['traceEvents']
+    self.assertEqual(
+        [('M', 'thread_name', 0, None), ('X', 'Network Create', 0, 9e6),
+         ('M', 'thread_name', 1, None), ('X', 'VM Create', 1, 10e6),
+         ('X', 'VM Wait For Boot', 1, 12e6)],
+        [(e['ph'], e['name'], e['tid'], e.get('ts')) for e in events])
+    self.assertEqual('vm1', events[2]['args']['name'])
+    self.assertEqual(3e6, events[4]['dur'])
+    self.assertFalse(events[1]['args']['succeeded'])
+
+if __name__ == '__main__':
+  unittest.main()
@@ -14,6 +14,7 @@
 
 import unittest
 
+from perfkitbenchmarker import histogram
 from perfkitbenchmarker import sample
 
 
@@ -28,3 +29,21 @@ class SampleTestCase(unittest.TestCase):
     instance = sample.Sample(metric='Test', value=1.0, unit='Mbps',
                              metadata=metadata.copy())
     self.assertDictEqual(metadata, instance.metadata)
+
+
+class PercentileCalculatorTestCase(unittest.TestCase):
+
+  def testHistogramMatchesList(self):
+    # Values below 2 ** precision_bits are recorded exactly.
+    numbers = range(1, 1000)
+    numbers_histogram = histogram.Histogram()
+    for number in numbers:
+      numbers_histogram.Record(number)
+    from_list = sample.PercentileCalculator(numbers)
+    from_histogram = sample.PercentileCalculator(numbers_histogram)
+    self.assertAlmostEqual(from_list.pop('stddev'),
+                           from_histogram.pop('stddev'))
+    self.assertEqual(from_list, from_histogram)
+
+  def testEmptyHistogram(self):
+    self.assertEqual({}, sample.PercentileCalculator(histogram.Histogram()))
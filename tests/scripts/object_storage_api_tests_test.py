@@ -0,0 +1,313 @@
+# Copyright 2016 PerfKitBenchmarker Authors. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Tests for perfkitbenchmarker.scripts.object_storage_api_tests."""
+
+import itertools
+import os
+import re
+import string
+import sys
+import unittest
+
+import mock
+
+# The script is copied to the client VM, where the storage client libraries
+# are installed. The tests replace them with the fakes below.
+with mock.patch.dict(sys.modules, {
+    'azure': mock.MagicMock(),
+    'azure.storage': mock.MagicMock(),
+    'azure.storage.blob': mock.MagicMock(),
+    'boto': mock.MagicMock(),
+    'boto.s3': mock.MagicMock(),
+    'boto.s3.connection': mock.MagicMock(),
+    'gcs_oauth2_boto_plugin': mock.MagicMock()}):
+  from perfkitbenchmarker.scripts import object_storage_api_tests
+
+MiB = 1024 * 1024
+
+
+class _FakeStore(object):
+  """An in-memory bucket, served through fake boto storage URIs."""
+
+  def __init__(self):
+    self.objects = {}
+    self.uploads = {}
+    self.upload_ids = itertools.count()
+    self.parts_uploaded = []
+    self.completed = []
+    self.ranges_read = []
+
+  def StorageUri(self, path, storage_schema):
+    return _FakeUri(self, path)
+
+
+class _FakeUri(object):
+
+  def __init__(self, store, path):
+    self._store = store
+    self._bucket, _, self._name = path.partition('/')
+
+  def connect(self, **kwargs):
+    pass
+
+  def set_contents_from_file(self, fp, size=None):
+    # Like boto, compute the MD5 from the file first and then rewind it to
+    # send the body.
+    self._store.objects[self._name] = _ReadLikeBoto(fp, size)
+
+  def get_bucket(self, validate=True):
+    return _FakeBucket(self._store)
+
+  def new_key(self):
+    return self
+
+  def get_contents_as_string(self, headers=None):
+    start, end = re.match(r'bytes=(\d+)-(\d+)$', headers['Range']).groups()
+    self._store.ranges_read.append((int(start), int(end)))
+    return self._store.objects[self._name][int(start):int(end) + 1]
+
+  def delete_key(self):
+    del self._store.objects[self._name]
+
+
+class _FakeBucket(object):
+
+  def __init__(self, store):
+    self._store = store
+
+  def initiate_multipart_upload(self, name):
+    upload = _FakeUpload(self._store, str(next(self._store.upload_ids)))
+    self._store.uploads[upload.id] = upload
+    return upload
+
+  def complete_multipart_upload(self, name, upload_id, xml_body):
+    parts = self._store.uploads.pop(upload_id).parts
+    etags = re.findall(r'<ETag>(.*?)</ETag>', xml_body)
+    self._store.objects[name] = ''.join(parts[etag] for etag in etags)
+    self._store.completed.append(name)
+
+
+class _FakeUpload(object):
+
+  def __init__(self, store, upload_id):
+    self._store = store
+    self.id = upload_id
+    self.parts = {}
+
+  def upload_part_from_file(self, fp, part_number, size=None):
+    data = _ReadLikeBoto(fp, size)
+    etag = '"%s-%d"' % (self.id, part_number)
+    self.parts[etag] = data
+    self._store.parts_uploaded.append(len(data))
+    return mock.Mock(etag=etag)
+
+  def cancel_upload(self):
+    del self._store.uploads[self.id]
+
+
+def _ReadLikeBoto(fp, size):
+  """Reads 'size' bytes from 'fp' the way boto uploads a file.
+
+  boto reads the file in chunks from its current position to compute the MD5
+  of the body, seeks back to that position, and reads it again to send it.
+  """
+  start = fp.tell()
+  for _ in xrange(2):
+    fp.seek(start)
+    chunks = []
+    remaining = size
+    while remaining:
+      chunk = fp.read(min(remaining, 3 * 1024))
+      if not chunk:
+        break
+      chunks.append(chunk)
+      remaining -= len(chunk)
+  return ''.join(chunks)
+
+
+class PayloadPoolTestCase(unittest.TestCase):
+
+  def setUp(self):
+    self.pool = object_storage_api_tests.PayloadPool()
+
+  def testSliceSizes(self):
+    for size in (0, 1, 1000, 10):
+      payload = self.pool.Get(size)
+      self.assertIsInstance(payload, memoryview)
+      self.assertEqual(size, len(payload))
+      self.assertTrue(payload.readonly)
+
+  def testSlicesShareThePool(self):
+    self.assertEqual(self.pool.Get(1000).tobytes()[:10],
+                     self.pool.Get(10).tobytes())
+
+  def testGrowsAtTheEndOfThePool(self):
+    block_size = object_storage_api_tests.PAYLOAD_BLOCK_SIZE_BYTES
+    with mock.patch.object(object_storage_api_tests.os, 'urandom',
+                           wraps=os.urandom) as urandom:
+      first = self.pool.Get(block_size - 1).tobytes()
+      self.pool.Get(block_size - 1)
+      self.assertEqual(1, urandom.call_count)
+      second = self.pool.Get(2 * block_size + 1).tobytes()
+    # Only the missing bytes are generated, in blocks, after the existing
+    # ones.
+    self.assertEqual([mock.call(block_size - 1), mock.call(block_size),
+                      mock.call(2)],
+                     urandom.call_args_list)
+    self.assertEqual(first, second[:block_size - 1])
+    self.assertGreater(self.pool.generation_time, 0)
+
+  def testPrintableBytes(self):
+    letters = string.ascii_letters
+    with mock.patch.object(object_storage_api_tests.os, 'urandom',
+                           return_value=''.join(map(chr, xrange(256)))):
+      payload = self.pool.Get(256).tobytes()
+    self.assertEqual(''.join(letters[i % len(letters)] for i in xrange(256)),
+                     payload)
+    self.assertTrue(set(self.pool.Get(4096).tobytes()) <= set(letters))
+
+
+class PayloadReaderTestCase(unittest.TestCase):
+
+  def setUp(self):
+    self.reader = object_storage_api_tests.PayloadReader(
+        memoryview('0123456789'))
+
+  def testRead(self):
+    self.assertEqual(10, len(self.reader))
+    self.assertEqual('012', self.reader.read(3))
+    self.assertEqual(3, self.reader.tell())
+    self.assertEqual('', self.reader.read(0))
+    self.assertEqual('3456789', self.reader.read(100))
+    self.assertEqual(10, self.reader.tell())
+    self.assertEqual('', self.reader.read(1))
+    self.assertEqual(10, self.reader.tell())
+
+  def testReadAll(self):
+    self.reader.read(4)
+    self.assertEqual('456789', self.reader.read())
+    self.reader.seek(8)
+    self.assertEqual('89', self.reader.read(None))
+
+  def testSeek(self):
+    self.reader.seek(4)
+    self.assertEqual(4, self.reader.tell())
+    self.reader.seek(2, os.SEEK_CUR)
+    self.assertEqual('67', self.reader.read(2))
+    self.reader.seek(-3, os.SEEK_END)
+    self.assertEqual('789', self.reader.read())
+    self.reader.seek(0, os.SEEK_END)
+    self.assertEqual(10, self.reader.tell())
+    self.reader.seek(-20, os.SEEK_CUR)
+    self.assertEqual(0, self.reader.tell())
+    self.reader.seek(20)
+    self.assertEqual('', self.reader.read())
+
+  def testUploadedLikeBoto(self):
+    self.assertEqual('0123456789', _ReadLikeBoto(self.reader, 10))
+    self.reader.seek(0)
+    self.assertEqual('01234', _ReadLikeBoto(self.reader, 5))
+    # A part of a payload is uploaded from its own reader.
+    part = object_storage_api_tests.PayloadReader(memoryview('0123456789')[6:])
+    self.assertEqual('6789', _ReadLikeBoto(part, len(part)))
+
+  def testLargePayload(self):
+    payload = object_storage_api_tests.PayloadPool().Get(MiB + 7)
+    reader = object_storage_api_tests.PayloadReader(payload)
+    self.assertEqual(payload.tobytes(), _ReadLikeBoto(reader, len(reader)))
+    self.assertEqual(MiB + 7, reader.tell())
+
+
+class MultiStreamThroughputTestCase(unittest.TestCase):
+
+  def setUp(self):
+    self.store = _FakeStore()
+    p = mock.patch.object(object_storage_api_tests, 'boto')
+    p.start().storage_uri.side_effect = self.store.StorageUri
+    self.addCleanup(p.stop)
+    p = mock.patch.object(object_storage_api_tests, 'FLAGS')
+    self.flags = p.start()
+    self.addCleanup(p.stop)
+    self.flags.port = None
+    self.flags.use_https = True
+    self.flags.path_style = False
+    self.flags.bucket = 'bucket'
+
+  def _Payload(self, size):
+    return memoryview(''.join(chr(ord('a') + i % 26) for i in xrange(size)))
+
+  def testWriteInParts(self):
+    payload = self._Payload(12 * MiB)
+    object_storage_api_tests._WriteObjectInParts(
+        's3', 'bucket', 'obj', payload, 5 * MiB)
+    self.assertEqual([5 * MiB, 5 * MiB, 2 * MiB], self.store.parts_uploaded)
+    self.assertEqual(payload.tobytes(), self.store.objects['obj'])
+    self.assertEqual({}, self.store.uploads)
+
+  def testWriteSinglePart(self):
+    payload = self._Payload(MiB)
+    for storage_schema, part_size in (('s3', 0), ('s3', 5 * MiB),
+                                      ('gs', MiB / 4)):
+      object_storage_api_tests._WriteObjectInParts(
+          storage_schema, 'bucket', 'obj', payload, part_size)
+      self.assertEqual(payload.tobytes(), self.store.objects['obj'])
+    self.assertEqual([], self.store.parts_uploaded)
+
+  def testFailedWriteCancelsUpload(self):
+    with mock.patch.object(_FakeUpload, 'upload_part_from_file',
+                           side_effect=IOError):
+      with self.assertRaises(IOError):
+        object_storage_api_tests._WriteObjectInParts(
+            's3', 'bucket', 'obj', self._Payload(10 * MiB), 5 * MiB)
+    self.assertEqual({}, self.store.uploads)
+    self.assertNotIn('obj', self.store.objects)
+
+  def testReadInParts(self):
+    self.store.objects['obj'] = 'x' * 11
+    self.assertEqual(11, object_storage_api_tests._ReadObjectInParts(
+        's3', 'bucket', 'obj', 11, 4))
+    self.assertEqual([(0, 3), (4, 7), (8, 10)], self.store.ranges_read)
+
+  def testReadSinglePart(self):
+    self.store.objects['obj'] = 'x' * 11
+    self.assertEqual(11, object_storage_api_tests._ReadObjectInParts(
+        'gs', 'bucket', 'obj', 11, 0))
+    self.assertEqual([(0, 10)], self.store.ranges_read)
+
+  def testBenchmark(self):
+    self.flags.num_streams = 3
+    self.flags.objects_per_stream = 2
+    self.flags.object_size_bytes = 11 * MiB
+    self.flags.part_size_bytes = 5 * MiB
+    self.flags.stream_pool = 'thread'
+    with mock.patch.object(object_storage_api_tests, 'logging') as logging:
+      object_storage_api_tests.MultiStreamThroughputBenchmark('s3')
+
+    self.assertEqual(6, len(self.store.completed))
+    self.assertEqual(sorted(6 * [5 * MiB, 5 * MiB, MiB]),
+                     sorted(self.store.parts_uploaded))
+    self.assertEqual(18, len(self.store.ranges_read))
+    # All the objects were deleted after they were read.
+    self.assertEqual({}, self.store.objects)
+    messages = [call[0][0] % call[0][1:]
+                for call in logging.info.call_args_list]
+    for direction in (object_storage_api_tests.UPLOAD,
+                      object_storage_api_tests.DOWNLOAD):
+      self.assertTrue(any(
+          message.startswith('Multi stream %s aggregate throughput in Bps: '
+                             % direction) for message in messages))
+
+
+if __name__ == '__main__':
+  unittest.main()
@@ -0,0 +1,88 @@
+# Copyright 2016 PerfKitBenchmarker Authors. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Tests for perfkitbenchmarker.tcp_probe."""
+
+import socket
+import threading
+import time
+import unittest
+
+from perfkitbenchmarker import errors
+from perfkitbenchmarker import tcp_probe
+from perfkitbenchmarker import vm_util
+
+
+def _GetFreePort():
+  """Returns a local port on which nothing listens."""
+  sock = socket.socket()
+  sock.bind(('127.0.0.1', 0))
+  port = sock.getsockname()[1]
+  sock.close()
+  return port
+
+
+def _Listen(port):
+  sock = socket.socket()
+  sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+  sock.bind(('127.0.0.1', port))
+  sock.listen(128)
+  return sock
+
+
+class WaitForPortTestCase(unittest.TestCase):
+
+  def testOpenPort(self):
+    listener = _Listen(0)
+    self.addCleanup(listener.close)
+    start = time.time()
+    open_time = tcp_probe.WaitForPort('127.0.0.1', listener.getsockname()[1],
+                                      timeout=10)
+    self.assertLessEqual(start, open_time)
+    self.assertLessEqual(open_time, time.time())
+
+  def testPortOpeningLater(self):
+    ports = [_GetFreePort() for _ in xrange(8)]
+    listeners = []
+    self.addCleanup(lambda: [listener.close() for listener in listeners])
+
+    def OpenPorts():
+      time.sleep(.5)
+      listeners.extend(_Listen(port) for port in ports)
+      self.opened_at = time.time()
+
+    opener = threading.Thread(target=OpenPorts)
+    opener.start()
+    open_times = vm_util.RunThreaded(
+        lambda port: tcp_probe.WaitForPort('127.0.0.1', port, timeout=10),
+        ports)
+    opener.join()
+    for open_time in open_times:
+      self.assertGreaterEqual(open_time, self.opened_at)
+      # The ports were probed again soon after they opened.
+      self.assertLess(open_time - self.opened_at,
+                      tcp_probe._MAX_PROBE_INTERVAL + 1)
+
+  def testTimeout(self):
+    start = time.time()
+    with self.assertRaises(errors.VirtualMachine.VmStateError):
+      tcp_probe.WaitForPort('127.0.0.1', _GetFreePort(), timeout=.5)
+    self.assertLess(time.time() - start, 5)
+
+  def testUnresolvableHost(self):
+    with self.assertRaises(errors.VirtualMachine.VmStateError):
+      tcp_probe.WaitForPort('pkb-test.invalid', 22, timeout=.3)
+
+
+if __name__ == '__main__':
+  unittest.main()
@@ -0,0 +1,141 @@
+# Copyright 2015 PerfKitBenchmarker Authors. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Tests for perfkitbenchmarker.traces.dstat."""
+
+import json
+import os
+import shutil
+import tempfile
+import unittest
+
+import mock
+
+from perfkitbenchmarker.traces import dstat
+
+_CSV_PATH = os.path.join(os.path.dirname(__file__), '..', 'data',
+                         'dstat-sample.csv')
+
+
+class SummarizeCsvTestCase(unittest.TestCase):
+
+  def testColumnNames(self):
+    names = [name for name, _ in dstat.SummarizeCsv(_CSV_PATH)]
+    self.assertEqual(
+        ['total cpu usage:usr', 'total cpu usage:sys', 'total cpu usage:idl',
+         'total cpu usage:wai', 'total cpu usage:hiq', 'total cpu usage:siq',
+         'dsk/total:read', 'dsk/total:writ'], names)
+
+  def testStatistics(self):
+    summaries = dict(dstat.SummarizeCsv(_CSV_PATH))
+    # The truncated last row is ignored.
+    self.assertEqual({'mean': 20.4, 'p50': 20.0, 'p95': 40.0, 'p99': 40.0,
+                      'max': 40.0}, summaries['total cpu usage:usr'])
+    # Missing values are skipped.
+    self.assertEqual({'mean': 15360.0, 'p50': 16384.0, 'p95': 32768.0,
+                      'p99': 32768.0, 'max': 32768.0},
+                     summaries['dsk/total:writ'])
+
+  def testTimeRangeAndRegex(self):
+    summaries = dstat.SummarizeCsv(_CSV_PATH, start_time=1455052322,
+                                   end_time=1455052324, column_regex='usr$')
+    self.assertEqual(
+        [('total cpu usage:usr',
+          {'mean': 20.0, 'p50': 20.0, 'p95': 30.0, 'p99': 30.0,
+           'max': 30.0})], summaries)
+
+  def testMissingHeader(self):
+    temp_dir = tempfile.mkdtemp()
+    self.addCleanup(shutil.rmtree, temp_dir)
+    path = os.path.join(temp_dir, 'empty.csv')
+    with open(path, 'w') as csv_file:
+      csv_file.write('"Dstat 0.7.2 CSV output"\n')
+    with self.assertRaisesRegexp(ValueError, 'header'):
+      dstat.SummarizeCsv(path)
+
+
+class ColumnSummaryTestCase(unittest.TestCase):
+
+  def testReservoirBoundsMemory(self):
+    summary = dstat._ColumnSummary(reservoir_size=100)
+    for i in xrange(10000):
+      summary.Add(float(i))
+    self.assertEqual(100, len(summary._reservoir))
+    statistics = summary.Statistics()
+    self.assertEqual(4999.5, statistics['mean'])
+    self.assertEqual(9999.0, statistics['max'])
+    self.assertAlmostEqual(5000, statistics['p50'], delta=1500)
+
+
+class CreateSamplesTestCase(unittest.TestCase):
+
+  def testCreateSamples(self):
+    summaries = [('dsk/total:read', {'mean': 1.0, 'p50': 2.0, 'p95': 3.0,
+                                     'p99': 4.0, 'max': 5.0})]
+    samples = dstat.CreateSamples(summaries, {'vm_name': 'vm0'})
+    self.assertEqual(
+        [('dstat dsk/total:read mean', 1.0), ('dstat dsk/total:read p50', 2.0),
+         ('dstat dsk/total:read p95', 3.0), ('dstat dsk/total:read p99', 4.0),
+         ('dstat dsk/total:read max', 5.0)],
+        [(s.metric, s.value) for s in samples])
+    self.assertEqual({'vm_name': 'vm0', 'dstat_column': 'dsk/total:read',
+                      'statistic': 'p99'}, samples[3].metadata)
+
+
+class DStatCollectorTestCase(unittest.TestCase):
+
+  def setUp(self):
+    self.temp_dir = tempfile.mkdtemp()
+    self.addCleanup(shutil.rmtree, self.temp_dir)
+    self.vm = mock.Mock()
+    self.vm.name = 'pkb-1a2b3c4d-0'
+    self.vm.PullFile.side_effect = (
+        lambda directory, _: shutil.copy(_CSV_PATH, directory))
+
+  def _StopOnVm(self, collector):
+    collector._pids[self.vm.name] = '1234'
+    collector._file_names[self.vm.name] = '/tmp/pkb/dstat-sample.csv'
+    return collector._StopOnVm(self.vm, start_time=1455052321,
+                               end_time=1455052330)
+
+  def testNoSamplesByDefault(self):
+    collector = dstat._DStatCollector(output_directory=self.temp_dir)
+    self.assertEqual([], self._StopOnVm(collector))
+    self.vm.RemoteCommand.assert_called_once_with('kill 1234 || true')
+
+  def testPublish(self):
+    collector = dstat._DStatCollector(output_directory=self.temp_dir,
+                                      publish=True, publish_regex='cpu')
+    samples = self._StopOnVm(collector)
+    self.assertEqual(6 * len(dstat.SUMMARY_STATISTICS), len(samples))
+    self.assertEqual(self.vm.name, samples[0].metadata['vm_name'])
+
+  @unittest.skipUnless(dstat.numpy, 'NumPy is not installed.')
+  def testTimeSeries(self):
+    collector = dstat._DStatCollector(output_directory=self.temp_dir,
+                                      timeseries=True)
+    self._StopOnVm(collector)
+    prefix = os.path.join(self.temp_dir, 'dstat-sample')
+    time_series = dstat.numpy.load(prefix + '.npy', mmap_mode='r')
+    self.assertEqual((5, 9), time_series.shape)
+    self.assertTrue(time_series.flags.f_contiguous)
+    self.assertEqual([0.0, 1.0, 2.0, 3.0, 4.0], list(time_series[:, 0]))
+    self.assertTrue(dstat.numpy.isnan(time_series[2, 8]))
+    with open(prefix + '.json') as metadata_file:
+      metadata = json.load(metadata_file)
+    self.assertEqual('seconds_since_phase_start', metadata['columns'][0])
+    self.assertEqual(1455052321, metadata['phase_start'])
+
+
+if __name__ == '__main__':
+  unittest.main()
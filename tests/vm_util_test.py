@@ -195,6 +195,94 @@ class RunParallelThreadsTestCase(unittest.TestCase):
       vm_util.RunParallelThreads(calls, max_concurrency=1)
     self.assertEqual(int_list, [0, 1])
 
+  def testFailFastStopsStartingCalls(self):
+    int_list = []
+    calls = [(_AppendLength, (int_list,), {}), (_RaiseValueError, (), {}),
+             (_AppendLength, (int_list,), {})]
+    with self.assertRaisesRegexp(errors.VmUtil.ThreadException,
+                                 '1 calls were not started'):
+      vm_util.RunParallelThreads(calls, max_concurrency=1, fail_fast=True)
+    self.assertEqual(int_list, [0])
+
+  def testFailFastCancelsRunningCalls(self):
+    started = threading.Event()
+    cancelled = []
+
+    def WaitForCancellation():
+      started.set()
+      while not vm_util.IsCallCancelled():
+        time.sleep(0.01)
+      cancelled.append(True)
+
+    def RaiseAfterStart():
+      started.wait()
+      raise ValueError()
+
+    calls = [(WaitForCancellation, (), {}), (RaiseAfterStart, (), {})]
+    with self.assertRaises(errors.VmUtil.ThreadException):
+      vm_util.RunParallelThreads(calls, max_concurrency=2, fail_fast=True)
+    self.assertEqual(cancelled, [True])
+    self.assertFalse(vm_util.IsCallCancelled())
+
+  def testRetryStopsWhenCancelled(self):
+    attempts = []
+
+    @vm_util.Retry(poll_interval=0, max_retries=5)
+    def AlwaysFail():
+      attempts.append(None)
+      raise ValueError()
+
+    calls = [(_RaiseValueError, (), {}), (AlwaysFail, (), {})]
+    with self.assertRaises(errors.VmUtil.ThreadException):
+      vm_util.RunParallelThreads(calls, max_concurrency=1, fail_fast=True)
+    self.assertEqual(attempts, [])
+    with self.assertRaises(errors.VmUtil.ThreadException):
+      vm_util.RunParallelThreads(list(reversed(calls)), max_concurrency=2,
+                                 fail_fast=False)
+    self.assertEqual(len(attempts), 6)
+
+  def testThreadsAreReused(self):
+    pool = vm_util._ThreadPool(8)
+    calls = [(threading.current_thread, (), {}) for _ in range(4)]
+    with mock.patch(vm_util.__name__ + '._thread_pool', pool):
+      first = vm_util.RunParallelThreads(calls, max_concurrency=4)
+      # Threads become available just after they deliver their result.
+      while pool._available < pool._thread_count:
+        time.sleep(0.01)
+      second = vm_util.RunParallelThreads(calls, max_concurrency=4)
+    self.assertTrue(set(first) & set(second))
+    self.assertNotIn(threading.current_thread(), first)
+
+  def testNestedCallsBeyondPoolLimit(self):
+    pool = vm_util._ThreadPool(2)
+    with mock.patch(vm_util.__name__ + '._thread_pool', pool):
+      calls = [(vm_util.RunParallelThreads,
+                ([(_ReturnArgs, (i,), {}) for i in range(3)], 3), {})
+               for _ in range(3)]
+      result = vm_util.RunParallelThreads(calls, max_concurrency=3)
+    self.assertEqual(result, [[(None, 0), (None, 1), (None, 2)]] * 3)
+
+
+class RetryTestCase(unittest.TestCase):
+
+  def testExponentialBackoff(self):
+    attempts = []
+
+    @vm_util.Retry(poll_interval=1, max_poll_interval=4, max_retries=4,
+                   timeout=-1)
+    def AlwaysFail():
+      attempts.append(None)
+      raise ValueError()
+
+    with mock.patch(vm_util.__name__ + '.time.sleep') as sleep, \
+        mock.patch(vm_util.__name__ + '.random.uniform',
+                   side_effect=lambda low, high: high):
+      with self.assertRaises(ValueError):
+        AlwaysFail()
+    self.assertEqual(len(attempts), 5)
+    self.assertEqual([mock.call(1), mock.call(2), mock.call(4), mock.call(4)],
+                     sleep.mock_calls)
+
 
 class RunThreadedTestCase(unittest.TestCase):
 
@@ -268,6 +356,97 @@ class IssueCommandTestCase(unittest.TestCase):
         vm_util.IssueCommand(['sleep', '2s'], timeout=None)
     self.assertFalse(HaveSleepSubprocess())
 
+  def testStdoutCallback(self):
+    lines = []
+    stdout, stderr, retcode = vm_util.IssueCommand(
+        ['sh', '-c', 'cat; echo two; echo error >&2'], input='one\n',
+        stdout_callback=lines.append)
+    self.assertEqual(retcode, 0)
+    self.assertEqual(lines, ['one\n', 'two\n'])
+    self.assertEqual(stdout, 'one\ntwo\n')
+    self.assertEqual(stderr, 'error\n')
+
+  def testStdoutCallbackRaises(self):
+    def Callback(line):
+      raise ValueError(line)
+
+    with self.assertRaises(ValueError):
+      vm_util.IssueCommand(['sh', '-c', 'echo one; exec sleep 30'],
+                           stdout_callback=Callback)
+    # The process was killed rather than left running.
+    self.assertFalse(HaveSleepSubprocess())
+
+  def testStdoutCallbackKeepsTail(self):
+    with mock.patch(vm_util.__name__ + '.OUTPUT_TAIL_SIZE', 10):
+      stdout, _, _ = vm_util.IssueCommand(
+          ['seq', '1000'], stdout_callback=lambda line: None)
+    self.assertEqual(stdout, '[3883 bytes omitted]\n\n999\n1000\n')
+
+
+class GetSshOptionsTestCase(unittest.TestCase):
+
+  def setUp(self):
+    p = mock.patch(vm_util.__name__ + '.FLAGS')
+    self.flags = p.start()
+    self.addCleanup(p.stop)
+    self.flags.ssh_options = []
+    self.flags.log_level = 'info'
+    self.flags.ssh_control_path = None
+    self.flags.ssh_control_persist = '30m'
+    self.flags.run_uri = 'abcd1234'
+
+  @mock.patch(vm_util.__name__ + '.RunningOnWindows', return_value=False)
+  def testConnectionReuse(self, _):
+    self.flags.ssh_reuse_connections = True
+    options = vm_util.GetSshOptions('key')
+    self.assertIn('ControlMaster=no', options)
+    self.assertIn(
+        'ControlPath=%s' % os.path.join(vm_util.GetTempDir(), '%C'), options)
+
+  @mock.patch(vm_util.__name__ + '.RunningOnWindows', return_value=False)
+  def testControlPathOverride(self, _):
+    self.flags.ssh_reuse_connections = True
+    self.flags.ssh_control_path = '/tmp/%r@%h:%p'
+    self.assertIn('ControlPath=/tmp/%r@%h:%p', vm_util.GetSshOptions('key'))
+
+  @mock.patch(vm_util.__name__ + '.RunningOnWindows', return_value=False)
+  def testNoConnectionReuse(self, _):
+    self.flags.ssh_reuse_connections = False
+    options = vm_util.GetSshOptions('key')
+    self.assertFalse(any(o.startswith('Control') for o in options))
+
+  @mock.patch(vm_util.__name__ + '.RunningOnWindows', return_value=True)
+  def testNoConnectionReuseOnWindows(self, _):
+    self.flags.ssh_reuse_connections = True
+    options = vm_util.GetSshOptions('key')
+    self.assertFalse(any(o.startswith('Control') for o in options))
+
+  @mock.patch(vm_util.__name__ + '.RunningOnWindows', return_value=False)
+  def testStartSshControlMaster(self, _):
+    self.flags.ssh_reuse_connections = True
+    with mock.patch(vm_util.__name__ + '.subprocess.Popen') as popen:
+      popen.return_value.wait.return_value = 0
+      self.assertTrue(vm_util.StartSshControlMaster('perfkit@1.2.3.4', 22,
+                                                    'key'))
+    cmd = popen.call_args[0][0]
+    # ssh uses the first value of an option.
+    self.assertLess(cmd.index('ControlMaster=yes'),
+                    cmd.index('ControlMaster=no'))
+    self.assertIn('ControlPersist=30m', cmd)
+    self.assertIn('-f', cmd)
+    # The master does not hold the pipes of any command.
+    kwargs = popen.call_args[1]
+    for stream in 'stdin', 'stdout', 'stderr':
+      self.assertEqual(os.devnull, kwargs[stream].name)
+
+  @mock.patch(vm_util.__name__ + '.RunningOnWindows', return_value=False)
+  def testStartSshControlMasterFailure(self, _):
+    self.flags.ssh_reuse_connections = True
+    with mock.patch(vm_util.__name__ + '.subprocess.Popen') as popen:
+      popen.return_value.wait.return_value = 255
+      self.assertFalse(vm_util.StartSshControlMaster('perfkit@1.2.3.4', 22,
+                                                     'key'))
+
 
 if __name__ == '__main__':
   unittest.main()
@@ -0,0 +1,103 @@
+#!/usr/bin/env python
+
+# Copyright 2016 PerfKitBenchmarker Authors. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Measures the startup time of pkb.py.
+
+Each scenario runs in a fresh interpreter, and performs everything pkb.py
+does before it creates any resource: importing PerfKitBenchmarker, parsing
+flags, looking up the requested benchmarks and loading their configs. The
+'help' scenario runs 'pkb.py --helpshort' instead. The mean, median and
+maximum wall time of each scenario are reported.
+
+By default the on-disk config cache (see configs.MINIMAL_CONFIG_CACHE_FILE)
+is left in place, so the warm-cache startup time is measured. Pass --cold to
+delete it before every run.
+"""
+
+import argparse
+import os
+import subprocess
+import sys
+import time
+
+REPO_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
+
+# Runs pkb.py up to the point where it starts provisioning resources.
+STARTUP_SNIPPET = """
+import sys
+from perfkitbenchmarker import benchmark_sets
+from perfkitbenchmarker import pkb
+pkb._ParseFlags(sys.argv)
+for benchmark_module, user_config in benchmark_sets.GetBenchmarksFromFlags():
+  benchmark_module.GetConfig(user_config)
+"""
+
+SCENARIOS = (
+    ('import', ['-c', 'import perfkitbenchmarker.pkb']),
+    ('ping', ['-c', STARTUP_SNIPPET, '--benchmarks=ping']),
+    # fio_jobfile is defined by the fio benchmark, so all modules have to be
+    # imported before the flags can be parsed.
+    ('ping+fio flag', ['-c', STARTUP_SNIPPET, '--benchmarks=ping',
+                       '--fio_jobfile=unused.job']),
+    ('standard set', ['-c', STARTUP_SNIPPET]),
+    ('help', [os.path.join(REPO_DIR, 'pkb.py'), '--helpshort']),
+)
+
+
+def _DeleteConfigCache():
+  sys.path.insert(0, REPO_DIR)
+  from perfkitbenchmarker import configs
+  if os.path.exists(configs.MINIMAL_CONFIG_CACHE_FILE):
+    os.remove(configs.MINIMAL_CONFIG_CACHE_FILE)
+
+
+def _TimeScenario(args, iterations, cold):
+  """Runs the interpreter with 'args' and returns the per-run durations."""
+  durations = []
+  with open(os.devnull, 'w') as devnull:
+    for _ in xrange(iterations):
+      if cold:
+        _DeleteConfigCache()
+      start = time.time()
+      # --helpshort exits with a non-zero status, so it is not checked.
+      subprocess.call([sys.executable] + args, cwd=REPO_DIR, stdout=devnull,
+                      stderr=devnull)
+      durations.append(time.time() - start)
+  return durations
+
+
+def _Summarize(name, durations):
+  durations = sorted(durations)
+  mean = sum(durations) / len(durations)
+  median = durations[len(durations) // 2]
+  print '{0:<14s} mean={1:8.1f}ms median={2:8.1f}ms max={3:8.1f}ms'.format(
+      name, mean * 1000, median * 1000, durations[-1] * 1000)
+
+
+def main():
+  parser = argparse.ArgumentParser(
+      description=__doc__,
+      formatter_class=argparse.RawDescriptionHelpFormatter)
+  parser.add_argument('--iterations', type=int, default=10)
+  parser.add_argument('--cold', action='store_true',
+                      help='Delete the config cache before every run.')
+  args = parser.parse_args()
+
+  for name, scenario_args in SCENARIOS:
+    _Summarize(name, _TimeScenario(scenario_args, args.iterations, args.cold))
+
+
+if __name__ == '__main__':
+  sys.exit(main())
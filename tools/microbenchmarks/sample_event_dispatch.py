@@ -0,0 +1,86 @@
+#!/usr/bin/env python
+
+# Copyright 2016 PerfKitBenchmarker Authors. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Measures the cost of annotating samples through events.
+
+Every receiver annotates every sample, as GceVirtualMachine.AnnotateSamples
+does for each VM. The samples are dispatched the way
+SampleCollector.AddSamples dispatches them:
+
+  per-sample: receivers are connected to events.sample_created, which is sent
+              once for each sample.
+  batch:      receivers are connected to events.samples_created, which is
+              sent once with all samples.
+"""
+
+import argparse
+import os
+import sys
+import time
+
+REPO_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
+
+
+class _Annotator(object):
+
+  def AnnotateSample(self, unused_sender, benchmark_spec, sample):
+    sample['metadata']['preemptible'] = False
+
+  def AnnotateSamples(self, unused_sender, benchmark_spec, samples):
+    for sample in samples:
+      sample['metadata']['preemptible'] = False
+
+
+def _SendPerSample(events, samples):
+  for sample in samples:
+    events.sample_created.send(benchmark_spec=None, sample=sample)
+
+
+def _SendBatch(events, samples):
+  events.samples_created.send(benchmark_spec=None, samples=samples)
+
+
+def main():
+  parser = argparse.ArgumentParser(
+      description=__doc__,
+      formatter_class=argparse.RawDescriptionHelpFormatter)
+  parser.add_argument('--samples', type=int, default=100000)
+  parser.add_argument('--receivers', type=int, default=50)
+  args = parser.parse_args()
+
+  sys.path.insert(0, REPO_DIR)
+  from perfkitbenchmarker import events
+
+  samples = [{'metadata': {}} for _ in xrange(args.samples)]
+  annotators = [_Annotator() for _ in xrange(args.receivers)]
+  scenarios = (('per-sample', events.sample_created, 'AnnotateSample',
+                _SendPerSample),
+               ('batch', events.samples_created, 'AnnotateSamples',
+                _SendBatch))
+  for name, signal, method_name, send in scenarios:
+    receivers = [getattr(annotator, method_name) for annotator in annotators]
+    for receiver in receivers:
+      signal.connect(receiver)
+    start = time.time()
+    send(events, samples)
+    elapsed = time.time() - start
+    for receiver in receivers:
+      signal.disconnect(receiver)
+    print '{0:<10s} {1:8.3f}s ({2:.2f}us per sample and receiver)'.format(
+        name, elapsed, elapsed * 1e6 / (args.samples * args.receivers))
+
+
+if __name__ == '__main__':
+  sys.exit(main())
@@ -0,0 +1,130 @@
+#!/usr/bin/env python
+
+# Copyright 2016 PerfKitBenchmarker Authors. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Measures the cost of annotating and publishing many samples.
+
+Samples of a synthetic benchmark spec with three VM groups (about 50 metadata
+keys) are added to a SampleCollector and published as newline-delimited JSON
+to a temporary file. Each scenario runs in a fresh interpreter, which reports
+its wall time and peak resident memory:
+
+  copied:  the metadata of the spec is computed for every sample and copied
+           into it, as DefaultMetadataProvider used to do.
+  layered: DefaultMetadataProvider computes the metadata of the spec once, and
+           every sample refers to it through a LayeredMetadata.
+"""
+
+import argparse
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+REPO_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
+
+SCENARIOS = 'copied', 'layered'
+
+
+class _FakeDisk(object):
+  disk_type = 'pd-ssd'
+  disk_size = 500
+  num_striped_disks = 1
+  iops = None
+  metadata = {'replication': 'zone', 'legacy_disk_type': 'remote_ssd',
+              'media': 'ssd', 'mount_point': '/scratch'}
+
+
+class _FakeVm(object):
+  CLOUD = 'GCP'
+  zone = 'us-central1-c'
+  image = 'ubuntu-14-04'
+  scratch_disks = [_FakeDisk()]
+
+  def GetMachineTypeDict(self):
+    return {'machine_type': 'custom-16-61440', 'cpus': 16,
+            'memory_mib': 61440, 'preemptible': False}
+
+
+class _FakeSpec(object):
+  uuid = 'abcd1234-0000'
+  vm_groups = {'default': [_FakeVm()] * 3, 'clients': [_FakeVm()] * 4,
+               'servers': [_FakeVm()] * 2}
+
+
+def _RunScenario(scenario, num_samples):
+  """Adds and publishes 'num_samples' samples, then prints its costs."""
+  sys.path.insert(0, REPO_DIR)
+  from perfkitbenchmarker import flags
+  from perfkitbenchmarker import pkb  # noqa: defines flags used below.
+  from perfkitbenchmarker import publisher
+  from perfkitbenchmarker import sample
+
+  class CopyingMetadataProvider(publisher.DefaultMetadataProvider):
+
+    def AddMetadata(self, metadata, benchmark_spec):
+      metadata = metadata.copy()
+      metadata.update(self._GetSpecMetadata(benchmark_spec))
+      return metadata
+
+  flags.FLAGS([sys.argv[0]])
+  if scenario == 'copied':
+    provider = CopyingMetadataProvider()
+  else:
+    provider = publisher.DefaultMetadataProvider()
+  output = tempfile.NamedTemporaryFile(suffix='.json')
+  collector = publisher.SampleCollector(
+      metadata_providers=[provider],
+      publishers=[publisher.NewlineDelimitedJSONPublisher(output.name)],
+      incremental=False)
+  spec = _FakeSpec()
+  batch_size = 1000
+  start = time.time()
+  for i in xrange(0, num_samples, batch_size):
+    collector.AddSamples(
+        [sample.Sample('latency', j, 'ms', {'percentile': j % 100})
+         for j in xrange(i, min(i + batch_size, num_samples))],
+        'synthetic', spec)
+  added = time.time()
+  collector.PublishSamples()
+  published = time.time()
+  output.close()
+  max_rss_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+  print ('{0:<8s} add={1:7.2f}s publish={2:7.2f}s '
+         'max_rss={3:8.1f}MiB'.format(scenario, added - start,
+                                      published - added, max_rss_kb / 1024.0))
+
+
+def main():
+  parser = argparse.ArgumentParser(
+      description=__doc__,
+      formatter_class=argparse.RawDescriptionHelpFormatter)
+  parser.add_argument('--samples', type=int, default=1000000)
+  parser.add_argument('--scenario', choices=SCENARIOS,
+                      help='Run a single scenario in this interpreter.')
+  args = parser.parse_args()
+
+  if args.scenario:
+    _RunScenario(args.scenario, args.samples)
+    return
+  for scenario in SCENARIOS:
+    subprocess.check_call([sys.executable, os.path.abspath(__file__),
+                           '--samples', str(args.samples),
+                           '--scenario', scenario])
+
+
+if __name__ == '__main__':
+  sys.exit(main())
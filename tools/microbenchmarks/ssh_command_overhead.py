@@ -0,0 +1,199 @@
+#!/usr/bin/env python
+
+# Copyright 2016 PerfKitBenchmarker Authors. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Measures the per-command overhead of ssh with and without multiplexing.
+
+Runs a trivial command ('true') repeatedly over ssh, first with a full
+handshake per command (the behavior of --nossh_reuse_connections), then
+through a ControlMaster connection (--ssh_reuse_connections), and reports the
+mean, median and maximum wall time per command for each mode.
+
+By default a throwaway sshd is started on a free local port, using freshly
+generated host and client keys, so that no VM or existing sshd configuration
+is required. Pass --host to measure against an existing server instead.
+"""
+
+import argparse
+import contextlib
+import os
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+
+SSHD_CANDIDATES = ('sshd', '/usr/sbin/sshd', '/usr/local/sbin/sshd')
+SSHD_CONFIG = """\
+Port {port}
+ListenAddress 127.0.0.1
+HostKey {host_key}
+AuthorizedKeysFile {authorized_keys}
+PidFile {pid_file}
+StrictModes no
+UsePAM no
+PasswordAuthentication no
+"""
+
+# Mirrors the options built by vm_util.GetSshOptions.
+BASE_SSH_OPTIONS = [
+    '-2',
+    '-o', 'UserKnownHostsFile=/dev/null',
+    '-o', 'StrictHostKeyChecking=no',
+    '-o', 'IdentitiesOnly=yes',
+    '-o', 'PreferredAuthentications=publickey',
+    '-o', 'PasswordAuthentication=no',
+    '-o', 'ConnectTimeout=5',
+    '-o', 'GSSAPIAuthentication=no',
+    '-o', 'LogLevel=ERROR',
+]
+
+
+def _FindSshd():
+  for candidate in SSHD_CANDIDATES:
+    for directory in [''] + os.environ.get('PATH', '').split(os.pathsep):
+      path = os.path.join(directory, candidate)
+      if os.path.isfile(path) and os.access(path, os.X_OK):
+        return path
+  return None
+
+
+def _GetFreePort():
+  sock = socket.socket()
+  sock.bind(('127.0.0.1', 0))
+  port = sock.getsockname()[1]
+  sock.close()
+  return port
+
+
+def _KeyGen(path):
+  subprocess.check_call(['ssh-keygen', '-t', 'rsa', '-N', '', '-q',
+                         '-f', path])
+
+
+@contextlib.contextmanager
+def _LocalSshd(work_dir):
+  """Starts an unprivileged sshd on localhost.
+
+  Yields:
+    (host, port, user, private key path) tuple.
+  """
+  sshd = _FindSshd()
+  if not sshd:
+    raise SystemExit('No sshd binary found. Install openssh-server or pass '
+                     '--host to use an existing server.')
+  host_key = os.path.join(work_dir, 'host_key')
+  client_key = os.path.join(work_dir, 'client_key')
+  _KeyGen(host_key)
+  _KeyGen(client_key)
+  authorized_keys = os.path.join(work_dir, 'authorized_keys')
+  shutil.copy(client_key + '.pub', authorized_keys)
+  port = _GetFreePort()
+  config_path = os.path.join(work_dir, 'sshd_config')
+  with open(config_path, 'w') as fp:
+    fp.write(SSHD_CONFIG.format(port=port, host_key=host_key,
+                                authorized_keys=authorized_keys,
+                                pid_file=os.path.join(work_dir, 'sshd.pid')))
+  process = subprocess.Popen([sshd, '-D', '-e', '-f', config_path])
+  try:
+    deadline = time.time() + 10
+    while time.time() < deadline:
+      try:
+        socket.create_connection(('127.0.0.1', port), 1).close()
+        break
+      except socket.error:
+        time.sleep(0.05)
+    yield '127.0.0.1', port, os.environ.get('USER', 'root'), client_key
+  finally:
+    process.terminate()
+    process.wait()
+
+
+@contextlib.contextmanager
+def _ExistingServer(host, port, user, key):
+  yield host, port, user, key
+
+
+def _TimeCommands(ssh_cmd, iterations):
+  """Runs 'ssh_cmd' 'iterations' times and returns the per-call durations."""
+  durations = []
+  with open(os.devnull, 'w') as devnull:
+    for _ in xrange(iterations):
+      start = time.time()
+      subprocess.check_call(ssh_cmd, stdout=devnull)
+      durations.append(time.time() - start)
+  return durations
+
+
+def _Summarize(name, durations):
+  durations = sorted(durations)
+  mean = sum(durations) / len(durations)
+  median = durations[len(durations) // 2]
+  print '{0:<12s} mean={1:8.2f}ms median={2:8.2f}ms max={3:8.2f}ms'.format(
+      name, mean * 1000, median * 1000, durations[-1] * 1000)
+  return mean
+
+
+def main():
+  parser = argparse.ArgumentParser(
+      description=__doc__,
+      formatter_class=argparse.RawDescriptionHelpFormatter)
+  parser.add_argument('--host', help='Existing SSH server to measure against. '
+                      'If omitted, a local sshd is started.')
+  parser.add_argument('--port', type=int, default=22)
+  parser.add_argument('--user', default=os.environ.get('USER'))
+  parser.add_argument('--key', help='Private key to use with --host.')
+  parser.add_argument('--iterations', type=int, default=50)
+  args = parser.parse_args()
+
+  work_dir = tempfile.mkdtemp(prefix='pkb-ssh-overhead')
+  try:
+    if args.host:
+      server = _ExistingServer(args.host, args.port, args.user, args.key)
+    else:
+      server = _LocalSshd(work_dir)
+    with server as (host, port, user, key):
+      ssh_cmd = ['ssh', '-p', str(port), '%s@%s' % (user, host)]
+      ssh_cmd.extend(BASE_SSH_OPTIONS)
+      if key:
+        ssh_cmd.extend(['-i', key])
+      control_options = ['-o', 'ControlMaster=no',
+                         '-o', 'ControlPath=%s' % os.path.join(work_dir, '%C')]
+
+      baseline = _Summarize(
+          'handshake', _TimeCommands(ssh_cmd + ['true'], args.iterations))
+      multiplexed_cmd = ssh_cmd + control_options
+      # Start the master outside of the timed loop, as
+      # vm_util.StartSshControlMaster does.
+      with open(os.devnull, 'r+') as devnull:
+        subprocess.check_call(
+            ssh_cmd[:1] + ['-f', '-N', '-o', 'ControlMaster=yes',
+                           '-o', 'ControlPersist=1m'] + multiplexed_cmd[1:],
+            stdin=devnull, stdout=devnull, stderr=devnull)
+      try:
+        reused = _Summarize(
+            'multiplexed',
+            _TimeCommands(multiplexed_cmd + ['true'], args.iterations))
+      finally:
+        with open(os.devnull, 'w') as devnull:
+          subprocess.call(multiplexed_cmd[:1] + ['-O', 'exit'] +
+                          multiplexed_cmd[1:], stderr=devnull)
+      print 'Speedup: {0:.1f}x'.format(baseline / reused)
+  finally:
+    shutil.rmtree(work_dir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+  sys.exit(main())